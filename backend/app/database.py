@@ -78,4 +78,14 @@ async def init_db():
         except Exception:
             pass  # Table doesn't exist yet, create_all will handle it
 
+        # Migration: Add runner_registration column to job_queue (multi-slot runners)
+        try:
+            result = await conn.execute(text("PRAGMA table_info(job_queue)"))
+            columns = {row[1] for row in result.fetchall()}
+
+            if columns and "runner_registration" not in columns:
+                await conn.execute(text("ALTER TABLE job_queue ADD COLUMN runner_registration TEXT"))
+        except Exception:
+            pass  # Table doesn't exist yet, create_all will handle it
+
         await conn.run_sync(Base.metadata.create_all)
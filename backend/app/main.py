@@ -26,7 +26,10 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     from app.database import engine, async_session
     from app.services.runner_pool import runner_pool
+    from app.services.job_queue import job_queue
+    from app.services.job_store import JobStore, JobStoreError
     from app.services.playground_service import playground_service
+    from app.services.git_maintenance import git_maintenance
     from app.services.execution import recover_orphaned_executions
 
     await init_db()
@@ -39,11 +42,24 @@ async def lifespan(app: FastAPI):
                 f"Recovered {len(recovered)} orphaned step executions on startup"
             )
 
+    # Put back jobs that were queued or running when the backend stopped
+    for job, runner_id, runner_type, registration in await job_queue.attach_store(JobStore(async_session)):
+        if runner_id:
+            runner_pool.restore_assignment(runner_id, job, runner_type, registration)
+        else:
+            await job_queue.enqueue(job)
+
     await runner_pool.start()
     await playground_service.start()
+    await git_maintenance.start()
     yield
+    await git_maintenance.stop()
     await playground_service.stop()
     await runner_pool.stop()
+    try:
+        await job_queue.flush()
+    except JobStoreError as e:
+        logging.getLogger(__name__).error(f"Job queue not fully persisted on shutdown: {e}")
     await engine.dispose()
 
 
@@ -1068,6 +1068,16 @@ def list_branches(repo_id: str) -> dict:
         return response.json()
 
 
+def _diff_params(client: httpx.Client, repo_id: str, head_branch: str, base_branch: str) -> dict | None:
+    """Query params for the diff endpoints; None if the repo doesn't exist."""
+    if not base_branch:
+        response = client.get(f"/api/repos/{repo_id}")
+        if response.status_code != 200:
+            return None
+        base_branch = response.json().get("default_branch") or "main"
+    return {"base": base_branch, "head": head_branch}
+
+
 @mcp.tool()
 def get_diff(
     repo_id: str,
@@ -1075,19 +1085,20 @@ def get_diff(
     base_branch: str = ""
 ) -> dict:
     """
-    Get the diff between two branches.
+    Get the files changed between two branches.
 
     Args:
         repo_id: The repository ID
         head_branch: The branch with changes
         base_branch: The branch to compare against (default: repo's default branch)
 
-    Returns file diffs with additions, deletions, and patch content.
+    Returns the changed files with their status, additions and deletions,
+    plus totals - no patch content. Use get_file_diff for a file's patch.
     """
     with _get_client() as client:
-        params = {"head_branch": head_branch}
-        if base_branch:
-            params["base_branch"] = base_branch
+        params = _diff_params(client, repo_id, head_branch, base_branch)
+        if params is None:
+            return {"error": f"Repo {repo_id} not found"}
 
         response = client.get(f"/api/repos/{repo_id}/diff", params=params)
         if response.status_code == 404:
@@ -1100,6 +1111,41 @@ def get_diff(
         return response.json()
 
 
+@mcp.tool()
+def get_file_diff(
+    repo_id: str,
+    head_branch: str,
+    path: str,
+    base_branch: str = ""
+) -> dict:
+    """
+    Get the patch of one file between two branches.
+
+    Args:
+        repo_id: The repository ID
+        head_branch: The branch with changes
+        path: The file's path, as listed by get_diff
+        base_branch: The branch to compare against (default: repo's default branch)
+
+    Returns the file's unified diff; very large patches are truncated.
+    """
+    with _get_client() as client:
+        params = _diff_params(client, repo_id, head_branch, base_branch)
+        if params is None:
+            return {"error": f"Repo {repo_id} not found"}
+        params["path"] = path
+
+        response = client.get(f"/api/repos/{repo_id}/diff/file", params=params)
+        if response.status_code == 404:
+            return {"error": f"Repo or branch not found"}
+        if response.status_code == 400:
+            error_detail = response.json().get("detail", "Bad request")
+            return {"error": error_detail}
+        if response.status_code != 200:
+            return {"error": f"Failed to get file diff: {response.text}"}
+        return response.json()
+
+
 # =============================================================================
 # Repo-Defined Assets (.lazyaf) Tools
 # =============================================================================
@@ -1,6 +1,6 @@
 from app.models.repo import Repo
 from app.models.card import Card, CardStatus, RunnerType, StepType
-from app.models.job import Job, JobStatus
+from app.models.job import Job, JobStatus, QueuedJobRecord, QueueState
 from app.models.runner import Runner, RunnerStatus
 from app.models.agent_file import AgentFile
 from app.models.pipeline import Pipeline, PipelineRun, StepRun, RunStatus, StepExecution, StepExecutionStatus
@@ -13,6 +13,8 @@ __all__ = [
     "StepType",
     "Job",
     "JobStatus",
+    "QueuedJobRecord",
+    "QueueState",
     "Runner",
     "RunnerStatus",
     "AgentFile",
@@ -2,7 +2,7 @@ from datetime import datetime
 from enum import Enum
 from uuid import uuid4
 
-from sqlalchemy import String, DateTime, Text, ForeignKey
+from sqlalchemy import String, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
@@ -40,3 +40,31 @@ class Job(Base):
     test_output: Mapped[str | None] = mapped_column(Text, nullable=True)  # Raw test output
     # Pipeline step reference (Phase 9)
     step_run_id: Mapped[str | None] = mapped_column(String(36), nullable=True)  # FK to step_runs when job is part of pipeline
+
+
+class QueueState(str, Enum):
+    QUEUED = "queued"
+    ASSIGNED = "assigned"
+
+
+class QueuedJobRecord(Base):
+    """
+    A job in the runner job queue, persisted so a restart can rehydrate it.
+
+    Rows are written by services/job_store.py and deleted once the runner
+    reports back; payload holds the serialized QueuedJob.
+    """
+    __tablename__ = "job_queue"
+    __table_args__ = (
+        Index("ix_job_queue_claim", "state", "runner_type", "created_at"),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)  # Job ID
+    state: Mapped[str] = mapped_column(String(20), default=QueueState.QUEUED.value)
+    runner_type: Mapped[str] = mapped_column(String(50), default="any")  # Requested runner type
+    runner_id: Mapped[str | None] = mapped_column(String(36), nullable=True)  # Set while assigned
+    assigned_runner_type: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    runner_registration: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON: name, slots, capacity
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    assigned_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
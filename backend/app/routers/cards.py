@@ -11,9 +11,10 @@ from app.config import get_settings
 from app.database import get_db
 from app.models import Card, Repo, Job, AgentFile
 from app.schemas import CardCreate, CardRead, CardUpdate
+from app.services.git.diff import DIFF_MAX_BYTES, DIFF_MAX_LINES
 from app.services.job_queue import job_queue, QueuedJob
 from app.services.websocket import manager
-from app.services.git_server import git_repo_manager
+from app.services.git_server import git_repo_manager, git_workers
 
 router = APIRouter(tags=["cards"])
 
@@ -92,6 +93,46 @@ async def list_cards(
     return result.scalars().all()
 
 
+@router.get("/api/repos/{repo_id}/cards/diffstat")
+async def get_cards_diffstat(
+    repo_id: str,
+    include_pipeline_cards: bool = Query(False, description="Include cards created by pipelines"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get files changed and +/- line counts for every card branch in one call.
+
+    Returns {card_id: {"files_changed", "additions", "deletions", ...}} for
+    cards that have a branch; cards whose branch is missing map to {"error": ...}.
+    """
+    result = await db.execute(select(Repo).where(Repo.id == repo_id))
+    repo = result.scalar_one_or_none()
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repo not found")
+
+    if not repo.is_ingested:
+        raise HTTPException(status_code=400, detail="Repo is not ingested")
+
+    query = select(Card).where(Card.repo_id == repo_id, Card.branch_name != None)  # noqa: E711
+    if not include_pipeline_cards:
+        query = query.where(Card.pipeline_run_id == None)  # noqa: E711
+    result = await db.execute(query)
+    cards = result.scalars().all()
+    if not cards:
+        return {}
+
+    diffstats = await git_workers.run(
+        git_repo_manager.get_diffstats,
+        repo_id,
+        repo.default_branch,
+        sorted({card.branch_name for card in cards}),
+    )
+
+    if "error" in diffstats and diffstats["error"]:
+        raise HTTPException(status_code=400, detail=diffstats["error"])
+
+    return {card.id: diffstats["stats"][card.branch_name] for card in cards}
+
+
 @router.post("/api/repos/{repo_id}/cards", response_model=CardRead, status_code=201)
 async def create_card(repo_id: str, card: CardCreate, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(Repo).where(Repo.id == repo_id))
@@ -313,7 +354,8 @@ async def approve_card(
         target_branch = request.target_branch or repo.default_branch
 
         # Perform the merge
-        merge_result = git_repo_manager.merge_branch(
+        merge_result = await git_workers.run(
+            git_repo_manager.merge_branch,
             repo_id=repo.id,
             source_branch=card.branch_name,
             target_branch=target_branch
@@ -406,7 +448,8 @@ async def resolve_conflicts(
         raise HTTPException(status_code=400, detail="No conflict resolutions provided")
 
     # Apply conflict resolutions and merge
-    merge_result = git_repo_manager.resolve_and_merge(
+    merge_result = await git_workers.run(
+        git_repo_manager.resolve_and_merge,
         repo_id=repo.id,
         source_branch=card.branch_name,
         target_branch=target_branch,
@@ -571,7 +614,8 @@ async def rebase_card_branch(
     onto_branch = request.onto_branch or repo.default_branch
 
     # Perform the rebase
-    rebase_result = git_repo_manager.rebase_branch(
+    rebase_result = await git_workers.run(
+        git_repo_manager.rebase_branch,
         repo_id=repo.id,
         branch_name=card.branch_name,
         onto_branch=onto_branch
@@ -623,7 +667,48 @@ async def get_card_diff(
         raise HTTPException(status_code=400, detail="Repo is not ingested")
 
     # Get diff between default branch and card's branch
-    diff = git_repo_manager.get_diff(repo.id, repo.default_branch, card.branch_name)
+    diff = await git_workers.run(git_repo_manager.get_diff, repo.id, repo.default_branch, card.branch_name)
+
+    if "error" in diff and diff["error"]:
+        raise HTTPException(status_code=400, detail=diff["error"])
+
+    return diff
+
+
+@router.get("/api/cards/{card_id}/diff/file")
+async def get_card_file_diff(
+    card_id: str,
+    path: str,
+    max_lines: int = DIFF_MAX_LINES,
+    max_bytes: int = DIFF_MAX_BYTES,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the diff of one file on a card's branch, capped at max_lines/max_bytes."""
+    result = await db.execute(select(Card).where(Card.id == card_id))
+    card = result.scalar_one_or_none()
+    if not card:
+        raise HTTPException(status_code=404, detail="Card not found")
+
+    if not card.branch_name:
+        raise HTTPException(status_code=400, detail="Card has no branch")
+
+    result = await db.execute(select(Repo).where(Repo.id == card.repo_id))
+    repo = result.scalar_one_or_none()
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repo not found")
+
+    if not repo.is_ingested:
+        raise HTTPException(status_code=400, detail="Repo is not ingested")
+
+    diff = await git_workers.run(
+        git_repo_manager.get_file_diff,
+        repo.id,
+        repo.default_branch,
+        card.branch_name,
+        path,
+        max_lines=max_lines,
+        max_bytes=max_bytes,
+    )
 
     if "error" in diff and diff["error"]:
         raise HTTPException(status_code=400, detail=diff["error"])
@@ -671,7 +756,8 @@ async def resolve_rebase_conflicts(
         raise HTTPException(status_code=400, detail="No conflict resolutions provided")
 
     # Apply conflict resolutions and complete rebase
-    rebase_result = git_repo_manager.resolve_rebase_conflicts(
+    rebase_result = await git_workers.run(
+        git_repo_manager.resolve_rebase_conflicts,
         repo_id=repo.id,
         branch_name=card.branch_name,
         onto_branch=onto_branch,
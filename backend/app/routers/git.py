@@ -4,14 +4,18 @@ Git HTTP smart protocol endpoints.
 Implements the server side of git clone/fetch/push over HTTP.
 """
 
+import asyncio
 import gzip
+import zlib
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.services.git_server import git_backend, git_repo_manager
+from app.services.git.protocol import protocol_version
+from app.services.git_server import git_backend, git_repo_manager, git_workers
 
 router = APIRouter(prefix="/git", tags=["git"])
 
@@ -40,9 +44,62 @@ async def get_request_body(request: Request) -> bytes:
     return body
 
 
+class RequestBodyReader:
+    """
+    Blocking, file-like view of a streamed request body.
+
+    Meant to be read from a git worker thread: each read pulls chunks from
+    the event loop as needed, so only a chunk or two of the body is held in
+    memory at a time. gzip bodies are decompressed incrementally.
+    """
+
+    def __init__(self, request: Request):
+        self._loop = asyncio.get_running_loop()
+        self._chunks = request.stream()
+        self._gzip = request.headers.get("content-encoding", "").lower() == "gzip"
+        self._decoder = None
+        self._started = False
+        self._buffer = bytearray()
+        self._eof = False
+        self.bytes_received = 0
+
+    async def _next_chunk(self) -> bytes | None:
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def _fill(self) -> None:
+        chunk = asyncio.run_coroutine_threadsafe(self._next_chunk(), self._loop).result()
+        if chunk is None:
+            self._eof = True
+            if self._decoder is not None:
+                self._buffer += self._decoder.flush()
+            return
+        self.bytes_received += len(chunk)
+        if not self._started:
+            self._started = True
+            if self._gzip or chunk[:2] == b"\x1f\x8b":
+                self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self._decoder is not None:
+            chunk = self._decoder.decompress(chunk)
+        self._buffer += chunk
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to size bytes (all remaining if negative), blocking until available."""
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            self._fill()
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
 @router.get("/{repo_id}.git/info/refs")
 async def get_info_refs(
     repo_id: str,
+    request: Request,
     service: str = Query(..., description="git-upload-pack or git-receive-pack"),
 ):
     """
@@ -50,6 +107,9 @@ async def get_info_refs(
 
     GET /git/{repo_id}.git/info/refs?service=git-upload-pack  (clone/fetch)
     GET /git/{repo_id}.git/info/refs?service=git-receive-pack (push)
+
+    Clients sending "Git-Protocol: version=2" get the v2 capability
+    advertisement for upload-pack instead of every ref.
     """
     if not git_repo_manager.repo_exists(repo_id):
         raise HTTPException(status_code=404, detail="Repository not found")
@@ -58,7 +118,8 @@ async def get_info_refs(
         raise HTTPException(status_code=400, detail="Invalid service")
 
     try:
-        content, content_type = git_backend.get_info_refs(repo_id, service)
+        version = protocol_version(request.headers.get("git-protocol"))
+        content, content_type = await git_workers.run(git_backend.get_info_refs, repo_id, service, version)
         return Response(
             content=content,
             media_type=content_type,
@@ -84,12 +145,15 @@ async def git_upload_pack(repo_id: str, request: Request):
         raise HTTPException(status_code=404, detail="Repository not found")
 
     body = await get_request_body(request)
-    print(f"[git] upload-pack request: {len(body)} bytes")
+    version = protocol_version(request.headers.get("git-protocol"))
+    print(f"[git] upload-pack request: {len(body)} bytes (protocol v{version})")
 
     try:
-        result = git_backend.handle_upload_pack(repo_id, body)
-        return Response(
-            content=result,
+        # Pack frames are generated as objects are compressed, so the client
+        # starts receiving data before the whole pack has been built
+        frames = await git_workers.run(git_backend.stream_upload_pack, repo_id, body, version)
+        return StreamingResponse(
+            git_workers.iterate(frames),
             media_type="application/x-git-upload-pack-result",
             headers={
                 "Cache-Control": "no-cache",
@@ -117,10 +181,13 @@ async def git_receive_pack(repo_id: str, request: Request, db: AsyncSession = De
     if not git_repo_manager.repo_exists(repo_id):
         raise HTTPException(status_code=404, detail="Repository not found")
 
-    body = await get_request_body(request)
+    # The pack is streamed from the request into objects/pack by a git
+    # worker instead of being buffered (and decompressed) in memory first
+    body = RequestBodyReader(request)
 
     try:
-        result = git_backend.handle_receive_pack(repo_id, body)
+        result = await git_workers.run(git_backend.handle_receive_pack, repo_id, body)
+        print(f"[git] receive-pack request: {body.bytes_received} bytes")
         output = result["output"]
         pushed_refs = result.get("pushed_refs", [])
 
@@ -160,7 +227,7 @@ async def get_head(repo_id: str):
     if not git_repo_manager.repo_exists(repo_id):
         raise HTTPException(status_code=404, detail="Repository not found")
 
-    default_branch = git_repo_manager.get_default_branch(repo_id)
+    default_branch = await git_workers.run(git_repo_manager.get_default_branch, repo_id)
     if default_branch:
         content = f"ref: refs/heads/{default_branch}\n"
     else:
@@ -204,3 +271,9 @@ async def handle_push_event(
         "triggered_runs": len(runs),
         "run_ids": [r.id for r in runs],
     }
+
+
+@router.get("/workers")
+async def git_worker_status():
+    """Git worker pool status: concurrency limit, queue depth and totals."""
+    return git_workers.stats()
@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import Job, Card
 from app.schemas import JobRead
+from app.services.job_queue import job_queue
 from app.services.runner_pool import runner_pool
 from app.services.websocket import manager
 
@@ -53,6 +54,8 @@ async def cancel_job(job_id: str, db: AsyncSession = Depends(get_db)):
     if job.status not in ("queued", "running"):
         raise HTTPException(status_code=400, detail="Job cannot be cancelled")
 
+    # Jobs no runner has taken yet are dropped from the queue
+    await job_queue.cancel(job_id)
     # TODO: Actually cancel the job on the runner
     job.status = "failed"
     job.error = "Cancelled by user"
@@ -7,15 +7,15 @@ Reads pipelines and agents from the repository's .lazyaf/ directory:
 """
 
 import json
-import yaml
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models import Repo, Pipeline, PipelineRun
-from app.services.git_server import git_repo_manager
+from app.services.git_server import git_repo_manager, git_workers
 from app.services.pipeline_executor import pipeline_executor
+from app.services.lazyaf_index import AGENTS_DIR, PIPELINES_DIR
 from app.schemas.lazyaf_yaml import (
     AgentYaml,
     PipelineYaml,
@@ -35,6 +35,28 @@ async def get_repo_or_404(db: AsyncSession, repo_id: str) -> Repo:
     return repo
 
 
+def _agent_response(agent: AgentYaml, branch: str, filename: str) -> RepoAgentResponse:
+    return RepoAgentResponse(
+        name=agent.name,
+        description=agent.description,
+        prompt_template=agent.prompt_template,
+        source="repo",
+        branch=branch,
+        filename=filename,
+    )
+
+
+def _pipeline_response(pipeline: PipelineYaml, branch: str, filename: str) -> RepoPipelineResponse:
+    return RepoPipelineResponse(
+        name=pipeline.name,
+        description=pipeline.description,
+        steps=[step.model_dump() for step in pipeline.steps],
+        source="repo",
+        branch=branch,
+        filename=filename,
+    )
+
+
 @router.get("/agents", response_model=list[RepoAgentResponse])
 async def list_repo_agents(
     repo_id: str,
@@ -52,40 +74,17 @@ async def list_repo_agents(
     if not target_branch:
         return []
 
-    # List .lazyaf/agents/ directory
-    files = git_repo_manager.list_directory(repo_id, target_branch, ".lazyaf/agents")
+    # Compiled .lazyaf/ index for the branch; malformed files are skipped
+    config = await git_workers.run(git_repo_manager.get_lazyaf_config, repo_id, target_branch)
 
-    if not files:
+    if not config:
         return []
 
-    agents = []
-    for filename in files:
-        if not (filename.endswith('.yaml') or filename.endswith('.yml')):
-            continue
-
-        content = git_repo_manager.get_file_content(
-            repo_id, target_branch, f".lazyaf/agents/{filename}"
-        )
-        if not content:
-            continue
-
-        try:
-            data = yaml.safe_load(content.decode('utf-8'))
-            agent = AgentYaml(**data)
-            agents.append(RepoAgentResponse(
-                name=agent.name,
-                description=agent.description,
-                prompt_template=agent.prompt_template,
-                source="repo",
-                branch=target_branch,
-                filename=filename,
-            ))
-        except Exception as e:
-            # Log but continue - skip malformed files
-            print(f"[lazyaf_files] Error parsing {filename}: {e}")
-            continue
-
-    return agents
+    return [
+        _agent_response(compiled.model, target_branch, filename)
+        for filename, compiled in config.agents.items()
+        if compiled.model
+    ]
 
 
 @router.get("/agents/{agent_name}", response_model=RepoAgentResponse)
@@ -107,27 +106,15 @@ async def get_repo_agent(
         raise HTTPException(status_code=404, detail="Agent not found")
 
     # Try both .yaml and .yml extensions
-    for ext in ['.yaml', '.yml']:
-        filename = f"{agent_name}{ext}"
-        content = git_repo_manager.get_file_content(
-            repo_id, target_branch, f".lazyaf/agents/{filename}"
-        )
-        if content:
-            try:
-                data = yaml.safe_load(content.decode('utf-8'))
-                agent = AgentYaml(**data)
-                return RepoAgentResponse(
-                    name=agent.name,
-                    description=agent.description,
-                    prompt_template=agent.prompt_template,
-                    source="repo",
-                    branch=target_branch,
-                    filename=filename,
-                )
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Error parsing agent file: {e}")
-
-    raise HTTPException(status_code=404, detail="Agent not found")
+    config = await git_workers.run(git_repo_manager.get_lazyaf_config, repo_id, target_branch)
+    compiled = config.find(AGENTS_DIR, agent_name) if config else None
+
+    if not compiled:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    if compiled.error:
+        raise HTTPException(status_code=500, detail=f"Error parsing agent file: {compiled.error}")
+
+    return _agent_response(compiled.model, target_branch, compiled.filename)
 
 
 @router.get("/pipelines", response_model=list[RepoPipelineResponse])
@@ -147,40 +134,17 @@ async def list_repo_pipelines(
     if not target_branch:
         return []
 
-    # List .lazyaf/pipelines/ directory
-    files = git_repo_manager.list_directory(repo_id, target_branch, ".lazyaf/pipelines")
+    # Compiled .lazyaf/ index for the branch; malformed files are skipped
+    config = await git_workers.run(git_repo_manager.get_lazyaf_config, repo_id, target_branch)
 
-    if not files:
+    if not config:
         return []
 
-    pipelines = []
-    for filename in files:
-        if not (filename.endswith('.yaml') or filename.endswith('.yml')):
-            continue
-
-        content = git_repo_manager.get_file_content(
-            repo_id, target_branch, f".lazyaf/pipelines/{filename}"
-        )
-        if not content:
-            continue
-
-        try:
-            data = yaml.safe_load(content.decode('utf-8'))
-            pipeline = PipelineYaml(**data)
-            pipelines.append(RepoPipelineResponse(
-                name=pipeline.name,
-                description=pipeline.description,
-                steps=[step.model_dump() for step in pipeline.steps],
-                source="repo",
-                branch=target_branch,
-                filename=filename,
-            ))
-        except Exception as e:
-            # Log but continue - skip malformed files
-            print(f"[lazyaf_files] Error parsing {filename}: {e}")
-            continue
-
-    return pipelines
+    return [
+        _pipeline_response(compiled.model, target_branch, filename)
+        for filename, compiled in config.pipelines.items()
+        if compiled.model
+    ]
 
 
 @router.get("/pipelines/{pipeline_name}", response_model=RepoPipelineResponse)
@@ -202,27 +166,15 @@ async def get_repo_pipeline(
         raise HTTPException(status_code=404, detail="Pipeline not found")
 
     # Try both .yaml and .yml extensions
-    for ext in ['.yaml', '.yml']:
-        filename = f"{pipeline_name}{ext}"
-        content = git_repo_manager.get_file_content(
-            repo_id, target_branch, f".lazyaf/pipelines/{filename}"
-        )
-        if content:
-            try:
-                data = yaml.safe_load(content.decode('utf-8'))
-                pipeline = PipelineYaml(**data)
-                return RepoPipelineResponse(
-                    name=pipeline.name,
-                    description=pipeline.description,
-                    steps=[step.model_dump() for step in pipeline.steps],
-                    source="repo",
-                    branch=target_branch,
-                    filename=filename,
-                )
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Error parsing pipeline file: {e}")
-
-    raise HTTPException(status_code=404, detail="Pipeline not found")
+    config = await git_workers.run(git_repo_manager.get_lazyaf_config, repo_id, target_branch)
+    compiled = config.find(PIPELINES_DIR, pipeline_name) if config else None
+
+    if not compiled:
+        raise HTTPException(status_code=404, detail="Pipeline not found")
+    if compiled.error:
+        raise HTTPException(status_code=500, detail=f"Error parsing pipeline file: {compiled.error}")
+
+    return _pipeline_response(compiled.model, target_branch, compiled.filename)
 
 
 @router.post("/pipelines/{pipeline_name}/run")
@@ -243,23 +195,15 @@ async def run_repo_pipeline(
     if not target_branch:
         raise HTTPException(status_code=400, detail="No branch specified and repo has no default branch")
 
-    # Find and parse the pipeline
-    pipeline_data = None
-    for ext in ['.yaml', '.yml']:
-        filename = f"{pipeline_name}{ext}"
-        content = git_repo_manager.get_file_content(
-            repo_id, target_branch, f".lazyaf/pipelines/{filename}"
-        )
-        if content:
-            try:
-                data = yaml.safe_load(content.decode('utf-8'))
-                pipeline_data = PipelineYaml(**data)
-                break
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Error parsing pipeline file: {e}")
-
-    if not pipeline_data:
+    # Find the compiled pipeline
+    config = await git_workers.run(git_repo_manager.get_lazyaf_config, repo_id, target_branch)
+    compiled = config.find(PIPELINES_DIR, pipeline_name) if config else None
+
+    if not compiled:
         raise HTTPException(status_code=404, detail="Pipeline not found in repo")
+    if compiled.error:
+        raise HTTPException(status_code=500, detail=f"Error parsing pipeline file: {compiled.error}")
+    pipeline_data = compiled.model
 
     # Check if a platform pipeline with same name exists for this repo
     result = await db.execute(
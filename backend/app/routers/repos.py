@@ -5,7 +5,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import Repo
 from app.schemas import RepoCreate, RepoRead, RepoUpdate, RepoIngest
-from app.services.git_server import git_repo_manager
+from app.services.git.diff import DIFF_MAX_BYTES, DIFF_MAX_LINES
+from app.services.git_server import git_repo_manager, git_workers
 from app.services.websocket import manager
 
 router = APIRouter(prefix="/api/repos", tags=["repos"])
@@ -64,14 +65,14 @@ async def ingest_repo(repo: RepoCreate, request: Request, db: AsyncSession = Dep
 
     # Initialize bare repo for git storage
     try:
-        git_repo_manager.create_bare_repo(db_repo.id)
+        await git_workers.run(git_repo_manager.create_bare_repo, db_repo.id)
 
         # If path provided, push files from local repo
         if repo.path:
-            push_result = git_repo_manager.push_from_local(db_repo.id, repo.path)
+            push_result = await git_workers.run(git_repo_manager.push_from_local, db_repo.id, repo.path)
             if not push_result["success"]:
                 # Clean up and fail
-                git_repo_manager.delete_repo(db_repo.id)
+                await git_workers.run(git_repo_manager.delete_repo, db_repo.id)
                 await db.delete(db_repo)
                 await db.commit()
                 raise HTTPException(status_code=400, detail=push_result["error"])
@@ -87,7 +88,7 @@ async def ingest_repo(repo: RepoCreate, request: Request, db: AsyncSession = Dep
         raise  # Re-raise HTTP exceptions
     except Exception as e:
         # Rollback repo creation if git init fails
-        git_repo_manager.delete_repo(db_repo.id)
+        await git_workers.run(git_repo_manager.delete_repo, db_repo.id)
         await db.delete(db_repo)
         await db.commit()
         raise HTTPException(status_code=500, detail=f"Failed to initialize git repo: {e}")
@@ -159,7 +160,7 @@ async def delete_repo(repo_id: str, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Repo not found")
 
     # Delete the git repo storage
-    git_repo_manager.delete_repo(repo_id)
+    await git_workers.run(git_repo_manager.delete_repo, repo_id)
 
     await db.delete(repo)
     await db.commit()
@@ -187,7 +188,7 @@ async def test_setup_repo(repo_id: str, db: AsyncSession = Depends(get_db)):
     try:
         # Create bare repo if it doesn't exist
         if not git_repo_manager.repo_exists(repo_id):
-            git_repo_manager.create_bare_repo(repo_id)
+            await git_workers.run(git_repo_manager.create_bare_repo, repo_id)
 
         # Initialize with a minimal commit using dulwich
         from dulwich.repo import Repo as DulwichRepo
@@ -246,8 +247,8 @@ async def list_branches(repo_id: str, db: AsyncSession = Depends(get_db)):
     if not repo.is_ingested:
         raise HTTPException(status_code=400, detail="Repo is not ingested")
 
-    branches = git_repo_manager.list_branches(repo_id)
-    git_default_branch = git_repo_manager.get_default_branch(repo_id)
+    branches = await git_workers.run(git_repo_manager.list_branches, repo_id)
+    git_default_branch = await git_workers.run(git_repo_manager.get_default_branch, repo_id)
 
     # Sync default branch from git repo to database if it differs
     # This handles the case where user pushed with a different default branch
@@ -263,13 +264,14 @@ async def list_branches(repo_id: str, db: AsyncSession = Depends(get_db)):
         non_lazyaf = [b for b in branches if not b.startswith("lazyaf/")]
         default_branch = non_lazyaf[0] if non_lazyaf else branches[0]
 
-    # Get commit SHA for each branch
+    # Commit SHAs come from one ref snapshot instead of a lookup per branch
+    refs = await git_workers.run(git_repo_manager.get_refs, repo_id)
     branch_info = []
     for branch in branches:
-        commit = git_repo_manager.get_branch_commit(repo_id, branch)
+        commit = refs.get(f"refs/heads/{branch}".encode())
         branch_info.append({
             "name": branch,
-            "commit": commit,
+            "commit": commit.decode("ascii") if commit else None,
             "is_default": branch == default_branch,
             "is_lazyaf": branch.startswith("lazyaf/"),
         })
@@ -297,10 +299,10 @@ async def list_commits(
     if not repo.is_ingested:
         raise HTTPException(status_code=400, detail="Repo is not ingested")
 
-    commits = git_repo_manager.get_commit_log(repo_id, branch, max_count=min(limit, 100))
+    commits = await git_workers.run(git_repo_manager.get_commit_log, repo_id, branch, max_count=min(limit, 100))
 
     return {
-        "branch": branch or git_repo_manager.get_default_branch(repo_id),
+        "branch": branch or await git_workers.run(git_repo_manager.get_default_branch, repo_id),
         "commits": commits,
         "total": len(commits),
     }
@@ -322,7 +324,42 @@ async def get_branch_diff(
     if not repo.is_ingested:
         raise HTTPException(status_code=400, detail="Repo is not ingested")
 
-    diff = git_repo_manager.get_diff(repo_id, base, head)
+    diff = await git_workers.run(git_repo_manager.get_diff, repo_id, base, head)
+
+    if "error" in diff and diff["error"]:
+        raise HTTPException(status_code=400, detail=diff["error"])
+
+    return diff
+
+
+@router.get("/{repo_id}/diff/file")
+async def get_branch_file_diff(
+    repo_id: str,
+    base: str,
+    head: str,
+    path: str,
+    max_lines: int = DIFF_MAX_LINES,
+    max_bytes: int = DIFF_MAX_BYTES,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the diff of one file between two branches, capped at max_lines/max_bytes."""
+    result = await db.execute(select(Repo).where(Repo.id == repo_id))
+    repo = result.scalar_one_or_none()
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repo not found")
+
+    if not repo.is_ingested:
+        raise HTTPException(status_code=400, detail="Repo is not ingested")
+
+    diff = await git_workers.run(
+        git_repo_manager.get_file_diff,
+        repo_id,
+        base,
+        head,
+        path,
+        max_lines=max_lines,
+        max_bytes=max_bytes,
+    )
 
     if "error" in diff and diff["error"]:
         raise HTTPException(status_code=400, detail=diff["error"])
@@ -351,13 +388,13 @@ async def get_branches_info(
     if not repo.is_ingested:
         raise HTTPException(status_code=400, detail="Repo is not ingested")
 
-    branches = git_repo_manager.get_branches_info(repo_id)
+    branches = await git_workers.run(git_repo_manager.get_branches_info, repo_id)
     orphaned_count = sum(1 for b in branches if b.get("is_orphaned"))
     damaged_count = 0
 
     # Optionally verify integrity
     if verify:
-        integrity = git_repo_manager.verify_repo_integrity(repo_id)
+        integrity = await git_workers.run(git_repo_manager.verify_repo_integrity, repo_id)
         damaged_set = set(integrity.get("damaged_branches", []))
 
         # Get detailed missing objects info
@@ -404,7 +441,7 @@ async def delete_branch(
     if not repo.is_ingested:
         raise HTTPException(status_code=400, detail="Repo is not ingested")
 
-    result = git_repo_manager.delete_branch(repo_id, branch_name)
+    result = await git_workers.run(git_repo_manager.delete_branch, repo_id, branch_name)
 
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["error"])
@@ -426,10 +463,86 @@ async def cleanup_orphaned_branches(repo_id: str, db: AsyncSession = Depends(get
     if not repo.is_ingested:
         raise HTTPException(status_code=400, detail="Repo is not ingested")
 
-    result = git_repo_manager.cleanup_orphaned_branches(repo_id)
+    result = await git_workers.run(git_repo_manager.cleanup_orphaned_branches, repo_id)
     return result
 
 
+@router.get("/{repo_id}/refs")
+async def get_ref_counts(repo_id: str, db: AsyncSession = Depends(get_db)):
+    """Count the repo's refs, split into loose ref files and packed-refs entries."""
+    result = await db.execute(select(Repo).where(Repo.id == repo_id))
+    repo = result.scalar_one_or_none()
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repo not found")
+
+    if not repo.is_ingested:
+        raise HTTPException(status_code=400, detail="Repo is not ingested")
+
+    counts = await git_workers.run(git_repo_manager.get_ref_counts, repo_id)
+    if counts is None:
+        raise HTTPException(status_code=404, detail="Git repository not found")
+    return counts
+
+
+@router.post("/{repo_id}/pack-refs")
+async def pack_refs(repo_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Pack all loose refs into packed-refs now instead of waiting for the
+    background maintenance pass.
+    """
+    result = await db.execute(select(Repo).where(Repo.id == repo_id))
+    repo = result.scalar_one_or_none()
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repo not found")
+
+    if not repo.is_ingested:
+        raise HTTPException(status_code=400, detail="Repo is not ingested")
+
+    pack_result = await git_workers.run(git_repo_manager.pack_refs, repo_id)
+    if not pack_result["success"]:
+        status = 404 if pack_result["error"] == "Repository not found" else 409
+        raise HTTPException(status_code=status, detail=pack_result["error"])
+    return pack_result
+
+
+@router.get("/{repo_id}/objects")
+async def get_object_stats(repo_id: str, db: AsyncSession = Depends(get_db)):
+    """Count the repo's pack files and loose objects."""
+    result = await db.execute(select(Repo).where(Repo.id == repo_id))
+    repo = result.scalar_one_or_none()
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repo not found")
+
+    if not repo.is_ingested:
+        raise HTTPException(status_code=400, detail="Repo is not ingested")
+
+    stats = await git_workers.run(git_repo_manager.get_object_stats, repo_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Git repository not found")
+    return stats
+
+
+@router.post("/{repo_id}/repack")
+async def repack_repo(repo_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Consolidate packs and loose objects and prune unreachable objects now
+    instead of waiting for the background maintenance pass.
+    """
+    result = await db.execute(select(Repo).where(Repo.id == repo_id))
+    repo = result.scalar_one_or_none()
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repo not found")
+
+    if not repo.is_ingested:
+        raise HTTPException(status_code=400, detail="Repo is not ingested")
+
+    repack_result = await git_workers.run(git_repo_manager.repack, repo_id)
+    if not repack_result["success"]:
+        status = 404 if repack_result["error"] == "Repository not found" else 409
+        raise HTTPException(status_code=status, detail=repack_result["error"])
+    return repack_result
+
+
 @router.post("/{repo_id}/reinitialize")
 async def reinitialize_repo(repo_id: str, db: AsyncSession = Depends(get_db)):
     """
@@ -446,7 +559,7 @@ async def reinitialize_repo(repo_id: str, db: AsyncSession = Depends(get_db)):
     if not repo.is_ingested:
         raise HTTPException(status_code=400, detail="Repo is not ingested")
 
-    reinit_result = git_repo_manager.reinitialize_repo(repo_id)
+    reinit_result = await git_workers.run(git_repo_manager.reinitialize_repo, repo_id)
 
     if not reinit_result["success"]:
         raise HTTPException(status_code=500, detail=reinit_result.get("error", "Reinitialize failed"))
@@ -472,7 +585,7 @@ async def sync_repo_from_disk(repo_id: str, db: AsyncSession = Depends(get_db)):
     if not repo.is_ingested:
         raise HTTPException(status_code=400, detail="Repo is not ingested")
 
-    sync_result = git_repo_manager.sync_repo_from_disk(repo_id)
+    sync_result = await git_workers.run(git_repo_manager.sync_repo_from_disk, repo_id)
 
     if not sync_result["success"]:
         raise HTTPException(status_code=500, detail=sync_result.get("error", "Sync failed"))
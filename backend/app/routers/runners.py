@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -16,6 +16,61 @@ router = APIRouter(prefix="/api/runners", tags=["runners"])
 
 # === Models ===
 
+class DispatchLatency(BaseModel):
+    """Time from a job being enqueued to a runner taking it, over recent dispatches."""
+    dispatched: int = 0
+    avg_seconds: float | None = None
+    p95_seconds: float | None = None
+    max_seconds: float | None = None
+
+
+class SchedulingPolicyInfo(BaseModel):
+    priority_order: list[str] = []
+    repo_weights: dict[str, float] = {}
+    default_weight: float = 1.0
+    repo_concurrency: int = 0  # 0 = no cap
+    pipeline_concurrency: int = 0  # 0 = no cap
+
+
+class RepoLoad(BaseModel):
+    repo_id: str
+    weight: float
+    queued: int
+    running: int
+    share: float  # running / weight; the lowest share goes next within a priority class
+    capped: bool
+
+
+class PipelineLoad(BaseModel):
+    pipeline_run_id: str
+    queued: int
+    running: int
+    capped: bool
+
+
+class SchedulingDecision(BaseModel):
+    """Why a job was handed to a runner."""
+    job_id: str
+    runner_id: str | None = None
+    repo_id: str
+    pipeline_run_id: str | None = None
+    priority: str
+    repo_share: float  # the repo's weighted share of running jobs when it was picked
+    wait_seconds: float
+    candidates: int  # deque heads the job was picked from
+    capped: int  # deque heads passed over because of a concurrency cap
+    at: str
+
+
+class SchedulingStatus(BaseModel):
+    policy: SchedulingPolicyInfo = SchedulingPolicyInfo()
+    queued_by_priority: dict[str, int] = {}
+    running: int = 0
+    repos: list[RepoLoad] = []
+    pipelines: list[PipelineLoad] = []
+    recent_decisions: list[SchedulingDecision] = []
+
+
 class PoolStatus(BaseModel):
     total_runners: int
     idle_runners: int
@@ -23,18 +78,23 @@ class PoolStatus(BaseModel):
     offline_runners: int
     queued_jobs: int
     pending_jobs: int
+    dispatch_latency: DispatchLatency = DispatchLatency()
+    scheduling: SchedulingStatus = SchedulingStatus()
 
 
 class RegisterRequest(BaseModel):
     runner_id: str | None = None  # Client-provided ID for reconnection
     name: str | None = None
     runner_type: str = "claude-code"  # claude-code, gemini
+    slots: int = Field(1, ge=1, le=64)  # Jobs the runner can run at once
+    capacity: dict[str, float] = {}  # Resources available to those jobs, e.g. {"cpus": 8}
 
 
 class RegisterResponse(BaseModel):
     runner_id: str
     name: str
     runner_type: str
+    slots: int = 1
 
 
 class JobResponse(BaseModel):
@@ -79,10 +139,12 @@ class CompleteRequest(BaseModel):
     error: str | None = None
     pr_url: str | None = None
     test_results: TestResultsPayload | None = None
+    job_id: str | None = None  # Which job finished; defaults to the runner's oldest
 
 
 class LogRequest(BaseModel):
     lines: list[str]
+    job_id: str | None = None  # Job the lines belong to on a multi-slot runner
 
 
 class DockerCommand(BaseModel):
@@ -118,6 +180,8 @@ async def pool_status():
         offline_runners=runner_pool.offline_count,
         queued_jobs=job_queue.queue_size,
         pending_jobs=job_queue.pending_count,
+        dispatch_latency=DispatchLatency(**job_queue.dispatch_stats()),
+        scheduling=SchedulingStatus(**job_queue.scheduling_stats()),
     )
 
 
@@ -134,22 +198,94 @@ async def register_runner(request: RegisterRequest):
     runner = runner_pool.register(
         runner_id=request.runner_id,
         name=request.name,
-        runner_type=request.runner_type
+        runner_type=request.runner_type,
+        slots=request.slots,
+        capacity=request.capacity,
+    )
+    return RegisterResponse(
+        runner_id=runner.id, name=runner.name, runner_type=runner.runner_type, slots=runner.slots
     )
-    return RegisterResponse(runner_id=runner.id, name=runner.name, runner_type=runner.runner_type)
 
 
 @router.post("/{runner_id}/heartbeat")
-async def runner_heartbeat(runner_id: str):
-    """Send a heartbeat to keep the runner alive."""
-    if not runner_pool.heartbeat(runner_id):
+async def runner_heartbeat(runner_id: str, job_id: str | None = Query(None)):
+    """Send a heartbeat to keep the runner alive, and the given job with it."""
+    if not runner_pool.heartbeat(runner_id, job_id=job_id):
         raise HTTPException(status_code=404, detail="Runner not found")
     return {"status": "ok"}
 
 
+def _job_response(job) -> JobResponse:
+    return JobResponse(
+        id=job.id,
+        card_id=job.card_id,
+        repo_id=job.repo_id,
+        repo_url=job.repo_url,
+        repo_path=job.repo_path,
+        base_branch=job.base_branch,
+        branch_name=f"lazyaf/{job.id[:8]}",
+        card_title=job.card_title,
+        card_description=job.card_description,
+        use_internal_git=job.use_internal_git,
+        model=job.model,
+        agent_file_ids=job.agent_file_ids,
+        prompt_template=job.prompt_template,
+        step_type=job.step_type,
+        step_config=job.step_config,
+        continue_in_context=job.continue_in_context,
+        is_continuation=job.is_continuation,
+        previous_step_logs=job.previous_step_logs,
+        # Playground fields
+        is_playground=job.is_playground,
+        playground_session_id=job.playground_session_id,
+        playground_save_branch=job.playground_save_branch,
+    )
+
+
+async def _mark_card_picked_up(db: AsyncSession, card_id: str, runner_type: str):
+    """Record which runner type picked up a card's job and broadcast the change."""
+    result = await db.execute(select(Card).where(Card.id == card_id))
+    card = result.scalar_one_or_none()
+    if not card:
+        return
+
+    card.completed_runner_type = runner_type
+    await db.commit()
+    await db.refresh(card)
+
+    # Broadcast card update via WebSocket
+    await manager.send_card_updated({
+        "id": card.id,
+        "repo_id": card.repo_id,
+        "title": card.title,
+        "description": card.description,
+        "status": card.status,
+        "runner_type": card.runner_type,
+        "branch_name": card.branch_name,
+        "pr_url": card.pr_url,
+        "job_id": card.job_id,
+        "completed_runner_type": card.completed_runner_type,
+        "created_at": card.created_at.isoformat() if card.created_at else None,
+        "updated_at": card.updated_at.isoformat() if card.updated_at else None,
+    })
+
+
 @router.get("/{runner_id}/job")
-async def get_runner_job(runner_id: str, db: AsyncSession = Depends(get_db)):
-    """Poll for a job. Returns null if no job available."""
+async def get_runner_job(
+    runner_id: str,
+    wait: float = Query(0, ge=0, description="Seconds to hold the request open until a job arrives"),
+    max_jobs: int = Query(1, ge=1, le=64, description="Most jobs to hand out, bounded by the runner's free slots"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Poll for a job. Returns null if no job available.
+
+    With wait > 0 the request long-polls: it returns as soon as a matching
+    job is enqueued, or with null after wait seconds.
+
+    A multi-slot runner can ask for several jobs at once with max_jobs; all
+    of them are listed in "jobs", and "job" is the first.
+    """
     runner = runner_pool.get_runner(runner_id)
     if not runner:
         raise HTTPException(status_code=404, detail="Runner not found")
@@ -157,76 +293,33 @@ async def get_runner_job(runner_id: str, db: AsyncSession = Depends(get_db)):
     # Also acts as heartbeat
     runner_pool.heartbeat(runner_id)
 
-    job = await runner_pool.get_job(runner_id)
-    if not job:
-        return {"job": None}
+    jobs = await runner_pool.get_jobs(runner_id, wait=wait, max_jobs=max_jobs)
+    if not jobs:
+        return {"job": None, "jobs": []}
 
     # Update card's completed_runner_type to show which runner picked it up
-    result = await db.execute(select(Card).where(Card.id == job.card_id))
-    card = result.scalar_one_or_none()
-    if card:
-        card.completed_runner_type = runner.runner_type
-        await db.commit()
-        await db.refresh(card)
-
-        # Broadcast card update via WebSocket
-        await manager.send_card_updated({
-            "id": card.id,
-            "repo_id": card.repo_id,
-            "title": card.title,
-            "description": card.description,
-            "status": card.status,
-            "runner_type": card.runner_type,
-            "branch_name": card.branch_name,
-            "pr_url": card.pr_url,
-            "job_id": card.job_id,
-            "completed_runner_type": card.completed_runner_type,
-            "created_at": card.created_at.isoformat() if card.created_at else None,
-            "updated_at": card.updated_at.isoformat() if card.updated_at else None,
-        })
+    for job in jobs:
+        await _mark_card_picked_up(db, job.card_id, runner.runner_type)
 
-    return {
-        "job": JobResponse(
-            id=job.id,
-            card_id=job.card_id,
-            repo_id=job.repo_id,
-            repo_url=job.repo_url,
-            repo_path=job.repo_path,
-            base_branch=job.base_branch,
-            branch_name=f"lazyaf/{job.id[:8]}",
-            card_title=job.card_title,
-            card_description=job.card_description,
-            use_internal_git=job.use_internal_git,
-            model=job.model,
-            agent_file_ids=job.agent_file_ids,
-            prompt_template=job.prompt_template,
-            step_type=job.step_type,
-            step_config=job.step_config,
-            continue_in_context=job.continue_in_context,
-            is_continuation=job.is_continuation,
-            previous_step_logs=job.previous_step_logs,
-            # Playground fields
-            is_playground=job.is_playground,
-            playground_session_id=job.playground_session_id,
-            playground_save_branch=job.playground_save_branch,
-        )
-    }
+    responses = [_job_response(job) for job in jobs]
+    return {"job": responses[0], "jobs": responses}
 
 
 @router.post("/{runner_id}/complete")
 async def complete_job(runner_id: str, request: CompleteRequest, db: AsyncSession = Depends(get_db)):
-    """Mark the current job as complete."""
+    """Mark the current job (or, on a multi-slot runner, the given job) as complete."""
     from datetime import datetime
 
     runner = runner_pool.get_runner(runner_id)
     if not runner:
         raise HTTPException(status_code=404, detail="Runner not found")
 
-    # Get runner logs and type before completing (they get cleared)
-    runner_logs = runner_pool.get_logs(runner_id)
+    # Get job logs and runner type before completing (they get cleared)
+    job_id = request.job_id or (runner.current_job.id if runner.current_job else None)
+    runner_logs = list(runner_pool.get_job_logs(runner_id, job_id))
     runner_type = runner.runner_type
 
-    job_data = runner_pool.complete_job(runner_id, request.success, request.error)
+    job_data = runner_pool.complete_job(runner_id, request.success, request.error, job_id=request.job_id)
     if not job_data:
         raise HTTPException(status_code=400, detail="No job to complete")
 
@@ -329,27 +422,30 @@ async def append_logs(runner_id: str, request: LogRequest, db: AsyncSession = De
         raise HTTPException(status_code=404, detail="Runner not found")
 
     for line in request.lines:
-        runner_pool.append_log(runner_id, line)
+        runner_pool.append_log(runner_id, line, job_id=request.job_id)
 
     # Sync logs to Job model if runner has an active job
-    if runner.current_job:
-        result = await db.execute(select(Job).where(Job.id == runner.current_job.id))
+    job_id = request.job_id if request.job_id in runner.jobs else (
+        runner.current_job.id if runner.current_job else None
+    )
+    if job_id:
+        result = await db.execute(select(Job).where(Job.id == job_id))
         job = result.scalar_one_or_none()
         if job:
-            job.logs = "\n".join(runner_pool.get_logs(runner_id))
+            job.logs = "\n".join(runner_pool.get_job_logs(runner_id, job_id))
             await db.commit()
 
     return {"status": "ok", "total_lines": len(runner_pool.get_logs(runner_id))}
 
 
 @router.get("/{runner_id}/logs")
-async def get_logs(runner_id: str, offset: int = Query(0)):
-    """Get logs for a runner."""
+async def get_logs(runner_id: str, offset: int = Query(0), job_id: str | None = Query(None)):
+    """Get logs for a runner, or for one of its jobs."""
     runner = runner_pool.get_runner(runner_id)
     if not runner:
         raise HTTPException(status_code=404, detail="Runner not found")
 
-    logs = runner_pool.get_logs(runner_id)
+    logs = runner_pool.get_job_logs(runner_id, job_id) if job_id else runner_pool.get_logs(runner_id)
     return {"logs": logs[offset:], "total": len(logs)}
 
 
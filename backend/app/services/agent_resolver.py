@@ -9,7 +9,6 @@ Priority order:
 2. Platform-defined agents (database AgentFile table)
 """
 
-import yaml
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -134,51 +133,35 @@ class AgentResolver:
 
     def _get_repo_agent(self, repo_id: str, branch: str, agent_name: str) -> dict | None:
         """Get agent from repo's .lazyaf/agents/ directory."""
+        config = git_repo_manager.get_lazyaf_config(repo_id, branch)
+        if not config:
+            return None
+
         for ext in ['.yaml', '.yml']:
-            content = git_repo_manager.get_file_content(
-                repo_id, branch, f".lazyaf/agents/{agent_name}{ext}"
-            )
-            if content:
-                try:
-                    data = yaml.safe_load(content.decode('utf-8'))
-                    return {
-                        "name": data.get("name", agent_name),
-                        "description": data.get("description"),
-                        "prompt_template": data.get("prompt_template", ""),
-                    }
-                except Exception:
-                    pass
+            compiled = config.agents.get(f"{agent_name}{ext}")
+            if compiled and isinstance(compiled.data, dict):
+                return self._agent_from_data(compiled.data, agent_name)
         return None
 
     def _list_repo_agents(self, repo_id: str, branch: str) -> list[dict]:
         """List all agents from repo's .lazyaf/agents/ directory."""
-        agents = []
-
-        files = git_repo_manager.list_directory(repo_id, branch, ".lazyaf/agents")
-        if not files:
-            return agents
-
-        for filename in files:
-            if not (filename.endswith('.yaml') or filename.endswith('.yml')):
-                continue
-
-            content = git_repo_manager.get_file_content(
-                repo_id, branch, f".lazyaf/agents/{filename}"
-            )
-            if not content:
-                continue
-
-            try:
-                data = yaml.safe_load(content.decode('utf-8'))
-                agents.append({
-                    "name": data.get("name", filename.rsplit('.', 1)[0]),
-                    "description": data.get("description"),
-                    "prompt_template": data.get("prompt_template", ""),
-                })
-            except Exception:
-                continue
-
-        return agents
+        config = git_repo_manager.get_lazyaf_config(repo_id, branch)
+        if not config:
+            return []
+
+        return [
+            self._agent_from_data(compiled.data, filename.rsplit('.', 1)[0])
+            for filename, compiled in config.agents.items()
+            if isinstance(compiled.data, dict)
+        ]
+
+    @staticmethod
+    def _agent_from_data(data: dict, default_name: str) -> dict:
+        return {
+            "name": data.get("name", default_name),
+            "description": data.get("description"),
+            "prompt_template": data.get("prompt_template", ""),
+        }
 
 
 # Global agent resolver instance
@@ -0,0 +1,128 @@
+"""
+Low-level git storage and protocol helpers used by the git server.
+
+This package provides:
+- protocol: pkt-line framing, side-band multiplexing, v0 and v2 request parsing
+- pack: Streaming pack file generation and delta compression
+- walk: Missing-object computation for wants vs. common commits
+- reuse: Verbatim copying of entries from on-disk packs
+- pack_cache: LRU cache of generated packs shared by identical requests
+- commit_graph: Persistent generation-numbered index for ancestry queries
+- bitmap: Reachability bitmaps for want/have object set differences
+- negotiation: have/want ACK handling for upload-pack (v0 and v2)
+- shallow: Shallow/unshallow boundaries for deepen requests
+- filter: blob:none / blob:limit object filters for partial clones
+- workers: Thread pool that async handlers await for blocking git work
+- diff: Cached branch diffs with capped per-file patches
+- tree_cache: Cached tree/path lookups for reading files from branches
+- refs: Loose ref packing into packed-refs and ref counts
+- repack: Pack consolidation and pruning of unreachable objects
+- activity: Per-repo in-flight transfer tracking for maintenance throttling
+- batch: In-memory object batches written as one pack by server-side merges
+"""
+from app.services.git.protocol import (
+    pkt_line,
+    iter_pkt_lines,
+    sideband_frames,
+    UploadPackRequest,
+    parse_upload_pack_request,
+    CommandRequest,
+    parse_command_request,
+    parse_fetch_args,
+    protocol_version,
+)
+from app.services.git.pack import (
+    PackStreamWriter,
+    encode_object_header,
+    generate_pack,
+    create_delta,
+    delta_sort_key,
+)
+from app.services.git.reuse import PackReuse, plan_pack_reuse
+from app.services.git.pack_cache import PackCache, pack_cache_key
+from app.services.git.walk import MissingObject, find_missing_objects, reaches_any
+from app.services.git.negotiation import NegotiationResult, negotiate, negotiate_v2
+from app.services.git.shallow import ShallowInfo, compute_shallow
+from app.services.git.filter import ObjectFilter, filter_objects, parse_filter_spec
+from app.services.git.commit_graph import CommitGraph
+from app.services.git.bitmap import ReachabilityBitmaps
+from app.services.git.workers import GitWorkerPool
+from app.services.git.diff import BlobStats, DiffCache, FileChange, diff_trees
+from app.services.git.tree_cache import TreePathCache
+from app.services.git.refs import PackRefsResult, RefCounts, count_refs, pack_refs
+from app.services.git.repack import (
+    ObjectStoreStats,
+    RepackAborted,
+    RepackResult,
+    object_store_stats,
+    repack_repo,
+)
+from app.services.git.activity import RepoActivity
+from app.services.git.batch import ObjectBatch
+
+__all__ = [
+    # Protocol framing
+    "pkt_line",
+    "iter_pkt_lines",
+    "sideband_frames",
+    "UploadPackRequest",
+    "parse_upload_pack_request",
+    "CommandRequest",
+    "parse_command_request",
+    "parse_fetch_args",
+    "protocol_version",
+    # Pack generation
+    "PackStreamWriter",
+    "encode_object_header",
+    "generate_pack",
+    "create_delta",
+    "delta_sort_key",
+    # Pack reuse
+    "PackReuse",
+    "plan_pack_reuse",
+    # Pack cache
+    "PackCache",
+    "pack_cache_key",
+    # Object walks
+    "MissingObject",
+    "find_missing_objects",
+    "reaches_any",
+    # Negotiation
+    "NegotiationResult",
+    "negotiate",
+    "negotiate_v2",
+    # Shallow clones
+    "ShallowInfo",
+    "compute_shallow",
+    # Partial clone filters
+    "ObjectFilter",
+    "filter_objects",
+    "parse_filter_spec",
+    # Commit graph
+    "CommitGraph",
+    # Reachability bitmaps
+    "ReachabilityBitmaps",
+    # Worker pool
+    "GitWorkerPool",
+    # Branch diffs
+    "BlobStats",
+    "DiffCache",
+    "FileChange",
+    "diff_trees",
+    # Tree path cache
+    "TreePathCache",
+    # Ref storage
+    "PackRefsResult",
+    "RefCounts",
+    "count_refs",
+    "pack_refs",
+    # Repack and gc
+    "ObjectStoreStats",
+    "RepackAborted",
+    "RepackResult",
+    "object_store_stats",
+    "repack_repo",
+    "RepoActivity",
+    # Merge object batches
+    "ObjectBatch",
+]
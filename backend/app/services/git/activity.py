@@ -0,0 +1,59 @@
+"""
+Per-repo tracking of in-flight git transfers.
+
+Background maintenance only repacks a repo that has no clone, fetch or
+push running and has been quiet for a while, so it never competes with
+active clones for the pack files or the CPU.
+"""
+
+import threading
+import time
+from typing import Iterator
+
+
+class RepoActivity:
+    """Counts running transfers per repo and remembers when each repo was last used."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: dict[str, int] = {}
+        self._last_used: dict[str, float] = {}
+
+    def begin(self, repo_id: str) -> None:
+        with self._lock:
+            self._active[repo_id] = self._active.get(repo_id, 0) + 1
+            self._last_used[repo_id] = time.monotonic()
+
+    def end(self, repo_id: str) -> None:
+        with self._lock:
+            remaining = self._active.get(repo_id, 0) - 1
+            if remaining > 0:
+                self._active[repo_id] = remaining
+            else:
+                self._active.pop(repo_id, None)
+            self._last_used[repo_id] = time.monotonic()
+
+    def touch(self, repo_id: str) -> None:
+        """Record a short request (e.g. a ref advertisement) that needs no begin/end."""
+        with self._lock:
+            self._last_used[repo_id] = time.monotonic()
+
+    def active(self, repo_id: str) -> int:
+        with self._lock:
+            return self._active.get(repo_id, 0)
+
+    def idle_seconds(self, repo_id: str) -> float:
+        """Seconds since repo_id was last used: 0 while a transfer runs, infinite if never used."""
+        with self._lock:
+            if self._active.get(repo_id):
+                return 0.0
+            last = self._last_used.get(repo_id)
+        return float("inf") if last is None else time.monotonic() - last
+
+    def track(self, repo_id: str, frames: Iterator[bytes]) -> Iterator[bytes]:
+        """Wrap a response stream so the transfer counts as active until it is closed."""
+        self.begin(repo_id)
+        try:
+            yield from frames
+        finally:
+            self.end(repo_id)
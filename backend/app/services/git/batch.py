@@ -0,0 +1,66 @@
+"""
+Batched object writes for server-side merges and rebases.
+
+add_object() on a disk object store writes, compresses and syncs one
+loose file per object, so a merge of a deep tree pays that for every
+rewritten tree. An ObjectBatch keeps the new objects in memory, serves
+reads of them (a merged subtree is read back while its parent is built)
+and writes the ones the final commit needs as a single pack in flush().
+Nothing is written if the operation stops early, e.g. on conflicts.
+"""
+
+from typing import Iterable
+
+from dulwich.objects import Commit, ShaFile, Tree
+
+
+class ObjectBatch:
+    """Objects created by one operation, written to object_store as one pack."""
+
+    def __init__(self, object_store):
+        self.object_store = object_store
+        self._pending: dict[bytes, ShaFile] = {}
+
+    def add_object(self, obj: ShaFile) -> None:
+        self._pending.setdefault(obj.id, obj)
+
+    def __getitem__(self, sha: bytes) -> ShaFile:
+        obj = self._pending.get(sha)
+        return obj if obj is not None else self.object_store[sha]
+
+    def __contains__(self, sha: bytes) -> bool:
+        return sha in self._pending or sha in self.object_store
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _reachable(self, tips: Iterable[bytes]) -> dict[bytes, ShaFile]:
+        """Pending objects reachable from tips without leaving the batch."""
+        reachable = {}
+        stack = list(tips)
+        while stack:
+            sha = stack.pop()
+            obj = self._pending.get(sha)
+            if obj is None or sha in reachable:
+                continue
+            reachable[sha] = obj
+            if isinstance(obj, Commit):
+                stack.append(obj.tree)
+            elif isinstance(obj, Tree):
+                stack.extend(entry.sha for entry in obj.items())
+        return reachable
+
+    def flush(self, tips: Iterable[bytes] | None = None) -> int:
+        """
+        Write pending objects as one pack and return how many were written.
+
+        With tips, only objects reachable from them are written; trees that
+        were superseded while building the result are dropped. Objects the
+        store already has are skipped.
+        """
+        pending = self._reachable(tips) if tips is not None else self._pending
+        new = [(obj, None) for sha, obj in pending.items() if sha not in self.object_store]
+        self._pending = {}
+        if new:
+            self.object_store.add_objects(new)
+        return len(new)
@@ -0,0 +1,502 @@
+"""
+Reachability bitmaps.
+
+Every object the index has seen gets a fixed bit position, recorded in an
+append-only object table (SHA, type and the path it was first found at).
+A commit's bitmap has a bit set for every object reachable from it, so
+"objects in want but not in have" becomes reach(want) & ~reach(have)
+instead of a walk over commits and trees.
+
+Bitmaps are Python ints (set operations run in C) and are stored
+zlib-compressed. They are written for ref tips when packs arrive;
+reaching any other commit ORs in the nearest stored bitmaps and walks only
+what is new, skipping trees whose bit is already set since their contents
+must be set too.
+
+Queries walk a snapshot of the index without holding its lock, so clones
+and fetches of one repo run in parallel; objects they discover are merged
+into the index afterwards. Appends never remove anything, so rebuild()
+rewrites both files for the current ref tips (e.g. after a repack pruned
+objects). Only the most recently used indexes are kept in memory.
+"""
+
+import os
+import stat
+import struct
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable
+
+from dulwich.objects import S_ISGITLINK, Blob, Commit, Tag, Tree
+
+from app.services.git.walk import MissingObject
+
+OBJECT_TABLE_MAGIC = b"LOBJ\x00\x00\x00\x01"
+BITMAPS_MAGIC = b"LBMP\x00\x00\x00\x01"
+OBJECT_TABLE_FILENAME = "objects.table"
+BITMAPS_FILENAME = "bitmaps"
+_OBJECT = struct.Struct(">20sBH")
+_BITMAP = struct.Struct(">20sI")
+
+_TYPE_ORDER = {Tag.type_num: 0, Commit.type_num: 1}
+
+# Repos whose object table and bitmaps are kept in memory
+BITMAP_INDEX_CACHE_SIZE = 32
+
+
+def _read_records(path: Path, magic: bytes) -> tuple[bytes, int]:
+    """Return the file contents and the offset records start at, or (b"", 0) if unusable."""
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return b"", 0
+    if not data.startswith(magic):
+        path.unlink(missing_ok=True)
+        return b"", 0
+    return data, len(magic)
+
+
+def _truncate(path: Path, valid_end: int, size: int) -> None:
+    if valid_end != size:
+        # Torn write from an interrupted append; drop the partial record
+        with open(path, "r+b") as f:
+            f.truncate(valid_end)
+
+
+def _object_record(sha: bytes, type_num: int, path: bytes) -> bytes:
+    return _OBJECT.pack(bytes.fromhex(sha.decode("ascii")), type_num, len(path)) + path
+
+
+def _bitmap_record(sha: bytes, compressed: bytes) -> bytes:
+    return _BITMAP.pack(bytes.fromhex(sha.decode("ascii")), len(compressed)) + compressed
+
+
+def _compress(bits: int) -> bytes:
+    return zlib.compress(bits.to_bytes((bits.bit_length() + 7) // 8, "little"))
+
+
+def _write_file(path: Path, data: bytes) -> Path:
+    """Write data to a temporary file next to path and return it, for os.replace()."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}-", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return Path(tmp)
+
+
+class _Snapshot:
+    """
+    The index as of one moment, plus objects a walk found since.
+
+    The index only ever appends to its lists and replaces them wholesale on
+    reload, so positions below size stay valid without the lock. New
+    objects get provisional positions after size and are merged into the
+    index once the walk is done.
+    """
+
+    def __init__(self, shas: list[bytes], types: list[int], paths: list[bytes],
+                 position: dict[bytes, int], bitmaps: dict[bytes, bytes]):
+        self.shas = shas
+        self.types = types
+        self.paths = paths
+        self.size = len(shas)
+        self._position = position
+        self.bitmaps = bitmaps
+        self.new_shas: list[bytes] = []
+        self.new_types: list[int] = []
+        self.new_paths: list[bytes] = []
+        self._new_position: dict[bytes, int] = {}
+
+    def position(self, sha: bytes) -> int | None:
+        pos = self._position.get(sha)
+        if pos is not None and pos < self.size:
+            return pos
+        return self._new_position.get(sha)
+
+    def add(self, sha: bytes, type_num: int, path: bytes) -> int:
+        pos = self.position(sha)
+        if pos is None:
+            pos = self._new_position[sha] = self.size + len(self.new_shas)
+            self.new_shas.append(sha)
+            self.new_types.append(type_num)
+            self.new_paths.append(path[:0xffff])
+        return pos
+
+    def bitmap(self, sha: bytes) -> int | None:
+        compressed = self.bitmaps.get(sha)
+        if compressed is None:
+            return None
+        return int.from_bytes(zlib.decompress(compressed), "little")
+
+    def object(self, pos: int) -> MissingObject:
+        if pos < self.size:
+            return MissingObject(self.shas[pos], self.types[pos], self.paths[pos])
+        pos -= self.size
+        return MissingObject(self.new_shas[pos], self.new_types[pos], self.new_paths[pos])
+
+
+class _BitmapIndex:
+    """In-memory view of one repo's object table and stored bitmaps."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.table_path = directory / OBJECT_TABLE_FILENAME
+        self.bitmaps_path = directory / BITMAPS_FILENAME
+        self.lock = threading.Lock()
+        self.shas: list[bytes] = []
+        self.types: list[int] = []
+        self.paths: list[bytes] = []
+        self.position: dict[bytes, int] = {}
+        self.bitmaps: dict[bytes, bytes] = {}  # commit sha -> compressed bitmap
+        self._stored = 0  # objects already written to the table
+        self._file_ids: tuple | None = None
+
+    def _stat(self) -> tuple:
+        ids = []
+        for path in (self.table_path, self.bitmaps_path):
+            try:
+                st = os.stat(path)
+                ids.append((st.st_ino, st.st_size))
+            except FileNotFoundError:
+                ids.append(None)
+        return tuple(ids)
+
+    @property
+    def exists(self) -> bool:
+        return self.bitmaps_path.exists()
+
+    def refresh(self) -> None:
+        """Reload both files if they changed on disk (lock held)."""
+        if self._stat() == self._file_ids:
+            return
+        self.shas, self.types, self.paths, self.position = [], [], [], {}
+        self.bitmaps = {}
+
+        data, pos = _read_records(self.table_path, OBJECT_TABLE_MAGIC)
+        valid_end = pos
+        while pos + _OBJECT.size <= len(data):
+            raw_sha, type_num, path_len = _OBJECT.unpack_from(data, pos)
+            end = pos + _OBJECT.size + path_len
+            if end > len(data):
+                break
+            self._add(raw_sha.hex().encode("ascii"), type_num, data[pos + _OBJECT.size:end])
+            pos = valid_end = end
+        if data:
+            _truncate(self.table_path, valid_end, len(data))
+        self._stored = len(self.shas)
+
+        data, pos = _read_records(self.bitmaps_path, BITMAPS_MAGIC)
+        valid_end = pos
+        while pos + _BITMAP.size <= len(data):
+            raw_sha, length = _BITMAP.unpack_from(data, pos)
+            end = pos + _BITMAP.size + length
+            if end > len(data):
+                break
+            self.bitmaps[raw_sha.hex().encode("ascii")] = data[pos + _BITMAP.size:end]
+            pos = valid_end = end
+        if data:
+            _truncate(self.bitmaps_path, valid_end, len(data))
+        self._file_ids = self._stat()
+
+    def unload(self) -> None:
+        """Drop the in-memory copy; the next refresh() reads the files again (lock held)."""
+        self.shas, self.types, self.paths, self.position = [], [], [], {}
+        self.bitmaps = {}
+        self._stored = 0
+        self._file_ids = None
+
+    def _add(self, sha: bytes, type_num: int, path: bytes) -> int:
+        pos = len(self.shas)
+        self.shas.append(sha)
+        self.types.append(type_num)
+        self.paths.append(path)
+        self.position[sha] = pos
+        return pos
+
+    def snapshot(self) -> _Snapshot:
+        """A view of the index that can be walked without the lock (lock held)."""
+        return _Snapshot(self.shas, self.types, self.paths, self.position, dict(self.bitmaps))
+
+    def merge(self, snapshot: _Snapshot) -> None:
+        """
+        Add the objects a walk of snapshot found (lock held).
+
+        They keep their provisional positions if the index has not changed
+        since the snapshot was taken.
+        """
+        for sha, type_num, path in zip(snapshot.new_shas, snapshot.new_types, snapshot.new_paths):
+            if sha not in self.position:
+                self._add(sha, type_num, path)
+
+    def flush(self, new_bitmaps: dict[bytes, int] | None = None) -> None:
+        """Append newly assigned objects, then any new bitmaps (lock held)."""
+        self.table_path.parent.mkdir(parents=True, exist_ok=True)
+        if self._stored < len(self.shas):
+            out = bytearray() if self.table_path.exists() else bytearray(OBJECT_TABLE_MAGIC)
+            for pos in range(self._stored, len(self.shas)):
+                out += _object_record(self.shas[pos], self.types[pos], self.paths[pos])
+            with open(self.table_path, "ab") as f:
+                f.write(out)
+            self._stored = len(self.shas)
+        if new_bitmaps:
+            out = bytearray() if self.bitmaps_path.exists() else bytearray(BITMAPS_MAGIC)
+            for sha, bits in new_bitmaps.items():
+                compressed = _compress(bits)
+                self.bitmaps[sha] = compressed
+                out += _bitmap_record(sha, compressed)
+            with open(self.bitmaps_path, "ab") as f:
+                f.write(out)
+        self._file_ids = self._stat()
+
+    def replace(self, snapshot: _Snapshot) -> None:
+        """
+        Swap in an index built from scratch: snapshot's new objects and bitmaps (lock held).
+
+        The old bitmaps are removed first, so a crash between the two
+        renames leaves a table without bitmaps (queries fall back to
+        walking) rather than bitmaps pointing at the wrong objects.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        table = bytearray(OBJECT_TABLE_MAGIC)
+        for record in zip(snapshot.new_shas, snapshot.new_types, snapshot.new_paths):
+            table += _object_record(*record)
+        bitmaps = bytearray(BITMAPS_MAGIC)
+        for sha, compressed in snapshot.bitmaps.items():
+            bitmaps += _bitmap_record(sha, compressed)
+        table_tmp = _write_file(self.table_path, table)
+        bitmaps_tmp = _write_file(self.bitmaps_path, bitmaps)
+        self.bitmaps_path.unlink(missing_ok=True)
+        os.replace(table_tmp, self.table_path)
+        os.replace(bitmaps_tmp, self.bitmaps_path)
+        self.unload()
+
+
+class _IndexCache:
+    """
+    One _BitmapIndex per repo, with only the most recently used kept loaded.
+
+    Evicted indexes are unloaded rather than forgotten, so every repo keeps
+    a single lock and queries already running on a snapshot are unaffected.
+    """
+
+    def __init__(self, max_loaded: int = BITMAP_INDEX_CACHE_SIZE):
+        self.max_loaded = max_loaded
+        self._lock = threading.Lock()
+        self._indexes: dict[Path, _BitmapIndex] = {}
+        self._recent: OrderedDict[Path, None] = OrderedDict()
+
+    def get(self, directory: Path) -> _BitmapIndex:
+        evicted = []
+        with self._lock:
+            index = self._indexes.get(directory)
+            if index is None:
+                index = self._indexes[directory] = _BitmapIndex(directory)
+            self._recent[directory] = None
+            self._recent.move_to_end(directory)
+            while len(self._recent) > self.max_loaded:
+                old, _ = self._recent.popitem(last=False)
+                evicted.append(self._indexes[old])
+        for old in evicted:
+            with old.lock:
+                old.unload()
+        return index
+
+
+_indexes = _IndexCache()
+
+
+class _Marks:
+    """
+    Mutable bitset used while walking.
+
+    Setting or testing one bit of a Python int copies the whole int, so
+    walks mark bits in a bytearray and only OR whole bitmaps as ints.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def __contains__(self, pos: int) -> bool:
+        i = pos >> 3
+        return i < len(self.data) and bool(self.data[i] >> (pos & 7) & 1)
+
+    def add(self, pos: int) -> None:
+        i = pos >> 3
+        if i >= len(self.data):
+            self.data.extend(bytes(i + 1 - len(self.data)))
+        self.data[i] |= 1 << (pos & 7)
+
+    def update(self, bits: int) -> None:
+        merged = self.to_int() | bits
+        self.data = bytearray(merged.to_bytes((merged.bit_length() + 7) // 8, "little"))
+
+    def to_int(self) -> int:
+        return int.from_bytes(self.data, "little")
+
+
+def iter_bits(bits: int) -> Iterable[int]:
+    """Yield the positions of set bits, lowest first."""
+    text = bin(bits)[:1:-1]  # little-endian digit string
+    pos = text.find("1")
+    while pos != -1:
+        yield pos
+        pos = text.find("1", pos + 1)
+
+
+class ReachabilityBitmaps:
+    """
+    Reachability queries for one repo, backed by its bitmap index.
+
+    SHAs are hex bytes. Objects missing from the object store are left out
+    of every bitmap, mirroring find_missing_objects().
+    """
+
+    def __init__(self, index: _BitmapIndex, object_store):
+        self._index = index
+        self.object_store = object_store
+
+    @classmethod
+    def for_repo(cls, repo) -> "ReachabilityBitmaps":
+        return cls(_indexes.get(Path(repo.controldir()) / "lazyaf"), repo.object_store)
+
+    @property
+    def available(self) -> bool:
+        """Whether bitmaps have been written for this repo."""
+        return self._index.exists
+
+    def _add_tree(self, view: _Snapshot, tree_sha: bytes, marks: _Marks) -> None:
+        """Mark a tree and everything below it, skipping subtrees already marked."""
+        pending = [(tree_sha, b"")]
+        while pending:
+            sha, path = pending.pop()
+            pos = view.position(sha)
+            if pos is not None and pos in marks:
+                continue
+            try:
+                tree = self.object_store[sha]
+            except KeyError:
+                continue
+            marks.add(view.add(sha, tree.type_num, path))
+            if tree.type_num != Tree.type_num:
+                continue
+            for entry in tree.items():
+                if S_ISGITLINK(entry.mode):
+                    continue
+                entry_path = path + b"/" + entry.path if path else entry.path
+                if stat.S_ISDIR(entry.mode):
+                    pending.append((entry.sha, entry_path))
+                    continue
+                pos = view.position(entry.sha)
+                if pos is None:
+                    # Blobs are only checked for presence the first time they are seen
+                    if entry.sha not in self.object_store:
+                        continue
+                    pos = view.add(entry.sha, Blob.type_num, entry_path)
+                marks.add(pos)
+
+    def _reach(self, view: _Snapshot, tips: Iterable[bytes]) -> int:
+        """Bitmap of everything reachable from tips, in view's positions."""
+        marks = _Marks()
+        pending = list(tips)
+        while pending:
+            sha = pending.pop()
+            pos = view.position(sha)
+            if pos is not None and pos in marks:
+                continue
+            stored = view.bitmap(sha)
+            if stored is not None:
+                marks.update(stored)
+                continue
+            try:
+                obj = self.object_store[sha]
+            except KeyError:
+                continue
+            marks.add(view.add(sha, obj.type_num, b""))
+            if obj.type_num == Commit.type_num:
+                self._add_tree(view, obj.tree, marks)
+                pending.extend(obj.parents)
+            elif obj.type_num == Tag.type_num:
+                pending.append(obj.object[1])
+            elif obj.type_num == Tree.type_num:
+                self._add_tree(view, sha, marks)
+        return marks.to_int()
+
+    def _snapshot(self) -> _Snapshot:
+        with self._index.lock:
+            self._index.refresh()
+            return self._index.snapshot()
+
+    def _merge(self, view: _Snapshot) -> None:
+        """Record the objects a walk of view discovered."""
+        if not view.new_shas:
+            return
+        index = self._index
+        with index.lock:
+            index.refresh()
+            index.merge(view)
+            index.flush()
+
+    def reachable(self, tips: Iterable[bytes]) -> int:
+        """Bitmap of every object reachable from tips."""
+        index = self._index
+        with index.lock:
+            # Held throughout so the positions in the result are the index's
+            index.refresh()
+            view = index.snapshot()
+            bits = self._reach(view, tips)
+            index.merge(view)
+            index.flush()
+            return bits
+
+    def write_bitmaps(self, commits: Iterable[bytes]) -> int:
+        """Store bitmaps for commits (typically new ref tips); return how many were written."""
+        index = self._index
+        with index.lock:
+            # Held throughout so the stored bitmaps use the index's positions
+            index.refresh()
+            view = index.snapshot()
+            new = {}
+            for sha in commits:
+                if sha in view.bitmaps or sha in new:
+                    continue
+                bits = self._reach(view, [sha])
+                if bits:
+                    new[sha] = bits
+            index.merge(view)
+            index.flush(new)
+            return len(new)
+
+    def rebuild(self, tips: Iterable[bytes]) -> int:
+        """
+        Rewrite the index with bitmaps for tips only (typically the current ref tips).
+
+        Objects no longer reachable from any tip, and bitmaps of commits
+        that are no longer tips, are dropped. Returns how many bitmaps were
+        written.
+        """
+        view = _Snapshot([], [], [], {}, {})
+        for sha in dict.fromkeys(tips):
+            bits = self._reach(view, [sha])
+            if bits:
+                # Later tips stop walking at this one if they reach it
+                view.bitmaps[sha] = _compress(bits)
+        with self._index.lock:
+            self._index.replace(view)
+        return len(view.bitmaps)
+
+    def find_missing_objects(self, wants: Iterable[bytes], common: Iterable[bytes] = ()) -> list[MissingObject]:
+        """
+        Bitmap equivalent of walk.find_missing_objects().
+
+        Returns tags, then commits, then trees and blobs, each group in
+        index order, with the path each object was first seen at.
+        """
+        view = self._snapshot()
+        want_bits = self._reach(view, wants)
+        have_bits = self._reach(view, common)
+        self._merge(view)
+        objects = [view.object(pos) for pos in iter_bits(want_bits & ~have_bits)]
+        objects.sort(key=lambda o: _TYPE_ORDER.get(o.type_num, 2))
+        return objects
@@ -0,0 +1,336 @@
+"""
+Persistent commit-graph index with generation numbers.
+
+Each repo keeps an append-only file of (commit, generation, commit time,
+parents) records, so ancestry questions are answered from the index
+instead of parsing commit objects. Generation numbers (1 + the largest
+parent generation) bound every walk: a commit can only reach commits with
+a smaller generation, so is-ancestor, merge-base and ahead/behind stop as
+soon as the remaining candidates cannot change the answer.
+
+The index is extended lazily: any query first indexes the commits
+reachable from its tips that are not yet recorded, and callers that
+create commits (pushes, merges) can update it eagerly. rebuild() rewrites
+it for the current ref tips, dropping commits a repack pruned.
+"""
+
+import heapq
+import os
+import struct
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterable
+
+GRAPH_MAGIC = b"LCGR\x00\x00\x00\x01"
+GRAPH_FILENAME = "commit-graph"
+_RECORD = struct.Struct(">20sIqI")
+_PARENT = struct.Struct(">I")
+
+# paint flags for merge-base / ahead-behind walks
+_FROM_A = 1
+_FROM_B = 2
+_STALE = 4
+
+
+class _GraphIndex:
+    """In-memory view of one repo's commit-graph file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.shas: list[bytes] = []
+        self.position: dict[bytes, int] = {}
+        self.generation: list[int] = []
+        self.commit_time: list[int] = []
+        self.parents: list[tuple[int, ...]] = []
+        self._file_id: tuple[int, int] | None = None
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size
+
+    def refresh(self) -> None:
+        """Reload the file if it was replaced, truncated or written elsewhere (lock held)."""
+        file_id = self._stat()
+        if file_id == self._file_id:
+            return
+        self.shas, self.position = [], {}
+        self.generation, self.commit_time, self.parents = [], [], []
+        self._file_id = None
+        if file_id is None:
+            return
+        data = self.path.read_bytes()
+        if not data.startswith(GRAPH_MAGIC):
+            self.path.unlink(missing_ok=True)
+            return
+        pos = len(GRAPH_MAGIC)
+        valid_end = pos
+        while pos + _RECORD.size <= len(data):
+            raw_sha, generation, commit_time, num_parents = _RECORD.unpack_from(data, pos)
+            end = pos + _RECORD.size + num_parents * _PARENT.size
+            if end > len(data):
+                break
+            parents = tuple(
+                _PARENT.unpack_from(data, pos + _RECORD.size + i * _PARENT.size)[0]
+                for i in range(num_parents)
+            )
+            self._add(raw_sha.hex().encode("ascii"), generation, commit_time, parents)
+            pos = valid_end = end
+        if valid_end != len(data):
+            # Torn write from an interrupted append; drop the partial record
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_end)
+        self._file_id = self._stat()
+
+    def _add(self, sha: bytes, generation: int, commit_time: int, parents: tuple[int, ...]) -> int:
+        pos = len(self.shas)
+        self.shas.append(sha)
+        self.position[sha] = pos
+        self.generation.append(generation)
+        self.commit_time.append(commit_time)
+        self.parents.append(parents)
+        return pos
+
+    def _encode(self, records: list[tuple[bytes, int, tuple[bytes, ...]]], out: bytearray) -> bytearray:
+        for sha, commit_time, parent_shas in records:
+            parents = tuple(self.position[p] for p in parent_shas if p in self.position)
+            generation = 1 + max((self.generation[p] for p in parents), default=0)
+            self._add(sha, generation, commit_time, parents)
+            out += _RECORD.pack(bytes.fromhex(sha.decode("ascii")), generation, commit_time, len(parents))
+            for parent in parents:
+                out += _PARENT.pack(parent)
+        return out
+
+    def append(self, records: list[tuple[bytes, int, tuple[bytes, ...]]]) -> None:
+        """Index (sha, commit_time, parent shas) records given parents-first (lock held)."""
+        out = self._encode(records, bytearray() if self._file_id is not None else bytearray(GRAPH_MAGIC))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab") as f:
+            f.write(out)
+        self._file_id = self._stat()
+
+    def replace(self, records: list[tuple[bytes, int, tuple[bytes, ...]]]) -> None:
+        """Rewrite the file with only records, given parents-first (lock held)."""
+        self.shas, self.position = [], {}
+        self.generation, self.commit_time, self.parents = [], [], []
+        out = self._encode(records, bytearray(GRAPH_MAGIC))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f"{self.path.name}-", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(out)
+        os.replace(tmp, self.path)
+        self._file_id = self._stat()
+
+
+_indexes: dict[Path, _GraphIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _index_for(path: Path) -> _GraphIndex:
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = _GraphIndex(path)
+        return index
+
+
+class CommitGraph:
+    """
+    Ancestry queries for one repo, backed by its commit-graph index.
+
+    SHAs are hex bytes, as used by dulwich. Commits missing from the object
+    store are treated as unknown (they have no ancestors and no descendants).
+    """
+
+    def __init__(self, index: _GraphIndex, object_store):
+        self._index = index
+        self.object_store = object_store
+
+    @classmethod
+    def for_repo(cls, repo) -> "CommitGraph":
+        path = Path(repo.controldir()) / "lazyaf" / GRAPH_FILENAME
+        return cls(_index_for(path), repo.object_store)
+
+    def __len__(self) -> int:
+        with self._index.lock:
+            self._index.refresh()
+            return len(self._index.shas)
+
+    def _collect(self, tips: Iterable[bytes], known: dict[bytes, int]) -> list[tuple[bytes, int, tuple[bytes, ...]]]:
+        """(sha, commit_time, parents) of commits reachable from tips but not in known, parents first."""
+        commits: dict[bytes, tuple[int, tuple[bytes, ...]]] = {}
+        pending = [sha for sha in tips if sha not in known]
+        while pending:
+            sha = pending.pop()
+            if sha in commits or sha in known:
+                continue
+            try:
+                commit = self.object_store[sha]
+            except KeyError:
+                continue
+            if commit.type_name != b"commit":
+                continue
+            commits[sha] = (commit.commit_time, tuple(commit.parents))
+            pending.extend(p for p in commit.parents if p not in known)
+
+        # Parents must be written before their children
+        ordered: list[tuple[bytes, int, tuple[bytes, ...]]] = []
+        emitted: set[bytes] = set()
+        for root in commits:
+            stack = [(root, False)]
+            while stack:
+                sha, expanded = stack.pop()
+                if sha in emitted:
+                    continue
+                commit_time, parents = commits[sha]
+                if expanded:
+                    emitted.add(sha)
+                    ordered.append((sha, commit_time, parents))
+                    continue
+                stack.append((sha, True))
+                stack.extend((p, False) for p in parents if p in commits and p not in emitted)
+        return ordered
+
+    def update(self, tips: Iterable[bytes]) -> int:
+        """Index every commit reachable from tips; return how many were added."""
+        index = self._index
+        with index.lock:
+            index.refresh()
+            ordered = self._collect(tips, index.position)
+            if ordered:
+                index.append(ordered)
+            return len(ordered)
+
+    def rebuild(self, tips: Iterable[bytes]) -> int:
+        """Rewrite the index with only the commits reachable from tips; return how many that is."""
+        ordered = self._collect(tips, {})
+        with self._index.lock:
+            self._index.replace(ordered)
+        return len(ordered)
+
+    def _positions(self, *shas: bytes) -> list[int | None]:
+        self.update(shas)
+        return [self._index.position.get(sha) for sha in shas]
+
+    def generation(self, sha: bytes) -> int | None:
+        """Generation number of a commit, or None if it is unknown."""
+        (pos,) = self._positions(sha)
+        return None if pos is None else self._index.generation[pos]
+
+    def is_ancestor(self, ancestor: bytes, descendant: bytes) -> bool:
+        """Whether ancestor is reachable from descendant (a commit is its own ancestor)."""
+        target, start = self._positions(ancestor, descendant)
+        if target is None or start is None:
+            return False
+        generation, parents = self._index.generation, self._index.parents
+        floor = generation[target]
+        pending = [start]
+        seen = {start}
+        while pending:
+            pos = pending.pop()
+            if pos == target:
+                return True
+            for parent in parents[pos]:
+                # Nothing below the ancestor's generation can lead back to it
+                if parent not in seen and generation[parent] >= floor:
+                    seen.add(parent)
+                    pending.append(parent)
+        return False
+
+    def _paint(self, a: int, b: int) -> list[int]:
+        """
+        Walk down from a and b in generation order and return their merge bases.
+
+        Children always have a higher generation than their parents, so a
+        commit's flags are final when it is popped. A commit reached from
+        both sides that is not below another such commit is a merge base;
+        everything under it is marked stale, and the walk ends once only
+        stale commits remain queued.
+        """
+        generation, parents = self._index.generation, self._index.parents
+        flags = {a: _FROM_A}
+        flags[b] = flags.get(b, 0) | _FROM_B
+        heap = [(-generation[pos], pos) for pos in flags]
+        heapq.heapify(heap)
+        live = len(heap)
+        bases: list[int] = []
+        while heap and live:
+            _, pos = heapq.heappop(heap)
+            flag = flags[pos]
+            if not flag & _STALE:
+                live -= 1
+                if flag & (_FROM_A | _FROM_B) == (_FROM_A | _FROM_B):
+                    bases.append(pos)
+                    flag |= _STALE
+            for parent in parents[pos]:
+                old = flags.get(parent)
+                if old is None:
+                    flags[parent] = flag
+                    heapq.heappush(heap, (-generation[parent], parent))
+                    if not flag & _STALE:
+                        live += 1
+                elif old | flag != old:
+                    # Still queued: parents have lower generations than pos
+                    flags[parent] = old | flag
+                    if flag & _STALE and not old & _STALE:
+                        live -= 1
+        return bases
+
+    def merge_base(self, a: bytes, b: bytes) -> bytes | None:
+        """A best common ancestor of a and b, or None if they share no history."""
+        pos_a, pos_b = self._positions(a, b)
+        if pos_a is None or pos_b is None:
+            return None
+        if pos_a == pos_b:
+            return a
+        bases = self._paint(pos_a, pos_b)
+        if not bases:
+            return None
+        best = max(bases, key=lambda pos: (self._index.generation[pos], self._index.commit_time[pos]))
+        return self._index.shas[best]
+
+    def ahead_behind(self, base: bytes, head: bytes) -> tuple[int, int]:
+        """
+        Return (ahead, behind): commits only reachable from head, and only from base.
+
+        Like git's ahead-behind, only commits above the shared history are
+        visited.
+        """
+        pos_base, pos_head = self._positions(base, head)
+        if pos_base is None or pos_head is None:
+            return 0, 0
+        generation, parents = self._index.generation, self._index.parents
+        flags = {pos_base: _FROM_A}
+        flags[pos_head] = flags.get(pos_head, 0) | _FROM_B
+        both = _FROM_A | _FROM_B
+        heap = [(-generation[pos], pos) for pos in flags]
+        heapq.heapify(heap)
+        # Number of queued commits not yet known to be shared history
+        unshared = sum(1 for pos in flags if flags[pos] != both)
+        ahead = behind = 0
+        while heap and unshared:
+            _, pos = heapq.heappop(heap)
+            flag = flags[pos]
+            if flag != both:
+                unshared -= 1
+                # Children have higher generations, so this commit's flags are final
+                if flag == _FROM_B:
+                    ahead += 1
+                else:
+                    behind += 1
+            for parent in parents[pos]:
+                old = flags.get(parent)
+                if old is None:
+                    flags[parent] = flag
+                    heapq.heappush(heap, (-generation[parent], parent))
+                    if flag != both:
+                        unshared += 1
+                elif old | flag != old:
+                    flags[parent] = old | flag
+                    if old | flag == both:
+                        unshared -= 1
+        return ahead, behind
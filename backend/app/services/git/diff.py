@@ -0,0 +1,304 @@
+"""
+Cached branch diffs with per-file patches served on demand.
+
+A diff between two commits never changes, so the list of changed files
+is cached by (diff base SHA, head SHA), and each file's line stats and
+unified diff by its (old blob, new blob) pair. Listing a diff only
+computes line counts; patch text is formatted when a file is opened and
+returned under line and byte caps.
+
+Line counts compare line hashes after trimming the common prefix and
+suffix, so diffstats for many branches (the board's "N files, +A/-D")
+stay cheap, and blob pairs shared between branches are counted once.
+
+Binary blobs (a NUL byte near the start, as git checks) and blobs over
+DIFF_MAX_FILE_BYTES are summarized by size instead of being decoded.
+"""
+
+import difflib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from dulwich.diff_tree import tree_changes
+from dulwich.objects import Blob
+
+DIFF_MAX_FILE_BYTES = 1024 * 1024
+DIFF_MAX_LINES = 2000
+DIFF_MAX_BYTES = 256 * 1024
+BINARY_SNIFF_BYTES = 8000
+DEFAULT_DIFF_CACHE_ENTRIES = 256
+DEFAULT_PATCH_CACHE_BYTES = 32 * 1024 * 1024
+DEFAULT_STATS_CACHE_ENTRIES = 65536
+
+
+class BlobStats(NamedTuple):
+    """Line stats for one (old blob, new blob) pair."""
+    additions: int
+    deletions: int
+    binary: bool = False
+    too_large: bool = False
+    old_size: int = 0
+    new_size: int = 0
+
+
+class FileChange(NamedTuple):
+    """One changed path between two trees, with line stats but no patch text."""
+    path: str
+    status: str  # added, modified, deleted
+    old_sha: bytes | None
+    new_sha: bytes | None
+    additions: int
+    deletions: int
+    binary: bool = False
+    too_large: bool = False
+    old_size: int = 0
+    new_size: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "path": self.path,
+            "status": self.status,
+            "additions": self.additions,
+            "deletions": self.deletions,
+            "binary": self.binary,
+            "too_large": self.too_large,
+            "old_size": self.old_size,
+            "new_size": self.new_size,
+        }
+
+
+def is_binary(data: bytes) -> bool:
+    """Whether data looks binary, using git's NUL-byte heuristic."""
+    return b"\0" in data[:BINARY_SNIFF_BYTES]
+
+
+def _read_blob(object_store, sha: bytes | None) -> bytes:
+    if sha is None:
+        return b""
+    try:
+        obj = object_store[sha]
+    except KeyError:
+        return b""
+    return obj.data if isinstance(obj, Blob) else b""
+
+
+def _opcodes(old_lines: list[bytes], new_lines: list[bytes]) -> list[tuple[str, int, int, int, int]]:
+    """
+    SequenceMatcher opcodes for two line lists.
+
+    Lines are compared by hash, and the common prefix and suffix are
+    trimmed first (as git's xdiff does), so an edit in a large file only
+    runs the matcher over the changed region.
+    """
+    old_hashes = [hash(line) for line in old_lines]
+    new_hashes = [hash(line) for line in new_lines]
+    limit = min(len(old_hashes), len(new_hashes))
+    prefix = 0
+    while prefix < limit and old_hashes[prefix] == new_hashes[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_hashes[-1 - suffix] == new_hashes[-1 - suffix]:
+        suffix += 1
+    old_end = len(old_hashes) - suffix
+    new_end = len(new_hashes) - suffix
+
+    opcodes = []
+    if prefix:
+        opcodes.append(("equal", 0, prefix, 0, prefix))
+    if prefix < old_end or prefix < new_end:
+        matcher = difflib.SequenceMatcher(None, old_hashes[prefix:old_end], new_hashes[prefix:new_end])
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal" and opcodes and opcodes[-1][0] == "equal":
+                _, p1, _, q1, _ = opcodes.pop()
+                opcodes.append(("equal", p1, prefix + i2, q1, prefix + j2))
+            else:
+                opcodes.append((tag, prefix + i1, prefix + i2, prefix + j1, prefix + j2))
+    if suffix:
+        if opcodes and opcodes[-1][0] == "equal":
+            _, p1, _, q1, _ = opcodes.pop()
+            opcodes.append(("equal", p1, len(old_hashes), q1, len(new_hashes)))
+        else:
+            opcodes.append(("equal", old_end, len(old_hashes), new_end, len(new_hashes)))
+    return opcodes
+
+
+def line_stats(old: bytes, new: bytes) -> tuple[int, int]:
+    """(additions, deletions) between two blobs' contents, matching format_patch()."""
+    if not old:
+        return len(new.splitlines()), 0
+    if not new:
+        return 0, len(old.splitlines())
+    additions = deletions = 0
+    for tag, i1, i2, j1, j2 in _opcodes(old.splitlines(keepends=True), new.splitlines(keepends=True)):
+        if tag != "equal":
+            deletions += i2 - i1
+            additions += j2 - j1
+    return additions, deletions
+
+
+def blob_stats(object_store, old_sha: bytes | None, new_sha: bytes | None) -> BlobStats:
+    """Line stats for a blob pair; binary and oversized blobs only get sizes."""
+    old_data = _read_blob(object_store, old_sha)
+    new_data = _read_blob(object_store, new_sha)
+    sizes = {"old_size": len(old_data), "new_size": len(new_data)}
+    if is_binary(old_data) or is_binary(new_data):
+        return BlobStats(0, 0, binary=True, **sizes)
+    if max(len(old_data), len(new_data)) > DIFF_MAX_FILE_BYTES:
+        return BlobStats(0, 0, too_large=True, **sizes)
+    return BlobStats(*line_stats(old_data, new_data), **sizes)
+
+
+def diff_trees(object_store, old_tree: bytes, new_tree: bytes, stats=blob_stats) -> list[FileChange]:
+    """
+    List the files changed between two trees, with line stats.
+
+    Subtrees with the same SHA on both sides are skipped without being
+    read. stats(object_store, old_sha, new_sha) computes each file's
+    BlobStats; DiffCache passes a cached version.
+    """
+    changes = []
+    for change in tree_changes(object_store, old_tree, new_tree):
+        old_sha = change.old.sha if change.old else None
+        new_sha = change.new.sha if change.new else None
+        path = (change.new.path if change.new else change.old.path).decode("utf-8", errors="replace")
+        status = "added" if old_sha is None else "deleted" if new_sha is None else "modified"
+        changes.append(FileChange(path, status, old_sha, new_sha, *stats(object_store, old_sha, new_sha)))
+    return changes
+
+
+def _format_range(start: int, stop: int) -> str:
+    """Unified diff hunk range, as difflib formats it."""
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def _grouped_opcodes(opcodes: list, n: int = 3):
+    """Group opcodes into hunks with n lines of context (difflib's get_grouped_opcodes)."""
+    matcher = difflib.SequenceMatcher()
+    matcher.opcodes = opcodes  # get_opcodes() returns the cached list
+    return matcher.get_grouped_opcodes(n)
+
+
+def format_patch(object_store, change: FileChange) -> str:
+    """Unified diff text for one change ("" for binary or oversized files)."""
+    if change.binary or change.too_large:
+        return ""
+    old_lines = _read_blob(object_store, change.old_sha).splitlines(keepends=True)
+    new_lines = _read_blob(object_store, change.new_sha).splitlines(keepends=True)
+    if old_lines == new_lines:
+        return ""
+
+    out = [f"--- a/{change.path}\n", f"+++ b/{change.path}\n"]
+    for group in _grouped_opcodes(_opcodes(old_lines, new_lines)):
+        first, last = group[0], group[-1]
+        out.append(f"@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@\n")
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                out.extend(b" " + line for line in old_lines[i1:i2])
+                continue
+            if tag in ("replace", "delete"):
+                out.extend(b"-" + line for line in old_lines[i1:i2])
+            if tag in ("replace", "insert"):
+                out.extend(b"+" + line for line in new_lines[j1:j2])
+    return "".join(
+        line if isinstance(line, str) else line.decode("utf-8", errors="replace")
+        for line in out
+    )
+
+
+def truncate_patch(patch: str, max_lines: int, max_bytes: int) -> tuple[str, bool]:
+    """Cut a patch to at most max_lines lines and max_bytes UTF-8 bytes, on a line boundary."""
+    lines = patch.splitlines(keepends=True)
+    out = []
+    size = 0
+    for line in lines[:max_lines]:
+        size += len(line.encode("utf-8"))
+        if size > max_bytes:
+            break
+        out.append(line)
+    return "".join(out), len(out) < len(lines)
+
+
+class DiffCache:
+    """
+    LRU caches of file lists per commit pair, line stats per blob pair and
+    patch text per blob pair.
+
+    All three are content-addressed, so entries never need invalidating.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_DIFF_CACHE_ENTRIES,
+                 max_patch_bytes: int = DEFAULT_PATCH_CACHE_BYTES,
+                 max_stats_entries: int = DEFAULT_STATS_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.max_patch_bytes = max_patch_bytes
+        self.max_stats_entries = max_stats_entries
+        self._lock = threading.Lock()
+        self._changes: OrderedDict[tuple[bytes, bytes], list[FileChange]] = OrderedDict()
+        self._stats: OrderedDict[tuple, BlobStats] = OrderedDict()
+        self._patches: OrderedDict[tuple, str] = OrderedDict()
+        self._patch_bytes = 0
+
+    def blob_stats(self, object_store, old_sha: bytes | None, new_sha: bytes | None) -> BlobStats:
+        """Cached blob_stats() for a blob pair."""
+        key = (old_sha, new_sha)
+        with self._lock:
+            cached = self._stats.get(key)
+            if cached is not None:
+                self._stats.move_to_end(key)
+                return cached
+        stats = blob_stats(object_store, old_sha, new_sha)
+        if self.max_stats_entries > 0:
+            with self._lock:
+                self._stats[key] = stats
+                while len(self._stats) > self.max_stats_entries:
+                    self._stats.popitem(last=False)
+        return stats
+
+    def changes(self, object_store, base_commit: bytes, head_commit: bytes) -> list[FileChange]:
+        """Files changed from base_commit to head_commit (commit SHAs)."""
+        key = (base_commit, head_commit)
+        with self._lock:
+            cached = self._changes.get(key)
+            if cached is not None:
+                self._changes.move_to_end(key)
+                return cached
+        changes = diff_trees(
+            object_store,
+            object_store[base_commit].tree,
+            object_store[head_commit].tree,
+            stats=self.blob_stats,
+        )
+        if self.max_entries > 0:
+            with self._lock:
+                self._changes[key] = changes
+                self._changes.move_to_end(key)
+                while len(self._changes) > self.max_entries:
+                    self._changes.popitem(last=False)
+        return changes
+
+    def patch(self, object_store, change: FileChange) -> str:
+        """Full unified diff for one change."""
+        key = (change.old_sha, change.new_sha, change.path)
+        with self._lock:
+            cached = self._patches.get(key)
+            if cached is not None:
+                self._patches.move_to_end(key)
+                return cached
+        patch = format_patch(object_store, change)
+        size = len(patch)
+        if size <= self.max_patch_bytes:
+            with self._lock:
+                if key not in self._patches:
+                    self._patches[key] = patch
+                    self._patch_bytes += size
+                while self._patch_bytes > self.max_patch_bytes:
+                    _, evicted = self._patches.popitem(last=False)
+                    self._patch_bytes -= len(evicted)
+        return patch
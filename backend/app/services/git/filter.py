@@ -0,0 +1,152 @@
+"""
+Object filters for partial clones.
+
+Implements the blob:none and blob:limit=<n>[kmg] filter specs a client
+sends with "filter <spec>". Blobs discovered by the object walk are left
+out of the pack when filtered; objects the client asked for by id are
+always sent, which is how a partial clone lazily fetches missing blobs.
+
+Blob sizes come from the pack entry headers where possible, so large
+binary assets are not inflated just to learn that they are filtered out.
+"""
+
+import zlib
+from dataclasses import dataclass
+from typing import Iterable
+
+from dulwich.objects import Blob
+from dulwich.pack import OFS_DELTA, REF_DELTA, PackFileDisappeared
+
+from app.services.git.walk import MissingObject
+
+_SIZE_SUFFIXES = {b"k": 1 << 10, b"m": 1 << 20, b"g": 1 << 30}
+
+# Enough compressed bytes to inflate the two size varints at the start of a delta
+_DELTA_HEADER_READ = 64
+
+
+@dataclass(frozen=True)
+class ObjectFilter:
+    """A parsed filter spec; blobs of at least blob_limit bytes are omitted."""
+    spec: bytes
+    blob_limit: int
+
+    def omits(self, size: int) -> bool:
+        return size >= self.blob_limit
+
+
+def parse_filter_spec(spec: bytes) -> ObjectFilter:
+    """
+    Parse a filter spec, raising ValueError for unsupported ones.
+
+    blob:none is treated as blob:limit=0, which omits every blob.
+    """
+    spec = spec.strip()
+    if spec == b"blob:none":
+        return ObjectFilter(spec, 0)
+    if spec.startswith(b"blob:limit="):
+        value = spec[11:].lower()
+        multiplier = _SIZE_SUFFIXES.get(value[-1:], 1)
+        if multiplier > 1:
+            value = value[:-1]
+        if value.isdigit():
+            return ObjectFilter(spec, int(value) * multiplier)
+    raise ValueError(f"unsupported filter spec '{spec.decode(errors='replace')}'")
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    """Read a delta header size varint, returning (value, next position)."""
+    value = shift = 0
+    while True:
+        c = data[pos]
+        pos += 1
+        value |= (c & 0x7f) << shift
+        shift += 7
+        if not c & 0x80:
+            return value, pos
+
+
+class _BlobSizer:
+    """Blob sizes read from pack entry headers, falling back to loading the blob."""
+
+    def __init__(self, object_store):
+        self.object_store = object_store
+        self._files: dict[str, object] = {}
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def _packed_size(self, sha: bytes) -> int | None:
+        for pack in getattr(self.object_store, "packs", ()):
+            try:
+                offset = pack.index.object_offset(sha)
+            except (KeyError, PackFileDisappeared):
+                continue
+            try:
+                f = self._files.get(pack.data.path)
+                if f is None:
+                    f = self._files[pack.data.path] = open(pack.data.path, "rb")
+                f.seek(offset)
+                raw = f.read(32 + _DELTA_HEADER_READ)
+            except (OSError, PackFileDisappeared):
+                continue
+            return self._entry_size(raw)
+        return None
+
+    @staticmethod
+    def _entry_size(raw: bytes) -> int | None:
+        c = raw[0]
+        type_num = (c >> 4) & 0x07
+        size = c & 0x0f
+        shift, pos = 4, 1
+        while c & 0x80:
+            c = raw[pos]
+            size |= (c & 0x7f) << shift
+            shift += 7
+            pos += 1
+        if type_num not in (OFS_DELTA, REF_DELTA):
+            return size
+        # The entry size of a delta is the delta's; the object size is the
+        # second varint of the inflated delta header
+        if type_num == OFS_DELTA:
+            while raw[pos] & 0x80:
+                pos += 1
+            pos += 1
+        else:
+            pos += 20
+        try:
+            header = zlib.decompressobj().decompress(raw[pos:], 20)
+            _, after_source = _read_varint(header, 0)
+            target_size, _ = _read_varint(header, after_source)
+        except (zlib.error, IndexError):
+            return None
+        return target_size
+
+    def size(self, sha: bytes) -> int:
+        size = self._packed_size(sha)
+        if size is None:
+            size = len(self.object_store[sha].as_raw_string())
+        return size
+
+
+def filter_objects(object_store, missing: list[MissingObject], object_filter: ObjectFilter,
+                   keep: Iterable[bytes] = ()) -> list[MissingObject]:
+    """
+    Drop the blobs object_filter omits from missing.
+
+    Objects in keep (the explicitly wanted ones) are never dropped.
+    """
+    keep = set(keep)
+    sizer = _BlobSizer(object_store) if object_filter.blob_limit > 0 else None
+    try:
+        return [
+            obj for obj in missing
+            if obj.type_num != Blob.type_num
+            or obj.sha in keep
+            or (sizer is not None and not object_filter.omits(sizer.size(obj.sha)))
+        ]
+    finally:
+        if sizer is not None:
+            sizer.close()
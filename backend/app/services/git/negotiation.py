@@ -0,0 +1,157 @@
+"""
+have/want negotiation for git-upload-pack.
+
+Implements the ACK/NAK responses of the v0/v1 protocol for plain,
+multi_ack and multi_ack_detailed clients over stateless HTTP, where each
+request carries all wants plus every have the client still considers
+relevant, and the acknowledgments section of protocol v2 fetch.
+"""
+
+from dataclasses import dataclass, field
+
+from app.services.git.protocol import DELIM_PKT, FLUSH_PKT, UploadPackRequest, pkt_line
+from app.services.git.walk import reaches_any
+
+
+@dataclass
+class NegotiationResult:
+    """Outcome of processing one round of haves."""
+    lines: list[bytes] = field(default_factory=list)  # pkt-lines to send before any pack
+    common: list[bytes] = field(default_factory=list)  # haves we also have
+    send_pack: bool = False
+
+
+def _multi_ack_mode(request: UploadPackRequest) -> int:
+    if request.has_capability(b"multi_ack_detailed"):
+        return 2
+    if request.has_capability(b"multi_ack"):
+        return 1
+    return 0
+
+
+class _GiveUpCheck:
+    """Caches whether every want already reaches a common commit."""
+
+    def __init__(self, object_store, wants: list[bytes]):
+        self.object_store = object_store
+        self.wants = wants
+        self._common: set[bytes] = set()
+        self._result: bool | None = None
+
+    def add_common(self, sha: bytes) -> None:
+        if sha not in self._common:
+            self._common.add(sha)
+            self._result = None
+
+    def ok(self) -> bool:
+        if not self._common:
+            return False
+        if self._result is None:
+            times = []
+            for sha in self._common:
+                try:
+                    obj = self.object_store[sha]
+                except KeyError:
+                    continue
+                if obj.type_name == b"commit":
+                    times.append(obj.commit_time)
+            cutoff = min(times) if times else 0
+            self._result = all(
+                reaches_any(self.object_store, want, self._common, cutoff)
+                for want in self.wants
+            )
+        return self._result
+
+
+def negotiate(object_store, request: UploadPackRequest) -> NegotiationResult:
+    """
+    Process the client's haves and decide whether to send a pack now.
+
+    Mirrors upload-pack's get_common_commits(): every have we also have is
+    acknowledged as common, "ready" is signalled once every want reaches a
+    common commit, and the pack is sent after "done" (or right away once
+    ready when the client negotiated no-done).
+    """
+    result = NegotiationResult()
+    mode = _multi_ack_mode(request)
+    give_up = _GiveUpCheck(object_store, request.wants)
+    last_common: bytes | None = None
+    got_common = False
+    got_other = False
+    sent_ready = False
+
+    for have in request.haves:
+        if have in object_store:
+            got_common = True
+            last_common = have
+            result.common.append(have)
+            give_up.add_common(have)
+            if mode == 2:
+                result.lines.append(pkt_line(b"ACK " + have + b" common\n"))
+            elif mode == 1:
+                result.lines.append(pkt_line(b"ACK " + have + b" continue\n"))
+            elif len(result.common) == 1:
+                result.lines.append(pkt_line(b"ACK " + have + b"\n"))
+        else:
+            got_other = True
+            if mode and give_up.ok():
+                if mode == 2:
+                    sent_ready = True
+                    result.lines.append(pkt_line(b"ACK " + have + b" ready\n"))
+                else:
+                    result.lines.append(pkt_line(b"ACK " + have + b" continue\n"))
+
+    if request.done or not request.haves:
+        # A request without haves is a fresh clone - nothing to negotiate
+        if result.common:
+            if mode:
+                result.lines.append(pkt_line(b"ACK " + last_common + b"\n"))
+        else:
+            result.lines.append(pkt_line(b"NAK\n"))
+        result.send_pack = True
+        return result
+
+    # End of a negotiation round (flush without done)
+    if mode == 2 and got_common and not got_other and give_up.ok():
+        sent_ready = True
+        result.lines.append(pkt_line(b"ACK " + last_common + b" ready\n"))
+    if not result.common or mode:
+        result.lines.append(pkt_line(b"NAK\n"))
+    if request.has_capability(b"no-done") and sent_ready:
+        result.lines.append(pkt_line(b"ACK " + last_common + b"\n"))
+        result.send_pack = True
+    return result
+
+
+def negotiate_v2(object_store, request: UploadPackRequest) -> NegotiationResult:
+    """
+    Process the haves of a protocol v2 fetch request.
+
+    After "done" the packfile section follows directly. Otherwise an
+    acknowledgments section lists the common haves (or NAK), and adds
+    "ready" plus a delimiter once every want reaches a common commit, in
+    which case the pack follows; without ready the response ends there.
+    """
+    result = NegotiationResult()
+    give_up = _GiveUpCheck(object_store, request.wants)
+    for have in request.haves:
+        if have in object_store:
+            result.common.append(have)
+            give_up.add_common(have)
+
+    if request.done:
+        result.send_pack = True
+        return result
+
+    result.lines.append(pkt_line(b"acknowledgments\n"))
+    if not result.common:
+        result.lines.append(pkt_line(b"NAK\n"))
+    for sha in result.common:
+        result.lines.append(pkt_line(b"ACK " + sha + b"\n"))
+    if give_up.ok():
+        result.lines.append(pkt_line(b"ready\n"))
+        result.lines.append(DELIM_PKT)
+        result.send_pack = True
+    else:
+        result.lines.append(FLUSH_PKT)
+    return result
@@ -0,0 +1,331 @@
+"""
+Streaming pack file generation.
+
+Packs are produced as an iterator of byte chunks so upload-pack responses
+can start flowing to the client while later objects are still being
+compressed. The trailing SHA-1 is computed incrementally as chunks are
+emitted, so the full pack never has to be held in memory.
+"""
+
+import hashlib
+import struct
+import sys
+import zlib
+from collections import deque
+from typing import Generator, Iterable, Iterator
+
+from dulwich.pack import OFS_DELTA
+
+
+PACK_SIGNATURE = b"PACK"
+PACK_VERSION = 2
+
+# Delta search defaults, matching git's pack.window / pack.depth
+DEFAULT_DELTA_WINDOW = 10
+DEFAULT_DELTA_DEPTH = 50
+# Objects smaller than this are never worth deltifying (git uses the same cutoff)
+DELTA_MIN_OBJECT_SIZE = 50
+# Objects larger than this are sent whole to keep the search window's memory bounded
+DELTA_MAX_OBJECT_SIZE = 32 * 1024 * 1024
+# Granularity of the base index used to find copy candidates (git's RABIN_WINDOW)
+DELTA_BLOCK_SIZE = 16
+# Largest copy a single delta instruction can express
+DELTA_MAX_COPY = 0x10000
+
+
+def encode_object_header(type_num: int, size: int) -> bytes:
+    """Encode a pack object header.
+
+    First byte: continuation bit + type (bits 4-6) + size bits 0-3,
+    followed by 7 bits of size per byte.
+    """
+    header = bytearray()
+    c = (type_num << 4) | (size & 0x0f)
+    size >>= 4
+    while size:
+        header.append(c | 0x80)
+        c = size & 0x7f
+        size >>= 7
+    header.append(c)
+    return bytes(header)
+
+
+def encode_ofs_delta_offset(distance: int) -> bytes:
+    """Encode the negative base offset of an OFS_DELTA object.
+
+    Big-endian base-128 with an implicit +1 on every continuation byte.
+    """
+    encoded = bytearray([distance & 0x7f])
+    distance >>= 7
+    while distance:
+        distance -= 1
+        encoded.insert(0, 0x80 | (distance & 0x7f))
+        distance >>= 7
+    return bytes(encoded)
+
+
+def pack_name_hash(path: bytes) -> int:
+    """
+    Git's pack name hash, used to sort delta candidates.
+
+    Weighted towards the last characters of the path, so files with the
+    same name (or extension) in different directories sort together.
+    """
+    value = 0
+    for c in path:
+        if c in b" \t\n\r\v\f":
+            continue
+        value = ((value >> 2) + (c << 24)) & 0xffffffff
+    return value
+
+
+def _encode_delta_size(size: int) -> bytes:
+    """Little-endian base-128 size used in delta headers."""
+    encoded = bytearray()
+    while True:
+        c = size & 0x7f
+        size >>= 7
+        if size:
+            encoded.append(c | 0x80)
+        else:
+            encoded.append(c)
+            return bytes(encoded)
+
+
+def _match_length(base: bytes, base_pos: int, target: bytes, target_pos: int) -> int:
+    """Length of the common run starting at the given offsets, found by galloping."""
+    limit = min(len(base) - base_pos, len(target) - target_pos)
+    length = 0
+    step = DELTA_BLOCK_SIZE
+    while length < limit:
+        step = min(step, limit - length)
+        if base[base_pos + length:base_pos + length + step] == target[target_pos + length:target_pos + length + step]:
+            length += step
+            step *= 2
+        elif step > 1:
+            step //= 2
+        else:
+            break
+    return length
+
+
+def _append_copy(out: bytearray, offset: int, size: int) -> None:
+    """Append a copy instruction; a size of DELTA_MAX_COPY is encoded as zero."""
+    op = 0x80
+    args = bytearray()
+    for i in range(4):
+        byte = (offset >> (i * 8)) & 0xff
+        if byte:
+            op |= 1 << i
+            args.append(byte)
+    if size != DELTA_MAX_COPY:
+        for i in range(3):
+            byte = (size >> (i * 8)) & 0xff
+            if byte:
+                op |= 1 << (4 + i)
+                args.append(byte)
+    out.append(op)
+    out.extend(args)
+
+
+def create_delta(base: bytes, target: bytes, max_size: int | None = None) -> bytes | None:
+    """
+    Encode target as a git delta against base.
+
+    Like git's diff-delta, the base is indexed in fixed-size blocks and the
+    target is scanned for runs that can be copied from it; everything else
+    is inserted literally. Runs in linear time, so unrelated inputs are
+    cheap to reject.
+
+    With max_size, gives up and returns None as soon as the delta is
+    bound to be larger than max_size bytes.
+    """
+    if max_size is None:
+        max_size = sys.maxsize
+    out = bytearray(_encode_delta_size(len(base)))
+    out += _encode_delta_size(len(target))
+
+    index: dict[bytes, int] = {}
+    for offset in range(len(base) - DELTA_BLOCK_SIZE, -1, -DELTA_BLOCK_SIZE):
+        index[base[offset:offset + DELTA_BLOCK_SIZE]] = offset
+
+    literal = bytearray()
+
+    def flush_literal():
+        for start in range(0, len(literal), 0x7f):
+            chunk = literal[start:start + 0x7f]
+            out.append(len(chunk))
+            out.extend(chunk)
+        literal.clear()
+
+    pos = 0
+    end = len(target) - DELTA_BLOCK_SIZE
+    while pos <= end:
+        base_pos = index.get(target[pos:pos + DELTA_BLOCK_SIZE])
+        if base_pos is None:
+            literal.append(target[pos])
+            pos += 1
+            # Pending literals are emitted as-is, so this is a lower bound
+            if len(out) + len(literal) > max_size:
+                return None
+            continue
+        # Pull any matching bytes back out of the pending literal
+        while literal and base_pos and base[base_pos - 1] == literal[-1]:
+            literal.pop()
+            base_pos -= 1
+            pos -= 1
+        length = _match_length(base, base_pos, target, pos)
+        flush_literal()
+        pos += length
+        while length:
+            size = min(length, DELTA_MAX_COPY)
+            _append_copy(out, base_pos, size)
+            base_pos += size
+            length -= size
+        if len(out) > max_size:
+            return None
+    literal.extend(target[pos:])
+    flush_literal()
+    if len(out) > max_size:
+        return None
+    return bytes(out)
+
+
+class PackStreamWriter:
+    """
+    Incrementally encodes a version 2 pack.
+
+    Each method returns the bytes to emit and folds them into the running
+    checksum; trailer() returns the final SHA-1 that terminates the pack.
+    """
+
+    def __init__(self, num_objects: int):
+        self.num_objects = num_objects
+        self.offset = 0
+        self._sha = hashlib.sha1()
+
+    def _emit(self, data: bytes) -> bytes:
+        self._sha.update(data)
+        self.offset += len(data)
+        return data
+
+    def header(self) -> bytes:
+        return self._emit(
+            PACK_SIGNATURE
+            + struct.pack(">I", PACK_VERSION)
+            + struct.pack(">I", self.num_objects)
+        )
+
+    def write_object(self, type_num: int, data: bytes) -> bytes:
+        """Encode a full (non-delta) object, zlib compressed like git's default."""
+        return self._emit(encode_object_header(type_num, len(data)) + zlib.compress(data))
+
+    def write_ofs_delta(self, base_offset: int, delta: bytes) -> bytes:
+        """Encode a delta against the object previously written at base_offset."""
+        return self._emit(
+            encode_object_header(OFS_DELTA, len(delta))
+            + encode_ofs_delta_offset(self.offset - base_offset)
+            + zlib.compress(delta)
+        )
+
+    def write_raw(self, header: bytes, compressed: bytes) -> bytes:
+        """Emit an already-encoded entry, e.g. one copied from another pack."""
+        return self._emit(header + compressed)
+
+    def trailer(self) -> bytes:
+        return self._emit(self._sha.digest())
+
+
+class _DeltaBase:
+    """A recently written object kept in the delta search window."""
+    __slots__ = ("offset", "type_num", "data", "depth")
+
+    def __init__(self, offset: int, type_num: int, data: bytes, depth: int):
+        self.offset = offset
+        self.type_num = type_num
+        self.data = data
+        self.depth = depth
+
+
+def _find_best_delta(window: deque, type_num: int, data: bytes,
+                     max_depth: int) -> tuple[_DeltaBase, bytes] | None:
+    """Try each window entry of the same type as a base; return the smallest delta."""
+    best = None
+    # Like git's try_delta(): a delta must at least halve the object, and
+    # bases deep in a chain must do better still
+    limit = len(data) // 2 - 20
+    for base in reversed(window):
+        if base.type_num != type_num or base.depth >= max_depth:
+            continue
+        if len(data) < len(base.data) >> 5:
+            continue
+        max_size = limit * (max_depth - base.depth) // max_depth
+        if best is not None:
+            max_size = min(max_size, len(best[1]) - 1)
+        if max_size <= 0:
+            continue
+        delta = create_delta(base.data, data, max_size)
+        if delta is not None:
+            best = (base, delta)
+    return best
+
+
+def write_objects(writer: PackStreamWriter, objects: Iterable[tuple[int, bytes]],
+                  delta_window: int = 0,
+                  delta_depth: int = DEFAULT_DELTA_DEPTH) -> Generator[bytes, None, int]:
+    """
+    Encode (type_num, raw_data) objects with writer, returning how many were written.
+
+    With delta_window > 0 each object is compared against the previous
+    delta_window objects of the same type and written as an OFS_DELTA when
+    that is substantially smaller. Callers should order objects so likely
+    bases are adjacent (see delta_sort_key()).
+    """
+    window: deque[_DeltaBase] = deque(maxlen=delta_window or None)
+    written = 0
+    for type_num, data in objects:
+        offset = writer.offset
+        if not delta_window:
+            yield writer.write_object(type_num, data)
+        elif len(data) < DELTA_MIN_OBJECT_SIZE or len(data) > DELTA_MAX_OBJECT_SIZE:
+            yield writer.write_object(type_num, data)
+        else:
+            found = _find_best_delta(window, type_num, data, delta_depth)
+            if found:
+                base, delta = found
+                yield writer.write_ofs_delta(base.offset, delta)
+                window.append(_DeltaBase(offset, type_num, data, base.depth + 1))
+            else:
+                yield writer.write_object(type_num, data)
+                window.append(_DeltaBase(offset, type_num, data, 0))
+        written += 1
+    return written
+
+
+def generate_pack(objects: Iterable[tuple[int, bytes]], num_objects: int,
+                  delta_window: int = 0, delta_depth: int = DEFAULT_DELTA_DEPTH) -> Iterator[bytes]:
+    """
+    Yield a complete pack for the given (type_num, raw_data) objects.
+
+    num_objects must match the number of objects the iterable produces,
+    since the count is written in the header before any object is read.
+    See write_objects() for the delta options.
+    """
+    writer = PackStreamWriter(num_objects)
+    yield writer.header()
+    written = yield from write_objects(writer, objects, delta_window, delta_depth)
+    if written != num_objects:
+        raise ValueError(f"Pack header declared {num_objects} objects but {written} were written")
+    yield writer.trailer()
+
+
+def delta_sort_key(type_num: int, path: bytes) -> tuple[int, int, bytes]:
+    """
+    Sort key that groups delta candidates, like git's type_size_sort().
+
+    Objects of the same type and similar name end up adjacent in the
+    search window. Python's sort is stable, so within a group the caller's
+    order (newest first for walk output) is preserved and newer versions
+    become the bases older ones delta against.
+    """
+    return (type_num, pack_name_hash(path), path)
@@ -0,0 +1,253 @@
+"""
+On-disk cache of generated packs.
+
+Packs are keyed by the repo and the want/common commit sets that produced
+them. Objects are content-addressed, so a cached pack never goes stale:
+the same tips always describe the same objects. Entries are evicted
+least-recently-used once the cache exceeds its byte budget.
+
+Identical concurrent requests (e.g. a pipeline fanning out to many steps
+on one commit) share a single generation. The pack is produced once in
+the background into a temporary file, and every requester, including the
+first, streams from that file as it grows.
+
+Generation is queued with the submit callable (the git worker pool in the
+server). Requesters usually wait on a git worker themselves, so if every
+worker is busy following a pack whose generation is still queued, a
+requester stops waiting after CLAIM_TIMEOUT and produces the pack inline.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+CACHE_SUFFIX = ".pack"
+READ_CHUNK_SIZE = 64 * 1024
+# How long a requester waits for a worker to start a generation before running it itself
+CLAIM_TIMEOUT = 0.5
+
+
+def pack_cache_key(repo_id: str, wants: Iterable[bytes], common: Iterable[bytes],
+                   options: Iterable[bytes] = ()) -> str:
+    """
+    Build a cache key from a repo, its want/common tip sets and pack options.
+
+    options holds anything else that changes the pack bytes (e.g. whether
+    ofs-delta was negotiated).
+    """
+    h = hashlib.sha256()
+    h.update(repo_id.encode())
+    for label, values in ((b"want", wants), (b"common", common), (b"option", options)):
+        for value in sorted(set(values)):
+            h.update(b"\0" + label + b" " + value)
+    return h.hexdigest()
+
+
+class _Generation:
+    """A pack being written to disk in the background."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.size = 0
+        self.done = False
+        self.error: BaseException | None = None
+        self.started = False
+        # Produces the pack on the calling thread if no worker has claimed it
+        self.start: Callable[[], None] | None = None
+        self.cond = threading.Condition()
+
+    def claim(self) -> bool:
+        """Mark the generation as started; False if another thread got there first."""
+        with self.cond:
+            if self.started:
+                return False
+            self.started = True
+            return True
+
+    def run(self, chunks: Iterator[bytes], on_complete: Callable[["_Generation"], None]) -> None:
+        try:
+            with open(self.path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    f.flush()
+                    with self.cond:
+                        self.size += len(chunk)
+                        self.cond.notify_all()
+        except BaseException as e:
+            with self.cond:
+                self.error = e
+                self.cond.notify_all()
+        else:
+            on_complete(self)
+        finally:
+            with self.cond:
+                self.done = True
+                self.cond.notify_all()
+
+    def follow(self, f) -> Iterator[bytes]:
+        """
+        Yield the pack from an open handle as it is written, raising if generation fails.
+
+        If nothing has started the generation within CLAIM_TIMEOUT, start()
+        is called to produce it on this thread.
+        """
+        with f:
+            sent = 0
+            while True:
+                with self.cond:
+                    while self.size == sent and not self.done and self.error is None:
+                        if self.started or self.start is None:
+                            self.cond.wait()
+                        elif not self.cond.wait(CLAIM_TIMEOUT) and not self.started:
+                            break
+                    stalled = not self.started
+                    if not stalled:
+                        if self.error is not None:
+                            raise self.error
+                        available = self.size
+                        finished = self.done
+                if stalled:
+                    self.start()
+                    continue
+                while sent < available:
+                    data = f.read(min(READ_CHUNK_SIZE, available - sent))
+                    if not data:
+                        break
+                    sent += len(data)
+                    yield data
+                if finished and sent >= available:
+                    return
+
+
+class PackCache:
+    """
+    Bounded LRU cache of generated packs, stored as files in cache_dir.
+
+    get_or_generate() is safe to call from multiple threads; requests for a
+    key that is already being generated attach to the in-flight generation.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int,
+                 submit: Callable[[Callable[[], None]], object] | None = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Queues a generation in the background; defaults to a dedicated thread
+        self.submit = submit or self._start_thread
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, int] | None = None
+        self._in_flight: dict[str, _Generation] = {}
+        self._total_bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _load(self) -> None:
+        """Create the cache directory and index any packs left from a previous run."""
+        if self._entries is not None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        except PermissionError:
+            # Running in test context without /app access - use temp dir
+            self.cache_dir = Path(tempfile.mkdtemp(prefix="lazyaf_pack_cache_"))
+        found = []
+        for path in self.cache_dir.iterdir():
+            if path.suffix == CACHE_SUFFIX:
+                st = path.stat()
+                found.append((st.st_mtime, path.stem, st.st_size))
+            elif path.name.endswith(".tmp"):
+                path.unlink(missing_ok=True)
+        self._entries = OrderedDict((key, size) for _, key, size in sorted(found))
+        self._total_bytes = sum(self._entries.values())
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{CACHE_SUFFIX}"
+
+    def _complete(self, key: str, generation: _Generation) -> None:
+        final = self._path(key)
+        with self._lock:
+            os.replace(generation.path, final)
+            generation.path = final
+            self._entries[key] = generation.size
+            self._total_bytes += generation.size
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least-recently-used packs until the cache fits its budget (lock held)."""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self._path(key).unlink(missing_ok=True)
+
+    def _stream_file(self, f) -> Iterator[bytes]:
+        with f:
+            while True:
+                data = f.read(READ_CHUNK_SIZE)
+                if not data:
+                    return
+                yield data
+
+    def _start_thread(self, task: Callable[[], None]) -> None:
+        threading.Thread(target=task, name="pack-cache", daemon=True).start()
+
+    def _generate(self, key: str, generation: _Generation, generate: Callable[[], Iterator[bytes]]) -> None:
+        """Write the pack for key to its temporary file, unless another thread already is."""
+        if not generation.claim():
+            return
+        try:
+            generation.run(generate(), lambda gen: self._complete(key, gen))
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            if generation.error is not None:
+                generation.path.unlink(missing_ok=True)
+
+    def get_or_generate(self, key: str, generate: Callable[[], Iterator[bytes]]) -> Iterator[bytes]:
+        """
+        Stream the pack for key, generating it with generate() on a miss.
+
+        The generator is consumed in the background via submit so it runs
+        to completion (and populates the cache) even if this caller stops
+        reading early.
+        """
+        if not self.enabled:
+            return generate()
+
+        with self._lock:
+            self._load()
+            generation = self._in_flight.get(key)
+            if generation is None and key in self._entries:
+                path = self._path(key)
+                try:
+                    # Files are opened under the lock so eviction cannot race the open
+                    f = open(path, "rb")
+                except FileNotFoundError:
+                    # Removed behind our back; regenerate below
+                    self._total_bytes -= self._entries.pop(key)
+                else:
+                    self._entries.move_to_end(key)
+                    os.utime(path)
+                    print(f"[git_server] pack cache hit {key[:12]}")
+                    return self._stream_file(f)
+            if generation is not None:
+                print(f"[git_server] pack cache joined in-flight {key[:12]}")
+                return generation.follow(open(generation.path, "rb"))
+
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{key[:12]}-", suffix=".tmp")
+            os.close(fd)
+            generation = _Generation(Path(tmp))
+            generation.start = lambda: self._generate(key, generation, generate)
+            self._in_flight[key] = generation
+            stream = generation.follow(open(generation.path, "rb"))
+
+        try:
+            self.submit(generation.start)
+        except RuntimeError as e:
+            # Pool shut down; the first requester produces the pack itself
+            print(f"[git_server] pack cache could not queue {key[:12]}: {e}")
+        return stream
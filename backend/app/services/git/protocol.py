@@ -0,0 +1,225 @@
+"""
+Git smart-protocol framing helpers.
+
+pkt-line encoding/decoding and side-band multiplexing shared by the
+upload-pack and receive-pack handlers, plus request parsing for both the
+v0/v1 want/have exchange and protocol v2 commands.
+"""
+
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+
+FLUSH_PKT = b"0000"
+DELIM_PKT = b"0001"
+
+# Side-band channels
+SIDEBAND_DATA = 1
+SIDEBAND_PROGRESS = 2
+SIDEBAND_ERROR = 3
+
+# Max pkt-line = 65520 (0xfff0), minus 4 for length, minus 1 for band = 65515
+SIDEBAND_64K_MAX_DATA = 65515
+# Plain side-band is limited to 1000-byte packets
+SIDEBAND_MAX_DATA = 995
+
+
+def pkt_line(data: bytes) -> bytes:
+    """Encode data as a git pkt-line."""
+    length = len(data) + 4  # +4 for the length prefix itself
+    return f"{length:04x}".encode() + data
+
+
+def iter_pkt_lines(data: bytes) -> Iterator[bytes | None]:
+    """
+    Decode a buffer of pkt-lines.
+
+    Yields the payload of each line with any trailing newline stripped,
+    or None for flush/delimiter packets. Stops at the first malformed or
+    truncated length prefix.
+    """
+    offset = 0
+    while offset + 4 <= len(data):
+        try:
+            pkt_len = int(data[offset:offset + 4], 16)
+        except ValueError:
+            return
+        if pkt_len < 4:
+            # 0000 = flush, 0001 = delimiter, 0002 = response-end
+            offset += 4
+            yield None
+            continue
+        line = data[offset + 4:offset + pkt_len]
+        offset += pkt_len
+        if line.endswith(b"\n"):
+            line = line[:-1]
+        yield line
+
+
+def sideband_frames(chunks: Iterable[bytes], band: int = SIDEBAND_DATA,
+                    max_data: int = SIDEBAND_64K_MAX_DATA) -> Iterator[bytes]:
+    """
+    Re-frame a stream of byte chunks as side-band pkt-lines.
+
+    Small chunks are coalesced so each frame carries up to max_data bytes,
+    and large chunks are split across frames.
+    """
+    prefix = bytes([band])
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= max_data:
+            yield pkt_line(prefix + bytes(buffer[:max_data]))
+            del buffer[:max_data]
+    if buffer:
+        yield pkt_line(prefix + bytes(buffer))
+
+
+@dataclass
+class UploadPackRequest:
+    """Parsed want/have negotiation from a git-upload-pack POST body."""
+    wants: list[bytes] = field(default_factory=list)
+    haves: list[bytes] = field(default_factory=list)
+    capabilities: list[bytes] = field(default_factory=list)
+    done: bool = False
+    # Shallow clients: their current boundary commits and how to deepen
+    shallows: list[bytes] = field(default_factory=list)
+    depth: int = 0
+    deepen_since: int = 0
+    deepen_not: list[bytes] = field(default_factory=list)
+    deepen_relative: bool = False
+    # Partial clones: "blob:none", "blob:limit=<n>"; empty for a full pack
+    filter_spec: bytes = b""
+    # Why an argument was rejected; reported by validate()
+    error: str = ""
+
+    def has_capability(self, name: bytes) -> bool:
+        return name in self.capabilities
+
+    @property
+    def deepen(self) -> bool:
+        """Whether the client asked for a new shallow boundary."""
+        return self.depth > 0 or self.deepen_since > 0 or bool(self.deepen_not)
+
+    def validate(self) -> None:
+        """Raise ValueError if an argument could not be parsed."""
+        if self.error:
+            raise ValueError(self.error)
+
+
+def _parse_count(request: UploadPackRequest, name: str, value: bytes) -> int:
+    """Parse a non-negative integer argument, recording an error on request if it isn't one."""
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    if not request.error:
+        request.error = f"invalid {name} value '{value.decode(errors='replace')}'"
+    return 0
+
+
+def _parse_shallow_line(request: UploadPackRequest, line: bytes) -> bool:
+    """Apply a shallow/deepen line to request; False if it is not one."""
+    if line.startswith(b"shallow "):
+        request.shallows.append(line[8:].strip())
+    elif line.startswith(b"deepen-since "):
+        request.deepen_since = _parse_count(request, "deepen-since", line[13:])
+    elif line.startswith(b"deepen-not "):
+        request.deepen_not.append(line[11:].strip())
+    elif line == b"deepen-relative":
+        request.deepen_relative = True
+    elif line.startswith(b"deepen "):
+        request.depth = _parse_count(request, "deepen", line[7:])
+    else:
+        return False
+    return True
+
+
+def parse_upload_pack_request(data: bytes) -> UploadPackRequest:
+    """Parse want/shallow/deepen/filter/have/done pkt-lines sent by the client."""
+    request = UploadPackRequest()
+    for line in iter_pkt_lines(data):
+        if line is None:
+            continue
+        if line.startswith(b"want "):
+            # Parse: want <sha> [capabilities] - only the first want carries caps
+            parts = line[5:].split(b" ")
+            request.wants.append(parts[0])
+            request.capabilities.extend(c for c in parts[1:] if c)
+        elif line.startswith(b"have "):
+            request.haves.append(line[5:].strip())
+        elif line == b"done":
+            request.done = True
+            break
+        elif line.startswith(b"filter "):
+            request.filter_spec = line[7:].strip()
+        else:
+            _parse_shallow_line(request, line)
+    # v0 sends deepen-relative as a capability on the first want line
+    if request.has_capability(b"deepen-relative"):
+        request.deepen_relative = True
+    return request
+
+
+def protocol_version(git_protocol: str | None) -> int:
+    """
+    Protocol version requested through the Git-Protocol header.
+
+    The header holds colon-separated key[=value] parameters; the highest
+    version=N wins, and a missing header means v0.
+    """
+    version = 0
+    for param in (git_protocol or "").split(":"):
+        key, _, value = param.partition("=")
+        if key == "version" and value.isdigit():
+            version = max(version, int(value))
+    return version
+
+
+@dataclass
+class CommandRequest:
+    """Parsed protocol v2 request: command=<name>, capabilities, delim, arguments."""
+    command: bytes = b""
+    capabilities: list[bytes] = field(default_factory=list)
+    args: list[bytes] = field(default_factory=list)
+
+
+def parse_command_request(data: bytes) -> CommandRequest:
+    """Parse a v2 command request body."""
+    request = CommandRequest()
+    in_args = False
+    for line in iter_pkt_lines(data):
+        if line is None:
+            # Delimiter before the arguments, flush after them
+            if in_args:
+                break
+            in_args = True
+        elif in_args:
+            request.args.append(line)
+        elif line.startswith(b"command="):
+            request.command = line[8:]
+        else:
+            request.capabilities.append(line)
+    return request
+
+
+def parse_fetch_args(args: list[bytes]) -> UploadPackRequest:
+    """
+    Build an UploadPackRequest from v2 fetch arguments.
+
+    Arguments other than want/have/done, shallow/deepen and filter (thin-pack,
+    ofs-delta, no-progress, include-tag) are kept as capabilities, which
+    is what they were in v0.
+    """
+    request = UploadPackRequest()
+    for arg in args:
+        if arg.startswith(b"want "):
+            request.wants.append(arg[5:].strip())
+        elif arg.startswith(b"have "):
+            request.haves.append(arg[5:].strip())
+        elif arg == b"done":
+            request.done = True
+        elif arg.startswith(b"filter "):
+            request.filter_spec = arg[7:].strip()
+        elif not _parse_shallow_line(request, arg):
+            request.capabilities.append(arg)
+    return request
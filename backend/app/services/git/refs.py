@@ -0,0 +1,195 @@
+"""
+Loose ref packing for repos with thousands of branches.
+
+Every card and pipeline step gets its own lazyaf/* branch, each stored as
+a loose file under refs/. pack_refs() moves them into packed-refs the way
+git pack-refs --all --prune does:
+
+1. loose refs are read without locks,
+2. packed-refs is rewritten under its lock file with those values,
+3. each loose file is deleted under its own lock, only if it and
+   packed-refs still hold the packed value (a concurrent update keeps its
+   newer loose ref),
+4. refs deleted while steps 1-2 ran are dropped from packed-refs again,
+   so a branch deletion is never undone,
+5. directories left empty by deleted branches are removed.
+
+Callers must not run two pack_refs() on one repo at the same time.
+"""
+
+import os
+from dataclasses import dataclass
+
+from dulwich.file import FileLocked, GitFile
+from dulwich.object_store import peel_sha
+from dulwich.refs import write_packed_refs
+
+PACKED_REFS = "packed-refs"
+SYMREF_PREFIX = b"ref: "
+# refs/ subdirectories git expects to exist even when empty
+_KEEP_DIRS = {"refs", os.path.join("refs", "heads"), os.path.join("refs", "tags")}
+
+
+@dataclass
+class RefCounts:
+    """How many refs a repo stores loose and in packed-refs."""
+    loose: int = 0
+    packed: int = 0
+    shadowed: int = 0  # packed refs overridden by a loose ref of the same name
+
+    @property
+    def total(self) -> int:
+        return self.loose + self.packed - self.shadowed
+
+    def to_dict(self) -> dict:
+        return {"loose": self.loose, "packed": self.packed, "total": self.total}
+
+
+@dataclass
+class PackRefsResult:
+    """Outcome of one pack_refs() run."""
+    packed: int = 0  # loose refs written to packed-refs
+    pruned: int = 0  # loose files removed afterwards
+    kept: int = 0  # loose refs updated or locked meanwhile, left in place
+    dirs_removed: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "packed": self.packed,
+            "pruned": self.pruned,
+            "kept": self.kept,
+            "dirs_removed": self.dirs_removed,
+        }
+
+
+def _read_loose(path: str) -> bytes | None:
+    try:
+        with open(path, "rb") as f:
+            return f.read().strip()
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return None
+
+
+def _iter_loose_files(controldir: str):
+    """Yield (ref name, path) for every loose ref file under refs/."""
+    refs_dir = os.path.join(controldir, "refs")
+    for dirpath, _, filenames in os.walk(refs_dir):
+        for filename in filenames:
+            if filename.endswith(".lock"):
+                continue
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, controldir).replace(os.sep, "/").encode()
+            yield name, path
+
+
+def read_loose_refs(controldir: str) -> dict[bytes, bytes]:
+    """Loose refs holding a SHA (symbolic refs are left out)."""
+    loose = {}
+    for name, path in _iter_loose_files(controldir):
+        value = _read_loose(path)
+        if value and not value.startswith(SYMREF_PREFIX) and len(value) == 40:
+            loose[name] = value
+    return loose
+
+
+def count_refs(repo) -> RefCounts:
+    """Count loose and packed refs without reading every loose file."""
+    packed = repo.refs.get_packed_refs()
+    counts = RefCounts(packed=len(packed))
+    for name, _ in _iter_loose_files(repo.controldir()):
+        counts.loose += 1
+        if name in packed:
+            counts.shadowed += 1
+    return counts
+
+
+def _peeled(object_store, refs: dict[bytes, bytes]) -> dict[bytes, bytes]:
+    """Peeled targets for annotated tags, written as ^<sha> lines."""
+    peeled = {}
+    for name, sha in refs.items():
+        if not name.startswith(b"refs/tags/"):
+            continue
+        try:
+            _, target = peel_sha(object_store, sha)
+        except KeyError:
+            continue
+        if target.id != sha:
+            peeled[name] = target.id
+    return peeled
+
+
+def _remove_empty_dirs(controldir: str) -> int:
+    removed = 0
+    refs_dir = os.path.join(controldir, "refs")
+    for dirpath, _, _ in os.walk(refs_dir, topdown=False):
+        if os.path.relpath(dirpath, controldir) in _KEEP_DIRS:
+            continue
+        try:
+            os.rmdir(dirpath)
+            removed += 1
+        except OSError:
+            # Not empty, or recreated by a concurrent ref write
+            continue
+    return removed
+
+
+def _write_packed(repo, update: dict[bytes, bytes], drop: dict[bytes, bytes] | None = None) -> None:
+    """
+    Merge update into packed-refs under its lock.
+
+    Names in drop are removed if packed-refs still holds the given value.
+    Raises FileLocked if another writer holds packed-refs.lock.
+    """
+    path = os.path.join(repo.controldir(), PACKED_REFS)
+    with GitFile(path, "wb") as f:
+        # Re-read while holding the lock
+        repo.refs._invalidate_packed_refs_cache()
+        packed = dict(repo.refs.get_packed_refs())
+        packed.update(update)
+        for name, sha in (drop or {}).items():
+            if packed.get(name) == sha:
+                del packed[name]
+        write_packed_refs(f, packed, _peeled(repo.object_store, packed))
+    repo.refs._invalidate_packed_refs_cache()
+
+
+def pack_refs(repo) -> PackRefsResult:
+    """Move every loose ref of repo into packed-refs and prune the loose files."""
+    controldir = repo.controldir()
+    result = PackRefsResult()
+    loose = read_loose_refs(controldir)
+    if loose:
+        _write_packed(repo, loose)
+        result.packed = len(loose)
+
+    deleted = {}
+    for name, sha in loose.items():
+        path = os.path.join(controldir, *name.decode().split("/"))
+        try:
+            lock = GitFile(path, "wb")
+        except FileLocked:
+            # Being updated right now; its new value stays loose
+            result.kept += 1
+            continue
+        except OSError:
+            # Parent directory removed by a concurrent branch deletion
+            deleted[name] = sha
+            continue
+        try:
+            current = _read_loose(path)
+            if current is None:
+                deleted[name] = sha
+            elif current == sha and repo.refs.get_packed_refs().get(name) == sha:
+                os.remove(path)
+                result.pruned += 1
+            else:
+                result.kept += 1
+        finally:
+            # Never written; only held to keep writers out
+            lock.abort()
+
+    if deleted:
+        # Deleted between reading the loose refs and writing packed-refs
+        _write_packed(repo, {}, drop=deleted)
+    result.dirs_removed = _remove_empty_dirs(controldir)
+    return result
@@ -0,0 +1,155 @@
+"""
+Repacking and garbage collection for bare repos.
+
+Every push adds a pack and every server-side merge or rebase adds loose
+objects, so without maintenance each object lookup probes a growing list
+of pack indexes. repack_repo() works like git repack -a -d plus git prune:
+
+1. everything reachable from the refs is written to one new pack,
+   copying existing pack entries (and their deltas) verbatim and
+   delta-compressing the loose objects,
+2. all old packs and the packed loose objects are deleted,
+3. unreachable loose objects are deleted; unreachable packed objects
+   (e.g. from deleted lazyaf/* branches) go away with their packs.
+
+Every pack is consolidated, however young. The grace period only decides
+what may be dropped: unreachable objects in packs younger than it are
+copied into the new pack, and unreachable loose objects younger than it
+are left loose, so objects a running push, merge or rebase has written
+but not yet pointed a ref at are never pruned.
+"""
+
+import os
+import time
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Callable
+
+from app.services.git.pack import DEFAULT_DELTA_WINDOW, delta_sort_key
+from app.services.git.reuse import forget_pack_layout, plan_pack_reuse
+from app.services.git.walk import MissingObject, find_missing_objects
+
+DEFAULT_PRUNE_GRACE = 3600
+
+
+class RepackAborted(Exception):
+    """should_abort() asked a repack to stop; the repo was left unchanged."""
+
+
+@dataclass
+class ObjectStoreStats:
+    """Pack and loose object counts, the inputs to the repack decision."""
+    packs: int = 0
+    loose_objects: int = 0
+
+    def to_dict(self) -> dict:
+        return {"packs": self.packs, "loose_objects": self.loose_objects}
+
+
+@dataclass
+class RepackResult:
+    """Outcome of one repack_repo() run."""
+    before: ObjectStoreStats
+    after: ObjectStoreStats
+    packed_objects: int = 0  # objects written to the new pack
+    pruned_objects: int = 0  # unreachable objects deleted
+
+    def to_dict(self) -> dict:
+        return {
+            "before": self.before.to_dict(),
+            "after": self.after.to_dict(),
+            "packed_objects": self.packed_objects,
+            "pruned_objects": self.pruned_objects,
+        }
+
+
+def object_store_stats(object_store) -> ObjectStoreStats:
+    return ObjectStoreStats(
+        packs=object_store.count_pack_files(),
+        loose_objects=object_store.count_loose_objects(),
+    )
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def repack_repo(repo, prune_grace: int = DEFAULT_PRUNE_GRACE,
+                should_abort: Callable[[], bool] | None = None) -> RepackResult:
+    """
+    Consolidate repo's packs and loose objects into one pack, pruning
+    unreachable objects older than prune_grace seconds.
+
+    should_abort is polled while the new pack is written; if it returns
+    True the partial pack is discarded and RepackAborted is raised.
+    """
+    store = repo.object_store
+    before = object_store_stats(store)
+    cutoff = time.time() - prune_grace
+
+    packs = list(store.packs)
+    loose = set(store._iter_loose_objects())
+
+    tips = [sha for name, sha in repo.get_refs().items() if name != b"HEAD"]
+    reachable = find_missing_objects(store, tips)
+    reachable_shas = {obj.sha for obj in reachable}
+    to_pack = list(reachable)
+    # Unreachable objects in young packs may belong to a push or merge in progress
+    kept: set[bytes] = set()
+    for pack in packs:
+        if _mtime(pack._data_path) < cutoff:
+            continue
+        for sha in pack:
+            if sha not in reachable_shas and sha not in kept:
+                kept.add(sha)
+                to_pack.append(MissingObject(sha, store[sha].type_num))
+    to_pack.sort(key=lambda o: delta_sort_key(o.type_num, o.path))
+
+    if to_pack:
+        reuse = plan_pack_reuse(store, to_pack)
+
+        def fresh_objects():
+            for entry in reuse.fresh:
+                obj = store[entry.sha]
+                yield obj.type_num, obj.as_raw_string()
+
+        f, commit, abort = store.add_pack()
+        try:
+            for chunk in reuse.generate_pack(fresh_objects(), delta_window=DEFAULT_DELTA_WINDOW):
+                if should_abort is not None and should_abort():
+                    raise RepackAborted()
+                f.write(chunk)
+        except BaseException:
+            abort()
+            raise
+        new_pack = commit()
+    else:
+        new_pack = None
+
+    pruned: set[bytes] = set()
+    for pack in packs:
+        if new_pack is not None and pack.name() == new_pack.name():
+            # Same contents as before; the consolidated pack replaced itself
+            continue
+        pruned.update(sha for sha in pack if sha not in reachable_shas and sha not in kept)
+        forget_pack_layout(pack)
+        store._remove_pack(pack)
+
+    for sha in loose:
+        # Reachable (and kept) loose objects are in the new pack now
+        if sha not in reachable_shas and sha not in kept:
+            if _mtime(store._get_shafile_path(sha)) >= cutoff:
+                continue
+            pruned.add(sha)
+        with suppress(FileNotFoundError):
+            store.delete_loose_object(sha)
+
+    return RepackResult(
+        before=before,
+        after=object_store_stats(store),
+        packed_objects=len(to_pack),
+        pruned_objects=len(pruned),
+    )
@@ -0,0 +1,132 @@
+"""
+Cache of open repository handles and ref snapshots.
+
+Opening a dulwich Repo reads its config, and its object store scans
+objects/pack and parses each .idx lazily on first use, so a fresh handle
+per call repeats that work several times per API request. Handles are
+kept in an LRU instead, together with a snapshot of each repo's refs.
+
+Handles are shared by the git worker threads. dulwich reads pack entries
+with seek() + read() on one file object, so cached handles use an object
+store that serializes object reads. Ref snapshots are dropped whenever a
+ref is changed through the manager (push, merge, rebase, branch delete).
+"""
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from dulwich.config import ConfigFile
+from dulwich.object_store import DiskObjectStore
+from dulwich.repo import Repo as DulwichRepo
+
+DEFAULT_REPO_CACHE_SIZE = 32
+
+
+class _SharedObjectStore(DiskObjectStore):
+    """DiskObjectStore that can be read from several threads at once."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Reentrant: resolving a delta against another pack reads through get_raw
+        self._read_lock = threading.RLock()
+
+    def get_raw(self, name):
+        with self._read_lock:
+            return super().get_raw(name)
+
+    def get_unpacked_object(self, sha1, *, include_comp=False):
+        with self._read_lock:
+            return super().get_unpacked_object(sha1, include_comp=include_comp)
+
+    def _iter_cached_packs(self):
+        with self._read_lock:
+            return iter(list(self._pack_cache.values()))
+
+    def _update_pack_cache(self):
+        with self._read_lock:
+            return super()._update_pack_cache()
+
+    def _add_cached_pack(self, base_name, pack):
+        with self._read_lock:
+            super()._add_cached_pack(base_name, pack)
+
+    def _remove_pack(self, pack):
+        with self._read_lock:
+            super()._remove_pack(pack)
+
+
+def open_shared_repo(path: Path) -> DulwichRepo:
+    """Open a repo whose object store is safe to share between threads."""
+    config_path = path / "config"
+    config = ConfigFile.from_path(str(config_path)) if config_path.exists() else ConfigFile()
+    object_store = _SharedObjectStore.from_config(str(path / "objects"), config)
+    return DulwichRepo(str(path), object_store=object_store)
+
+
+class RepoHandleCache:
+    """
+    Bounded LRU of open repos plus per-repo ref snapshots.
+
+    A max_size of 0 disables caching: every get() opens a fresh handle and
+    refs are always read from disk.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_REPO_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._repos: OrderedDict[str, DulwichRepo] = OrderedDict()
+        self._refs: dict[str, dict[bytes, bytes]] = {}
+        # Bumped on every invalidation so a snapshot read concurrently is not stored stale
+        self._refs_version: dict[str, int] = {}
+
+    def get(self, repo_id: str, path: Path) -> DulwichRepo:
+        """Return the cached handle for repo_id, opening it from path on a miss."""
+        if self.max_size <= 0:
+            return DulwichRepo(str(path))
+        with self._lock:
+            repo = self._repos.get(repo_id)
+            if repo is not None:
+                self._repos.move_to_end(repo_id)
+                return repo
+        repo = open_shared_repo(path)
+        with self._lock:
+            # Another thread may have opened it meanwhile; keep a single handle
+            repo = self._repos.setdefault(repo_id, repo)
+            self._repos.move_to_end(repo_id)
+            while len(self._repos) > self.max_size:
+                # Evicted handles are not closed: another thread may still be using them
+                evicted, _ = self._repos.popitem(last=False)
+                self._refs.pop(evicted, None)
+            return repo
+
+    def get_refs(self, repo_id: str, repo: DulwichRepo) -> dict[bytes, bytes]:
+        """Return a copy of repo_id's refs, reading them from repo on a miss."""
+        if self.max_size <= 0:
+            return repo.get_refs()
+        with self._lock:
+            snapshot = self._refs.get(repo_id)
+            version = self._refs_version.get(repo_id, 0)
+        if snapshot is None:
+            snapshot = repo.get_refs()
+            with self._lock:
+                if self._refs_version.get(repo_id, 0) == version and repo_id in self._repos:
+                    self._refs[repo_id] = snapshot
+        return dict(snapshot)
+
+    def invalidate_refs(self, repo_id: str) -> None:
+        """Drop repo_id's ref snapshot after its refs changed."""
+        with self._lock:
+            self._refs.pop(repo_id, None)
+            self._refs_version[repo_id] = self._refs_version.get(repo_id, 0) + 1
+
+    def forget(self, repo_id: str) -> DulwichRepo | None:
+        """Drop the handle and refs for a repo that was deleted or recreated; return the handle."""
+        with self._lock:
+            self._refs.pop(repo_id, None)
+            self._refs_version[repo_id] = self._refs_version.get(repo_id, 0) + 1
+            return self._repos.pop(repo_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._repos)
@@ -0,0 +1,257 @@
+"""
+Verbatim reuse of objects that are already stored in on-disk packs.
+
+Pushed objects live in objects/pack already zlib-compressed, and often
+already deltified against each other. Instead of inflating and
+recompressing them for every clone, the entries are copied byte for byte
+into the outgoing pack, the way git's pack-reuse path does. Only the
+delta base references are rewritten, since base offsets change in the
+new pack. Loose objects, and deltas whose base is not being sent, are
+still encoded normally.
+
+Mapping a pack's entry boundaries means reading its whole index, so the
+layouts of recently used packs are cached; a pack never changes once
+written, and repack drops the layouts of the packs it deletes.
+"""
+
+import bisect
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Iterable, Iterator, NamedTuple
+
+from dulwich.objects import hex_to_sha, sha_to_hex
+from dulwich.pack import OFS_DELTA, REF_DELTA, PackFileDisappeared
+
+from app.services.git.pack import (
+    DEFAULT_DELTA_DEPTH,
+    PackStreamWriter,
+    encode_object_header,
+    encode_ofs_delta_offset,
+    write_objects,
+)
+from app.services.git.walk import MissingObject
+
+
+PACK_TRAILER_SIZE = 20
+
+# Pack layouts kept between requests (one per pack, shared by all repos)
+PACK_LAYOUT_CACHE_SIZE = 64
+
+
+class _PackLayout:
+    """Entry boundaries and offset-to-SHA map for one on-disk pack."""
+
+    def __init__(self, pack):
+        self.path = pack.data.path
+        self.sha_at: dict[int, bytes] = {}
+        self.crc_at: dict[int, int] = {}
+        for sha, offset, crc32 in pack.index.iterentries():
+            self.sha_at[offset] = sha_to_hex(sha)
+            self.crc_at[offset] = crc32
+        self.offsets = sorted(self.sha_at)
+        with open(self.path, "rb") as f:
+            self.end = f.seek(0, 2) - PACK_TRAILER_SIZE
+
+    def entry_end(self, offset: int) -> int:
+        i = bisect.bisect_right(self.offsets, offset)
+        return self.offsets[i] if i < len(self.offsets) else self.end
+
+
+class _PackLayoutCache:
+    """
+    Bounded LRU of pack layouts, keyed by pack data path.
+
+    Entries also remember the file's size and mtime, so a pack that was
+    deleted and rewritten under the same name is mapped afresh.
+    """
+
+    def __init__(self, max_entries: int = PACK_LAYOUT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[str, tuple[tuple[int, int], _PackLayout]] = OrderedDict()
+
+    def get(self, pack) -> _PackLayout:
+        path = pack._data_path
+        st = os.stat(path)
+        stamp = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == stamp:
+                self._cache.move_to_end(path)
+                return cached[1]
+        layout = _PackLayout(pack)
+        if self.max_entries > 0:
+            with self._lock:
+                self._cache[path] = (stamp, layout)
+                self._cache.move_to_end(path)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return layout
+
+    def forget(self, pack) -> None:
+        with self._lock:
+            self._cache.pop(pack._data_path, None)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+pack_layouts = _PackLayoutCache()
+
+
+def forget_pack_layout(pack) -> None:
+    """Drop the cached layout of a pack that is being deleted."""
+    pack_layouts.forget(pack)
+
+
+class _ReusedEntry(NamedTuple):
+    sha: bytes
+    offset: int
+
+
+def _parse_entry(raw: bytes, offset: int) -> tuple[int, int, bytes | int | None, bytes]:
+    """
+    Split a raw pack entry into (type_num, size, base, compressed data).
+
+    base is the absolute base offset for OFS_DELTA, the binary base SHA for
+    REF_DELTA and None for whole objects.
+    """
+    c = raw[0]
+    type_num = (c >> 4) & 0x07
+    size = c & 0x0f
+    shift = 4
+    pos = 1
+    while c & 0x80:
+        c = raw[pos]
+        size |= (c & 0x7f) << shift
+        shift += 7
+        pos += 1
+
+    base = None
+    if type_num == OFS_DELTA:
+        c = raw[pos]
+        pos += 1
+        distance = c & 0x7f
+        while c & 0x80:
+            c = raw[pos]
+            pos += 1
+            distance = ((distance + 1) << 7) | (c & 0x7f)
+        base = offset - distance
+    elif type_num == REF_DELTA:
+        base = raw[pos:pos + 20]
+        pos += 20
+    return type_num, size, base, raw[pos:]
+
+
+class PackReuse:
+    """
+    Split of the objects to send into reusable pack entries and fresh objects.
+
+    Built by plan_pack_reuse(); generate_pack() then streams the reused
+    entries first, followed by the fresh objects.
+    """
+
+    def __init__(self, object_store, reused: list[tuple[_PackLayout, list[_ReusedEntry]]],
+                 fresh: list[MissingObject], sent: set[bytes], allow_ofs_delta: bool = True):
+        self.object_store = object_store
+        self.reused = reused
+        self.fresh = fresh
+        self.sent = sent
+        self.allow_ofs_delta = allow_ofs_delta
+
+    @property
+    def reused_count(self) -> int:
+        return sum(len(entries) for _, entries in self.reused)
+
+    def __len__(self) -> int:
+        return self.reused_count + len(self.fresh)
+
+    def _write_reused(self, writer: PackStreamWriter) -> Iterator[bytes]:
+        written_at: dict[bytes, int] = {}
+        for layout, entries in self.reused:
+            with open(layout.path, "rb") as f:
+                for entry in entries:
+                    f.seek(entry.offset)
+                    raw = f.read(layout.entry_end(entry.offset) - entry.offset)
+                    out_offset = writer.offset
+                    chunk = self._reuse_entry(writer, layout, entry, raw, written_at)
+                    if chunk is None:
+                        # Corrupt entry or unusable delta base: send the object whole
+                        obj = self.object_store[entry.sha]
+                        chunk = writer.write_object(obj.type_num, obj.as_raw_string())
+                    written_at[entry.sha] = out_offset
+                    yield chunk
+
+    def _reuse_entry(self, writer: PackStreamWriter, layout: _PackLayout, entry: _ReusedEntry,
+                     raw: bytes, written_at: dict[bytes, int]) -> bytes | None:
+        if zlib.crc32(raw) != layout.crc_at[entry.offset]:
+            return None
+        type_num, size, base, compressed = _parse_entry(raw, entry.offset)
+        if base is None:
+            return writer.write_raw(raw[:len(raw) - len(compressed)], compressed)
+
+        base_sha = layout.sha_at.get(base) if type_num == OFS_DELTA else sha_to_hex(base)
+        if base_sha is None or base_sha not in self.sent:
+            return None
+        if self.allow_ofs_delta and base_sha in written_at:
+            header = (encode_object_header(OFS_DELTA, size)
+                      + encode_ofs_delta_offset(writer.offset - written_at[base_sha]))
+        else:
+            # Base is sent later (or from another pack); the client resolves it by name
+            header = encode_object_header(REF_DELTA, size) + hex_to_sha(base_sha)
+        return writer.write_raw(header, compressed)
+
+    def generate_pack(self, fresh_objects: Iterable[tuple[int, bytes]], delta_window: int = 0,
+                      delta_depth: int = DEFAULT_DELTA_DEPTH) -> Iterator[bytes]:
+        """
+        Yield a complete pack: reused entries, then fresh_objects encoded normally.
+
+        fresh_objects must yield the (type_num, raw_data) of self.fresh in order.
+        """
+        writer = PackStreamWriter(len(self))
+        yield writer.header()
+        yield from self._write_reused(writer)
+        written = yield from write_objects(writer, fresh_objects, delta_window, delta_depth)
+        if written != len(self.fresh):
+            raise ValueError(f"Expected {len(self.fresh)} fresh objects but {written} were written")
+        yield writer.trailer()
+
+
+def plan_pack_reuse(object_store, missing: list[MissingObject],
+                    allow_ofs_delta: bool = True) -> PackReuse:
+    """
+    Decide which of the missing objects can be copied from on-disk packs.
+
+    Each object is taken from the first pack that contains it; entries are
+    kept in their pack order so in-pack delta bases precede their deltas.
+    Objects found in no pack are returned as fresh, in their original order.
+    """
+    remaining = {obj.sha: obj for obj in missing}
+    sent = set(remaining)
+    reused: list[tuple[_PackLayout, list[_ReusedEntry]]] = []
+
+    for pack in getattr(object_store, "packs", ()):
+        if not remaining:
+            break
+        entries = []
+        try:
+            index = pack.index
+            for sha in remaining:
+                try:
+                    entries.append(_ReusedEntry(sha, index.object_offset(sha)))
+                except KeyError:
+                    continue
+            layout = pack_layouts.get(pack) if entries else None
+        except (PackFileDisappeared, OSError):
+            # Removed by a concurrent repack; its objects can still come from elsewhere
+            continue
+        if entries:
+            for entry in entries:
+                del remaining[entry.sha]
+            entries.sort(key=lambda e: e.offset)
+            reused.append((layout, entries))
+
+    fresh = [obj for obj in missing if obj.sha in remaining]
+    return PackReuse(object_store, reused, fresh, sent, allow_ofs_delta)
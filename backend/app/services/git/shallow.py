@@ -0,0 +1,178 @@
+"""
+Shallow-clone boundaries for upload-pack.
+
+Mirrors upload-pack's deepen(): works out which commits become the
+client's new shallow boundary ("shallow <sha>") and which of its current
+shallow commits get their history ("unshallow <sha>"), for deepen <n>,
+deepen-relative, deepen-since and deepen-not requests. The pack walk then
+treats every boundary commit as parentless.
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from app.services.git.protocol import pkt_line
+
+# "deepen 2147483647" is what git sends for fetch --unshallow
+INFINITE_DEPTH = 0x7fffffff
+
+
+@dataclass
+class ShallowInfo:
+    """Shallow/unshallow lines to send and the commit sets the pack walk needs."""
+    shallow: list[bytes] = field(default_factory=list)  # new boundaries, sent as "shallow"
+    unshallow: list[bytes] = field(default_factory=list)  # client boundaries that get parents
+    boundary: set[bytes] = field(default_factory=set)  # commits whose parents are not walked
+    extra_wants: list[bytes] = field(default_factory=list)  # parents of unshallowed commits
+
+    def lines(self) -> list[bytes]:
+        """shallow/unshallow pkt-lines, without the closing flush or delimiter."""
+        return (
+            [pkt_line(b"shallow " + sha + b"\n") for sha in self.shallow]
+            + [pkt_line(b"unshallow " + sha + b"\n") for sha in self.unshallow]
+        )
+
+
+def _load_commit(object_store, sha: bytes):
+    try:
+        obj = object_store[sha]
+    except KeyError:
+        return None
+    while obj.type_name == b"tag":
+        try:
+            obj = object_store[obj.object[1]]
+        except KeyError:
+            return None
+    return obj if obj.type_name == b"commit" else None
+
+
+def _commits_within_depth(object_store, heads: Iterable[bytes], depth: int) -> tuple[set[bytes], set[bytes]]:
+    """
+    Walk heads down to depth commits (heads are at depth 1).
+
+    Returns (boundary commits at exactly depth, commits above it), keeping
+    each commit at the smallest depth it is reached at, like git's
+    get_shallow_commits().
+    """
+    at_depth: dict[bytes, int] = {}
+    queue = deque()
+    for sha in heads:
+        commit = _load_commit(object_store, sha)
+        if commit is not None and commit.id not in at_depth:
+            at_depth[commit.id] = 1
+            queue.append((commit.id, commit))
+
+    boundary: set[bytes] = set()
+    interior: set[bytes] = set()
+    while queue:
+        sha, commit = queue.popleft()
+        cur_depth = at_depth[sha]
+        if cur_depth >= depth:
+            boundary.add(sha)
+            continue
+        interior.add(sha)
+        for parent in commit.parents:
+            if at_depth.get(parent, depth + 1) <= cur_depth + 1:
+                continue
+            parent_commit = _load_commit(object_store, parent)
+            if parent_commit is None:
+                continue
+            at_depth[parent] = cur_depth + 1
+            queue.append((parent, parent_commit))
+    # A commit first seen at the boundary and later reached by a shorter path is interior
+    return boundary - interior, interior
+
+
+def _ancestors(object_store, heads: Iterable[bytes]) -> set[bytes]:
+    """Every commit reachable from heads."""
+    seen: set[bytes] = set()
+    pending = list(heads)
+    while pending:
+        sha = pending.pop()
+        if sha in seen:
+            continue
+        commit = _load_commit(object_store, sha)
+        if commit is None:
+            continue
+        seen.add(sha)
+        pending.extend(commit.parents)
+    return seen
+
+
+def _commits_by_rev_list(object_store, wants: Iterable[bytes], since: int,
+                         not_commits: Iterable[bytes]) -> tuple[set[bytes], set[bytes]]:
+    """
+    Select commits reachable from wants that are newer than since and not
+    reachable from not_commits; boundaries are selected commits with a
+    parent outside the selection.
+
+    Wanted commits are always selected, so a since/not that excludes a
+    want entirely still yields a depth-1 clone of it.
+    """
+    excluded = _ancestors(object_store, not_commits)
+    selected: dict[bytes, object] = {}
+    pending = []
+    for sha in wants:
+        commit = _load_commit(object_store, sha)
+        if commit is not None:
+            selected[commit.id] = commit
+            pending.append(commit)
+    while pending:
+        commit = pending.pop()
+        for parent in commit.parents:
+            if parent in selected or parent in excluded:
+                continue
+            parent_commit = _load_commit(object_store, parent)
+            if parent_commit is None or parent_commit.commit_time < since:
+                continue
+            selected[parent] = parent_commit
+            pending.append(parent_commit)
+
+    boundary = {
+        sha for sha, commit in selected.items()
+        if any(parent not in selected for parent in commit.parents)
+    }
+    return boundary, set(selected) - boundary
+
+
+def compute_shallow(object_store, wants: Iterable[bytes], client_shallow: Iterable[bytes],
+                    depth: int = 0, deepen_since: int = 0, deepen_not: Iterable[bytes] = (),
+                    deepen_relative: bool = False) -> ShallowInfo:
+    """
+    Compute shallow boundaries for one upload-pack request.
+
+    Without any deepen argument the client's own shallow commits are only
+    kept as boundaries for the pack walk. deepen_not holds commit SHAs
+    (refs are resolved by the caller).
+    """
+    wants = list(wants)
+    client_shallow = [sha for sha in dict.fromkeys(client_shallow) if _load_commit(object_store, sha) is not None]
+    deepen_not = list(deepen_not)
+    info = ShallowInfo(boundary=set(client_shallow))
+
+    if depth >= INFINITE_DEPTH:
+        # --unshallow: our repos are never shallow, so every boundary goes away
+        new_boundary, interior = set(), set(client_shallow)
+    elif depth > 0:
+        if deepen_relative:
+            # Count depth from the client's current boundary instead of the wants
+            new_boundary, interior = _commits_within_depth(object_store, client_shallow, depth + 1)
+        else:
+            new_boundary, interior = _commits_within_depth(object_store, wants, depth)
+    elif deepen_since or deepen_not:
+        new_boundary, interior = _commits_by_rev_list(object_store, wants, deepen_since, deepen_not)
+    else:
+        return info
+
+    client = set(client_shallow)
+    info.shallow = sorted(new_boundary - client)
+    info.boundary.update(new_boundary)
+    for sha in client_shallow:
+        if sha in interior:
+            info.unshallow.append(sha)
+            info.extra_wants.extend(
+                parent for parent in _load_commit(object_store, sha).parents
+                if parent not in info.extra_wants
+            )
+    return info
@@ -0,0 +1,98 @@
+"""
+Cache of tree lookups for reading files out of branches.
+
+Reading .lazyaf/agents/*.yaml walks from a branch's root tree to every
+file, once per file per request. Trees are immutable, so the parsed
+entries of a tree, the entry at (root tree SHA, path) and a commit's tree
+can all be cached without invalidation. The branch -> commit step comes
+from the manager's ref snapshot, which is dropped whenever a ref moves.
+"""
+
+import stat
+import threading
+from collections import OrderedDict
+
+from dulwich.objects import Commit, Tree
+
+DEFAULT_TREE_CACHE_ENTRIES = 16384
+
+_MISSING = object()
+
+
+class TreePathCache:
+    """
+    Bounded LRU of parsed trees, path lookups and commit trees.
+
+    SHAs are hex bytes and paths are "/"-separated strings relative to the
+    root tree. Absent paths are cached too, so repeated probes for an
+    optional file stay cheap. Objects missing from the store raise
+    KeyError and are never cached, since the cache is shared by all repos.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_TREE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[tuple, object] = OrderedDict()
+
+    def _get(self, key: tuple):
+        with self._lock:
+            value = self._cache.get(key, _MISSING)
+            if value is not _MISSING:
+                self._cache.move_to_end(key)
+            return value
+
+    def _put(self, key: tuple, value) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def commit_tree(self, object_store, commit_sha: bytes) -> bytes | None:
+        """Root tree SHA of a commit, or None if it isn't a commit."""
+        key = ("commit", commit_sha)
+        tree_sha = self._get(key)
+        if tree_sha is _MISSING:
+            obj = object_store[commit_sha]
+            tree_sha = obj.tree if isinstance(obj, Commit) else None
+            self._put(key, tree_sha)
+        return tree_sha
+
+    def tree_entries(self, object_store, tree_sha: bytes) -> dict[bytes, tuple[int, bytes]] | None:
+        """Entries of a tree as {name: (mode, sha)} in tree order, or None if it isn't a tree."""
+        key = ("tree", tree_sha)
+        entries = self._get(key)
+        if entries is _MISSING:
+            obj = object_store[tree_sha]
+            if isinstance(obj, Tree):
+                entries = {entry.path: (entry.mode, entry.sha) for entry in obj.items()}
+            else:
+                entries = None
+            self._put(key, entries)
+        return entries
+
+    def lookup(self, object_store, tree_sha: bytes, path: str) -> tuple[int, bytes] | None:
+        """(mode, sha) of the entry at path under tree_sha, or None if absent."""
+        path = path.strip("/")
+        if not path:
+            return stat.S_IFDIR, tree_sha
+        key = ("path", tree_sha, path)
+        entry = self._get(key)
+        if entry is not _MISSING:
+            return entry
+
+        parent_path, _, name = path.rpartition("/")
+        parent = self.lookup(object_store, tree_sha, parent_path)
+        entry = None
+        if parent is not None and stat.S_ISDIR(parent[0]):
+            entries = self.tree_entries(object_store, parent[1])
+            if entries is not None:
+                entry = entries.get(name.encode("utf-8"))
+        self._put(key, entry)
+        return entry
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
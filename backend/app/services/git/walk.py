@@ -0,0 +1,265 @@
+"""
+Object graph walks for pack generation.
+
+Computes which objects a client is missing given the commits it wants and
+the commits it has in common with us, without re-walking the full history
+and trees the client already has. Shallow boundary commits are treated as
+having no parents.
+"""
+
+import heapq
+import stat
+from itertools import count
+from typing import Iterable, NamedTuple
+
+from dulwich.objects import S_ISGITLINK, Blob, Commit, Tag, Tree
+
+
+def _peel(object_store, sha: bytes, out: list[bytes]) -> bytes | None:
+    """Follow annotated tags, recording each tag object, and return the target SHA."""
+    seen = set()
+    while sha not in seen:
+        seen.add(sha)
+        try:
+            obj = object_store[sha]
+        except KeyError:
+            return None
+        if obj.type_name != b"tag":
+            return sha
+        out.append(sha)
+        sha = obj.object[1]
+    return None
+
+
+class _CommitWalker:
+    """
+    Date-ordered commit walk separating wanted commits from common ones.
+
+    Mirrors git's revision limiting: commits reachable from the common set
+    are marked uninteresting and the walk stops once every queued commit is
+    uninteresting, so history behind the common commits is never visited.
+    """
+
+    def __init__(self, object_store, shallow: Iterable[bytes] = ()):
+        self.object_store = object_store
+        self.shallow = set(shallow)
+        self.commits: dict[bytes, object] = {}
+        self.uninteresting: set[bytes] = set()
+        self._heap: list[tuple[int, int, bytes]] = []
+        self._queued: dict[bytes, int] = {}
+        self._interesting_queued = 0
+        self._seq = count()
+
+    def _load(self, sha: bytes):
+        commit = self.commits.get(sha)
+        if commit is None:
+            try:
+                commit = self.object_store[sha]
+            except KeyError:
+                return None
+            if commit.type_name != b"commit":
+                return None
+            self.commits[sha] = commit
+        return commit
+
+    def parents(self, sha: bytes) -> list[bytes]:
+        """Parents of a loaded commit; none for shallow boundaries."""
+        if sha in self.shallow:
+            return []
+        return self.commits[sha].parents
+
+    def _push(self, sha: bytes) -> None:
+        commit = self._load(sha)
+        if commit is None:
+            return
+        heapq.heappush(self._heap, (-commit.commit_time, next(self._seq), sha))
+        self._queued[sha] = self._queued.get(sha, 0) + 1
+        if sha not in self.uninteresting:
+            self._interesting_queued += 1
+
+    def _mark_uninteresting(self, sha: bytes) -> bool:
+        if sha in self.uninteresting:
+            return False
+        self.uninteresting.add(sha)
+        self._interesting_queued -= self._queued.get(sha, 0)
+        return True
+
+    def walk(self, wants: Iterable[bytes], common: Iterable[bytes]) -> tuple[list[bytes], set[bytes]]:
+        """
+        Return (commits to send newest-first, uninteresting boundary commits).
+
+        Boundary commits are the common commits whose trees the client is
+        known to have; their trees are used to prune the tree walk.
+        """
+        for sha in common:
+            if self._load(sha) is not None:
+                self._mark_uninteresting(sha)
+                self._push(sha)
+        for sha in wants:
+            self._push(sha)
+
+        visited_interesting: set[bytes] = set()
+        visited_uninteresting: set[bytes] = set()
+        output: list[bytes] = []
+
+        while self._heap and self._interesting_queued > 0:
+            _, _, sha = heapq.heappop(self._heap)
+            self._queued[sha] -= 1
+            is_uninteresting = sha in self.uninteresting
+            if not is_uninteresting:
+                self._interesting_queued -= 1
+
+            if is_uninteresting:
+                if sha in visited_uninteresting:
+                    continue
+                visited_uninteresting.add(sha)
+                for parent in self.parents(sha):
+                    self._mark_uninteresting(parent)
+                    self._push(parent)
+            else:
+                if sha in visited_interesting:
+                    continue
+                visited_interesting.add(sha)
+                output.append(sha)
+                for parent in self.parents(sha):
+                    self._push(parent)
+
+        # Clock skew can pop a commit before we learn it is reachable from
+        # the common set; drop those after the fact.
+        commits = [sha for sha in output if sha not in self.uninteresting]
+        sent = set(commits)
+        boundary = {
+            parent
+            for sha in commits
+            for parent in self.parents(sha)
+            if parent not in sent and parent in self.commits
+        }
+        boundary.update(sha for sha in common if sha in self.commits)
+        return commits, boundary
+
+
+def _mark_tree_known(object_store, tree_sha: bytes, known: set[bytes]) -> None:
+    """Add a tree and everything under it to the known set."""
+    pending = [tree_sha]
+    while pending:
+        sha = pending.pop()
+        if sha in known:
+            continue
+        known.add(sha)
+        try:
+            tree = object_store[sha]
+        except KeyError:
+            continue
+        for entry in tree.items():
+            if S_ISGITLINK(entry.mode):
+                continue
+            if stat.S_ISDIR(entry.mode):
+                pending.append(entry.sha)
+            else:
+                known.add(entry.sha)
+
+
+class MissingObject(NamedTuple):
+    """An object to send, with the type and path hints used for delta search."""
+    sha: bytes
+    type_num: int
+    path: bytes = b""
+
+
+def find_missing_objects(object_store, wants: Iterable[bytes],
+                         common: Iterable[bytes] = (),
+                         shallow: Iterable[bytes] = ()) -> list[MissingObject]:
+    """
+    List objects reachable from wants but not from common.
+
+    Tags and commits come first (newest first), followed by trees and blobs
+    in discovery order, each tagged with the path it was found at. Only
+    objects present in the store are returned. History is not followed
+    past shallow commits.
+    """
+    common = list(common)
+    tags: list[bytes] = []
+    want_commits: list[bytes] = []
+    for sha in wants:
+        target = _peel(object_store, sha, tags)
+        if target is not None:
+            want_commits.append(target)
+
+    walker = _CommitWalker(object_store, shallow)
+    commits, boundary = walker.walk(want_commits, common)
+
+    known: set[bytes] = set(walker.uninteresting)
+    for sha in boundary:
+        _mark_tree_known(object_store, walker.commits[sha].tree, known)
+
+    ordered: list[MissingObject] = []
+    seen: set[bytes] = set()
+    for sha in tags:
+        if sha not in seen:
+            seen.add(sha)
+            ordered.append(MissingObject(sha, Tag.type_num))
+    for sha in commits:
+        if sha not in seen:
+            seen.add(sha)
+            ordered.append(MissingObject(sha, Commit.type_num))
+
+    # Wanted objects that are not commits (e.g. a tree or blob requested by id)
+    pending: list[tuple[bytes, bytes, int | None]] = [
+        (sha, b"", None) for sha in reversed(want_commits) if sha not in walker.commits
+    ]
+    pending.extend((walker.commits[sha].tree, b"", Tree.type_num) for sha in reversed(commits))
+
+    while pending:
+        sha, path, type_num = pending.pop()
+        if sha in known or sha in seen:
+            continue
+        if type_num == Blob.type_num:
+            # Blobs are only checked for presence; they are read when packed
+            if sha not in object_store:
+                continue
+            seen.add(sha)
+            ordered.append(MissingObject(sha, type_num, path))
+            continue
+        try:
+            obj = object_store[sha]
+        except KeyError:
+            continue
+        seen.add(sha)
+        ordered.append(MissingObject(sha, obj.type_num, path))
+        if obj.type_num != Tree.type_num:
+            continue
+        for entry in reversed(list(obj.items())):
+            if S_ISGITLINK(entry.mode):
+                continue
+            if entry.sha not in known and entry.sha not in seen:
+                entry_path = path + b"/" + entry.path if path else entry.path
+                entry_type = Tree.type_num if stat.S_ISDIR(entry.mode) else Blob.type_num
+                pending.append((entry.sha, entry_path, entry_type))
+
+    return ordered
+
+
+def reaches_any(object_store, start: bytes, targets: set[bytes], cutoff_time: int) -> bool:
+    """
+    Check whether any commit in targets is reachable from start.
+
+    Commits older than cutoff_time (the oldest target) cannot lead to a
+    target in a well-formed history, so they are not explored.
+    """
+    pending = [start]
+    seen = set()
+    while pending:
+        sha = pending.pop()
+        if sha in targets:
+            return True
+        if sha in seen:
+            continue
+        seen.add(sha)
+        try:
+            commit = object_store[sha]
+        except KeyError:
+            continue
+        if commit.type_name != b"commit" or commit.commit_time < cutoff_time:
+            continue
+        pending.extend(commit.parents)
+    return False
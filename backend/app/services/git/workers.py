@@ -0,0 +1,112 @@
+"""
+Worker pool for blocking git operations.
+
+dulwich is synchronous, so calling it from an async handler stalls the
+event loop (and with it runner heartbeats and WebSocket pings) for the
+whole clone, merge or diff. Handlers await GitWorkerPool.run() instead,
+which executes the call on a bounded set of threads. zlib and file I/O
+release the GIL, so pack work overlaps well across threads, and repos,
+object stores and caches can be shared without pickling.
+
+Calls beyond the concurrency limit wait in the executor's queue; stats()
+reports how many are queued and running and how long they waited.
+Synchronous code (e.g. background pack generation) queues work with
+submit() and shares the same limit and stats.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class GitWorkerPool:
+    """Bounded thread pool that async handlers await for git work."""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max(1, max_workers)
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._peak_queued = 0
+        self._started = 0
+        self._total_wait = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="git-worker")
+            return self._executor
+
+    def _call(self, submitted: float, func: Callable[..., T], args, kwargs) -> T:
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._started += 1
+            self._total_wait += time.monotonic() - submitted
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self._failed += 1
+            raise
+        else:
+            with self._lock:
+                self._completed += 1
+            return result
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def submit(self, func: Callable[..., T], *args, **kwargs) -> Future:
+        """Queue func(*args, **kwargs) on a git worker from synchronous code."""
+        executor = self._get_executor()
+        with self._lock:
+            self._queued += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+        try:
+            return executor.submit(self._call, time.monotonic(), func, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+            raise
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Run func(*args, **kwargs) on a git worker and return its result."""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    async def iterate(self, iterable: Iterable[T]) -> AsyncIterator[T]:
+        """Consume a blocking iterator (e.g. pack frames) on git workers."""
+        iterator = iter(iterable)
+        while True:
+            item = await self.run(next, iterator, _END)
+            if item is _END:
+                return
+            yield item
+
+    def stats(self) -> dict:
+        """Current queue depth and totals for monitoring."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "running": self._running,
+                "queued": self._queued,
+                "peak_queued": self._peak_queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_ms": round(self._total_wait / self._started * 1000, 2) if self._started else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,116 @@
+"""
+Background maintenance for the internal git repos.
+
+Every GIT_MAINTENANCE_INTERVAL seconds each repo is checked:
+
+- loose refs are packed into packed-refs once there are
+  GIT_PACK_REFS_THRESHOLD of them,
+- packs and loose objects are consolidated into one pack, pruning
+  unreachable objects, once there are GIT_GC_PACK_LIMIT packs or
+  GIT_GC_LOOSE_LIMIT loose objects and no clone, fetch or push has touched
+  the repo for GIT_GC_IDLE_SECONDS.
+
+The work runs on the git worker pool, one repo at a time, and repacks are
+skipped while other git work is queued so they never hold up clones.
+"""
+
+import asyncio
+import logging
+
+from app.services.git_server import (
+    GIT_GC_IDLE_SECONDS,
+    GIT_GC_LOOSE_LIMIT,
+    GIT_GC_PACK_LIMIT,
+    GIT_MAINTENANCE_INTERVAL,
+    GIT_PACK_REFS_THRESHOLD,
+    GitRepoManager,
+    git_repo_manager,
+    git_workers,
+)
+from app.services.git.workers import GitWorkerPool
+
+logger = logging.getLogger(__name__)
+
+
+class GitMaintenance:
+    def __init__(self, repo_manager: GitRepoManager, workers: GitWorkerPool = git_workers,
+                 interval: int = GIT_MAINTENANCE_INTERVAL,
+                 pack_refs_threshold: int = GIT_PACK_REFS_THRESHOLD,
+                 pack_limit: int = GIT_GC_PACK_LIMIT, loose_limit: int = GIT_GC_LOOSE_LIMIT,
+                 idle_seconds: int = GIT_GC_IDLE_SECONDS):
+        self.repo_manager = repo_manager
+        self.workers = workers
+        self.interval = interval
+        self.pack_refs_threshold = pack_refs_threshold
+        self.pack_limit = pack_limit
+        self.loose_limit = loose_limit
+        self.idle_seconds = idle_seconds
+        self._running = False
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        """Start the periodic maintenance task (a no-op when the interval is 0)."""
+        if self._running or self.interval <= 0:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._maintenance_loop())
+        logger.info("Git maintenance started")
+
+    async def stop(self):
+        """Stop the periodic maintenance task."""
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        logger.info("Git maintenance stopped")
+
+    async def _maintenance_loop(self):
+        while self._running:
+            try:
+                await asyncio.sleep(self.interval)
+                await self.run_once()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Git maintenance error: {e}")
+
+    def _workers_busy(self) -> bool:
+        return self.workers.stats()["queued"] > 0
+
+    async def run_once(self) -> dict[str, dict]:
+        """
+        Run one maintenance pass over all repos.
+
+        Returns {repo_id: {"pack_refs": ..., "repack": ...}} for the repos
+        where anything ran.
+        """
+        results = {}
+        repo_ids = await self.workers.run(self.repo_manager.list_repos)
+        for repo_id in repo_ids:
+            done = {}
+            try:
+                packed = await self.workers.run(
+                    self.repo_manager.maybe_pack_refs, repo_id, self.pack_refs_threshold,
+                )
+                if packed is not None:
+                    done["pack_refs"] = packed
+                if self._workers_busy():
+                    logger.info(f"Skipping repack of {repo_id}: git workers are busy")
+                else:
+                    repacked = await self.workers.run(
+                        self.repo_manager.maybe_repack, repo_id,
+                        self.pack_limit, self.loose_limit, self.idle_seconds,
+                    )
+                    if repacked is not None:
+                        done["repack"] = repacked
+            except Exception as e:
+                logger.error(f"Maintenance of {repo_id} failed: {e}")
+            if done:
+                results[repo_id] = done
+        return results
+
+
+git_maintenance = GitMaintenance(git_repo_manager)
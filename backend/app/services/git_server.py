@@ -4,22 +4,113 @@ Git server service - manages bare repos and HTTP smart protocol.
 
 import os
 import shutil
+import stat
+import threading
 from pathlib import Path
 from io import BytesIO
+from typing import BinaryIO, Iterator
 
+from dulwich.file import FileLocked
 from dulwich.repo import Repo as DulwichRepo
 
+from app.services.git.activity import RepoActivity
+from app.services.git.batch import ObjectBatch
+from app.services.git.bitmap import ReachabilityBitmaps
+from app.services.git.commit_graph import CommitGraph
+from app.services.git.diff import (
+    DEFAULT_DIFF_CACHE_ENTRIES,
+    DIFF_MAX_BYTES,
+    DIFF_MAX_LINES,
+    DiffCache,
+    truncate_patch,
+)
+from app.services.git.filter import ObjectFilter, filter_objects, parse_filter_spec
+from app.services.git.negotiation import negotiate, negotiate_v2
+from app.services.git.pack import DEFAULT_DELTA_WINDOW, delta_sort_key
+from app.services.git.pack_cache import PackCache, pack_cache_key
+from app.services.git.protocol import (
+    DELIM_PKT,
+    FLUSH_PKT,
+    SIDEBAND_64K_MAX_DATA,
+    SIDEBAND_DATA,
+    SIDEBAND_ERROR,
+    SIDEBAND_MAX_DATA,
+    UploadPackRequest,
+    parse_command_request,
+    parse_fetch_args,
+    parse_upload_pack_request,
+    pkt_line,
+    sideband_frames,
+)
+from app.services.git.repo_cache import DEFAULT_REPO_CACHE_SIZE, RepoHandleCache
+from app.services.git.refs import count_refs, pack_refs
+from app.services.git.repack import DEFAULT_PRUNE_GRACE, RepackAborted, object_store_stats, repack_repo
+from app.services.git.reuse import plan_pack_reuse
+from app.services.git.shallow import ShallowInfo, compute_shallow
+from app.services.git.tree_cache import DEFAULT_TREE_CACHE_ENTRIES, TreePathCache
+from app.services.git.walk import find_missing_objects
+from app.services.git.workers import GitWorkerPool
+from app.services.lazyaf_index import EMPTY_CONFIG, DEFAULT_LAZYAF_INDEX_ENTRIES, LazyafConfig, LazyafIndex
+
 
 # Storage directory for bare repos - configurable via env, defaults to data volume
 GIT_REPOS_DIR = Path(os.getenv("GIT_REPOS_DIR", "/app/data/git_repos"))
 
+# Generated-pack cache - defaults to <repos dir>/.pack-cache; 0 bytes disables it
+GIT_PACK_CACHE_DIR = os.getenv("GIT_PACK_CACHE_DIR")
+GIT_PACK_CACHE_MAX_BYTES = int(os.getenv("GIT_PACK_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Reachability bitmaps for pushed tips - set to 0 to fall back to object walks
+GIT_BITMAPS = os.getenv("GIT_BITMAPS", "1") != "0"
+
+# Threads that run blocking git work for async handlers; extra calls queue
+GIT_WORKERS = int(os.getenv("GIT_WORKERS", str(max(2, os.cpu_count() or 1))))
+
+# Open repo handles (and ref snapshots) kept between requests; 0 disables the cache
+GIT_REPO_CACHE_SIZE = int(os.getenv("GIT_REPO_CACHE_SIZE", str(DEFAULT_REPO_CACHE_SIZE)))
+
+# Branch diffs (file lists with stats) kept in memory, keyed by commit pair
+GIT_DIFF_CACHE_ENTRIES = int(os.getenv("GIT_DIFF_CACHE_ENTRIES", str(DEFAULT_DIFF_CACHE_ENTRIES)))
+
+# Parsed trees and path lookups for reading files out of branches; 0 disables it
+GIT_TREE_CACHE_ENTRIES = int(os.getenv("GIT_TREE_CACHE_ENTRIES", str(DEFAULT_TREE_CACHE_ENTRIES)))
+
+# Compiled .lazyaf/ agents and pipelines, keyed by .lazyaf tree SHA
+LAZYAF_INDEX_ENTRIES = int(os.getenv("LAZYAF_INDEX_ENTRIES", str(DEFAULT_LAZYAF_INDEX_ENTRIES)))
+
+# Loose refs a repo may accumulate before maintenance packs them into packed-refs
+GIT_PACK_REFS_THRESHOLD = int(os.getenv("GIT_PACK_REFS_THRESHOLD", "50"))
+
+# Seconds between background maintenance passes over all repos; 0 disables them
+GIT_MAINTENANCE_INTERVAL = int(os.getenv("GIT_MAINTENANCE_INTERVAL", "300"))
+
+# Repack a repo once it has this many packs or loose objects...
+GIT_GC_PACK_LIMIT = int(os.getenv("GIT_GC_PACK_LIMIT", "20"))
+GIT_GC_LOOSE_LIMIT = int(os.getenv("GIT_GC_LOOSE_LIMIT", "1000"))
+# ...and no clone, fetch or push has touched it for this many seconds
+GIT_GC_IDLE_SECONDS = int(os.getenv("GIT_GC_IDLE_SECONDS", "120"))
+# Unreachable objects younger than this are kept (they may belong to a running push or merge)
+GIT_GC_PRUNE_GRACE = int(os.getenv("GIT_GC_PRUNE_GRACE", str(DEFAULT_PRUNE_GRACE)))
+
+# Protocol v2 upload-pack capabilities (Git-Protocol: version=2); pushes stay on v0
+UPLOAD_PACK_V2_CAPABILITIES = [b"version 2", b"agent=lazyaf", b"ls-refs", b"fetch=shallow filter", b"object-format=sha1"]
+
 
 class GitRepoManager:
     """Manages bare git repositories for LazyAF."""
 
-    def __init__(self, repos_dir: Path = GIT_REPOS_DIR):
+    def __init__(self, repos_dir: Path = GIT_REPOS_DIR, repo_cache_size: int = GIT_REPO_CACHE_SIZE):
         self.repos_dir = repos_dir
         self._initialized = False
+        self._handles = RepoHandleCache(repo_cache_size)
+        self._diffs = DiffCache(GIT_DIFF_CACHE_ENTRIES)
+        self._trees = TreePathCache(GIT_TREE_CACHE_ENTRIES)
+        self._lazyaf = LazyafIndex(LAZYAF_INDEX_ENTRIES)
+        # In-flight clones/fetches/pushes, so maintenance can stay out of their way
+        self.activity = RepoActivity()
+        # One maintenance run per repo at a time
+        self._maintenance_locks: dict[str, threading.Lock] = {}
+        self._maintenance_guard = threading.Lock()
 
     def _ensure_dir(self):
         """Lazily create the repos directory when first needed."""
@@ -57,6 +148,7 @@ class GitRepoManager:
 
         # Create bare repo using dulwich
         DulwichRepo.init_bare(str(repo_path))
+        self._handles.forget(repo_id)
         return repo_path
 
     def delete_repo(self, repo_id: str) -> bool:
@@ -64,6 +156,7 @@ class GitRepoManager:
         repo_path = self.get_repo_path(repo_id)
         if not repo_path.exists():
             return False
+        self._handles.forget(repo_id)
         shutil.rmtree(repo_path)
         return True
 
@@ -124,6 +217,9 @@ class GitRepoManager:
                 capture_output=True,
             )
 
+            # Refs were written by git itself, not through the cached handle
+            self.invalidate_refs(repo_id)
+
             # Clean up - remove the temporary remote
             subprocess.run(
                 ["git", "remote", "remove", remote_name],
@@ -159,11 +255,16 @@ class GitRepoManager:
                 pass  # Ignore cleanup errors
 
     def get_repo(self, repo_id: str) -> DulwichRepo | None:
-        """Get a dulwich Repo object."""
+        """Get a dulwich Repo object (a cached handle shared between requests)."""
         repo_path = self.get_repo_path(repo_id)
         if not repo_path.exists():
+            self._handles.forget(repo_id)
             return None
-        return DulwichRepo(str(repo_path))
+        return self._handles.get(repo_id, repo_path)
+
+    def invalidate_refs(self, repo_id: str) -> None:
+        """Discard the cached ref snapshot after refs were changed."""
+        self._handles.invalidate_refs(repo_id)
 
     def list_repos(self) -> list[str]:
         """List all repository IDs."""
@@ -178,7 +279,100 @@ class GitRepoManager:
         repo = self.get_repo(repo_id)
         if not repo:
             return {}
-        return repo.get_refs()
+        return self._handles.get_refs(repo_id, repo)
+
+    def _maintenance_lock(self, repo_id: str) -> threading.Lock:
+        with self._maintenance_guard:
+            return self._maintenance_locks.setdefault(repo_id, threading.Lock())
+
+    def get_ref_counts(self, repo_id: str) -> dict | None:
+        """Loose, packed and total ref counts for a repo (None if it doesn't exist)."""
+        repo = self.get_repo(repo_id)
+        if not repo:
+            return None
+        return count_refs(repo).to_dict()
+
+    def pack_refs(self, repo_id: str) -> dict:
+        """
+        Pack a repo's loose refs into packed-refs and prune the loose files.
+
+        Ref values don't change, so the cached ref snapshot stays valid.
+        """
+        repo = self.get_repo(repo_id)
+        if not repo:
+            return {"success": False, "error": "Repository not found"}
+        lock = self._maintenance_lock(repo_id)
+        if not lock.acquire(blocking=False):
+            return {"success": False, "error": "Maintenance already running"}
+        try:
+            result = pack_refs(repo)
+        except FileLocked:
+            return {"success": False, "error": "packed-refs is locked by another writer"}
+        finally:
+            lock.release()
+        print(f"[git_server] pack-refs {repo_id}: packed {result.packed}, pruned {result.pruned}, "
+              f"kept {result.kept} loose")
+        return {"success": True, **result.to_dict(), "refs": count_refs(repo).to_dict()}
+
+    def maybe_pack_refs(self, repo_id: str, threshold: int = GIT_PACK_REFS_THRESHOLD) -> dict | None:
+        """Pack refs if the repo has at least threshold loose refs; None if it was skipped."""
+        repo = self.get_repo(repo_id)
+        if not repo or count_refs(repo).loose < threshold:
+            return None
+        return self.pack_refs(repo_id)
+
+    def get_object_stats(self, repo_id: str) -> dict | None:
+        """Pack and loose object counts for a repo (None if it doesn't exist)."""
+        repo = self.get_repo(repo_id)
+        if not repo:
+            return None
+        return object_store_stats(repo.object_store).to_dict()
+
+    def repack(self, repo_id: str, prune_grace: int = GIT_GC_PRUNE_GRACE) -> dict:
+        """
+        Consolidate a repo's packs and loose objects into one pack, prune
+        unreachable objects and rewrite the commit-graph and bitmaps for the
+        current ref tips.
+
+        Gives up, leaving the repo as it was, if a clone, fetch or push of
+        the repo starts while the new pack is being written.
+        """
+        repo = self.get_repo(repo_id)
+        if not repo:
+            return {"success": False, "error": "Repository not found"}
+        lock = self._maintenance_lock(repo_id)
+        if not lock.acquire(blocking=False):
+            return {"success": False, "error": "Maintenance already running"}
+        try:
+            result = repack_repo(repo, prune_grace, should_abort=lambda: self.activity.active(repo_id) > 0)
+            self._rebuild_indexes(repo_id, repo)
+        except RepackAborted:
+            print(f"[git_server] repack {repo_id}: aborted, repo in use")
+            return {"success": False, "error": "Repack aborted: repository in use"}
+        finally:
+            lock.release()
+        print(f"[git_server] repack {repo_id}: {result.before.packs} packs/{result.before.loose_objects} loose -> "
+              f"{result.after.packs}/{result.after.loose_objects}, "
+              f"{result.packed_objects} packed, {result.pruned_objects} pruned")
+        return {"success": True, **result.to_dict()}
+
+    def maybe_repack(self, repo_id: str, pack_limit: int = GIT_GC_PACK_LIMIT,
+                     loose_limit: int = GIT_GC_LOOSE_LIMIT,
+                     idle_seconds: int = GIT_GC_IDLE_SECONDS) -> dict | None:
+        """
+        Repack if the repo has reached pack_limit packs or loose_limit loose
+        objects and has been idle for idle_seconds; None if it was skipped.
+        """
+        repo = self.get_repo(repo_id)
+        if not repo or self.activity.idle_seconds(repo_id) < idle_seconds:
+            return None
+        stats = object_store_stats(repo.object_store)
+        if stats.packs < pack_limit and stats.loose_objects < loose_limit:
+            return None
+        if stats.packs <= 1 and not stats.loose_objects:
+            # Nothing to consolidate; don't pay for a reachability walk
+            return None
+        return self.repack(repo_id)
 
     def get_default_branch(self, repo_id: str) -> str | None:
         """Get the default branch (HEAD) for a repo."""
@@ -284,6 +478,7 @@ class GitRepoManager:
 
         try:
             del repo.refs[ref_name]
+            self.invalidate_refs(repo_id)
             return {
                 "success": True,
                 "message": f"Deleted branch '{branch_name}'",
@@ -329,6 +524,7 @@ class GitRepoManager:
                 # Commit doesn't exist - delete the branch
                 try:
                     del repo.refs[ref_name]
+                    self.invalidate_refs(repo_id)
                     deleted.append(branch_name)
                     print(f"[git_server] Deleted orphaned branch: {branch_name}")
                 except Exception as e:
@@ -455,6 +651,11 @@ class GitRepoManager:
             func(path)
 
         try:
+            # Close the cached handle so its pack files are released
+            cached = self._handles.forget(repo_id)
+            if cached is not None:
+                cached.close()
+
             # Force garbage collection multiple times to release any cached repo objects
             # and their file handles (especially pack files on Windows)
             for _ in range(3):
@@ -486,6 +687,7 @@ class GitRepoManager:
             # Recreate as a fresh bare repo
             repo_path.mkdir(parents=True, exist_ok=True)
             DulwichRepo.init_bare(str(repo_path))
+            self._handles.forget(repo_id)
 
             print(f"[git_server] Reinitialized repository {repo_id}")
             return {
@@ -517,7 +719,8 @@ class GitRepoManager:
             return {"success": False, "error": "Repository directory not found", "branches": []}
 
         try:
-            # Re-open the repo fresh from disk
+            # Re-open the repo fresh from disk, dropping the cached handle and refs
+            self._handles.forget(repo_id)
             repo = DulwichRepo(str(repo_path))
 
             # Get current refs from disk
@@ -656,6 +859,8 @@ class GitRepoManager:
                 # Fast-forward: just update the target ref to point to source
                 target_ref = f"refs/heads/{target_branch}".encode()
                 repo.refs[target_ref] = source_sha.encode('ascii')
+                self.invalidate_refs(repo_id)
+                self.index_pushed_tips(repo, [source_sha.encode('ascii')])
                 print(f"[git_server] fast-forward merge: {target_branch} -> {source_sha[:8]}")
                 return {
                     "success": True,
@@ -684,8 +889,9 @@ class GitRepoManager:
             merge_base_tree = repo.object_store[merge_base_commit.tree]
 
             # Attempt three-way merge of trees
+            batch = ObjectBatch(repo.object_store)
             merged_tree_sha, conflicts = self._merge_trees(
-                repo, merge_base_tree.id, target_tree.id, source_tree.id
+                batch, merge_base_tree.id, target_tree.id, source_tree.id
             )
 
             if conflicts:
@@ -713,12 +919,15 @@ class GitRepoManager:
             commit.encoding = b'UTF-8'
             commit.message = f"Merge branch '{source_branch}' into {target_branch}\n".encode('utf-8')
 
-            # Add commit to object store
-            repo.object_store.add_object(commit)
+            # Write the commit and its new trees as one pack
+            batch.add_object(commit)
+            batch.flush([commit.id])
 
             # Update target branch ref
             target_ref = f"refs/heads/{target_branch}".encode()
             repo.refs[target_ref] = commit.id
+            self.invalidate_refs(repo_id)
+            self.index_pushed_tips(repo, [commit.id])
 
             print(f"[git_server] merge commit created: {commit.id.decode('ascii')[:8]}")
             return {
@@ -737,42 +946,87 @@ class GitRepoManager:
 
     def _is_ancestor(self, repo, ancestor_sha: str, descendant_sha: str) -> bool:
         """Check if ancestor_sha is an ancestor of descendant_sha."""
-        from dulwich.walk import Walker
-
         try:
-            walker = Walker(repo.object_store, [descendant_sha.encode('ascii')], max_entries=1000)
-            for entry in walker:
-                if entry.commit.id.decode('ascii') == ancestor_sha:
-                    return True
-        except Exception:
-            pass
+            graph = CommitGraph.for_repo(repo)
+            return graph.is_ancestor(ancestor_sha.encode('ascii'), descendant_sha.encode('ascii'))
+        except Exception as e:
+            print(f"[git_server] ancestry check error: {e}")
         return False
 
     def _find_merge_base(self, repo, sha1: str, sha2: str) -> str | None:
         """Find the common ancestor (merge base) of two commits."""
-        from dulwich.walk import Walker
-
         try:
-            # Get all ancestors of sha1
-            ancestors1 = set()
-            walker = Walker(repo.object_store, [sha1.encode('ascii')], max_entries=1000)
-            for entry in walker:
-                ancestors1.add(entry.commit.id.decode('ascii'))
-
-            # Find first ancestor of sha2 that's also in ancestors1
-            walker = Walker(repo.object_store, [sha2.encode('ascii')], max_entries=1000)
-            for entry in walker:
-                commit_sha = entry.commit.id.decode('ascii')
-                if commit_sha in ancestors1:
-                    return commit_sha
+            merge_base = CommitGraph.for_repo(repo).merge_base(sha1.encode('ascii'), sha2.encode('ascii'))
+            return merge_base.decode('ascii') if merge_base else None
         except Exception as e:
             print(f"[git_server] merge base error: {e}")
         return None
 
-    def _merge_trees(self, repo, base_tree_sha, ours_tree_sha, theirs_tree_sha, path_prefix: str = "") -> tuple[bytes, list[str]]:
+    def index_pushed_tips(self, repo, tips: list[bytes]) -> None:
+        """
+        Extend the commit-graph, reachability bitmaps and .lazyaf index for
+        new ref tips (from a push, merge or rebase) while they are fresh.
+        """
+        self._index_commits(repo, tips)
+        self._write_bitmaps(repo, tips)
+        self._compile_lazyaf(repo, tips)
+
+    def _index_commits(self, repo, shas: list[bytes]) -> None:
+        """Add new commits to the repo's commit-graph so later queries don't have to."""
+        try:
+            CommitGraph.for_repo(repo).update(shas)
+        except Exception as e:
+            # Queries index lazily, so a failure here only costs time later
+            print(f"[git_server] commit-graph update error: {e}")
+
+    def _rebuild_indexes(self, repo_id: str, repo) -> None:
+        """Rewrite the commit-graph and bitmaps for the current ref tips, dropping pruned objects."""
+        tips = [sha for name, sha in self.get_refs(repo_id).items() if name != b"HEAD"]
+        try:
+            CommitGraph.for_repo(repo).rebuild(tips)
+            if GIT_BITMAPS:
+                ReachabilityBitmaps.for_repo(repo).rebuild(tips)
+        except Exception as e:
+            # Both are rebuilt lazily, so a failure here only costs time later
+            print(f"[git_server] index rebuild error: {e}")
+
+    def _write_bitmaps(self, repo, shas: list[bytes]) -> None:
+        """Store reachability bitmaps for new ref tips so packs for them skip the object walk."""
+        if not GIT_BITMAPS:
+            return
+        try:
+            ReachabilityBitmaps.for_repo(repo).write_bitmaps(shas)
+        except Exception as e:
+            # Pack generation falls back to walking objects
+            print(f"[git_server] bitmap update error: {e}")
+
+    def _lazyaf_config(self, repo, commit_sha: bytes) -> LazyafConfig:
+        """Compiled .lazyaf/ directory of a commit (empty if it has none)."""
+        tree_sha = self._trees.commit_tree(repo.object_store, commit_sha)
+        if tree_sha is None:
+            return EMPTY_CONFIG
+        entry = self._trees.lookup(repo.object_store, tree_sha, ".lazyaf")
+        if entry is None or not stat.S_ISDIR(entry[0]):
+            return EMPTY_CONFIG
+        return self._lazyaf.get(repo.object_store, self._trees, entry[1])
+
+    def _compile_lazyaf(self, repo, shas: list[bytes]) -> None:
+        """Compile .lazyaf/ for new ref tips so agent and pipeline reads hit the index."""
+        for sha in shas:
+            try:
+                self._lazyaf_config(repo, sha)
+            except Exception as e:
+                # Reads compile lazily, so a failure here only costs time later
+                print(f"[git_server] .lazyaf compile error: {e}")
+
+    def _merge_trees(self, objects: ObjectBatch, base_tree_sha, ours_tree_sha, theirs_tree_sha,
+                     path_prefix: str = "") -> tuple[bytes, list[str]]:
         """
         Perform a three-way merge of trees (recursively for subdirectories).
 
+        Merged trees are added to objects; base_tree_sha is None for a
+        directory that both sides added.
+
         Returns (merged_tree_sha, list_of_conflicts)
         - If entry unchanged in ours, take theirs
         - If entry unchanged in theirs, take ours
@@ -783,12 +1037,13 @@ class GitRepoManager:
         from dulwich.objects import Tree
         import stat
 
-        base_tree = repo.object_store[base_tree_sha]
-        ours_tree = repo.object_store[ours_tree_sha]
-        theirs_tree = repo.object_store[theirs_tree_sha]
+        ours_tree = objects[ours_tree_sha]
+        theirs_tree = objects[theirs_tree_sha]
 
         # Get all entries from both sides
-        base_entries = {e.path: (e.mode, e.sha) for e in base_tree.items()}
+        base_entries = {}
+        if base_tree_sha is not None:
+            base_entries = {e.path: (e.mode, e.sha) for e in objects[base_tree_sha].items()}
         ours_entries = {e.path: (e.mode, e.sha) for e in ours_tree.items()}
         theirs_entries = {e.path: (e.mode, e.sha) for e in theirs_tree.items()}
 
@@ -827,18 +1082,15 @@ class GitRepoManager:
                 if ours_is_tree and theirs_is_tree and base_is_tree:
                     # Both sides modified a directory - recursively merge
                     merged_subtree_sha, sub_conflicts = self._merge_trees(
-                        repo, base[1], ours[1], theirs[1],
+                        objects, base[1], ours[1], theirs[1],
                         path_prefix=f"{full_path}/"
                     )
                     merged_entries[path] = (ours[0], merged_subtree_sha)  # Keep mode from ours
                     conflicts.extend(sub_conflicts)
                 elif ours_is_tree and theirs_is_tree and not base_is_tree:
-                    # New directory on both sides - try to merge
-                    # Use an empty tree as base if directory didn't exist
-                    empty_tree = Tree()
-                    repo.object_store.add_object(empty_tree)
+                    # New directory on both sides - merge against an empty base
                     merged_subtree_sha, sub_conflicts = self._merge_trees(
-                        repo, empty_tree.id, ours[1], theirs[1],
+                        objects, None, ours[1], theirs[1],
                         path_prefix=f"{full_path}/"
                     )
                     merged_entries[path] = (ours[0], merged_subtree_sha)
@@ -857,7 +1109,7 @@ class GitRepoManager:
         for path, (mode, sha) in sorted(merged_entries.items()):
             merged_tree.add(path, mode, sha)
 
-        repo.object_store.add_object(merged_tree)
+        objects.add_object(merged_tree)
         return merged_tree.id, conflicts
 
     def _get_blob_at_path(self, repo, tree_sha, path: str) -> bytes | None:
@@ -865,36 +1117,13 @@ class GitRepoManager:
         Get blob content at a nested path in a tree.
         Returns None if path doesn't exist or isn't a blob.
         """
-        from dulwich.objects import Blob, Tree
-        import stat
-
-        parts = path.split('/')
-        current_sha = tree_sha
-
-        for i, part in enumerate(parts):
-            try:
-                obj = repo.object_store[current_sha]
-                if not isinstance(obj, Tree):
-                    return None
-
-                # Find the entry matching this part
-                part_bytes = part.encode('utf-8')
-                found = False
-                for entry in obj.items():
-                    if entry.path == part_bytes:
-                        current_sha = entry.sha
-                        found = True
-                        break
-
-                if not found:
-                    return None
-
-            except KeyError:
-                return None
+        from dulwich.objects import Blob
 
-        # current_sha should now point to the blob
         try:
-            obj = repo.object_store[current_sha]
+            entry = self._trees.lookup(repo.object_store, tree_sha, path)
+            if entry is None:
+                return None
+            obj = repo.object_store[entry[1]]
             if isinstance(obj, Blob):
                 return obj.data
         except KeyError:
@@ -924,17 +1153,17 @@ class GitRepoManager:
 
         return conflict_details
 
-    def _set_blob_at_path(self, repo, tree_sha, path: str, blob_sha, mode: int = 0o100644):
+    def _set_blob_at_path(self, objects: ObjectBatch, tree_sha, path: str, blob_sha, mode: int = 0o100644):
         """
         Create a new tree with a blob set at the given nested path.
-        Returns the new root tree SHA.
+        New trees are added to objects. Returns the new root tree SHA.
         """
         from dulwich.objects import Tree
 
         parts = path.split('/')
         if len(parts) == 1:
             # Base case: update this tree directly
-            tree = repo.object_store[tree_sha]
+            tree = objects[tree_sha]
             new_tree = Tree()
             found = False
             for entry in tree.items():
@@ -945,11 +1174,11 @@ class GitRepoManager:
                     new_tree.add(entry.path, entry.mode, entry.sha)
             if not found:
                 new_tree.add(parts[0].encode('utf-8'), mode, blob_sha)
-            repo.object_store.add_object(new_tree)
+            objects.add_object(new_tree)
             return new_tree.id
 
         # Recursive case: update subtree and rebuild parent
-        tree = repo.object_store[tree_sha]
+        tree = objects[tree_sha]
         new_tree = Tree()
         subdir = parts[0].encode('utf-8')
         rest_path = '/'.join(parts[1:])
@@ -957,12 +1186,12 @@ class GitRepoManager:
         for entry in tree.items():
             if entry.path == subdir:
                 # Recurse into this subtree
-                new_subtree_sha = self._set_blob_at_path(repo, entry.sha, rest_path, blob_sha, mode)
+                new_subtree_sha = self._set_blob_at_path(objects, entry.sha, rest_path, blob_sha, mode)
                 new_tree.add(entry.path, entry.mode, new_subtree_sha)
             else:
                 new_tree.add(entry.path, entry.mode, entry.sha)
 
-        repo.object_store.add_object(new_tree)
+        objects.add_object(new_tree)
         return new_tree.id
 
     def resolve_and_merge(self, repo_id: str, source_branch: str, target_branch: str,
@@ -1004,8 +1233,9 @@ class GitRepoManager:
             merge_base_commit = repo.object_store[merge_base_sha.encode('ascii')]
 
             # Perform recursive merge (handles subdirectories)
+            batch = ObjectBatch(repo.object_store)
             merged_tree_sha, conflicts = self._merge_trees(
-                repo,
+                batch,
                 merge_base_commit.tree,
                 target_commit.tree,
                 source_commit.tree
@@ -1029,10 +1259,10 @@ class GitRepoManager:
                 # Create blob with resolved content
                 blob = Blob()
                 blob.data = content.encode('utf-8')
-                repo.object_store.add_object(blob)
+                batch.add_object(blob)
 
                 # Update tree with resolved blob
-                current_tree_sha = self._set_blob_at_path(repo, current_tree_sha, path, blob.id)
+                current_tree_sha = self._set_blob_at_path(batch, current_tree_sha, path, blob.id)
 
             # Create merge commit
             commit = Commit()
@@ -1045,11 +1275,14 @@ class GitRepoManager:
             commit.encoding = b'UTF-8'
             commit.message = f"Merge branch '{source_branch}' into {target_branch} (conflicts resolved)\n".encode('utf-8')
 
-            repo.object_store.add_object(commit)
+            batch.add_object(commit)
+            batch.flush([commit.id])
 
             # Update target branch ref
             target_ref = f"refs/heads/{target_branch}".encode()
             repo.refs[target_ref] = commit.id
+            self.invalidate_refs(repo_id)
+            self.index_pushed_tips(repo, [commit.id])
 
             print(f"[git_server] conflict resolution merge commit created: {commit.id.decode('ascii')[:8]}")
             return {
@@ -1108,6 +1341,8 @@ class GitRepoManager:
                 # Fast-forward: just update the branch ref to point to onto
                 branch_ref = f"refs/heads/{branch_name}".encode()
                 repo.refs[branch_ref] = onto_sha.encode('ascii')
+                self.invalidate_refs(repo_id)
+                self.index_pushed_tips(repo, [onto_sha.encode('ascii')])
                 print(f"[git_server] fast-forward rebase: {branch_name} -> {onto_sha[:8]}")
                 return {
                     "success": True,
@@ -1141,8 +1376,9 @@ class GitRepoManager:
 
             # Attempt three-way merge of trees
             # In this case: base=merge_base, ours=onto (what we're rebasing onto), theirs=branch (our changes)
+            batch = ObjectBatch(repo.object_store)
             merged_tree_sha, conflicts = self._merge_trees(
-                repo, merge_base_tree.id, onto_tree.id, branch_tree.id
+                batch, merge_base_tree.id, onto_tree.id, branch_tree.id
             )
 
             if conflicts:
@@ -1169,12 +1405,15 @@ class GitRepoManager:
             commit.encoding = b'UTF-8'
             commit.message = f"Rebase: merge {onto_branch} into {branch_name}\n".encode('utf-8')
 
-            # Add commit to object store
-            repo.object_store.add_object(commit)
+            # Write the commit and its new trees as one pack
+            batch.add_object(commit)
+            batch.flush([commit.id])
 
             # Update branch ref
             branch_ref = f"refs/heads/{branch_name}".encode()
             repo.refs[branch_ref] = commit.id
+            self.invalidate_refs(repo_id)
+            self.index_pushed_tips(repo, [commit.id])
 
             print(f"[git_server] rebase commit created: {commit.id.decode('ascii')[:8]}")
             return {
@@ -1231,8 +1470,9 @@ class GitRepoManager:
             merge_base_commit = repo.object_store[merge_base_sha.encode('ascii')]
 
             # Perform recursive merge: base=merge_base, ours=onto, theirs=branch
+            batch = ObjectBatch(repo.object_store)
             merged_tree_sha, conflicts = self._merge_trees(
-                repo,
+                batch,
                 merge_base_commit.tree,
                 onto_commit.tree,
                 branch_commit.tree
@@ -1255,10 +1495,10 @@ class GitRepoManager:
                 # Create blob with resolved content
                 blob = Blob()
                 blob.data = content.encode('utf-8')
-                repo.object_store.add_object(blob)
+                batch.add_object(blob)
 
                 # Update tree with resolved blob
-                current_tree_sha = self._set_blob_at_path(repo, current_tree_sha, path, blob.id)
+                current_tree_sha = self._set_blob_at_path(batch, current_tree_sha, path, blob.id)
 
             # Create merge commit on the feature branch
             commit = Commit()
@@ -1271,11 +1511,14 @@ class GitRepoManager:
             commit.encoding = b'UTF-8'
             commit.message = f"Rebase: merge {onto_branch} into {branch_name} (conflicts resolved)\n".encode('utf-8')
 
-            repo.object_store.add_object(commit)
+            batch.add_object(commit)
+            batch.flush([commit.id])
 
             # Update feature branch ref (not the target branch)
             branch_ref = f"refs/heads/{branch_name}".encode()
             repo.refs[branch_ref] = commit.id
+            self.invalidate_refs(repo_id)
+            self.index_pushed_tips(repo, [commit.id])
 
             print(f"[git_server] rebase conflict resolution commit created: {commit.id.decode('ascii')[:8]}")
             return {
@@ -1296,134 +1539,71 @@ class GitRepoManager:
                 "message": ""
             }
 
-    def get_diff(self, repo_id: str, base_branch: str, head_branch: str) -> dict:
-        """Get diff between two branches.
-
-        Shows changes unique to head_branch by diffing from merge base to head.
-        This prevents showing parallel work on base_branch as "deletions".
-        """
-        from dulwich.diff_tree import tree_changes
-        from dulwich.objects import Blob
-
+    def _resolve_diff(self, repo_id: str, base_branch: str, head_branch: str) -> dict:
+        """Resolve the commits a branch diff compares, or return {"error": ...}."""
         repo = self.get_repo(repo_id)
         if not repo:
-            return {"error": "Repo not found", "files": [], "diff": ""}
+            return {"error": "Repo not found"}
 
         base_sha = self.get_branch_commit(repo_id, base_branch)
         head_sha = self.get_branch_commit(repo_id, head_branch)
 
         if not base_sha or not head_sha:
-            return {"error": "Branch not found", "files": [], "diff": ""}
+            return {"error": "Branch not found"}
 
-        try:
-            # Find merge base to show only changes unique to head_branch
-            # Without this, parallel work on base_branch appears as "deletions"
-            merge_base_sha = self._find_merge_base(repo, base_sha, head_sha)
+        # Find merge base to show only changes unique to head_branch
+        # Without this, parallel work on base_branch appears as "deletions"
+        merge_base_sha = self._find_merge_base(repo, base_sha, head_sha)
 
+        return {
+            "repo": repo,
+            "base_sha": base_sha,
+            "head_sha": head_sha,
+            "merge_base_sha": merge_base_sha,
             # Use merge base for diff if found, otherwise fall back to base
-            diff_base_sha = merge_base_sha if merge_base_sha else base_sha
-
-            diff_base_commit = repo.object_store[diff_base_sha.encode('ascii')]
-            head_commit = repo.object_store[head_sha.encode('ascii')]
-
-            diff_base_tree = repo.object_store[diff_base_commit.tree]
-            head_tree = repo.object_store[head_commit.tree]
-
-            changes = tree_changes(repo.object_store, diff_base_tree.id, head_tree.id)
-
-            files = []
-            for change in changes:
-                # change.old and change.new can be None entirely for adds/deletes
-                old_path = change.old.path if change.old else None
-                new_path = change.new.path if change.new else None
-                old_sha = change.old.sha if change.old else None
-                new_sha = change.new.sha if change.new else None
-
-                file_info = {
-                    "path": (new_path or old_path).decode('utf-8', errors='replace'),
-                    "status": "modified",
-                    "additions": 0,
-                    "deletions": 0,
-                    "diff": "",
-                }
+            "diff_base_sha": merge_base_sha if merge_base_sha else base_sha,
+        }
+
+    def get_diff(self, repo_id: str, base_branch: str, head_branch: str) -> dict:
+        """Get the files changed between two branches, with line stats.
 
-                # Determine change type
-                if old_sha is None:
-                    file_info["status"] = "added"
-                elif new_sha is None:
-                    file_info["status"] = "deleted"
-
-                # Get file contents for diff
-                old_content = ""
-                new_content = ""
-
-                if old_sha:
-                    try:
-                        old_blob = repo.object_store[old_sha]
-                        if isinstance(old_blob, Blob):
-                            old_content = old_blob.data.decode('utf-8', errors='replace')
-                    except Exception:
-                        pass
-
-                if new_sha:
-                    try:
-                        new_blob = repo.object_store[new_sha]
-                        if isinstance(new_blob, Blob):
-                            new_content = new_blob.data.decode('utf-8', errors='replace')
-                    except Exception:
-                        pass
-
-                # Generate unified diff
-                import difflib
-                old_lines = old_content.splitlines(keepends=True)
-                new_lines = new_content.splitlines(keepends=True)
-
-                diff_lines = list(difflib.unified_diff(
-                    old_lines, new_lines,
-                    fromfile=f"a/{file_info['path']}",
-                    tofile=f"b/{file_info['path']}",
-                ))
-
-                file_info["diff"] = "".join(diff_lines)
-                file_info["additions"] = sum(1 for line in diff_lines if line.startswith('+') and not line.startswith('+++'))
-                file_info["deletions"] = sum(1 for line in diff_lines if line.startswith('-') and not line.startswith('---'))
-
-                files.append(file_info)
+        Shows changes unique to head_branch by diffing from merge base to head.
+        This prevents showing parallel work on base_branch as "deletions".
+        Patch text is not included; fetch it per file with get_file_diff().
+        """
+        try:
+            resolved = self._resolve_diff(repo_id, base_branch, head_branch)
+            if "error" in resolved:
+                return {"error": resolved["error"], "files": []}
+            repo = resolved["repo"]
+            base_sha = resolved["base_sha"]
+            head_sha = resolved["head_sha"]
+
+            changes = self._diffs.changes(
+                repo.object_store,
+                resolved["diff_base_sha"].encode('ascii'),
+                head_sha.encode('ascii'),
+            )
+            files = [change.to_dict() for change in changes]
 
             # Count commits unique to head_branch (in head but not in base)
             # This handles diverged branches correctly by using set difference
             commit_count = 0
             try:
-                from dulwich.walk import Walker
-
-                # Get commits reachable from base
-                base_commits = set()
-                base_walker = Walker(repo.object_store, [base_sha.encode('ascii')], max_entries=1000)
-                for entry in base_walker:
-                    base_commits.add(entry.commit.id.decode('ascii'))
-
-                # Count commits reachable from head that aren't in base
-                head_walker = Walker(repo.object_store, [head_sha.encode('ascii')], max_entries=1000)
-                for entry in head_walker:
-                    commit_sha = entry.commit.id.decode('ascii')
-                    if commit_sha not in base_commits:
-                        commit_count += 1
+                graph = CommitGraph.for_repo(repo)
+                commit_count, _ = graph.ahead_behind(base_sha.encode('ascii'), head_sha.encode('ascii'))
             except Exception as e:
                 print(f"[git_server] Error counting commits: {e}")
 
-            # Combine all file diffs into a single diff string for convenience
-            combined_diff = "\n".join(f["diff"] for f in files if f["diff"])
-
             return {
                 "base_branch": base_branch,
                 "head_branch": head_branch,
                 "base_sha": base_sha,
                 "head_sha": head_sha,
-                "merge_base_sha": merge_base_sha,  # Where feature branched off
-                "diff_base_sha": diff_base_sha,    # What we're actually diffing from
+                "merge_base_sha": resolved["merge_base_sha"],  # Where feature branched off
+                "diff_base_sha": resolved["diff_base_sha"],    # What we're actually diffing from
                 "commit_count": commit_count,
                 "files": files,
-                "diff": combined_diff,  # Combined diff for convenience
                 "total_additions": sum(f["additions"] for f in files),
                 "total_deletions": sum(f["deletions"] for f in files),
             }
@@ -1432,7 +1612,120 @@ class GitRepoManager:
             print(f"[git_server] Error getting diff: {e}")
             import traceback
             traceback.print_exc()
-            return {"error": str(e), "files": [], "diff": ""}
+            return {"error": str(e), "files": []}
+
+    def get_diffstats(self, repo_id: str, base_branch: str, head_branches: list[str]) -> dict:
+        """Get "N files changed, +A/-D" for many branches against one base.
+
+        Meant for boards listing every card at once: refs are read once and
+        no patch text is produced. Branches that don't exist map to
+        {"error": ...}.
+        """
+        repo = self.get_repo(repo_id)
+        if not repo:
+            return {"error": "Repo not found", "stats": {}}
+
+        refs = self.get_refs(repo_id)
+        base_sha = refs.get(f"refs/heads/{base_branch}".encode())
+        if base_sha is None:
+            return {"error": "Branch not found", "stats": {}}
+
+        stats = {}
+        for branch in head_branches:
+            head_sha = refs.get(f"refs/heads/{branch}".encode())
+            if head_sha is None:
+                stats[branch] = {"error": "Branch not found"}
+                continue
+            try:
+                merge_base_sha = self._find_merge_base(repo, base_sha.decode('ascii'), head_sha.decode('ascii'))
+                diff_base_sha = merge_base_sha.encode('ascii') if merge_base_sha else base_sha
+                changes = self._diffs.changes(repo.object_store, diff_base_sha, head_sha)
+            except Exception as e:
+                print(f"[git_server] Error getting diffstat for {branch}: {e}")
+                stats[branch] = {"error": str(e)}
+                continue
+            stats[branch] = {
+                "head_sha": head_sha.decode('ascii'),
+                "diff_base_sha": diff_base_sha.decode('ascii'),
+                "files_changed": len(changes),
+                "additions": sum(c.additions for c in changes),
+                "deletions": sum(c.deletions for c in changes),
+            }
+
+        return {
+            "base_branch": base_branch,
+            "base_sha": base_sha.decode('ascii'),
+            "stats": stats,
+        }
+
+    def get_file_diff(
+        self,
+        repo_id: str,
+        base_branch: str,
+        head_branch: str,
+        path: str,
+        max_lines: int = DIFF_MAX_LINES,
+        max_bytes: int = DIFF_MAX_BYTES,
+    ) -> dict:
+        """Get the unified diff of one file between two branches.
+
+        The patch is cut to max_lines lines / max_bytes bytes ("truncated" is
+        set when it was). Binary and oversized files come back with an empty
+        diff and their sizes.
+        """
+        try:
+            resolved = self._resolve_diff(repo_id, base_branch, head_branch)
+            if "error" in resolved:
+                return {"error": resolved["error"]}
+            repo = resolved["repo"]
+
+            changes = self._diffs.changes(
+                repo.object_store,
+                resolved["diff_base_sha"].encode('ascii'),
+                resolved["head_sha"].encode('ascii'),
+            )
+            change = next((c for c in changes if c.path == path), None)
+            if change is None:
+                return {"error": "File not changed"}
+
+            patch, truncated = truncate_patch(self._diffs.patch(repo.object_store, change), max_lines, max_bytes)
+            return {
+                **change.to_dict(),
+                "diff_base_sha": resolved["diff_base_sha"],
+                "head_sha": resolved["head_sha"],
+                "diff": patch,
+                "truncated": truncated,
+            }
+
+        except Exception as e:
+            print(f"[git_server] Error getting file diff: {e}")
+            return {"error": str(e)}
+
+    def get_lazyaf_config(self, repo_id: str, branch: str) -> LazyafConfig | None:
+        """
+        Get the compiled .lazyaf/ agents and pipelines of a branch.
+
+        Args:
+            repo_id: Repository ID
+            branch: Branch name to read from
+
+        Returns:
+            LazyafConfig (empty if the branch has no .lazyaf/), or None if
+            the repo or branch doesn't exist
+        """
+        repo = self.get_repo(repo_id)
+        if not repo:
+            return None
+
+        branch_sha = self.get_branch_commit(repo_id, branch)
+        if not branch_sha:
+            return None
+
+        try:
+            return self._lazyaf_config(repo, branch_sha.encode('ascii'))
+        except Exception as e:
+            print(f"[git_server] Error reading .lazyaf config: {e}")
+            return None
 
     def get_file_content(self, repo_id: str, branch: str, path: str) -> bytes | None:
         """
@@ -1457,9 +1750,11 @@ class GitRepoManager:
             return None
 
         try:
-            commit = repo.object_store[branch_sha.encode('ascii')]
-            return self._get_blob_at_path(repo, commit.tree, path)
-        except (KeyError, Exception):
+            tree_sha = self._trees.commit_tree(repo.object_store, branch_sha.encode('ascii'))
+            if tree_sha is None:
+                return None
+            return self._get_blob_at_path(repo, tree_sha, path)
+        except Exception:
             return None
 
     def list_directory(self, repo_id: str, branch: str, path: str) -> list[str] | None:
@@ -1476,8 +1771,6 @@ class GitRepoManager:
         Returns:
             List of filenames (not full paths), or None if directory not found
         """
-        from dulwich.objects import Tree
-
         repo = self.get_repo(repo_id)
         if not repo:
             return None
@@ -1487,39 +1780,23 @@ class GitRepoManager:
             return None
 
         try:
-            commit = repo.object_store[branch_sha.encode('ascii')]
+            tree_sha = self._trees.commit_tree(repo.object_store, branch_sha.encode('ascii'))
+            if tree_sha is None:
+                return None
 
             # Navigate to the target directory
-            parts = path.strip('/').split('/') if path else []
-            current_sha = commit.tree
+            entry = self._trees.lookup(repo.object_store, tree_sha, path or "")
+            if entry is None:
+                return None
 
-            for part in parts:
-                if not part:
-                    continue
-                obj = repo.object_store[current_sha]
-                if not isinstance(obj, Tree):
-                    return None
-
-                part_bytes = part.encode('utf-8')
-                found = False
-                for entry in obj.items():
-                    if entry.path == part_bytes:
-                        current_sha = entry.sha
-                        found = True
-                        break
-
-                if not found:
-                    return None
-
-            # current_sha should now point to the target directory
-            obj = repo.object_store[current_sha]
-            if not isinstance(obj, Tree):
+            entries = self._trees.tree_entries(repo.object_store, entry[1])
+            if entries is None:
                 return None
 
             # Return list of filenames
-            return [entry.path.decode('utf-8', errors='replace') for entry in obj.items()]
+            return [name.decode('utf-8', errors='replace') for name in entries]
 
-        except (KeyError, Exception):
+        except Exception:
             return None
 
     def delete_directory_from_branch(self, repo_id: str, branch: str, directory: str,
@@ -1591,6 +1868,8 @@ class GitRepoManager:
             # Update branch ref
             branch_ref = f"refs/heads/{branch}".encode()
             repo.refs[branch_ref] = new_commit.id
+            self.invalidate_refs(repo_id)
+            self.index_pushed_tips(repo, [new_commit.id])
 
             new_sha = new_commit.id.decode('ascii')
             print(f"[git_server] cleanup commit created: {new_sha[:8]}")
@@ -1610,13 +1889,27 @@ class GitRepoManager:
 class HTTPGitBackend:
     """HTTP smart protocol handler for git operations."""
 
-    def __init__(self, repo_manager: GitRepoManager):
+    def __init__(self, repo_manager: GitRepoManager, pack_cache: PackCache | None = None):
         self.repo_manager = repo_manager
-
-    def get_info_refs(self, repo_id: str, service: str) -> tuple[bytes, str]:
+        self._pack_cache = pack_cache
+
+    @property
+    def pack_cache(self) -> PackCache:
+        """Cache of generated packs, created next to the repos on first use."""
+        if self._pack_cache is None:
+            self.repo_manager._ensure_dir()
+            cache_dir = Path(GIT_PACK_CACHE_DIR) if GIT_PACK_CACHE_DIR else self.repo_manager.repos_dir / ".pack-cache"
+            self._pack_cache = PackCache(cache_dir, GIT_PACK_CACHE_MAX_BYTES, submit=git_workers.submit)
+        return self._pack_cache
+
+    def get_info_refs(self, repo_id: str, service: str, version: int = 0) -> tuple[bytes, str]:
         """
         Handle GET /info/refs?service=git-upload-pack or git-receive-pack
         Returns (content, content_type)
+
+        Upload-pack clients asking for protocol v2 get a capability
+        advertisement instead of the ref list; they request only the refs
+        they need with ls-refs.
         """
         repo = self.repo_manager.get_repo(repo_id)
         if not repo:
@@ -1626,6 +1919,12 @@ class HTTPGitBackend:
             raise ValueError(f"Invalid service: {service}")
 
         content_type = f"application/x-{service}-advertisement"
+        self.repo_manager.activity.touch(repo_id)
+
+        if service == "git-upload-pack" and version == 2:
+            # Like git http-backend, v2 skips the "# service=" preamble
+            lines = [pkt_line(cap + b"\n") for cap in UPLOAD_PACK_V2_CAPABILITIES]
+            return b"".join(lines) + FLUSH_PKT, content_type
 
         # Build packet-line response
         output = BytesIO()
@@ -1635,14 +1934,15 @@ class HTTPGitBackend:
         output.write(pkt_line(service_line))
         output.write(b"0000")  # Flush packet
 
-        # Get refs
-        refs = repo.get_refs()
+        # Get refs from the cached snapshot rather than reading every loose ref file
+        refs = self.repo_manager.get_refs(repo_id)
 
         if not refs:
             # Empty repo - send capabilities with zero-id
             if service == "git-upload-pack":
-                # no-done tells client to send everything in one request (no multi-round negotiation)
-                caps = b"thin-pack side-band side-band-64k ofs-delta shallow no-progress no-done"
+                # multi_ack_detailed + no-done: client negotiates haves in rounds and gets
+                # the pack as soon as we report "ready", without a separate done request
+                caps = b"multi_ack_detailed thin-pack side-band side-band-64k ofs-delta shallow deepen-since deepen-not deepen-relative no-progress filter no-done"
             else:
                 # No side-band for receive-pack - simpler response handling
                 caps = b"report-status delete-refs ofs-delta"
@@ -1652,8 +1952,9 @@ class HTTPGitBackend:
             # Send refs with capabilities on first line
             first = True
             if service == "git-upload-pack":
-                # no-done tells client to send everything in one request (no multi-round negotiation)
-                caps = b"thin-pack side-band side-band-64k ofs-delta shallow no-progress include-tag allow-tip-sha1-in-want allow-reachable-sha1-in-want no-done"
+                # multi_ack_detailed + no-done: client negotiates haves in rounds and gets
+                # the pack as soon as we report "ready", without a separate done request
+                caps = b"multi_ack_detailed thin-pack side-band side-band-64k ofs-delta shallow deepen-since deepen-not deepen-relative no-progress filter include-tag allow-tip-sha1-in-want allow-reachable-sha1-in-want no-done"
             else:
                 # No side-band for receive-pack - simpler response handling
                 caps = b"report-status delete-refs ofs-delta"
@@ -1681,239 +1982,266 @@ class HTTPGitBackend:
         output.write(b"0000")  # Final flush
         return output.getvalue(), content_type
 
-    def handle_upload_pack(self, repo_id: str, input_data: bytes) -> bytes:
+    def handle_upload_pack(self, repo_id: str, input_data: bytes, version: int = 0) -> bytes:
         """
         Handle POST git-upload-pack (client wants to clone/fetch).
 
-        Uses dulwich's pack generation to create pack data for requested objects.
+        Buffers the full response; see stream_upload_pack() for the
+        streaming variant used by the HTTP endpoint.
         """
-        import struct
+        return b"".join(self.stream_upload_pack(repo_id, input_data, version))
 
+    def stream_upload_pack(self, repo_id: str, input_data: bytes, version: int = 0) -> Iterator[bytes]:
+        """
+        Handle POST git-upload-pack as a stream of response frames.
+
+        The repo lookup and request parsing happen eagerly so a missing repo
+        raises ValueError before any bytes are sent. The returned iterator
+        then yields pkt-line/side-band frames while objects are compressed.
+        With version 2 the body is an ls-refs or fetch command request.
+        """
         repo = self.repo_manager.get_repo(repo_id)
         if not repo:
             raise ValueError(f"Repository {repo_id} not found")
 
+        if version == 2:
+            command = parse_command_request(input_data)
+            print(f"[git_server] upload-pack v2: {command.command.decode(errors='replace')}, {len(command.args)} args")
+            if command.command == b"ls-refs":
+                self.repo_manager.activity.touch(repo_id)
+                return iter([self._ls_refs(repo_id, repo, command.args)])
+            if command.command == b"fetch":
+                frames = self._fetch_v2_frames(repo_id, repo, parse_fetch_args(command.args))
+                return self.repo_manager.activity.track(repo_id, frames)
+            return iter([pkt_line(b"ERR unknown command " + command.command + b"\n")])
+
         print(f"[git_server] upload-pack: got {len(input_data)} bytes")
+        request = parse_upload_pack_request(input_data)
 
-        try:
-            input_stream = BytesIO(input_data)
-            wants = []
-            haves = []
-            capabilities = []
-            got_done = False
+        print(f"[git_server] wants: {[w[:8].decode() for w in request.wants]}")
+        print(f"[git_server] haves: {len(request.haves)} objects")
+        print(f"[git_server] caps: {request.capabilities}")
+        print(f"[git_server] got_done: {request.done}, no-done in caps: {request.has_capability(b'no-done')}")
 
-            # Parse pkt-lines for wants and haves
-            while True:
-                len_bytes = input_stream.read(4)
-                if len(len_bytes) < 4:
-                    break
+        return self.repo_manager.activity.track(repo_id, self._upload_pack_frames(repo_id, repo, request))
 
-                pkt_len = int(len_bytes, 16)
-                if pkt_len == 0:
-                    # Flush packet - check if there's more (haves section)
-                    continue
+    def _upload_pack_frames(self, repo_id: str, repo, request: UploadPackRequest) -> Iterator[bytes]:
+        """Generate the upload-pack response for a parsed request."""
+        if not request.wants:
+            return
+        try:
+            request.validate()
+            object_filter = self._object_filter(request)
+        except ValueError as e:
+            yield pkt_line(f"ERR {e}\n".encode())
+            return
 
-                if pkt_len == 1:
-                    # Delimiter packet
-                    continue
+        shallow = self._shallow_info(repo, request)
+        if request.deepen:
+            # Deepening clients read the shallow list at the start of every response
+            yield from shallow.lines()
+            yield FLUSH_PKT
+            if not request.haves and not request.done:
+                # First round of a shallow fetch only asks for the shallow list
+                return
+
+        # ACK the haves we share; only send a pack once negotiation is finished
+        negotiation = negotiate(repo.object_store, request)
+        print(f"[git_server] negotiation: {len(negotiation.common)} common, send_pack={negotiation.send_pack}")
+        yield from negotiation.lines
+        if not negotiation.send_pack:
+            return
 
-                line = input_stream.read(pkt_len - 4)
-                if line.endswith(b'\n'):
-                    line = line[:-1]
+        use_sideband = request.has_capability(b'side-band-64k') or request.has_capability(b'side-band')
+        max_data = SIDEBAND_64K_MAX_DATA if request.has_capability(b'side-band-64k') else SIDEBAND_MAX_DATA
+        yield from self._pack_frames(repo_id, repo, request, negotiation.common, use_sideband, max_data,
+                                     shallow, object_filter)
 
-                print(f"[git_server] pkt-line: {line}")
-
-                if line.startswith(b'want '):
-                    # Parse: want <sha> [capabilities]
-                    parts = line[5:].split(b' ')
-                    sha = parts[0]
-                    wants.append(sha)
-                    if len(parts) > 1:
-                        # First want line has capabilities
-                        caps = b' '.join(parts[1:]).split(b' ')
-                        capabilities.extend(c for c in caps if c)
-                elif line.startswith(b'have '):
-                    sha = line[5:].strip()
-                    haves.append(sha)
-                elif line == b'done':
-                    got_done = True
+    def _object_filter(self, request: UploadPackRequest) -> ObjectFilter | None:
+        """Parsed partial-clone filter for a request; raises ValueError if unsupported."""
+        if not request.filter_spec:
+            return None
+        object_filter = parse_filter_spec(request.filter_spec)
+        print(f"[git_server] filter: {object_filter.spec.decode()}")
+        return object_filter
+
+    def _shallow_info(self, repo, request: UploadPackRequest) -> ShallowInfo:
+        """Shallow boundaries for a request; empty unless the client is or wants to be shallow."""
+        deepen_not = []
+        for name in request.deepen_not:
+            # deepen-not names a ref, possibly abbreviated like "main" or "v1.0"
+            for candidate in (name, b"refs/heads/" + name, b"refs/tags/" + name):
+                try:
+                    deepen_not.append(repo.refs[candidate])
                     break
+                except KeyError:
+                    continue
+        shallow = compute_shallow(
+            repo.object_store, request.wants, request.shallows,
+            depth=request.depth, deepen_since=request.deepen_since,
+            deepen_not=deepen_not, deepen_relative=request.deepen_relative,
+        )
+        if request.deepen:
+            print(f"[git_server] deepen: {len(shallow.shallow)} shallow, {len(shallow.unshallow)} unshallow")
+        return shallow
+
+    def _ls_refs(self, repo_id: str, repo, args: list[bytes]) -> bytes:
+        """
+        Protocol v2 ls-refs response.
 
-            print(f"[git_server] wants: {[w[:8].decode() if isinstance(w, bytes) else w[:8] for w in wants]}")
-            print(f"[git_server] haves: {len(haves)} objects")
-            print(f"[git_server] caps: {capabilities}")
-            print(f"[git_server] got_done: {got_done}, no-done in caps: {b'no-done' in capabilities}")
-
-            # Debug: check pack directory
-            pack_dir = Path(repo.object_store.path) / "pack"
-            if pack_dir.exists():
-                pack_files = list(pack_dir.glob("*.pack"))
-                idx_files = list(pack_dir.glob("*.idx"))
-                print(f"[git_server] pack directory has {len(pack_files)} pack files, {len(idx_files)} idx files")
-                for pf in pack_files:
-                    print(f"[git_server]   - {pf.name} ({pf.stat().st_size} bytes)")
-            else:
-                print(f"[git_server] no pack directory yet")
-
-            # Force fresh repo to ensure packs are loaded
-            repo = self.repo_manager.get_repo(repo_id)
-            packs = list(repo.object_store.packs)
-            print(f"[git_server] object store has {len(packs)} loaded packs")
-
-            use_sideband = b'side-band-64k' in capabilities or b'side-band' in capabilities
+        Only refs under one of the requested ref-prefixes are listed (all of
+        them without any), so a runner fetching one branch doesn't pay for
+        the thousands of lazyaf/* card branches.
+        """
+        prefixes = tuple(arg[11:] for arg in args if arg.startswith(b"ref-prefix "))
+        want_symrefs = b"symrefs" in args
+        want_peeled = b"peel" in args
 
-            # Build pack with requested objects
-            output = BytesIO()
+        refs = self.repo_manager.get_refs(repo_id)
+        names = [name for name in refs if not prefixes or name.startswith(prefixes)]
+        # HEAD first, then the rest sorted like the v0 advertisement
+        names.sort(key=lambda name: (name != b"HEAD", name))
 
-            # Check if client is using no-done capability (sends everything in one request)
-            client_uses_no_done = b'no-done' in capabilities
-
-            # If we haven't received "done" and client isn't using no-done, this is just negotiation
-            # Send NAK and wait for the next request with "done"
-            if not got_done and not client_uses_no_done and haves:
-                print(f"[git_server] No 'done' received - sending NAK for negotiation")
-                output.write(pkt_line(b"NAK\n"))
-                return output.getvalue()
-
-            if wants:
-                # dulwich 0.25+ expects hex SHA for object_store lookups
-                def normalize_sha(sha):
-                    """Ensure SHA is hex bytes format for object_store lookup."""
-                    if isinstance(sha, str):
-                        return sha.encode('ascii')
-                    if isinstance(sha, bytes) and len(sha) == 20:
-                        # Binary SHA - convert to hex
-                        return sha.hex().encode('ascii')
-                    return sha  # Already hex bytes
-
-                # Collect all objects needed (use hex SHAs for dulwich 0.25+)
-                object_ids = set()
-                pending = list(wants)  # wants are already hex bytes
-                have_set = set(haves)
-
-                while pending:
-                    sha_hex = normalize_sha(pending.pop())
-                    if sha_hex in object_ids or sha_hex in have_set:
-                        continue
-                    object_ids.add(sha_hex)
-
-                    try:
-                        obj = repo.object_store[sha_hex]
-                        # Add parent objects for commits/trees
-                        if obj.type_name == b'commit':
-                            pending.append(normalize_sha(obj.tree))
-                            pending.extend(normalize_sha(p) for p in obj.parents)
-                        elif obj.type_name == b'tree':
-                            for entry in obj.items():
-                                pending.append(normalize_sha(entry.sha))
-                    except KeyError as e:
-                        print(f"[git_server] object not found: {sha_hex[:16].decode()}")
-
-                print(f"[git_server] packing {len(object_ids)} objects")
-
-                import hashlib
-
-                # Get objects for packing
-                def get_objects():
-                    for sha_hex in object_ids:
-                        try:
-                            obj = repo.object_store[sha_hex]
-                            yield obj.type_num, obj.as_raw_string()
-                        except KeyError as e:
-                            print(f"[git_server] skip object {sha_hex[:16].decode()}: {e}")
-
-                # Generate pack
-                pack_data = BytesIO()
-
-                # Use dulwich's write_pack_data for correct format
-                entries = list(get_objects())
-                print(f"[git_server] writing {len(entries)} objects to pack")
-
-                # Write pack header manually for control
-                pack_data.write(b'PACK')
-                pack_data.write(struct.pack('>I', 2))  # Version 2
-                pack_data.write(struct.pack('>I', len(entries)))  # Object count
-
-                # Write objects using proper pack object format
-                for type_num, data in entries:
-                    self._write_pack_object_v2(pack_data, type_num, data)
-
-                # Get pack content and calculate checksum
-                pack_content = pack_data.getvalue()
-                checksum = hashlib.sha1(pack_content).digest()
-
-                pack_bytes = pack_content + checksum
-                print(f"[git_server] pack size: {len(pack_bytes)} bytes")
-
-                # Send NAK before pack data (simple protocol without multi_ack)
-                nak_pkt = pkt_line(b"NAK\n")
-                print(f"[git_server] NAK pkt: {nak_pkt!r}")
-                output.write(nak_pkt)
-                print(f"[git_server] sent NAK, output so far: {output.getvalue()[:50]!r}")
-
-                if use_sideband:
-                    # Sideband: band 1 = pack data, band 2 = progress
-                    # Send pack data through sideband
-                    # Max pkt-line = 65520 (0xfff0), minus 4 for length, minus 1 for band = 65515
-                    chunk_size = 65515
-                    offset = 0
-                    while offset < len(pack_bytes):
-                        chunk = pack_bytes[offset:offset + chunk_size]
-                        # Band 1 prefix (pack data)
-                        sideband_pkt = bytes([1]) + chunk
-                        output.write(pkt_line(sideband_pkt))
-                        offset += chunk_size
-
-                    output.write(b"0000")  # Flush
-                else:
-                    # No sideband - just send pack data directly
-                    output.write(pack_bytes)
-                    output.write(b"0000")
+        output = BytesIO()
+        for name in names:
+            line = refs[name] + b" " + name
+            if want_symrefs:
+                target = repo.refs.read_ref(name)
+                if target and target.startswith(b"ref: "):
+                    line += b" symref-target:" + target[5:]
+            if want_peeled and name.startswith(b"refs/tags/"):
+                peeled = repo.get_peeled(name)
+                if peeled and peeled != refs[name]:
+                    line += b" peeled:" + peeled
+            output.write(pkt_line(line + b"\n"))
+        output.write(FLUSH_PKT)
+        print(f"[git_server] ls-refs: {len(names)} of {len(refs)} refs for {len(prefixes)} prefixes")
+        return output.getvalue()
+
+    def _fetch_v2_frames(self, repo_id: str, repo, request: UploadPackRequest) -> Iterator[bytes]:
+        """Generate the protocol v2 fetch response for parsed fetch arguments."""
+        if not request.wants:
+            return
+        try:
+            request.validate()
+            object_filter = self._object_filter(request)
+        except ValueError as e:
+            yield pkt_line(f"ERR {e}\n".encode())
+            return
 
-            result = output.getvalue()
-            print(f"[git_server] final response: first 100 bytes = {result[:100]!r}")
-            print(f"[git_server] final response length: {len(result)} bytes")
-            return result
+        negotiation = negotiate_v2(repo.object_store, request)
+        print(f"[git_server] v2 fetch: {len(request.wants)} wants, "
+              f"{len(negotiation.common)} common, send_pack={negotiation.send_pack}")
+        yield from negotiation.lines
+        if not negotiation.send_pack:
+            return
 
+        shallow = self._shallow_info(repo, request)
+        if request.deepen or request.shallows:
+            yield pkt_line(b"shallow-info\n")
+            yield from shallow.lines()
+            yield DELIM_PKT
+
+        # The v2 packfile section is always side-band-64k multiplexed
+        yield pkt_line(b"packfile\n")
+        yield from self._pack_frames(repo_id, repo, request, negotiation.common, True, SIDEBAND_64K_MAX_DATA,
+                                     shallow, object_filter)
+
+    def _pack_frames(self, repo_id: str, repo, request: UploadPackRequest, common: list[bytes],
+                     use_sideband: bool, max_data: int, shallow: ShallowInfo,
+                     object_filter: ObjectFilter | None = None) -> Iterator[bytes]:
+        """Stream the pack for wants minus common, ending with a flush."""
+        try:
+            use_ofs_delta = request.has_capability(b'ofs-delta')
+            # Unshallowed commits are on the client already; their parents are sent
+            wants = request.wants + shallow.extra_wants
+            common = common + shallow.unshallow
+            options = [b'ofs-delta'] if use_ofs_delta else []
+            options.extend(b"shallow " + sha for sha in shallow.boundary)
+            if object_filter:
+                options.append(b"filter " + object_filter.spec)
+            # Identical requests (e.g. parallel pipeline steps on one commit) share one pack
+            key = pack_cache_key(repo_id, wants, common, options=options)
+            # Generation can outlive this request; keep maintenance off the repo until it is cached
+            pack_chunks = self.pack_cache.get_or_generate(
+                key,
+                lambda: self.repo_manager.activity.track(
+                    repo_id,
+                    self._generate_pack(repo, wants, common, use_ofs_delta, shallow.boundary, object_filter),
+                ),
+            )
+            if use_sideband:
+                # Sideband: band 1 = pack data, band 2 = progress
+                yield from sideband_frames(pack_chunks, SIDEBAND_DATA, max_data)
+            else:
+                # No sideband - just send pack data directly
+                yield from pack_chunks
+            yield FLUSH_PKT
         except Exception as e:
             import traceback
             print(f"[git_server] upload-pack error: {e}")
             traceback.print_exc()
-            raise
-
-    def _write_pack_object_v2(self, output: BytesIO, type_num: int, data: bytes) -> None:
-        """Write a single object to pack format.
-
-        Pack object format:
-        - Header: variable-length encoded type (3 bits) + size
-        - Data: zlib compressed object data
+            if not use_sideband:
+                raise
+            # Headers are already sent, so report the failure in-band
+            yield pkt_line(bytes([SIDEBAND_ERROR]) + f"upload-pack: {e}\n".encode())
+            yield FLUSH_PKT
+
+    def _generate_pack(self, repo, wants: list[bytes], common: list[bytes],
+                       use_ofs_delta: bool, shallow: set[bytes] = frozenset(),
+                       object_filter: ObjectFilter | None = None) -> Iterator[bytes]:
+        """Build the pack of everything reachable from wants but not from common."""
+        bitmaps = ReachabilityBitmaps.for_repo(repo)
+        if GIT_BITMAPS and bitmaps.available and not shallow:
+            missing = bitmaps.find_missing_objects(wants, common)
+        else:
+            # Bitmaps cover full history, so shallow packs walk from the wants
+            missing = find_missing_objects(repo.object_store, wants, common, shallow)
+        if object_filter:
+            # Partial clone: leave out filtered blobs the client did not ask for by id
+            total = len(missing)
+            missing = filter_objects(repo.object_store, missing, object_filter, keep=wants)
+            print(f"[git_server] filter {object_filter.spec.decode()} omitted {total - len(missing)} blobs")
+        if use_ofs_delta:
+            # Group same-type, same-name objects so the delta window finds good bases
+            missing.sort(key=lambda o: delta_sort_key(o.type_num, o.path))
+        # Objects already in a pack are copied as stored; only loose ones are compressed
+        reuse = plan_pack_reuse(repo.object_store, missing, allow_ofs_delta=use_ofs_delta)
+        print(f"[git_server] packing {len(missing)} objects "
+              f"({reuse.reused_count} reused, ofs-delta={use_ofs_delta})")
+
+        def get_objects():
+            for entry in reuse.fresh:
+                obj = repo.object_store[entry.sha]
+                yield obj.type_num, obj.as_raw_string()
+
+        yield from reuse.generate_pack(
+            get_objects(),
+            delta_window=DEFAULT_DELTA_WINDOW if use_ofs_delta else 0,
+        )
+
+    def handle_receive_pack(self, repo_id: str, input_data: bytes | BinaryIO) -> bytes:
         """
-        import zlib
-
-        size = len(data)
-
-        # First byte: type (bits 4-6) + size bits 0-3
-        c = (type_num << 4) | (size & 0x0f)
-        size >>= 4
-
-        # Continue with size if more bits needed
-        while size:
-            output.write(bytes([c | 0x80]))
-            c = size & 0x7f
-            size >>= 7
-        output.write(bytes([c]))
+        Handle POST git-receive-pack (client wants to push).
 
-        # Write zlib compressed data (git uses default compression)
-        compressed = zlib.compress(data)
-        output.write(compressed)
+        The push counts as repo activity while it runs, which keeps
+        background repacks from touching the repo's packs meanwhile.
+        """
+        self.repo_manager.activity.begin(repo_id)
+        try:
+            return self._receive_pack(repo_id, input_data)
+        finally:
+            self.repo_manager.activity.end(repo_id)
 
-    def handle_receive_pack(self, repo_id: str, input_data: bytes) -> bytes:
+    def _receive_pack(self, repo_id: str, input_data: bytes | BinaryIO) -> bytes:
         """
-        Handle POST git-receive-pack (client wants to push).
+        Store a pushed pack and update refs.
 
-        Stores the pack file directly in objects/pack/ with an index file.
-        This is more robust than unpacking to loose objects, especially
-        for packs with delta objects.
+        input_data is the request body, either as bytes or as a binary
+        stream. The pack is copied from the stream into a temporary file in
+        objects/pack/ and indexed as it arrives, then moved into place, so
+        large pushes are never held in memory. Refs are only updated once
+        the pack is stored.
         """
         import struct
 
@@ -1921,7 +2249,11 @@ class HTTPGitBackend:
         if not repo:
             raise ValueError(f"Repository {repo_id} not found")
 
-        print(f"[git_server] receive-pack: got {len(input_data)} bytes")
+        if isinstance(input_data, (bytes, bytearray)):
+            print(f"[git_server] receive-pack: got {len(input_data)} bytes")
+            input_stream = BytesIO(input_data)
+        else:
+            input_stream = input_data
 
         try:
             # Parse the incoming data
@@ -1929,7 +2261,6 @@ class HTTPGitBackend:
             # Each ref update: old-sha new-sha ref-name\n
             # Ends with flush (0000) then PACK
 
-            input_stream = BytesIO(input_data)
             output_lines = []
 
             # Read pkt-lines for ref updates
@@ -1957,37 +2288,35 @@ class HTTPGitBackend:
                     ref_updates.append((old_sha, new_sha, ref_name))
                     print(f"[git_server] ref update: {ref_name.decode()} {old_sha[:8].decode()}..{new_sha[:8].decode()}")
 
-            # Rest is PACK data
-            pack_data = input_stream.read()
-            print(f"[git_server] pack data: {len(pack_data)} bytes")
+            # Rest is PACK data; only its header is read here
+            pack_header = input_stream.read(12)
 
             # Track if pack import succeeded - only update refs if it did
             pack_import_success = False
             pack_import_error = None
 
-            if pack_data and pack_data.startswith(b'PACK'):
-                print(f"[git_server] importing pack ({len(pack_data)} bytes)")
-
-                # Parse pack header for logging
-                assert pack_data[:4] == b'PACK'
-                version = struct.unpack('>I', pack_data[4:8])[0]
-                num_objects = struct.unpack('>I', pack_data[8:12])[0]
-                print(f"[git_server] pack version {version}, {num_objects} objects")
-
+            if pack_header.startswith(b'PACK'):
                 try:
-                    # Use dulwich's add_thin_pack which handles delta resolution
-                    # and stores the pack properly in the object store
-                    pack_stream = BytesIO(pack_data)
-
-                    def read_all(size):
-                        return pack_stream.read(size)
-
-                    def read_some(size):
-                        return pack_stream.read(size)
+                    version, num_objects = struct.unpack('>II', pack_header[4:12])
+                    print(f"[git_server] pack version {version}, {num_objects} objects")
+
+                    # add_thin_pack copies the stream into a temp pack while
+                    # indexing it, resolves deltas against existing objects
+                    # and moves the finished pack into objects/pack
+                    pending_header = [pack_header]
+
+                    def read_pack(size):
+                        if pending_header:
+                            head = pending_header.pop()
+                            if size < len(head):
+                                pending_header.append(head[size:])
+                                return head[:size]
+                            return head + input_stream.read(size - len(head))
+                        return input_stream.read(size)
 
                     print(f"[git_server] importing thin pack via object store...")
-                    pack = repo.object_store.add_thin_pack(read_all, read_some)
-                    print(f"[git_server] pack imported successfully")
+                    pack = repo.object_store.add_thin_pack(read_pack, read_pack)
+                    print(f"[git_server] pack imported successfully ({len(pack)} objects)")
 
                     # Verify first ref update object is accessible
                     test_sha = ref_updates[0][1] if ref_updates else None
@@ -2042,6 +2371,12 @@ class HTTPGitBackend:
                     print(f"[git_server] ref update error: {e}")
                     output_lines.append(f"ng {ref_name.decode()} {e}")
 
+            self.repo_manager.invalidate_refs(repo_id)
+
+            # Extend the commit-graph, bitmaps and .lazyaf index while the pushed commits are fresh
+            pushed_tips = [new_sha for _, new_sha, _ in ref_updates if new_sha != b'0' * 40]
+            self.repo_manager.index_pushed_tips(repo, pushed_tips)
+
             # Set HEAD if it doesn't point to a valid branch yet
             if first_branch_pushed:
                 try:
@@ -2092,12 +2427,7 @@ class HTTPGitBackend:
             raise
 
 
-def pkt_line(data: bytes) -> bytes:
-    """Encode data as a git pkt-line."""
-    length = len(data) + 4  # +4 for the length prefix itself
-    return f"{length:04x}".encode() + data
-
-
 # Singleton instances
 git_repo_manager = GitRepoManager()
 git_backend = HTTPGitBackend(git_repo_manager)
+git_workers = GitWorkerPool(GIT_WORKERS)
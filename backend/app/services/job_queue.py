@@ -1,16 +1,44 @@
 """
 In-memory job queue for managing pending jobs.
+
+Runners long-poll for work through wait_for_job(), which sleeps on a
+condition that enqueue() signals, so a job is handed out the moment it
+lands instead of on the runner's next poll.
+
+Which job a runner gets is decided by a SchedulingPolicy: priority
+classes first (playground > card > pipeline step by default), then a
+weighted fair share of running jobs across repos, with optional caps on
+how many jobs one repo or one pipeline run may have running at once.
+
+With a JobStore attached (see job_store.py), queued and assigned jobs are
+also written to the database, and attach_store() puts them back after a
+restart. A job is only handed to a runner once its assignment is written.
 """
 
 import asyncio
 import logging
+import os
+import time
+from collections import Counter, deque
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Callable, Awaitable
+from typing import TYPE_CHECKING, Callable, Awaitable
 from uuid import uuid4
 
+if TYPE_CHECKING:
+    from app.services.job_store import JobStore
+
 logger = logging.getLogger(__name__)
 
+# Number of recent dispatches the latency summary covers
+DISPATCH_LATENCY_WINDOW = 1000
+
+# Number of recent scheduling decisions kept for the status endpoint
+SCHEDULING_LOG_SIZE = 50
+
+# Priority classes, highest first
+PRIORITY_CLASSES = ("playground", "card", "pipeline")
+
 
 @dataclass
 class QueuedJob:
@@ -46,26 +74,312 @@ class QueuedJob:
     is_playground: bool = False  # True = ephemeral run, no card updates
     playground_session_id: str | None = None  # Links to SSE stream
     playground_save_branch: str | None = None  # If set, push changes to this branch
+    # Scheduling
+    priority: str | None = None  # playground, card or pipeline; derived from the job when unset
+
+
+def priority_class(job: QueuedJob) -> str:
+    """The job's priority class: explicit, else playground, pipeline step or card."""
+    if job.priority:
+        return job.priority
+    if job.is_playground:
+        return "playground"
+    if job.pipeline_run_id:
+        return "pipeline"
+    return "card"
+
+
+@dataclass
+class SchedulingPolicy:
+    """
+    How the queue picks between jobs a runner could take.
+
+    Jobs of a higher priority class always go first. Within a class, the
+    repo with the fewest running jobs per unit of weight goes next, and
+    the oldest job breaks ties. A job whose repo or pipeline run already
+    has repo_concurrency / pipeline_concurrency jobs running waits (0
+    means no cap).
+    """
+    priority_order: list[str] = field(default_factory=lambda: list(PRIORITY_CLASSES))
+    repo_weights: dict[str, float] = field(default_factory=dict)
+    default_weight: float = 1.0
+    repo_concurrency: int = 0
+    pipeline_concurrency: int = 0
+
+    def __post_init__(self):
+        weights = [self.default_weight, *self.repo_weights.values()]
+        if any(weight <= 0 for weight in weights):
+            raise ValueError("Repo weights must be positive")
+        if self.repo_concurrency < 0 or self.pipeline_concurrency < 0:
+            raise ValueError("Concurrency caps must be >= 0")
+
+    @classmethod
+    def from_env(cls) -> "SchedulingPolicy":
+        """
+        Build the policy from the environment:
+
+        JOB_PRIORITY_ORDER        comma-separated classes, highest first
+        JOB_REPO_WEIGHTS          repo_id=weight pairs, comma-separated
+        JOB_REPO_CONCURRENCY      max running jobs per repo (0 = no cap)
+        JOB_PIPELINE_CONCURRENCY  max running jobs per pipeline run (0 = no cap)
+        """
+        order = os.getenv("JOB_PRIORITY_ORDER")
+        weights = {}
+        for pair in os.getenv("JOB_REPO_WEIGHTS", "").split(","):
+            if pair.strip():
+                repo_id, _, weight = pair.partition("=")
+                weights[repo_id.strip()] = float(weight)
+        return cls(
+            priority_order=[c.strip() for c in order.split(",") if c.strip()] if order else list(PRIORITY_CLASSES),
+            repo_weights=weights,
+            repo_concurrency=int(os.getenv("JOB_REPO_CONCURRENCY", "0")),
+            pipeline_concurrency=int(os.getenv("JOB_PIPELINE_CONCURRENCY", "0")),
+        )
+
+    def rank(self, priority: str) -> int:
+        """Position of a priority class; unknown classes sort last."""
+        try:
+            return self.priority_order.index(priority)
+        except ValueError:
+            return len(self.priority_order)
+
+    def weight(self, repo_id: str) -> float:
+        return self.repo_weights.get(repo_id, self.default_weight)
+
+    def to_dict(self) -> dict:
+        return {
+            "priority_order": list(self.priority_order),
+            "repo_weights": dict(self.repo_weights),
+            "default_weight": self.default_weight,
+            "repo_concurrency": self.repo_concurrency,
+            "pipeline_concurrency": self.pipeline_concurrency,
+        }
+
+
+QueueKey = tuple[str | None, str]  # (required_runner_id, runner_type)
+GroupKey = tuple[str, str, str | None]  # (priority class, repo_id, pipeline_run_id)
+
+
+def _job_type(runner_type: str | None) -> str:
+    return str(runner_type) if runner_type else "any"
 
 
 class JobQueue:
-    def __init__(self):
-        self._jobs: list[QueuedJob] = []  # Ordered list of queued jobs
+    """
+    Job queue indexed by runner affinity and runner type.
+
+    Jobs are grouped by (required_runner_id, runner_type), the part a
+    runner must match:
+
+    - a job with required_runner_id can only go to that runner,
+    - a job with runner_type "any" can go to any runner,
+    - other jobs only go to runners of the same type (never to runners
+      that report no type).
+
+    Within each of those, jobs live in one FIFO deque per (priority class,
+    repo, pipeline run), so every job in a deque is held back by the same
+    concurrency caps. A runner compares the heads of the deques it may
+    take from under the scheduling policy, without looking at the jobs
+    behind them.
+
+    Each entry has a sequence number; cancel() only forgets the job's live
+    sequence numbers, and dead entries are skipped when they reach the head
+    of their deque, so cancelling is O(1) too. Once dead entries outnumber
+    live ones the deques are compacted.
+
+    A job counts as running from dequeue() until remove_pending() (the
+    runner reported back) or until it is enqueued again.
+
+    Playground jobs are never persisted: their sessions don't survive a
+    restart either.
+    """
+
+    def __init__(self, policy: SchedulingPolicy | None = None):
+        self.policy = policy or SchedulingPolicy()
+        self._queues: dict[QueueKey, dict[GroupKey, deque[tuple[int, QueuedJob]]]] = {}
+        self._entries: dict[int, tuple[float, GroupKey]] = {}  # live sequence number -> (enqueue time, group)
+        self._queued: dict[str, list[int]] = {}  # job_id -> live sequence numbers
+        self._seq = 0
+        self._stale = 0  # cancelled entries still sitting in a deque
         self._pending: dict[str, QueuedJob] = {}  # job_id -> job (includes jobs being worked on)
+        self._running: dict[str, QueuedJob] = {}  # job_id -> dequeued job not yet reported back
+        self._running_by_repo: Counter[str] = Counter()
+        self._running_by_pipeline: Counter[str] = Counter()
+        self._decisions: deque[dict] = deque(maxlen=SCHEDULING_LOG_SIZE)
         self._lock = asyncio.Lock()
         self._handlers: list[Callable[[QueuedJob], Awaitable[None]]] = []
+        # Bumped by every enqueue; long-polls wait on _job_added for it to change
+        self._version = 0
+        self._job_added: asyncio.Condition | None = None
+        self._job_added_loop: asyncio.AbstractEventLoop | None = None
+        self._wake_tasks: set[asyncio.Task] = set()
+        self._store: "JobStore | None" = None
+        # Dispatch latency: time from enqueue to a runner taking the job
+        self._latencies: deque[float] = deque(maxlen=DISPATCH_LATENCY_WINDOW)
+        self._dispatched = 0
+
+    def _condition(self) -> asyncio.Condition:
+        """The job-added condition, created on the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._job_added is None or self._job_added_loop is not loop:
+            self._job_added = asyncio.Condition()
+            self._job_added_loop = loop
+        return self._job_added
+
+    async def attach_store(self, store: "JobStore") -> list[tuple[QueuedJob, str | None, str | None, dict]]:
+        """
+        Persist the queue through store from now on, after loading what it holds.
+
+        Jobs that were waiting are queued again in their original order.
+        Jobs that were handed to a runner count as running again and are
+        returned as (job, runner_id, runner_type, registration) so the
+        runner pool can give them back to their runners.
+        """
+        queued, assigned = await store.load()
+        async with self._lock:
+            self._store = store
+            for job in queued:
+                self._add(job)
+            for job, *_ in assigned:
+                self._pending[job.id] = job
+                self._start(job)
+        if queued or assigned:
+            logger.info(f"Restored {len(queued)} queued and {len(assigned)} assigned jobs")
+        await self._notify()
+        return assigned
+
+    def _durable(self, job: QueuedJob) -> bool:
+        return self._store is not None and not job.is_playground
+
+    async def flush(self) -> None:
+        """
+        Wait until every change so far is written to the attached store.
+
+        Raises JobStoreError if it can't be; the changes are kept and
+        written by a later flush.
+        """
+        if self._store is not None:
+            await self._store.flush()
+
+    async def _persist(self) -> None:
+        """Write changes so far; if the store fails, keep retrying in the background."""
+        from app.services.job_store import JobStoreError
+        try:
+            await self.flush()
+        except JobStoreError as e:
+            logger.error(f"{e}; retrying in the background")
+            self._store.flush_soon()
 
     async def enqueue(self, job: QueuedJob) -> str:
-        """Add a job to the queue."""
+        """
+        Add a job to the queue and wake runners waiting in wait_for_job().
+
+        If the job can't be written to the store it is queued (and
+        dispatched) all the same and written by a background flush.
+        """
         async with self._lock:
-            self._pending[job.id] = job
-            self._jobs.append(job)
-            logger.info(f"Enqueued job {job.id[:8]} (type={job.runner_type!r}) for card {job.card_id[:8]}")
+            # A requeued job (its runner went away) no longer counts as running
+            self._release(job.id)
+            group = self._add(job)
+            if self._durable(job):
+                self._store.queued(job)
+            logger.info(f"Enqueued job {job.id[:8]} (type={job.runner_type!r}, priority={group[0]!r}) for card {job.card_id[:8]}")
+        await self._persist()
+        await self._notify()
         return job.id
 
-    async def dequeue(self, runner_type: str | None = None, runner_id: str | None = None) -> QueuedJob | None:
+    def _add(self, job: QueuedJob) -> GroupKey:
+        self._seq += 1
+        self._pending[job.id] = job
+        group = (priority_class(job), job.repo_id, job.pipeline_run_id)
+        self._entries[self._seq] = (time.monotonic(), group)
+        self._queued.setdefault(job.id, []).append(self._seq)
+        key = (job.required_runner_id or None, _job_type(job.runner_type))
+        self._queues.setdefault(key, {}).setdefault(group, deque()).append((self._seq, job))
+        return group
+
+    async def _notify(self) -> None:
+        """Wake long-polling runners so they retry dequeue()."""
+        condition = self._condition()
+        async with condition:
+            self._version += 1
+            condition.notify_all()
+
+    def _head(self, key: QueueKey, group: GroupKey) -> tuple[int, QueuedJob] | None:
+        """Oldest live entry of one deque, dropping cancelled entries on the way."""
+        groups = self._queues[key]
+        queue = groups[group]
+        while queue:
+            seq, job = queue[0]
+            if seq in self._entries:
+                return seq, job
+            queue.popleft()
+            self._stale -= 1
+        del groups[group]
+        if not groups:
+            del self._queues[key]
+        return None
+
+    def _compact(self) -> None:
+        """Drop cancelled entries from every deque."""
+        for key, groups in list(self._queues.items()):
+            for group, queue in list(groups.items()):
+                live = deque((seq, job) for seq, job in queue if seq in self._entries)
+                if live:
+                    groups[group] = live
+                else:
+                    del groups[group]
+            if not groups:
+                del self._queues[key]
+        self._stale = 0
+
+    def _at_cap(self, repo_id: str, pipeline_run_id: str | None) -> bool:
+        """Whether the repo or pipeline run already has as many jobs running as the policy allows."""
+        policy = self.policy
+        if policy.repo_concurrency and self._running_by_repo[repo_id] >= policy.repo_concurrency:
+            return True
+        return bool(
+            pipeline_run_id
+            and policy.pipeline_concurrency
+            and self._running_by_pipeline[pipeline_run_id] >= policy.pipeline_concurrency
+        )
+
+    def _share(self, repo_id: str) -> float:
+        """Running jobs of a repo per unit of its weight."""
+        return self._running_by_repo[repo_id] / self.policy.weight(repo_id)
+
+    def _start(self, job: QueuedJob) -> None:
+        self._running[job.id] = job
+        self._running_by_repo[job.repo_id] += 1
+        if job.pipeline_run_id:
+            self._running_by_pipeline[job.pipeline_run_id] += 1
+
+    def _release(self, job_id: str) -> bool:
+        """Stop counting a job as running; False if it wasn't."""
+        job = self._running.pop(job_id, None)
+        if job is None:
+            return False
+        for counter, name in ((self._running_by_repo, job.repo_id),
+                              (self._running_by_pipeline, job.pipeline_run_id)):
+            if name:
+                counter[name] -= 1
+                if counter[name] <= 0:
+                    del counter[name]
+        return True
+
+    @staticmethod
+    def _keys_for_runner(runner_type: str | None, runner_id: str | None) -> list[QueueKey]:
+        types = ["any"]
+        if runner_type and str(runner_type) != "any":
+            types.append(str(runner_type))
+        affinities = [None, runner_id] if runner_id else [None]
+        return [(affinity, job_type) for affinity in affinities for job_type in types]
+
+    async def dequeue(self, runner_type: str | None = None, runner_id: str | None = None,
+                      fits: Callable[[QueuedJob], bool] | None = None,
+                      registration: dict | None = None) -> QueuedJob | None:
         """
-        Get the next job from the queue that matches the runner type and affinity.
+        Get the next queued job for a runner under the scheduling policy.
 
         Matching logic:
         - If job has required_runner_id, only that runner can pick it up
@@ -73,57 +387,206 @@ class JobQueue:
         - If runner_type is specified (e.g., "claude-code"), return jobs that:
           - Have runner_type="any" (any runner can take them), OR
           - Have runner_type matching the runner's type
+
+        Among matching jobs whose repo and pipeline run are under their
+        concurrency caps, the highest priority class wins, then the repo
+        with the smallest weighted share of running jobs, then the oldest.
+        If fits is given, groups whose next job it rejects (e.g. too big
+        for the runner's remaining capacity) are passed over; jobs are never
+        taken out of order within a group.
+
+        registration (the runner's name, slots and capacity) is stored with
+        the assignment so the runner can be rebuilt after a restart.
         """
         async with self._lock:
-            runner_short = runner_id[:8] if runner_id else None
-            logger.info(f"Dequeue: runner_type={runner_type!r}, runner_id={runner_short}, queue_size={len(self._jobs)}")
-            for i, job in enumerate(self._jobs):
-                req_runner = job.required_runner_id[:8] if job.required_runner_id else None
-                matches = self._job_matches_runner(job, runner_type, runner_id)
-                logger.info(f"  Job {job.id[:8]}: type={job.runner_type!r}, required_runner={req_runner}, is_continuation={job.is_continuation}, matches={matches}")
-                if matches:
-                    self._jobs.pop(i)
-                    logger.info(f"  -> Assigned to runner {runner_short}")
-                    return job
+            job = self._pop(runner_type, runner_id, fits, registration)
+        if job is not None:
+            # Make the assignment durable before the runner starts on it
+            from app.services.job_store import JobStoreError
+            try:
+                await self.flush()
+            except JobStoreError as e:
+                # A restart would queue it again while the runner has it; put it back instead
+                logger.error(f"Could not record assignment of job {job.id[:8]}, requeueing it: {e}")
+                async with self._lock:
+                    self._release(job.id)
+                    self._add(job)
+                    if self._durable(job):
+                        self._store.queued(job)
+                        self._store.flush_soon()
+                return None
+        return job
+
+    def _pop(self, runner_type: str | None, runner_id: str | None,
+             fits: Callable[[QueuedJob], bool] | None = None,
+             registration: dict | None = None) -> QueuedJob | None:
+        """Take the job dequeue() should hand out; called with the lock held."""
+        best, best_rank = None, None
+        candidates = capped = 0
+        for key in self._keys_for_runner(runner_type, runner_id):
+            for group in list(self._queues.get(key, ())):
+                head = self._head(key, group)
+                if head is None:
+                    continue
+                priority, repo_id, pipeline_run_id = group
+                if self._at_cap(repo_id, pipeline_run_id):
+                    capped += 1
+                    continue
+                if fits is not None and not fits(head[1]):
+                    continue
+                candidates += 1
+                rank = (self.policy.rank(priority), self._share(repo_id), head[0])
+                if best_rank is None or rank < best_rank:
+                    best, best_rank = (key, group), rank
+        if best is None:
             return None
+        key, group = best
+        seq, job = self._queues[key][group].popleft()
+        enqueued_at, _ = self._entries.pop(seq)
+        seqs = self._queued[job.id]
+        seqs.remove(seq)
+        if not seqs:
+            del self._queued[job.id]
+        waited = time.monotonic() - enqueued_at
+        self._latencies.append(waited)
+        self._dispatched += 1
+        self._decisions.append({
+            "job_id": job.id,
+            "runner_id": runner_id,
+            "repo_id": job.repo_id,
+            "pipeline_run_id": job.pipeline_run_id,
+            "priority": group[0],
+            "repo_share": round(best_rank[1], 3),
+            "wait_seconds": round(waited, 3),
+            "candidates": candidates,
+            "capped": capped,
+            "at": datetime.utcnow().isoformat(),
+        })
+        self._start(job)
+        if self._durable(job):
+            self._store.assigned(job, runner_id, runner_type, registration)
+        logger.debug(f"Dequeued job {job.id[:8]} (priority={group[0]!r}) for runner {runner_id[:8] if runner_id else None} (type={runner_type!r})")
+        return job
 
-    def _job_matches_runner(self, job: QueuedJob, runner_type: str | None, runner_id: str | None = None) -> bool:
-        """Check if a job can be picked up by a runner of the given type and ID."""
-        # Check runner affinity first (for pipeline continuations)
-        if job.required_runner_id:
-            if runner_id != job.required_runner_id:
+    async def cancel(self, job_id: str) -> bool:
+        """Remove a job that is still waiting in the queue; False if it isn't queued."""
+        async with self._lock:
+            seqs = self._queued.pop(job_id, None)
+            if not seqs:
                 return False
-            # If runner matches, still need to check type
-
-        # Normalize to strings to ensure comparison works
-        job_type = str(job.runner_type) if job.runner_type else "any"
-        runner_type_str = str(runner_type) if runner_type else None
-
-        # If job requests "any" runner, any runner can take it
-        if job_type == "any":
-            return True
-
-        # If runner has no type (legacy), only take "any" jobs
-        if runner_type_str is None:
-            return job_type == "any"
-
-        # Otherwise, job type must match runner type exactly
-        return job_type == runner_type_str
+            for seq in seqs:
+                del self._entries[seq]
+            job = self._pending.pop(job_id, None)
+            if job is not None and self._durable(job):
+                self._store.done(job_id)
+            self._stale += len(seqs)
+            if self._stale > max(64, len(self._entries)):
+                self._compact()
+            logger.info(f"Cancelled queued job {job_id[:8]}")
+        await self._persist()
+        return True
 
-    async def wait_for_job(self, runner_type: str | None = None, timeout: float = 30.0) -> QueuedJob | None:
-        """Wait for a job that matches the runner type."""
-        import time
-        start = time.time()
-        while time.time() - start < timeout:
-            job = await self.dequeue(runner_type)
+    async def wait_for_job(self, runner_type: str | None = None, timeout: float = 30.0,
+                           runner_id: str | None = None,
+                           fits: Callable[[QueuedJob], bool] | None = None,
+                           registration: dict | None = None) -> QueuedJob | None:
+        """
+        Wait up to timeout seconds for a job that matches the runner type and
+        affinity, returning as soon as enqueue() adds one.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        condition = self._condition()
+        while True:
+            seen = self._version
+            job = await self.dequeue(runner_type, runner_id, fits, registration)
             if job:
                 return job
-            await asyncio.sleep(0.5)
-        return None
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            async with condition:
+                try:
+                    # Returns at once if a job was enqueued since `seen`
+                    await asyncio.wait_for(condition.wait_for(lambda: self._version != seen), remaining)
+                except asyncio.TimeoutError:
+                    return None
+
+    def dispatch_stats(self) -> dict:
+        """Summary of recent enqueue-to-dispatch latencies in seconds."""
+        latencies = sorted(self._latencies)
+        if not latencies:
+            return {"dispatched": self._dispatched, "avg_seconds": None, "p95_seconds": None, "max_seconds": None}
+        return {
+            "dispatched": self._dispatched,
+            "avg_seconds": round(sum(latencies) / len(latencies), 3),
+            "p95_seconds": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+            "max_seconds": round(latencies[-1], 3),
+        }
+
+    def scheduling_stats(self) -> dict:
+        """The scheduling policy, per-class and per-repo load, and recent decisions."""
+        queued_by_priority = Counter()
+        queued_by_repo = Counter()
+        queued_by_pipeline = Counter()
+        for _, (priority, repo_id, pipeline_run_id) in self._entries.values():
+            queued_by_priority[priority] += 1
+            queued_by_repo[repo_id] += 1
+            if pipeline_run_id:
+                queued_by_pipeline[pipeline_run_id] += 1
+        policy = self.policy
+        repos = [
+            {
+                "repo_id": repo_id,
+                "weight": policy.weight(repo_id),
+                "queued": queued_by_repo[repo_id],
+                "running": self._running_by_repo[repo_id],
+                "share": round(self._share(repo_id), 3),
+                "capped": bool(policy.repo_concurrency and self._running_by_repo[repo_id] >= policy.repo_concurrency),
+            }
+            for repo_id in sorted(queued_by_repo.keys() | self._running_by_repo.keys())
+        ]
+        pipelines = [
+            {
+                "pipeline_run_id": run_id,
+                "queued": queued_by_pipeline[run_id],
+                "running": self._running_by_pipeline[run_id],
+                "capped": bool(policy.pipeline_concurrency
+                               and self._running_by_pipeline[run_id] >= policy.pipeline_concurrency),
+            }
+            for run_id in sorted(queued_by_pipeline.keys() | self._running_by_pipeline.keys())
+        ]
+        by_priority = {name: 0 for name in policy.priority_order}
+        by_priority.update(queued_by_priority)
+        return {
+            "policy": policy.to_dict(),
+            "queued_by_priority": by_priority,
+            "running": len(self._running),
+            "repos": repos,
+            "pipelines": pipelines,
+            "recent_decisions": list(self._decisions),
+        }
 
     def remove_pending(self, job_id: str):
-        """Remove a job from pending tracking."""
-        self._pending.pop(job_id, None)
+        """Remove a job from pending tracking once its runner has reported back."""
+        job = self._pending.pop(job_id, None)
+        if job is not None and self._durable(job):
+            self._store.done(job_id)
+            self._store.flush_soon()
+        if self._release(job_id):
+            # A repo or pipeline run may be back under its cap, or a runner
+            # have room again for a job that didn't fit
+            self._wake_soon()
+
+    def _wake_soon(self) -> None:
+        """Schedule _notify() from synchronous code running on the event loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._notify())
+        self._wake_tasks.add(task)
+        task.add_done_callback(self._wake_tasks.discard)
 
     def get_pending(self, job_id: str) -> QueuedJob | None:
         """Get a pending job by ID."""
@@ -135,17 +598,27 @@ class JobQueue:
 
     @property
     def queue_size(self) -> int:
-        return len(self._jobs)
+        return len(self._entries)
 
     async def clear(self):
         """Clear all jobs from the queue. Used for testing cleanup."""
         async with self._lock:
-            count = len(self._jobs)
-            self._jobs.clear()
+            count = len(self._entries)
+            self._queues.clear()
+            self._entries.clear()
+            self._queued.clear()
+            self._stale = 0
             self._pending.clear()
+            self._running.clear()
+            self._running_by_repo.clear()
+            self._running_by_pipeline.clear()
+            self._decisions.clear()
+            if self._store is not None:
+                self._store.clear()
             logger.info(f"Cleared job queue ({count} jobs removed)")
-            return count
+        await self._persist()
+        return count
 
 
 # Global job queue instance
-job_queue = JobQueue()
+job_queue = JobQueue(SchedulingPolicy.from_env())
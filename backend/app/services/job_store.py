@@ -0,0 +1,186 @@
+"""
+Durable journal for the runner job queue.
+
+JobQueue dispatches from memory; a JobStore mirrors every queued and
+assigned job into the job_queue table so a restarted backend can put
+queued jobs back in line and hand in-flight jobs back to their runners.
+
+Changes are collected and written in batches: callers that need a change
+to be durable (enqueue, dequeue) await flush(), and callers that arrive
+while a batch is being written share the next transaction. A batch that
+fails to write is kept and retried, so no change is ever dropped.
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import asdict, fields
+from datetime import datetime
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from app.models.job import QueuedJobRecord, QueueState
+from app.services.job_queue import QueuedJob
+
+logger = logging.getLogger(__name__)
+
+# Attempts flush() makes at writing a batch, and the delay before the first retry
+FLUSH_ATTEMPTS = 3
+FLUSH_RETRY_DELAY = 0.05
+
+_JOB_FIELDS = {f.name for f in fields(QueuedJob)}
+
+
+def serialize_job(job: QueuedJob) -> str:
+    data = asdict(job)
+    data["created_at"] = job.created_at.isoformat()
+    return json.dumps(data)
+
+
+def deserialize_job(payload: str) -> QueuedJob:
+    # Ignore fields a newer or older QueuedJob no longer has
+    data = {name: value for name, value in json.loads(payload).items() if name in _JOB_FIELDS}
+    if data.get("created_at"):
+        data["created_at"] = datetime.fromisoformat(data["created_at"])
+    return QueuedJob(**data)
+
+
+class JobStoreError(Exception):
+    """Job queue changes could not be written; they are kept for the next flush."""
+
+
+class JobStore:
+    """Batched writes of job queue state to the database."""
+
+    def __init__(self, session_factory):
+        self._session_factory = session_factory
+        self._ops: list[tuple] = []
+        self._lock = asyncio.Lock()
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    def queued(self, job: QueuedJob) -> None:
+        """Record a job as waiting in the queue (also used for requeues)."""
+        self._ops.append(("queued", job))
+
+    def assigned(self, job: QueuedJob, runner_id: str | None, runner_type: str | None,
+                 registration: dict | None = None) -> None:
+        """Record a job as handed to a runner, with what the runner registered as."""
+        self._ops.append(("assigned", job.id, runner_id, runner_type, registration, datetime.utcnow()))
+
+    def done(self, job_id: str) -> None:
+        """Forget a job that finished or was cancelled."""
+        self._ops.append(("done", job_id))
+
+    def clear(self) -> None:
+        self._ops.append(("clear",))
+
+    async def flush(self, attempts: int = FLUSH_ATTEMPTS) -> int:
+        """
+        Write all recorded changes in one transaction and return how many there were.
+
+        Failed writes (e.g. "database is locked") are retried with backoff;
+        if every attempt fails, JobStoreError is raised and the changes stay
+        queued, in order, for the next flush.
+        """
+        for attempt in range(attempts):
+            try:
+                return await self._write()
+            except JobStoreError as e:
+                if attempt + 1 >= attempts:
+                    raise
+                logger.warning(f"{e}, retrying")
+                await asyncio.sleep(FLUSH_RETRY_DELAY * 2 ** attempt)
+        return 0
+
+    async def _write(self) -> int:
+        async with self._lock:
+            ops, self._ops = self._ops, []
+            if not ops:
+                return 0
+            try:
+                async with self._session_factory() as session:
+                    for op in ops:
+                        await session.execute(self._statement(op))
+                    await session.commit()
+            except Exception as e:
+                # Put the batch back in front of anything recorded since
+                self._ops[:0] = ops
+                raise JobStoreError(f"Failed to persist {len(ops)} job queue changes: {e}") from e
+            return len(ops)
+
+    async def _flush_in_background(self) -> None:
+        try:
+            await self.flush()
+        except JobStoreError as e:
+            logger.error(f"{e}; they will be written by the next flush")
+
+    def flush_soon(self) -> None:
+        """Schedule flush() from synchronous code running on the event loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._flush_in_background())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    @staticmethod
+    def _statement(op: tuple):
+        kind = op[0]
+        if kind == "queued":
+            job = op[1]
+            state = {
+                "state": QueueState.QUEUED.value,
+                "runner_type": str(job.runner_type) if job.runner_type else "any",
+                "runner_id": None,
+                "assigned_runner_type": None,
+                "runner_registration": None,
+                "payload": serialize_job(job),
+                "assigned_at": None,
+            }
+            return (
+                insert(QueuedJobRecord)
+                .values(id=job.id, created_at=job.created_at, **state)
+                .on_conflict_do_update(index_elements=[QueuedJobRecord.id], set_=state)
+            )
+        if kind == "assigned":
+            _, job_id, runner_id, runner_type, registration, assigned_at = op
+            return (
+                update(QueuedJobRecord)
+                .where(QueuedJobRecord.id == job_id)
+                .values(state=QueueState.ASSIGNED.value, runner_id=runner_id,
+                        assigned_runner_type=runner_type,
+                        runner_registration=json.dumps(registration) if registration else None,
+                        assigned_at=assigned_at)
+            )
+        if kind == "done":
+            return delete(QueuedJobRecord).where(QueuedJobRecord.id == op[1])
+        return delete(QueuedJobRecord)
+
+    async def load(self) -> tuple[list[QueuedJob], list[tuple[QueuedJob, str | None, str | None, dict]]]:
+        """
+        Read back the persisted queue: jobs still waiting, oldest first, and
+        (job, runner_id, runner_type, registration) for jobs that were
+        handed to a runner.
+        """
+        queued, assigned = [], []
+        async with self._session_factory() as session:
+            for state in (QueueState.QUEUED, QueueState.ASSIGNED):
+                result = await session.execute(
+                    select(QueuedJobRecord)
+                    .where(QueuedJobRecord.state == state.value)
+                    .order_by(QueuedJobRecord.created_at)
+                )
+                for record in result.scalars():
+                    try:
+                        job = deserialize_job(record.payload)
+                        registration = json.loads(record.runner_registration or "{}")
+                    except (ValueError, TypeError) as e:
+                        logger.error(f"Skipping unreadable queued job {record.id}: {e}")
+                        continue
+                    if state == QueueState.QUEUED:
+                        queued.append(job)
+                    else:
+                        assigned.append((job, record.runner_id, record.assigned_runner_type, registration))
+        return queued, assigned
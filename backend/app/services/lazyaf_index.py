@@ -0,0 +1,141 @@
+"""
+Compiled index of repo-defined .lazyaf/ configuration.
+
+Listing repo agents or pipelines used to read and parse every
+.lazyaf/agents/*.yaml and .lazyaf/pipelines/*.yaml on each request. The
+parsed and validated files are instead compiled once per .lazyaf tree
+SHA - when a push or merge moves a ref, or on first read - and kept in a
+bounded LRU. A tree SHA fixes the content of every file under it, so
+entries never go stale, and branches or repos sharing a .lazyaf tree
+share one entry. Parse and validation errors are recorded per file.
+"""
+
+import stat
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+import yaml
+from dulwich.objects import S_ISGITLINK, Blob
+
+from app.schemas.lazyaf_yaml import AgentYaml, PipelineYaml
+
+DEFAULT_LAZYAF_INDEX_ENTRIES = 1024
+
+AGENTS_DIR = "agents"
+PIPELINES_DIR = "pipelines"
+
+
+@dataclass
+class LazyafFile:
+    """One compiled YAML file from .lazyaf/agents/ or .lazyaf/pipelines/."""
+    filename: str
+    data: Any = None  # yaml.safe_load() result, None if the YAML didn't parse
+    model: AgentYaml | PipelineYaml | None = None  # None if parsing or validation failed
+    error: str | None = None
+
+
+@dataclass
+class LazyafConfig:
+    """Compiled .lazyaf/ directory; files are keyed by filename in tree order."""
+    tree_sha: str | None
+    agents: dict[str, LazyafFile] = field(default_factory=dict)
+    pipelines: dict[str, LazyafFile] = field(default_factory=dict)
+
+    @property
+    def errors(self) -> dict[str, str]:
+        """Path (relative to .lazyaf/) -> error for every file that failed to compile."""
+        errors = {}
+        for directory, files in ((AGENTS_DIR, self.agents), (PIPELINES_DIR, self.pipelines)):
+            for filename, compiled in files.items():
+                if compiled.error:
+                    errors[f"{directory}/{filename}"] = compiled.error
+        return errors
+
+    def find(self, directory: str, name: str) -> LazyafFile | None:
+        """File for {name}.yaml or {name}.yml in agents/ or pipelines/."""
+        files = self.agents if directory == AGENTS_DIR else self.pipelines
+        for ext in (".yaml", ".yml"):
+            compiled = files.get(f"{name}{ext}")
+            if compiled is not None:
+                return compiled
+        return None
+
+
+EMPTY_CONFIG = LazyafConfig(tree_sha=None)
+
+
+def _compile_file(filename: str, content: bytes, schema) -> LazyafFile:
+    try:
+        data = yaml.safe_load(content.decode("utf-8"))
+    except Exception as e:
+        return LazyafFile(filename, error=str(e))
+    try:
+        return LazyafFile(filename, data=data, model=schema(**data))
+    except Exception as e:
+        return LazyafFile(filename, data=data, error=str(e))
+
+
+def _compile_dir(object_store, tree_cache, lazyaf_tree: bytes, directory: str, schema) -> dict[str, LazyafFile]:
+    entry = tree_cache.lookup(object_store, lazyaf_tree, directory)
+    if entry is None or not stat.S_ISDIR(entry[0]):
+        return {}
+    files = {}
+    for name, (mode, sha) in (tree_cache.tree_entries(object_store, entry[1]) or {}).items():
+        filename = name.decode("utf-8", errors="replace")
+        if not (filename.endswith(".yaml") or filename.endswith(".yml")):
+            continue
+        if stat.S_ISDIR(mode) or S_ISGITLINK(mode):
+            continue
+        blob = object_store[sha]
+        if not isinstance(blob, Blob) or not blob.data:
+            # Empty files are skipped, as if absent
+            continue
+        files[filename] = _compile_file(filename, blob.data, schema)
+    return files
+
+
+def compile_lazyaf(object_store, tree_cache, lazyaf_tree: bytes) -> LazyafConfig:
+    """Parse and validate every agent and pipeline under a .lazyaf tree."""
+    config = LazyafConfig(
+        tree_sha=lazyaf_tree.decode("ascii"),
+        agents=_compile_dir(object_store, tree_cache, lazyaf_tree, AGENTS_DIR, AgentYaml),
+        pipelines=_compile_dir(object_store, tree_cache, lazyaf_tree, PIPELINES_DIR, PipelineYaml),
+    )
+    for path, error in config.errors.items():
+        print(f"[lazyaf_index] Error parsing .lazyaf/{path}: {error}")
+    return config
+
+
+class LazyafIndex:
+    """Bounded LRU of compiled .lazyaf configs keyed by .lazyaf tree SHA."""
+
+    def __init__(self, max_entries: int = DEFAULT_LAZYAF_INDEX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._configs: OrderedDict[bytes, LazyafConfig] = OrderedDict()
+
+    def __contains__(self, lazyaf_tree: bytes) -> bool:
+        with self._lock:
+            return lazyaf_tree in self._configs
+
+    def get(self, object_store, tree_cache, lazyaf_tree: bytes) -> LazyafConfig:
+        """Compiled config for a .lazyaf tree, compiling it on a miss."""
+        with self._lock:
+            config = self._configs.get(lazyaf_tree)
+            if config is not None:
+                self._configs.move_to_end(lazyaf_tree)
+                return config
+        config = compile_lazyaf(object_store, tree_cache, lazyaf_tree)
+        if self.max_entries > 0:
+            with self._lock:
+                self._configs[lazyaf_tree] = config
+                self._configs.move_to_end(lazyaf_tree)
+                while len(self._configs) > self.max_entries:
+                    self._configs.popitem(last=False)
+        return config
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._configs)
@@ -1236,6 +1236,7 @@ class PipelineExecutor:
                     result = await db.execute(select(Job).where(Job.id == step_run.job_id))
                     job = result.scalar_one_or_none()
                     if job and job.status in ("queued", "running"):
+                        await job_queue.cancel(job.id)
                         job.status = "failed"
                         job.error = "Pipeline cancelled"
 
@@ -1,5 +1,11 @@
 """
 Runner pool manager for external runner registration and job assignment.
+
+A runner advertises how many jobs it can run at once (slots) and,
+optionally, how much of each resource it has (capacity, e.g.
+{"cpus": 32, "memory_gb": 64}). A job may ask for resources through
+step_config["resources"]; it is only handed to a runner with a free slot
+and enough unused capacity for every resource the runner advertises.
 """
 
 import asyncio
@@ -14,17 +20,72 @@ from app.services.job_queue import JobQueue, QueuedJob, job_queue
 logger = logging.getLogger(__name__)
 
 
+def job_resources(job: QueuedJob) -> dict[str, float]:
+    """Resources a job asks for in step_config["resources"]; non-numeric values are ignored."""
+    resources = (job.step_config or {}).get("resources") or {}
+    if not isinstance(resources, dict):
+        return {}
+    return {
+        str(name): float(amount)
+        for name, amount in resources.items()
+        if isinstance(amount, (int, float)) and not isinstance(amount, bool)
+    }
+
+
 class RunnerInfo:
-    def __init__(self, id: str, name: str | None = None, runner_type: str = "claude-code"):
+    def __init__(self, id: str, name: str | None = None, runner_type: str = "claude-code",
+                 slots: int = 1, capacity: dict[str, float] | None = None):
         self.id = id
         self.name = name or f"runner-{id[:8]}"
         self.runner_type = runner_type  # claude-code, gemini
-        self.status: str = "idle"  # idle, busy, offline
-        self.current_job: QueuedJob | None = None
+        self.slots = max(1, slots)  # jobs the runner can run at once
+        self.capacity: dict[str, float] = dict(capacity or {})
+        self.status: str = "idle"  # idle (a slot is free), busy (every slot in use), offline
+        self.jobs: dict[str, QueuedJob] = {}  # job_id -> running job, oldest first
+        self.job_logs: dict[str, list[str]] = {}  # job_id -> that job's log lines
+        self.job_heartbeats: dict[str, datetime] = {}  # job_id -> last per-job heartbeat
         self.last_heartbeat: datetime = datetime.utcnow()
-        self.logs: list[str] = []
+        self.logs: list[str] = []  # Everything the runner logged, across its jobs
         self.registered_at: datetime = datetime.utcnow()
 
+    @property
+    def current_job(self) -> QueuedJob | None:
+        """The oldest running job (the only one on a single-slot runner)."""
+        return next(iter(self.jobs.values()), None)
+
+    @current_job.setter
+    def current_job(self, job: QueuedJob | None):
+        self.jobs = {job.id: job} if job else {}
+        self.job_logs = {job_id: lines for job_id, lines in self.job_logs.items() if job_id in self.jobs}
+        self.job_heartbeats = {job_id: at for job_id, at in self.job_heartbeats.items() if job_id in self.jobs}
+
+    @property
+    def free_slots(self) -> int:
+        return max(0, self.slots - len(self.jobs))
+
+    def resources_in_use(self) -> dict[str, float]:
+        in_use: dict[str, float] = {}
+        for job in self.jobs.values():
+            for name, amount in job_resources(job).items():
+                in_use[name] = in_use.get(name, 0.0) + amount
+        return in_use
+
+    def fits(self, job: QueuedJob) -> bool:
+        """Whether the job fits in the capacity left over by the runner's other jobs."""
+        demand = job_resources(job)
+        if not demand or not self.capacity:
+            return True
+        in_use = self.resources_in_use()
+        return all(
+            in_use.get(name, 0.0) + amount <= self.capacity[name]
+            for name, amount in demand.items()
+            if name in self.capacity
+        )
+
+    def registration(self) -> dict[str, Any]:
+        """What the runner registered as, stored with its jobs to rebuild it after a restart."""
+        return {"name": self.name, "slots": self.slots, "capacity": self.capacity}
+
     def is_alive(self, timeout_seconds: int = 30) -> bool:
         return datetime.utcnow() - self.last_heartbeat < timedelta(seconds=timeout_seconds)
 
@@ -32,6 +93,7 @@ class RunnerInfo:
 class RunnerPool:
     RUNNER_IMAGE = "lazyaf-runner:latest"
     HEARTBEAT_TIMEOUT = 90  # seconds - allow for network delays and polling intervals
+    LONG_POLL_MAX = 60  # seconds a job poll may block; must stay below HEARTBEAT_TIMEOUT
 
     def __init__(self):
         self._runners: dict[str, RunnerInfo] = {}
@@ -70,19 +132,38 @@ class RunnerPool:
                 logger.error(f"Cleanup loop error: {e}")
 
     def _cleanup_dead_runners(self):
-        """Mark runners as offline if they haven't sent a heartbeat."""
+        """Mark runners as offline if they haven't sent a heartbeat, and requeue stalled jobs."""
         now = datetime.utcnow()
+        timeout = timedelta(seconds=self.HEARTBEAT_TIMEOUT)
         for runner in self._runners.values():
             if runner.status != "offline" and not runner.is_alive(self.HEARTBEAT_TIMEOUT):
                 time_since_heartbeat = (now - runner.last_heartbeat).total_seconds()
                 logger.warning(f"Runner {runner.id} ({runner.name}) timed out after {time_since_heartbeat:.0f}s, marking offline")
                 runner.status = "offline"
-                # If it had a job, put it back in the queue
-                if runner.current_job:
-                    asyncio.create_task(job_queue.enqueue(runner.current_job))
-                    runner.current_job = None
-
-    def register(self, runner_id: str | None = None, name: str | None = None, runner_type: str = "claude-code") -> RunnerInfo:
+                # If it had jobs, put them back in the queue
+                self._requeue_jobs(runner)
+                continue
+            # A slot that sends its own heartbeats and stopped doing so has stalled
+            for job_id, last in list(runner.job_heartbeats.items()):
+                if now - last >= timeout:
+                    logger.warning(f"Job {job_id} on runner {runner.id} stopped sending heartbeats, requeueing it")
+                    job = runner.jobs.pop(job_id)
+                    runner.job_logs.pop(job_id, None)
+                    del runner.job_heartbeats[job_id]
+                    self._update_status(runner)
+                    asyncio.create_task(job_queue.enqueue(job))
+
+    def _requeue_jobs(self, runner: RunnerInfo):
+        for job in runner.jobs.values():
+            asyncio.create_task(job_queue.enqueue(job))
+        runner.current_job = None
+
+    def _update_status(self, runner: RunnerInfo):
+        if runner.status != "offline":
+            runner.status = "busy" if runner.free_slots == 0 else "idle"
+
+    def register(self, runner_id: str | None = None, name: str | None = None, runner_type: str = "claude-code",
+                 slots: int = 1, capacity: dict[str, float] | None = None) -> RunnerInfo:
         """Register a runner. If runner_id is provided and exists, reactivate it."""
         # Normalize runner_type to string
         runner_type = str(runner_type) if runner_type else "claude-code"
@@ -96,88 +177,173 @@ class RunnerPool:
             runner = self._runners[runner_id]
             runner.last_heartbeat = datetime.utcnow()
             runner.status = "idle"
+            # Runners only register between jobs, so any it was working on are lost
+            if runner.jobs:
+                logger.warning(f"Runner {runner_id} re-registered during jobs {list(runner.jobs)}, requeueing them")
+                self._requeue_jobs(runner)
             # Update name if provided
             if name:
                 runner.name = name
-            # Always update runner_type to latest value
+            # Always update runner_type, slots and capacity to latest values
             runner.runner_type = runner_type
-            logger.info(f"Runner {runner_id} ({runner.name}, type={runner.runner_type!r}) reconnected")
+            runner.slots = max(1, slots)
+            runner.capacity = dict(capacity or {})
+            logger.info(f"Runner {runner_id} ({runner.name}, type={runner.runner_type!r}, slots={runner.slots}) reconnected")
             return runner
 
         # Create new runner
-        runner = RunnerInfo(id=runner_id, name=name, runner_type=runner_type)
+        runner = RunnerInfo(id=runner_id, name=name, runner_type=runner_type, slots=slots, capacity=capacity)
         self._runners[runner_id] = runner
-        logger.info(f"Runner {runner_id} ({runner.name}, type={runner_type!r}) registered")
+        logger.info(f"Runner {runner_id} ({runner.name}, type={runner_type!r}, slots={runner.slots}) registered")
+        return runner
+
+    def restore_assignment(self, runner_id: str, job: QueuedJob, runner_type: str | None = None,
+                           registration: dict | None = None) -> RunnerInfo:
+        """
+        Give a job that was running before a backend restart back to its runner.
+
+        registration (name, slots, capacity) is what the runner registered
+        as, stored with the assignment, so the runner comes back with all
+        its slots without having to register again.
+
+        The runner gets a fresh heartbeat window: if it is still working on
+        the job it keeps heartbeating and reports back as usual, otherwise
+        the cleanup loop requeues the job once the runner times out.
+        """
+        registration = registration or {}
+        runner = self._runners.get(runner_id)
+        if runner is None:
+            runner = RunnerInfo(
+                id=runner_id,
+                name=registration.get("name"),
+                runner_type=runner_type or "claude-code",
+                slots=int(registration.get("slots", 1)),
+                capacity=registration.get("capacity"),
+            )
+            self._runners[runner_id] = runner
+        runner.jobs[job.id] = job
+        runner.job_logs.setdefault(job.id, [])
+        # Rows written before registrations were stored only tell us how many jobs it had
+        runner.slots = max(runner.slots, len(runner.jobs))
+        runner.last_heartbeat = datetime.utcnow()
+        self._update_status(runner)
+        logger.info(f"Restored job {job.id} on runner {runner_id}")
         return runner
 
     def unregister(self, runner_id: str) -> bool:
         """Unregister a runner."""
         if runner_id in self._runners:
             runner = self._runners.pop(runner_id)
-            # If it had a job, put it back in the queue
-            if runner.current_job:
-                asyncio.create_task(job_queue.enqueue(runner.current_job))
+            # If it had jobs, put them back in the queue
+            self._requeue_jobs(runner)
             logger.info(f"Runner {runner_id} unregistered")
             return True
         return False
 
-    def heartbeat(self, runner_id: str) -> bool:
-        """Update runner heartbeat."""
+    def heartbeat(self, runner_id: str, job_id: str | None = None) -> bool:
+        """Update runner heartbeat, and the job's if job_id is one of its jobs."""
         if runner_id in self._runners:
             runner = self._runners[runner_id]
             runner.last_heartbeat = datetime.utcnow()
+            if job_id in runner.jobs:
+                runner.job_heartbeats[job_id] = runner.last_heartbeat
             if runner.status == "offline":
                 runner.status = "idle"
             return True
         return False
 
-    async def get_job(self, runner_id: str) -> QueuedJob | None:
-        """Get a job for a runner if one is available that matches the runner's type."""
+    async def get_job(self, runner_id: str, wait: float = 0) -> QueuedJob | None:
+        """Get one job for a runner; see get_jobs()."""
+        jobs = await self.get_jobs(runner_id, wait=wait, max_jobs=1)
+        return jobs[0] if jobs else None
+
+    async def get_jobs(self, runner_id: str, wait: float = 0, max_jobs: int | None = None) -> list[QueuedJob]:
+        """
+        Get jobs for a runner, up to its free slots (and max_jobs), that match
+        the runner's type and fit its remaining capacity.
+
+        With wait > 0 this is a long-poll: it blocks for up to wait seconds
+        (capped at LONG_POLL_MAX) until a first matching job is enqueued, then
+        takes whatever else is available without waiting.
+        """
         if runner_id not in self._runners:
-            return None
+            return []
 
         runner = self._runners[runner_id]
         if runner.status != "idle":
-            return None
+            return []
 
+        limit = runner.free_slots if max_jobs is None else min(max_jobs, runner.free_slots)
+        jobs: list[QueuedJob] = []
         # Pass runner type AND runner_id to get a matching job (for affinity)
-        logger.debug(f"Runner {runner_id} (type={runner.runner_type!r}) requesting job")
-        job = await job_queue.dequeue(runner_type=runner.runner_type, runner_id=runner_id)
-        if job:
-            # Verify the match (should always be true if dequeue works correctly)
-            job_type = str(job.runner_type) if job.runner_type else "any"
-            runner_type = str(runner.runner_type) if runner.runner_type else "unknown"
-            if job_type != "any" and job_type != runner_type:
-                logger.error(f"BUG: Job {job.id} (type={job_type!r}) was dequeued for runner {runner_id} (type={runner_type!r}) - types don't match!")
-
-            runner.status = "busy"
-            runner.current_job = job
+        logger.debug(f"Runner {runner_id} (type={runner.runner_type!r}) requesting up to {limit} jobs")
+        while len(jobs) < limit:
+            if wait > 0 and not jobs:
+                job = await job_queue.wait_for_job(
+                    runner_type=runner.runner_type, timeout=min(wait, self.LONG_POLL_MAX), runner_id=runner_id,
+                    fits=runner.fits, registration=runner.registration(),
+                )
+                if job and (self._runners.get(runner_id) is not runner or runner.status != "idle"
+                            or not runner.fits(job)):
+                    # Unregistered, or given other work by another request, while waiting
+                    logger.info(f"Runner {runner_id} no longer has room, requeueing job {job.id}")
+                    await job_queue.enqueue(job)
+                    return []
+            else:
+                job = await job_queue.dequeue(
+                    runner_type=runner.runner_type, runner_id=runner_id, fits=runner.fits,
+                    registration=runner.registration(),
+                )
+            if not job:
+                break
+            self._assign(runner, job)
+            jobs.append(job)
+        return jobs
+
+    def _assign(self, runner: RunnerInfo, job: QueuedJob):
+        # Verify the match (should always be true if dequeue works correctly)
+        job_type = str(job.runner_type) if job.runner_type else "any"
+        runner_type = str(runner.runner_type) if runner.runner_type else "unknown"
+        if job_type != "any" and job_type != runner_type:
+            logger.error(f"BUG: Job {job.id} (type={job_type!r}) was dequeued for runner {runner.id} (type={runner_type!r}) - types don't match!")
+
+        runner.jobs[job.id] = job
+        runner.job_logs[job.id] = []
+        if runner.slots == 1:
             runner.logs = []  # Clear logs for new job
-            logger.info(f"Assigned job {job.id} (type={job_type!r}) to runner {runner_id} (type={runner_type!r})")
-        return job
+        self._update_status(runner)
+        logger.info(f"Assigned job {job.id} (type={job_type!r}) to runner {runner.id} (type={runner_type!r}, {len(runner.jobs)}/{runner.slots} slots)")
 
-    def complete_job(self, runner_id: str, success: bool, error: str | None = None) -> QueuedJob | None:
-        """Mark a job as complete."""
+    def complete_job(self, runner_id: str, success: bool, error: str | None = None,
+                     job_id: str | None = None) -> QueuedJob | None:
+        """Mark one of a runner's jobs (by default its oldest) as complete."""
         if runner_id not in self._runners:
             return None
 
         runner = self._runners[runner_id]
-        job = runner.current_job
+        job = runner.jobs.get(job_id) if job_id else runner.current_job
         if job:
             job_queue.remove_pending(job.id)
-            runner.current_job = None
+            del runner.jobs[job.id]
+            runner.job_logs.pop(job.id, None)
+            runner.job_heartbeats.pop(job.id, None)
             runner.status = "idle"
             logger.info(f"Runner {runner_id} completed job {job.id} (success={success})")
         return job
 
-    def append_log(self, runner_id: str, log_line: str):
-        """Append a log line for a runner."""
+    def append_log(self, runner_id: str, log_line: str, job_id: str | None = None):
+        """Append a log line for a runner, and for one of its jobs if job_id is given."""
         if runner_id in self._runners:
             runner = self._runners[runner_id]
             runner.logs.append(log_line)
             # Keep only last 1000 lines
             if len(runner.logs) > 1000:
                 runner.logs = runner.logs[-1000:]
+            if job_id in runner.jobs:
+                lines = runner.job_logs.setdefault(job_id, [])
+                lines.append(log_line)
+                if len(lines) > 1000:
+                    runner.job_logs[job_id] = lines[-1000:]
 
     def get_logs(self, runner_id: str) -> list[str]:
         """Get logs for a runner."""
@@ -185,6 +351,20 @@ class RunnerPool:
             return self._runners[runner_id].logs
         return []
 
+    def get_job_logs(self, runner_id: str, job_id: str | None) -> list[str]:
+        """
+        Get the log lines of one of a runner's jobs.
+
+        A single-slot runner's log is its job's log, whether or not the
+        runner tagged its lines with the job.
+        """
+        runner = self._runners.get(runner_id)
+        if runner is None:
+            return []
+        if runner.slots == 1 or job_id is None:
+            return runner.logs
+        return runner.job_logs.get(job_id, [])
+
     def get_runner(self, runner_id: str) -> RunnerInfo | None:
         """Get a specific runner."""
         return self._runners.get(runner_id)
@@ -199,6 +379,9 @@ class RunnerPool:
                 "status": r.status,
                 "current_job_id": r.current_job.id if r.current_job else None,
                 "current_job_title": r.current_job.card_title if r.current_job else None,
+                "job_ids": list(r.jobs),
+                "slots": r.slots,
+                "capacity": r.capacity,
                 "last_heartbeat": r.last_heartbeat.isoformat(),
                 "registered_at": r.registered_at.isoformat(),
                 "log_count": len(r.logs),
@@ -1,4 +1,4 @@
-import type { Repo, RepoCreate, RepoIngest, CloneUrlResponse, BranchesResponse, Card, CardCreate, CardUpdate, Job, JobLogs, Runner, PoolStatus, DockerCommand, RunnerLogs, CommitsResponse, DiffResponse, ApproveResponse, RebaseResponse, AgentFile, AgentFileCreate, AgentFileUpdate, Pipeline, PipelineCreate, PipelineUpdate, PipelineRun, PipelineRunCreate, StepLogsResponse, RepoAgent, RepoPipeline, PlaygroundTestRequest, PlaygroundTestResponse, PlaygroundResult } from './types';
+import type { Repo, RepoCreate, RepoIngest, CloneUrlResponse, BranchesResponse, Card, CardCreate, CardUpdate, Job, JobLogs, Runner, PoolStatus, DockerCommand, RunnerLogs, CommitsResponse, DiffResponse, FilePatch, CardDiffstat, ApproveResponse, RebaseResponse, AgentFile, AgentFileCreate, AgentFileUpdate, Pipeline, PipelineCreate, PipelineUpdate, PipelineRun, PipelineRunCreate, StepLogsResponse, RepoAgent, RepoPipeline, PlaygroundTestRequest, PlaygroundTestResponse, PlaygroundResult } from './types';
 
 const BASE_URL = '/api';
 
@@ -96,11 +96,16 @@ export const repos = {
   },
   diff: (id: string, base: string, head: string) =>
     request<DiffResponse>(`/repos/${id}/diff?base=${encodeURIComponent(base)}&head=${encodeURIComponent(head)}`),
+  diffFile: (id: string, base: string, head: string, path: string) => {
+    const params = new URLSearchParams({ base, head, path });
+    return request<FilePatch>(`/repos/${id}/diff/file?${params}`);
+  },
 };
 
 // Cards
 export const cards = {
   list: (repoId: string) => request<Card[]>(`/repos/${repoId}/cards`),
+  diffstat: (repoId: string) => request<Record<string, CardDiffstat>>(`/repos/${repoId}/cards/diffstat`),
   get: (id: string) => request<Card>(`/cards/${id}`),
   create: (repoId: string, data: CardCreate) => request<Card>(`/repos/${repoId}/cards`, {
     method: 'POST',
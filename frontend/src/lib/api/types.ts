@@ -178,7 +178,26 @@ export interface FileDiff {
   status: 'added' | 'modified' | 'deleted';
   additions: number;
   deletions: number;
+  binary: boolean;
+  too_large: boolean;
+  old_size: number;
+  new_size: number;
+}
+
+export interface CardDiffstat {
+  head_sha?: string;
+  diff_base_sha?: string;
+  files_changed?: number;
+  additions?: number;
+  deletions?: number;
+  error?: string;
+}
+
+export interface FilePatch extends FileDiff {
+  diff_base_sha: string;
+  head_sha: string;
   diff: string;
+  truncated: boolean;
 }
 
 export interface DiffResponse {
@@ -1,8 +1,20 @@
 import { writable, derived } from 'svelte/store';
-import type { Card, CardCreate, CardUpdate, CardStatus, ApproveResponse, RebaseResponse } from '../api/types';
+import type { Card, CardDiffstat, CardCreate, CardUpdate, CardStatus, ApproveResponse, RebaseResponse } from '../api/types';
 import { cards as cardsApi } from '../api/client';
 import { selectedRepoId } from './repos';
 
+// Files changed and +/- line counts per card id, loaded in one batched call
+export const cardDiffstats = writable<Record<string, CardDiffstat>>({});
+
+async function loadDiffstats(repoId: string) {
+  try {
+    cardDiffstats.set(await cardsApi.diffstat(repoId));
+  } catch {
+    // Repos that are not ingested have no branches to compare
+    cardDiffstats.set({});
+  }
+}
+
 function createCardsStore() {
   const { subscribe, set, update } = writable<Card[]>([]);
   const loading = writable(false);
@@ -19,6 +31,7 @@ function createCardsStore() {
       try {
         const data = await cardsApi.list(repoId);
         set(data);
+        loadDiffstats(repoId);
       } catch (e) {
         error.set(e instanceof Error ? e.message : 'Failed to load cards');
       } finally {
@@ -163,6 +176,7 @@ function createCardsStore() {
 
     clear() {
       set([]);
+      cardDiffstats.set({});
     },
   };
 }
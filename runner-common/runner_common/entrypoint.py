@@ -9,7 +9,9 @@ Uses shared modules for common functionality and dispatches to type-specific exe
 import os
 import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 from typing import Optional
 from uuid import uuid4
@@ -22,10 +24,11 @@ from .job_helpers import (
     complete_job,
     log_to_backend,
     poll_for_job,
+    poll_for_jobs,
     register,
     report_status,
 )
-from .git_helpers import clone, checkout, get_sha, push, configure_git, GitError
+from .git_helpers import clone, checkout, fetch_branch, get_sha, push, configure_git, unshallow, GitError
 from .context_helpers import (
     init_context,
     write_step_log,
@@ -44,14 +47,34 @@ from .executors import (
 )
 
 
+def parse_capacity(value: str) -> dict:
+    """Parse RUNNER_CAPACITY ("cpus=8,memory_gb=16") into a resource dict."""
+    capacity = {}
+    for item in value.split(","):
+        name, _, amount = item.partition("=")
+        if name.strip() and amount.strip():
+            capacity[name.strip()] = float(amount)
+    return capacity
+
+
 # Configuration from environment
 BACKEND_URL = os.environ.get("BACKEND_URL", "http://localhost:8000")
 RUNNER_TYPE = os.environ.get("RUNNER_TYPE", "claude-code")
 RUNNER_NAME = os.environ.get("RUNNER_NAME", None)
 POLL_INTERVAL = int(os.environ.get("POLL_INTERVAL", "5"))
+# Seconds each job poll waits on the backend for a job to arrive; 0 polls every POLL_INTERVAL
+LONG_POLL_TIMEOUT = int(os.environ.get("LONG_POLL_TIMEOUT", "30"))
 RECONNECT_INTERVAL = 5
 MAX_RECONNECT_BACKOFF = 60
 TEST_TIMEOUT = int(os.environ.get("TEST_TIMEOUT", "300"))
+# Commits of history cloned for script/docker steps; 0 clones full history
+CLONE_DEPTH = int(os.environ.get("CLONE_DEPTH", "1"))
+# Partial clone filter for full-history clones; empty downloads every blob up front
+CLONE_FILTER = os.environ.get("CLONE_FILTER", "blob:none")
+# Jobs run at once, each in its own workspace; 1 runs jobs one after another
+RUNNER_SLOTS = max(1, int(os.environ.get("RUNNER_SLOTS", "1")))
+# Resources shared by those jobs, matched against step_config.resources
+RUNNER_CAPACITY = parse_capacity(os.environ.get("RUNNER_CAPACITY", "")) or {"cpus": float(os.cpu_count() or 1)}
 
 # Generate persistent runner ID
 RUNNER_UUID = str(uuid4())
@@ -60,6 +83,10 @@ RUNNER_UUID = str(uuid4())
 runner_id: Optional[str] = None
 session = requests.Session()
 needs_reregister_flag = False
+# Job a slot thread is running, so its log lines go to that job's stream
+_slot = threading.local()
+_workspace_locks: dict = {}
+_workspace_locks_guard = threading.Lock()
 
 # Executor registry
 EXECUTORS = {
@@ -69,23 +96,82 @@ EXECUTORS = {
 }
 
 
+def current_job_id() -> Optional[str]:
+    """Get the job the calling slot thread is running, if any."""
+    return getattr(_slot, "job_id", None)
+
+
 def log(msg: str) -> None:
     """Log a message locally and to backend."""
-    print(f"[runner] {msg}", flush=True)
+    job_id = current_job_id()
+    prefix = f"[runner:{job_id[:8]}]" if job_id else "[runner]"
+    print(f"{prefix} {msg}", flush=True)
     if runner_id:
         try:
-            log_to_backend(runner_id, msg, BACKEND_URL)
+            log_to_backend(runner_id, msg, BACKEND_URL, job_id=job_id)
         except Exception:
             pass
 
 
-def get_workspace(pipeline_run_id: Optional[str] = None) -> Path:
-    """Get workspace path, optionally scoped to pipeline run."""
+def get_workspace(pipeline_run_id: Optional[str] = None, job_id: Optional[str] = None) -> Path:
+    """Get workspace path, optionally scoped to a job or a pipeline run."""
+    if job_id:
+        return Path(f"/workspace/jobs/{job_id[:8]}/repo")
     if pipeline_run_id:
         return Path(f"/workspace/{pipeline_run_id[:8]}/repo")
     return Path("/workspace/repo")
 
 
+def get_job_workspace(job: dict) -> Path:
+    """
+    Get the workspace a job runs in.
+
+    With several slots every job gets its own workspace, except pipeline
+    steps that take over or hand on the run's workspace.
+    """
+    pipeline_run_id = job.get("pipeline_run_id")
+    shares_run_workspace = pipeline_run_id and (
+        job.get("is_continuation") or job.get("continue_in_context")
+    )
+    if RUNNER_SLOTS > 1 and not shares_run_workspace:
+        return get_workspace(job_id=job["id"])
+    return get_workspace(pipeline_run_id)
+
+
+def workspace_lock(workspace: Path) -> threading.Lock:
+    """Get the lock that keeps two slots out of the same workspace."""
+    with _workspace_locks_guard:
+        return _workspace_locks.setdefault(workspace, threading.Lock())
+
+
+def get_clone_depth(job: dict) -> Optional[int]:
+    """
+    Get how many commits of history to clone for a job (None = full history).
+
+    Agent steps read, rebase and merge history, so they always get all of
+    it. Script and docker steps usually just run commands on the checkout
+    and get CLONE_DEPTH commits, unless step_config sets fetch_depth
+    (0 = full history).
+    """
+    if job.get("step_type", "agent") not in ("script", "docker"):
+        return None
+    step_config = job.get("step_config", {}) or {}
+    depth = int(step_config.get("fetch_depth", CLONE_DEPTH))
+    return depth if depth > 0 else None
+
+
+def get_clone_filter(job: dict) -> Optional[str]:
+    """
+    Get the partial clone filter for a job's full-history clone (None = no filter).
+
+    Agent steps need all commits but usually only read a handful of files,
+    so by default they clone without blobs and fetch them on demand.
+    step_config.clone_filter overrides CLONE_FILTER ("" = every blob).
+    """
+    step_config = job.get("step_config", {}) or {}
+    return step_config.get("clone_filter", CLONE_FILTER) or None
+
+
 def cleanup_workspace(workspace: Optional[Path] = None) -> None:
     """Clean up workspace directory."""
     workspace = workspace or Path("/workspace/repo")
@@ -120,8 +206,16 @@ def setup_repo(
 
     Returns base commit SHA or None.
     """
+    depth = get_clone_depth(job)
+
     if is_continuation and workspace.exists():
         log("Continuing from previous step - using existing workspace")
+        try:
+            # An earlier script/docker step may have left a shallow clone
+            if depth is None and unshallow(workspace):
+                log("Fetched full history for shallow workspace")
+        except GitError as e:
+            log(f"Warning: Could not unshallow workspace: {e}")
         try:
             return get_sha(workspace)
         except GitError:
@@ -147,10 +241,31 @@ def setup_repo(
     workspace.parent.mkdir(parents=True, exist_ok=True)
 
     try:
-        clone(repo_url, workspace)
+        if depth:
+            # Shallow clones are single-branch, so clone the base branch directly
+            log(f"Shallow clone (depth {depth}) of {base_branch}")
+            try:
+                clone(repo_url, workspace, branch=base_branch, depth=depth)
+            except GitError as e:
+                # e.g. an empty repo or a base branch that doesn't exist yet
+                log(f"Shallow clone failed, cloning full history: {e}")
+                depth = None
+                cleanup_workspace(workspace)
+        if not depth:
+            clone_filter = get_clone_filter(job)
+            if clone_filter:
+                log(f"Partial clone (filter {clone_filter})")
+            clone(repo_url, workspace, filter_spec=clone_filter)
     except GitError as e:
         raise Exception(f"Failed to clone repository: {e}")
 
+    # Only the base branch was cloned; fetch the job branch if it exists
+    if depth and branch_name and branch_name != base_branch:
+        try:
+            fetch_branch(workspace, branch_name, depth)
+        except GitError:
+            pass
+
     # Checkout branch
     if branch_name:
         try:
@@ -334,7 +449,7 @@ def execute_agent_step(job: dict) -> None:
     step_index = job.get("step_index", 0)
     branch_name = job.get("branch_name")
 
-    workspace = get_workspace(pipeline_run_id)
+    workspace = get_job_workspace(job)
 
     # Log context info
     log("=" * 50)
@@ -427,7 +542,7 @@ def execute_agent_step(job: dict) -> None:
             write_step_log(workspace, step_index, step_output, step_name)
             update_metadata(workspace, f"step_{step_index}_completed", True)
 
-        complete_job(runner_id, job_success, BACKEND_URL, test_results=test_results)
+        complete_job(runner_id, job_success, BACKEND_URL, test_results=test_results, job_id=job_id)
         log("Job completed!" if job_success else "Job completed with failures")
 
     except Exception as e:
@@ -437,7 +552,7 @@ def execute_agent_step(job: dict) -> None:
                 write_step_log(workspace, step_index, f"ERROR: {e}", step_name)
             except Exception:
                 pass
-        complete_job(runner_id, False, BACKEND_URL, error=str(e))
+        complete_job(runner_id, False, BACKEND_URL, error=str(e), job_id=job_id)
 
     finally:
         if not continue_in_context:
@@ -457,11 +572,11 @@ def execute_script_step(job: dict) -> None:
     step_name = job.get("step_name", "script")
     step_index = job.get("step_index", 0)
 
-    workspace = get_workspace(pipeline_run_id)
+    workspace = get_job_workspace(job)
 
     if not command:
         log("ERROR: No command specified")
-        complete_job(runner_id, False, BACKEND_URL, error="No command specified")
+        complete_job(runner_id, False, BACKEND_URL, error="No command specified", job_id=job_id)
         return
 
     # Log context
@@ -511,14 +626,14 @@ def execute_script_step(job: dict) -> None:
 
         if result.returncode == 0:
             log("Script completed successfully")
-            complete_job(runner_id, True, BACKEND_URL)
+            complete_job(runner_id, True, BACKEND_URL, job_id=job_id)
         else:
             log(f"Script failed with exit code {result.returncode}")
-            complete_job(runner_id, False, BACKEND_URL, error=f"Exit code {result.returncode}")
+            complete_job(runner_id, False, BACKEND_URL, error=f"Exit code {result.returncode}", job_id=job_id)
 
     except Exception as e:
         log(f"ERROR: {e}")
-        complete_job(runner_id, False, BACKEND_URL, error=str(e))
+        complete_job(runner_id, False, BACKEND_URL, error=str(e), job_id=job_id)
 
     finally:
         if not continue_in_context:
@@ -537,11 +652,11 @@ def execute_docker_step(job: dict) -> None:
     step_name = job.get("step_name", "docker")
     step_index = job.get("step_index", 0)
 
-    workspace = get_workspace(pipeline_run_id)
+    workspace = get_job_workspace(job)
 
     if not image or not command:
         log("ERROR: Image and command required")
-        complete_job(runner_id, False, BACKEND_URL, error="Image and command required")
+        complete_job(runner_id, False, BACKEND_URL, error="Image and command required", job_id=job_id)
         return
 
     log("=" * 50)
@@ -600,14 +715,14 @@ def execute_docker_step(job: dict) -> None:
 
         if result.returncode == 0:
             log("Docker step completed successfully")
-            complete_job(runner_id, True, BACKEND_URL)
+            complete_job(runner_id, True, BACKEND_URL, job_id=job_id)
         else:
             log(f"Docker step failed with exit code {result.returncode}")
-            complete_job(runner_id, False, BACKEND_URL, error=f"Exit code {result.returncode}")
+            complete_job(runner_id, False, BACKEND_URL, error=f"Exit code {result.returncode}", job_id=job_id)
 
     except Exception as e:
         log(f"ERROR: {e}")
-        complete_job(runner_id, False, BACKEND_URL, error=str(e))
+        complete_job(runner_id, False, BACKEND_URL, error=str(e), job_id=job_id)
 
     finally:
         if not continue_in_context:
@@ -625,7 +740,7 @@ def execute_job(job: dict) -> None:
     # TODO: Add playground support
     if is_playground:
         log("Playground jobs not yet supported in unified entrypoint")
-        complete_job(runner_id, False, BACKEND_URL, error="Playground not supported")
+        complete_job(runner_id, False, BACKEND_URL, error="Playground not supported", job_id=job.get("id"))
         return
 
     if step_type == "script":
@@ -636,6 +751,61 @@ def execute_job(job: dict) -> None:
         execute_agent_step(job)
 
 
+def run_job_in_slot(job: dict) -> None:
+    """Run a job on a slot thread with its own heartbeat, log stream and workspace."""
+    job_id = job["id"]
+    _slot.job_id = job_id
+    heartbeat_thread = HeartbeatThread(runner_id, BACKEND_URL, job_id=job_id)
+    heartbeat_thread.start()
+    try:
+        with workspace_lock(get_job_workspace(job)):
+            execute_job(job)
+    except Exception as e:
+        log(f"ERROR: {e}")
+    finally:
+        heartbeat_thread.stop()
+        _slot.job_id = None
+
+
+def run_concurrent_jobs() -> None:
+    """Poll for jobs and run up to RUNNER_SLOTS of them at once until re-registration is needed."""
+    global needs_reregister_flag
+
+    running = set()
+    with ThreadPoolExecutor(max_workers=RUNNER_SLOTS, thread_name_prefix="slot") as pool:
+        while not needs_reregister_flag:
+            running = {future for future in running if not future.done()}
+            free_slots = RUNNER_SLOTS - len(running)
+            if not free_slots:
+                wait(running, return_when=FIRST_COMPLETED)
+                continue
+            try:
+                started = time.monotonic()
+                # Only long-poll when idle, so finished jobs are noticed and their slots refilled
+                jobs = poll_for_jobs(
+                    runner_id, BACKEND_URL, wait=0 if running else LONG_POLL_TIMEOUT, max_jobs=free_slots
+                )
+                for job in jobs:
+                    log(f"Starting job {job['id'][:8]} ({len(running) + 1}/{RUNNER_SLOTS} slots)")
+                    running.add(pool.submit(run_job_in_slot, job))
+                if not jobs:
+                    remaining = max(0.0, POLL_INTERVAL - (time.monotonic() - started))
+                    if running:
+                        wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+                    else:
+                        time.sleep(remaining)
+            except NeedsReregister:
+                log("Backend requires re-registration")
+                needs_reregister_flag = True
+            except Exception as e:
+                log(f"Polling error: {e}")
+                time.sleep(POLL_INTERVAL)
+
+        running = {future for future in running if not future.done()}
+        if running:
+            log(f"Waiting for {len(running)} running jobs to finish...")
+
+
 def wait_for_backend() -> bool:
     """Wait for backend to become available."""
     backoff = RECONNECT_INTERVAL
@@ -663,6 +833,7 @@ def main() -> None:
     log(f"Runner Type: {RUNNER_TYPE}")
     log(f"Runner UUID: {RUNNER_UUID}")
     log(f"Backend URL: {BACKEND_URL}")
+    log(f"Slots: {RUNNER_SLOTS}, capacity: {RUNNER_CAPACITY}")
 
     # Validate runner type
     if RUNNER_TYPE not in EXECUTORS:
@@ -681,7 +852,10 @@ def main() -> None:
             backoff = RECONNECT_INTERVAL
             while True:
                 try:
-                    result = register(RUNNER_TYPE, BACKEND_URL, RUNNER_NAME, RUNNER_UUID)
+                    result = register(
+                        RUNNER_TYPE, BACKEND_URL, RUNNER_NAME, RUNNER_UUID,
+                        slots=RUNNER_SLOTS, capacity=RUNNER_CAPACITY,
+                    )
                     runner_id = result["runner_id"]
                     log(f"Registered as {result.get('name', runner_id)} (id: {runner_id})")
                     break
@@ -697,21 +871,27 @@ def main() -> None:
 
             log("Waiting for jobs...")
 
-            # Job polling loop
-            while not needs_reregister_flag:
-                try:
-                    job = poll_for_job(runner_id, BACKEND_URL)
-                    if job:
-                        execute_job(job)
-                        log("Waiting for next job...")
-                    else:
+            if RUNNER_SLOTS > 1:
+                run_concurrent_jobs()
+            else:
+                # Job polling loop
+                while not needs_reregister_flag:
+                    try:
+                        started = time.monotonic()
+                        job = poll_for_job(runner_id, BACKEND_URL, wait=LONG_POLL_TIMEOUT)
+                        if job:
+                            execute_job(job)
+                            log("Waiting for next job...")
+                        else:
+                            # A long-poll already waited; only pace polls that came back early
+                            # (long-polling disabled, or a backend that doesn't support it)
+                            time.sleep(max(0.0, POLL_INTERVAL - (time.monotonic() - started)))
+                    except NeedsReregister:
+                        log("Backend requires re-registration")
+                        needs_reregister_flag = True
+                    except Exception as e:
+                        log(f"Polling error: {e}")
                         time.sleep(POLL_INTERVAL)
-                except NeedsReregister:
-                    log("Backend requires re-registration")
-                    needs_reregister_flag = True
-                except Exception as e:
-                    log(f"Polling error: {e}")
-                    time.sleep(POLL_INTERVAL)
 
             # Cleanup
             log("Connection lost - will reconnect...")
@@ -39,7 +39,13 @@ def _run_git(args: list[str], cwd: Optional[Path] = None, check: bool = True) ->
         raise GitError(f"Git command failed: {e.stderr}") from e
 
 
-def clone(url: str, path: Path, branch: Optional[str] = None) -> None:
+def clone(
+    url: str,
+    path: Path,
+    branch: Optional[str] = None,
+    depth: Optional[int] = None,
+    filter_spec: Optional[str] = None,
+) -> None:
     """
     Clone a git repository to the specified path.
 
@@ -47,6 +53,10 @@ def clone(url: str, path: Path, branch: Optional[str] = None) -> None:
         url: The git repository URL
         path: Target directory for the clone
         branch: Optional branch to checkout after cloning
+        depth: Optional number of commits of history to fetch. Shallow
+            clones only fetch the checked-out branch.
+        filter_spec: Optional partial clone filter such as "blob:none".
+            Filtered blobs are fetched from the remote when first needed.
 
     Raises:
         GitError: If the clone operation fails
@@ -55,6 +65,10 @@ def clone(url: str, path: Path, branch: Optional[str] = None) -> None:
     args = ["clone", url, str(path)]
     if branch:
         args.extend(["--branch", branch])
+    if depth:
+        args.extend(["--depth", str(depth)])
+    if filter_spec:
+        args.append(f"--filter={filter_spec}")
 
     try:
         _run_git(args)
@@ -66,6 +80,48 @@ def clone(url: str, path: Path, branch: Optional[str] = None) -> None:
         raise GitError(f"Clone failed: {e}") from e
 
 
+def fetch_branch(path: Path, branch: str, depth: Optional[int] = None) -> None:
+    """
+    Fetch a single branch from origin into refs/remotes/origin/<branch>.
+
+    Used to make another branch available in a shallow, single-branch clone.
+
+    Args:
+        path: Path to the git repository
+        branch: Branch name to fetch
+        depth: Optional number of commits of history to fetch
+
+    Raises:
+        GitError: If the fetch fails (e.g., branch doesn't exist on origin)
+    """
+    args = ["fetch", "origin", f"+refs/heads/{branch}:refs/remotes/origin/{branch}"]
+    if depth:
+        args.extend(["--depth", str(depth)])
+    _run_git(args, cwd=path)
+    # Track it like a cloned branch so checkout(path, branch) can find it
+    _run_git(["remote", "set-branches", "--add", "origin", branch], cwd=path)
+
+
+def unshallow(path: Path) -> bool:
+    """
+    Fetch the full history of a shallow clone.
+
+    Args:
+        path: Path to the git repository
+
+    Returns:
+        True if the repository was shallow, False if it already had full history
+
+    Raises:
+        GitError: If the fetch fails
+    """
+    result = _run_git(["rev-parse", "--is-shallow-repository"], cwd=path)
+    if result.stdout.strip() != "true":
+        return False
+    _run_git(["fetch", "--unshallow"], cwd=path)
+    return True
+
+
 def checkout(path: Path, branch: str) -> None:
     """
     Checkout a branch in the repository.
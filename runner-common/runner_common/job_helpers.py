@@ -34,6 +34,7 @@ def send_heartbeat(
     runner_id: str,
     backend_url: str,
     timeout: float = 5.0,
+    job_id: Optional[str] = None,
 ) -> bool:
     """
     Send a heartbeat to the backend.
@@ -42,6 +43,7 @@ def send_heartbeat(
         runner_id: The runner's ID
         backend_url: Backend base URL
         timeout: Request timeout in seconds
+        job_id: Optional job the heartbeat also keeps alive (multi-slot runners)
 
     Returns:
         True if heartbeat was acknowledged, False otherwise
@@ -50,6 +52,7 @@ def send_heartbeat(
         session = _get_session()
         response = session.post(
             f"{backend_url}/api/runners/{runner_id}/heartbeat",
+            params={"job_id": job_id} if job_id else None,
             timeout=timeout,
         )
         return response.status_code == 200
@@ -98,6 +101,7 @@ def complete_job(
     pr_url: Optional[str] = None,
     test_results: Optional[dict] = None,
     timeout: float = 10.0,
+    job_id: Optional[str] = None,
 ) -> None:
     """
     Mark the current job as complete.
@@ -110,8 +114,11 @@ def complete_job(
         pr_url: Optional PR URL (for successful card jobs)
         test_results: Optional test results dict
         timeout: Request timeout in seconds
+        job_id: Optional job to complete; defaults to the runner's oldest job
     """
     payload = {"success": success}
+    if job_id is not None:
+        payload["job_id"] = job_id
     if error is not None:
         payload["error"] = error
     if pr_url is not None:
@@ -132,6 +139,7 @@ def log_to_backend(
     lines: Union[str, List[str]],
     backend_url: str,
     timeout: float = 5.0,
+    job_id: Optional[str] = None,
 ) -> None:
     """
     Send log lines to the backend.
@@ -141,15 +149,20 @@ def log_to_backend(
         lines: Single log line or list of lines
         backend_url: Backend base URL
         timeout: Request timeout in seconds
+        job_id: Optional job the lines belong to (multi-slot runners)
     """
     # Wrap single line in a list
     if isinstance(lines, str):
         lines = [lines]
 
+    payload = {"lines": lines}
+    if job_id is not None:
+        payload["job_id"] = job_id
+
     session = _get_session()
     session.post(
         f"{backend_url}/api/runners/{runner_id}/logs",
-        json={"lines": lines},
+        json=payload,
         timeout=timeout,
     )
 
@@ -160,6 +173,8 @@ def register(
     name: Optional[str] = None,
     runner_id: Optional[str] = None,
     timeout: float = 10.0,
+    slots: Optional[int] = None,
+    capacity: Optional[dict] = None,
 ) -> dict:
     """
     Register the runner with the backend.
@@ -170,6 +185,8 @@ def register(
         name: Optional runner name
         runner_id: Optional persistent runner ID (for reconnection)
         timeout: Request timeout in seconds
+        slots: Optional number of jobs the runner can run at once
+        capacity: Optional resources available to those jobs (e.g. {"cpus": 8})
 
     Returns:
         Dict with runner_id and name
@@ -182,6 +199,10 @@ def register(
         payload["name"] = name
     if runner_id is not None:
         payload["runner_id"] = runner_id
+    if slots is not None:
+        payload["slots"] = slots
+    if capacity:
+        payload["capacity"] = capacity
 
     try:
         session = _get_session()
@@ -200,6 +221,7 @@ def poll_for_job(
     runner_id: str,
     backend_url: str,
     timeout: float = 10.0,
+    wait: float = 0,
 ) -> Optional[dict]:
     """
     Poll the backend for an available job.
@@ -207,7 +229,9 @@ def poll_for_job(
     Args:
         runner_id: The runner's ID
         backend_url: Backend base URL
-        timeout: Request timeout in seconds
+        timeout: Request timeout in seconds (on top of wait)
+        wait: Seconds the backend may hold the request open until a job
+            arrives (long-poll); 0 returns immediately
 
     Returns:
         Job dict if one is available, None otherwise
@@ -218,7 +242,8 @@ def poll_for_job(
     session = _get_session()
     response = session.get(
         f"{backend_url}/api/runners/{runner_id}/job",
-        timeout=timeout,
+        params={"wait": wait} if wait > 0 else None,
+        timeout=timeout + wait,
     )
 
     if response.status_code == 404:
@@ -228,6 +253,51 @@ def poll_for_job(
     return data.get("job")
 
 
+def poll_for_jobs(
+    runner_id: str,
+    backend_url: str,
+    timeout: float = 10.0,
+    wait: float = 0,
+    max_jobs: int = 1,
+) -> List[dict]:
+    """
+    Poll the backend for up to max_jobs available jobs (multi-slot runners).
+
+    Args:
+        runner_id: The runner's ID
+        backend_url: Backend base URL
+        timeout: Request timeout in seconds (on top of wait)
+        wait: Seconds the backend may hold the request open until a first
+            job arrives (long-poll); 0 returns immediately
+        max_jobs: Most jobs to take, normally the runner's free slots
+
+    Returns:
+        List of job dicts, empty if none are available
+
+    Raises:
+        NeedsReregister: If the runner is no longer recognized (404)
+    """
+    params = {"max_jobs": max_jobs}
+    if wait > 0:
+        params["wait"] = wait
+
+    session = _get_session()
+    response = session.get(
+        f"{backend_url}/api/runners/{runner_id}/job",
+        params=params,
+        timeout=timeout + wait,
+    )
+
+    if response.status_code == 404:
+        raise NeedsReregister("Runner not recognized by backend")
+
+    data = response.json()
+    if "jobs" in data:
+        return data["jobs"]
+    # Backend without multi-slot support
+    return [data["job"]] if data.get("job") else []
+
+
 class HeartbeatThread(threading.Thread):
     """
     Background thread that sends periodic heartbeats.
@@ -244,6 +314,7 @@ class HeartbeatThread(threading.Thread):
         runner_id: str,
         backend_url: str,
         interval: float = 10.0,
+        job_id: Optional[str] = None,
     ):
         """
         Initialize the heartbeat thread.
@@ -252,17 +323,19 @@ class HeartbeatThread(threading.Thread):
             runner_id: The runner's ID
             backend_url: Backend base URL
             interval: Seconds between heartbeats
+            job_id: Optional job each heartbeat also keeps alive
         """
         super().__init__(daemon=True)
         self.runner_id = runner_id
         self.backend_url = backend_url
         self.interval = interval
+        self.job_id = job_id
         self._stop_event = threading.Event()
 
     def run(self) -> None:
         """Run the heartbeat loop."""
         while not self._stop_event.is_set():
-            send_heartbeat(self.runner_id, self.backend_url)
+            send_heartbeat(self.runner_id, self.backend_url, job_id=self.job_id)
             self._stop_event.wait(self.interval)
 
     def stop(self) -> None:
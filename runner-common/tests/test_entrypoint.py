@@ -15,8 +15,12 @@ from unittest.mock import patch, MagicMock
 import pytest
 
 from runner_common.entrypoint import (
+    get_clone_depth,
+    get_clone_filter,
     get_executor,
     get_workspace,
+    get_job_workspace,
+    parse_capacity,
     build_prompt,
     EXECUTORS,
 )
@@ -69,6 +73,71 @@ class TestGetWorkspace:
         path = get_workspace("abcdefghijklmnop")
         assert path == Path("/workspace/abcdefgh/repo")
 
+    def test_get_workspace_with_job_id(self):
+        """get_workspace() gives a job its own path."""
+        path = get_workspace("pipeline-run", job_id="abcdefghijklmnop")
+        assert path == Path("/workspace/jobs/abcdefgh/repo")
+
+
+class TestGetJobWorkspace:
+    """Tests for choosing a job's workspace."""
+
+    def test_single_slot_uses_shared_workspace(self, monkeypatch):
+        monkeypatch.setattr("runner_common.entrypoint.RUNNER_SLOTS", 1)
+        assert get_job_workspace({"id": "job-12345"}) == Path("/workspace/repo")
+
+    def test_multi_slot_isolates_jobs(self, monkeypatch):
+        monkeypatch.setattr("runner_common.entrypoint.RUNNER_SLOTS", 4)
+        assert get_job_workspace({"id": "job-12345"}) == Path("/workspace/jobs/job-1234/repo")
+        assert get_job_workspace({"id": "job-12345", "pipeline_run_id": "run-12345"}) == Path(
+            "/workspace/jobs/job-1234/repo"
+        )
+
+    def test_multi_slot_pipeline_context_shares_run_workspace(self, monkeypatch):
+        monkeypatch.setattr("runner_common.entrypoint.RUNNER_SLOTS", 4)
+        job = {"id": "job-12345", "pipeline_run_id": "run-12345", "is_continuation": True}
+        assert get_job_workspace(job) == Path("/workspace/run-1234/repo")
+
+
+class TestParseCapacity:
+
+    def test_parse_capacity(self):
+        assert parse_capacity("cpus=8, memory_gb=16.5") == {"cpus": 8.0, "memory_gb": 16.5}
+
+    def test_parse_capacity_empty(self):
+        assert parse_capacity("") == {}
+
+
+class TestGetCloneDepth:
+    """Tests for clone depth selection."""
+
+    def test_agent_steps_get_full_history(self):
+        """Agent steps (and jobs without a step type) clone full history."""
+        assert get_clone_depth({"step_type": "agent"}) is None
+        assert get_clone_depth({}) is None
+
+    def test_script_and_docker_steps_are_shallow(self):
+        """Script and docker steps clone a single commit by default."""
+        assert get_clone_depth({"step_type": "script"}) == 1
+        assert get_clone_depth({"step_type": "docker", "step_config": None}) == 1
+
+    def test_fetch_depth_overrides_default(self):
+        """step_config.fetch_depth sets the depth; 0 means full history."""
+        assert get_clone_depth({"step_type": "script", "step_config": {"fetch_depth": 10}}) == 10
+        assert get_clone_depth({"step_type": "script", "step_config": {"fetch_depth": 0}}) is None
+
+
+class TestGetCloneFilter:
+    """Tests for partial clone filter selection."""
+
+    def test_default_filter_is_blobless(self):
+        assert get_clone_filter({"step_type": "agent"}) == "blob:none"
+
+    def test_clone_filter_overrides_default(self):
+        """step_config.clone_filter sets the filter; "" disables it."""
+        assert get_clone_filter({"step_config": {"clone_filter": "blob:limit=1m"}}) == "blob:limit=1m"
+        assert get_clone_filter({"step_config": {"clone_filter": ""}}) is None
+
 
 class TestBuildPrompt:
     """Tests for prompt building."""
@@ -65,6 +65,69 @@ class TestClone:
         clone(git_server_url, target)
         assert (target / ".git").is_dir()
 
+    def test_clone_with_depth_is_shallow(self, tmp_path, git_server_url):
+        """clone(url, path, depth=1) fetches only the latest commit."""
+        from runner_common.git_helpers import clone
+
+        _push_commit(tmp_path, "Second commit")
+        target = tmp_path / "repo"
+        # --depth is ignored for plain-path clones, so use a file:// URL
+        clone(Path(git_server_url).as_uri(), target, branch="main", depth=1)
+
+        count = subprocess.run(["git", "rev-list", "--count", "HEAD"], cwd=target, capture_output=True, text=True)
+        assert count.stdout.strip() == "1"
+
+    def test_clone_with_filter_is_partial(self, tmp_path, git_server_url):
+        """clone(url, path, filter_spec=...) makes origin a promisor remote."""
+        from runner_common.git_helpers import clone
+
+        subprocess.run(["git", "config", "uploadpack.allowFilter", "true"], cwd=git_server_url, check=True)
+        target = tmp_path / "repo"
+        clone(Path(git_server_url).as_uri(), target, filter_spec="blob:none")
+
+        result = subprocess.run(
+            ["git", "config", "remote.origin.partialclonefilter"], cwd=target, capture_output=True, text=True
+        )
+        assert result.stdout.strip() == "blob:none"
+        assert (target / "README.md").exists()
+
+
+
+class TestFetchBranch:
+    """Tests for fetch_branch() and unshallow() functions."""
+
+    def test_fetch_branch_makes_branch_checkoutable(self, tmp_path, git_server_url):
+        """fetch_branch() lets a single-branch clone check out another branch."""
+        from runner_common.git_helpers import checkout, clone, fetch_branch, get_current_branch
+
+        subprocess.run(["git", "push", "origin", "main:feature"], cwd=tmp_path / "temp_clone", check=True, capture_output=True)
+        target = tmp_path / "repo"
+        clone(Path(git_server_url).as_uri(), target, branch="main", depth=1)
+
+        fetch_branch(target, "feature", depth=1)
+        checkout(target, "feature")
+        assert get_current_branch(target) == "feature"
+
+    def test_fetch_branch_raises_for_missing_branch(self, cloned_repo):
+        """fetch_branch() raises GitError if origin has no such branch."""
+        from runner_common.git_helpers import fetch_branch, GitError
+
+        with pytest.raises(GitError):
+            fetch_branch(cloned_repo, "nonexistent-12345")
+
+    def test_unshallow_fetches_full_history(self, tmp_path, git_server_url):
+        """unshallow() deepens a shallow clone and is a no-op afterwards."""
+        from runner_common.git_helpers import clone, unshallow
+
+        _push_commit(tmp_path, "Second commit")
+        target = tmp_path / "repo"
+        clone(Path(git_server_url).as_uri(), target, depth=1)
+
+        assert unshallow(target) is True
+        count = subprocess.run(["git", "rev-list", "--count", "HEAD"], cwd=target, capture_output=True, text=True)
+        assert count.stdout.strip() == "2"
+        assert unshallow(target) is False
+
 
 class TestCheckout:
     """Tests for checkout() function."""
@@ -332,6 +395,14 @@ def git_server_url(tmp_path):
     return str(bare_repo)
 
 
+def _push_commit(tmp_path, message: str) -> None:
+    """Push another commit to main through the git_server_url fixture's clone."""
+    temp_clone = tmp_path / "temp_clone"
+    (temp_clone / "README.md").write_text(f"# {message}\n")
+    subprocess.run(["git", "commit", "-am", message], cwd=temp_clone, check=True, capture_output=True)
+    subprocess.run(["git", "push", "origin", "main"], cwd=temp_clone, check=True, capture_output=True)
+
+
 @pytest.fixture
 def cloned_repo(tmp_path, git_server_url):
     """Create a cloned repo for testing."""
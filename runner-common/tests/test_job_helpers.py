@@ -60,6 +60,13 @@ class TestHeartbeat:
         result = send_heartbeat("runner-123", backend_url=mock_backend.url, timeout=1.0)
         assert result is True
 
+    def test_heartbeat_for_job(self, mock_backend):
+        """send_heartbeat(job_id=...) also keeps that job alive."""
+        from runner_common.job_helpers import send_heartbeat
+
+        send_heartbeat("runner-123", backend_url=mock_backend.url, job_id="job-1")
+        assert mock_backend.last_request.params == {"job_id": "job-1"}
+
 
 class TestReportStatus:
     """Tests for report_status() function."""
@@ -158,6 +165,13 @@ class TestCompleteJob:
         payload = mock_backend.last_request.json
         assert payload["pr_url"] == "https://github.com/org/repo/pull/42"
 
+    def test_complete_job_by_id(self, mock_backend):
+        """complete_job(job_id=...) names the job on multi-slot runners."""
+        from runner_common.job_helpers import complete_job
+
+        complete_job("runner-123", success=True, backend_url=mock_backend.url, job_id="job-1")
+        assert mock_backend.last_request.json["job_id"] == "job-1"
+
 
 class TestLogToBackend:
     """Tests for log_to_backend() function."""
@@ -188,6 +202,13 @@ class TestLogToBackend:
         # Should be wrapped in a list
         assert mock_backend.last_request.json["lines"] == ["Single log message"]
 
+    def test_log_for_job(self, mock_backend):
+        """log_to_backend(job_id=...) tags the lines with their job."""
+        from runner_common.job_helpers import log_to_backend
+
+        log_to_backend("runner-123", "line", backend_url=mock_backend.url, job_id="job-1")
+        assert mock_backend.last_request.json == {"lines": ["line"], "job_id": "job-1"}
+
 
 class TestRegister:
     """Tests for register() function."""
@@ -235,6 +256,15 @@ class TestRegister:
         with pytest.raises(RegistrationError):
             register(runner_type="claude-code", backend_url=mock_backend.url)
 
+    def test_register_sends_slots_and_capacity(self, mock_backend):
+        from runner_common.job_helpers import register
+
+        mock_backend.set_response(200, {"runner_id": "runner-1", "name": "r"})
+
+        register("mock", mock_backend.url, slots=4, capacity={"cpus": 8.0})
+        assert mock_backend.last_request.json["slots"] == 4
+        assert mock_backend.last_request.json["capacity"] == {"cpus": 8.0}
+
 
 class TestPollForJob:
     """Tests for poll_for_job() function."""
@@ -274,6 +304,49 @@ class TestPollForJob:
         with pytest.raises(NeedsReregister):
             poll_for_job("runner-123", backend_url=mock_backend.url)
 
+    def test_poll_without_wait_is_a_short_poll(self, mock_backend):
+        from runner_common.job_helpers import poll_for_job
+
+        mock_backend.set_response(200, {"job": None})
+
+        poll_for_job("runner-123", backend_url=mock_backend.url)
+        assert mock_backend.last_request.params is None
+        assert mock_backend.last_request.timeout == 10.0
+
+    def test_poll_with_wait_long_polls(self, mock_backend):
+        """poll_for_job(wait=N) asks the backend to hold the request and extends the timeout."""
+        from runner_common.job_helpers import poll_for_job
+
+        mock_backend.set_response(200, {"job": None})
+
+        poll_for_job("runner-123", backend_url=mock_backend.url, wait=30)
+        assert mock_backend.last_request.path == "/api/runners/runner-123/job"
+        assert mock_backend.last_request.params == {"wait": 30}
+        assert mock_backend.last_request.timeout == 40.0
+
+
+class TestPollForJobs:
+    """Tests for poll_for_jobs() function."""
+
+    def test_poll_returns_jobs(self, mock_backend):
+        from runner_common.job_helpers import poll_for_jobs
+
+        mock_backend.set_response(200, {"job": {"id": "job-1"}, "jobs": [{"id": "job-1"}, {"id": "job-2"}]})
+
+        jobs = poll_for_jobs("runner-123", backend_url=mock_backend.url, wait=30, max_jobs=3)
+        assert [job["id"] for job in jobs] == ["job-1", "job-2"]
+        assert mock_backend.last_request.params == {"max_jobs": 3, "wait": 30}
+
+    def test_poll_falls_back_to_single_job(self, mock_backend):
+        """Backends that only return "job" still work."""
+        from runner_common.job_helpers import poll_for_jobs
+
+        mock_backend.set_response(200, {"job": {"id": "job-1"}})
+        assert poll_for_jobs("runner-123", backend_url=mock_backend.url) == [{"id": "job-1"}]
+
+        mock_backend.set_response(200, {"job": None})
+        assert poll_for_jobs("runner-123", backend_url=mock_backend.url) == []
+
 
 class TestHeartbeatThread:
     """Tests for HeartbeatThread class."""
@@ -343,10 +416,12 @@ def mock_backend(monkeypatch):
     backend = MockBackend()
 
     class MockRequest:
-        def __init__(self, method, path, json=None):
+        def __init__(self, method, path, json=None, params=None, timeout=None):
             self.method = method
             self.path = path
             self.json = json
+            self.params = params
+            self.timeout = timeout
 
     class MockResponse:
         def __init__(self, status_code, json_data):
@@ -372,7 +447,9 @@ def mock_backend(monkeypatch):
                 t.sleep(backend._delay)
 
             path = url.replace(backend.url, "")
-            backend.last_request = MockRequest(method, path, kwargs.get("json"))
+            backend.last_request = MockRequest(
+                method, path, kwargs.get("json"), kwargs.get("params"), kwargs.get("timeout"),
+            )
             backend.request_count += 1
             return MockResponse(backend._response_status, backend._response_body)
 
@@ -137,14 +137,12 @@ async def clean_job_queue():
     from app.services.job_queue import job_queue
 
     # Clear before
-    job_queue._pending = {}
-    job_queue._jobs = []
+    await job_queue.clear()
 
     yield job_queue
 
     # Clear after
-    job_queue._pending = {}
-    job_queue._jobs = []
+    await job_queue.clear()
 
 
 # -----------------------------------------------------------------------------
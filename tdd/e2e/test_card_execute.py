@@ -237,8 +237,13 @@ class TestCardExecuteWithMockRunner:
         diff_response = await api_client.get(f"/api/cards/{card['id']}/diff")
         assert diff_response.status_code == 200
         diff_data = diff_response.json()
-        assert "diff" in diff_data
-        assert "src/new_feature.py" in diff_data["diff"]
+        assert "src/new_feature.py" in [f["path"] for f in diff_data["files"]]
+
+        file_response = await api_client.get(
+            f"/api/cards/{card['id']}/diff/file", params={"path": "src/new_feature.py"}
+        )
+        assert file_response.status_code == 200
+        assert "+++ b/src/new_feature.py" in file_response.json()["diff"]
 
 
 class TestCardExecuteFailureModes:
@@ -425,3 +425,61 @@ class TestCardLifecycleActions:
         """Returns 404 when retrying non-existent card."""
         response = await client.post("/api/cards/nonexistent/retry")
         assert_not_found(response, "Card")
+
+
+class TestCardsDiffstat:
+    """Tests for GET /api/repos/{repo_id}/cards/diffstat endpoint."""
+
+    @staticmethod
+    def _commit(repo, ref: bytes, files: dict[bytes, bytes], parents=()):
+        from dulwich.objects import Blob, Tree, Commit
+
+        tree = Tree()
+        for path, content in files.items():
+            blob = Blob.from_string(content)
+            repo.object_store.add_object(blob)
+            tree.add(path, 0o100644, blob.id)
+        commit = Commit()
+        commit.tree = tree.id
+        commit.parents = list(parents)
+        commit.author = commit.committer = b"Test <test@example.com>"
+        commit.author_time = commit.commit_time = 1000
+        commit.author_timezone = commit.commit_timezone = 0
+        commit.message = b"commit"
+        repo.object_store.add_object(tree)
+        repo.object_store.add_object(commit)
+        repo.refs[ref] = commit.id
+        return commit.id
+
+    async def test_diffstat_for_all_card_branches(self, client, ingested_repo, clean_git_repos, clean_job_queue):
+        """Returns per-card file and line counts in one call."""
+        repo_id = ingested_repo["id"]
+        card_ids = []
+        for title in ("First", "Second", "Unstarted"):
+            response = await client.post(f"/api/repos/{repo_id}/cards", json=card_create_payload(title=title))
+            card_ids.append(response.json()["id"])
+        first = (await client.post(f"/api/cards/{card_ids[0]}/start")).json()
+        second = (await client.post(f"/api/cards/{card_ids[1]}/start")).json()
+
+        git_repo = clean_git_repos.get_repo(repo_id)
+        main = self._commit(git_repo, b"refs/heads/main", {b"a.txt": b"a\nb\n"})
+        self._commit(git_repo, f"refs/heads/{first['branch_name']}".encode(), {
+            b"a.txt": b"a\nB\nc\n",
+            b"new.txt": b"x\n",
+        }, [main])
+        clean_git_repos.invalidate_refs(repo_id)
+
+        response = await client.get(f"/api/repos/{repo_id}/cards/diffstat")
+        assert_status_code(response, 200)
+        stats = response.json()
+
+        assert set(stats) == {first["id"], second["id"]}
+        assert stats[first["id"]]["files_changed"] == 2
+        assert stats[first["id"]]["additions"] == 3
+        assert stats[first["id"]]["deletions"] == 1
+        assert "error" in stats[second["id"]]
+
+    async def test_diffstat_repo_not_found(self, client):
+        """Returns 404 for an unknown repo."""
+        response = await client.get("/api/repos/nonexistent/cards/diffstat")
+        assert_not_found(response, "Repo")
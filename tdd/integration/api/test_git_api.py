@@ -10,6 +10,7 @@ Endpoints tested:
 - POST /git/{repo_id}.git/git-upload-pack
 - POST /git/{repo_id}.git/git-receive-pack
 - GET /git/{repo_id}.git/HEAD
+- GET /git/workers
 """
 import sys
 import shutil
@@ -158,6 +159,18 @@ class TestInfoRefsUploadPack:
         )
         assert response.content.endswith(b"0000")
 
+    async def test_protocol_v2_header_gets_capability_advertisement(self, client, created_git_repo):
+        """Git-Protocol: version=2 switches upload-pack to the v2 advertisement."""
+        response = await client.get(
+            f"/git/{created_git_repo}.git/info/refs",
+            params={"service": "git-upload-pack"},
+            headers={"Git-Protocol": "version=2"},
+        )
+        assert_status_code(response, 200)
+        assert response.content.startswith(b"000eversion 2\n")
+        assert b"ls-refs" in response.content
+        assert b"# service=" not in response.content
+
 
 # -----------------------------------------------------------------------------
 # Info Refs - Receive Pack Tests
@@ -292,6 +305,72 @@ class TestReceivePackEndpoint:
         # Either succeeds or fails with git protocol error (not 404)
         assert response.status_code != 404
 
+    @pytest.mark.parametrize("gzipped", [False, True])
+    async def test_streamed_push_updates_ref(self, client, created_git_repo, git_repo_manager, gzipped):
+        """A pack sent in many small chunks is stored and the ref updated."""
+        import gzip
+
+        body, commit_sha = _push_body(b"refs/heads/main")
+        if gzipped:
+            body = gzip.compress(body)
+
+        async def chunks():
+            for i in range(0, len(body), 7):
+                yield body[i:i + 7]
+
+        response = await client.post(
+            f"/git/{created_git_repo}.git/git-receive-pack",
+            content=chunks(),
+            headers={"Content-Type": "application/x-git-receive-pack-request",
+                     **({"Content-Encoding": "gzip"} if gzipped else {})},
+        )
+        assert_status_code(response, 200)
+        assert b"unpack ok" in response.content
+        assert b"ok refs/heads/main" in response.content
+        repo = git_repo_manager.get_repo(created_git_repo)
+        assert repo.refs[b"refs/heads/main"] == commit_sha
+        assert repo[commit_sha].message == b"streamed push\n"
+
+
+def _push_body(ref_name: bytes) -> tuple[bytes, bytes]:
+    """Build a receive-pack request creating ref_name at a new one-file commit."""
+    from dulwich.objects import Blob, Commit, Tree
+    from app.services.git.pack import generate_pack
+    from app.services.git.protocol import pkt_line
+
+    blob = Blob.from_string(b"hello\n" * 1000)
+    tree = Tree()
+    tree.add(b"hello.txt", 0o100644, blob.id)
+    commit = Commit()
+    commit.tree = tree.id
+    commit.author = commit.committer = b"Test <test@example.com>"
+    commit.author_time = commit.commit_time = 1000
+    commit.author_timezone = commit.commit_timezone = 0
+    commit.message = b"streamed push\n"
+    objects = [(o.type_num, o.as_raw_string()) for o in (commit, tree, blob)]
+
+    command = b"0" * 40 + b" " + commit.id + b" " + ref_name + b"\x00report-status\n"
+    body = pkt_line(command) + b"0000" + b"".join(generate_pack(objects, len(objects)))
+    return body, commit.id
+
+
+# -----------------------------------------------------------------------------
+# Worker Pool Status Tests
+# -----------------------------------------------------------------------------
+
+class TestWorkerStatusEndpoint:
+    """Tests for GET /git/workers."""
+
+    async def test_reports_queue_depth(self, client, created_git_repo):
+        """Reports the pool limit and counts the git calls it has run."""
+        await client.get(f"/git/{created_git_repo}.git/HEAD")
+        response = await client.get("/git/workers")
+        assert_status_code(response, 200)
+        stats = response.json()
+        assert stats["max_workers"] >= 1
+        assert stats["queued"] == 0
+        assert stats["completed"] >= 1
+
 
 # -----------------------------------------------------------------------------
 # HEAD Endpoint Tests
@@ -170,6 +170,44 @@ class TestGetRepoAgent:
         response = await client.get("/api/repos/nonexistent/lazyaf/agents/test-agent")
         assert_not_found(response, "Repo")
 
+    async def test_malformed_agent_reports_parse_error(self, client, repo_with_agent_definition, clean_git_repos):
+        """A malformed agent is left out of the list and its parse error is returned on get."""
+        from dulwich.objects import Blob, Commit
+
+        repo_id = repo_with_agent_definition["id"]
+        git_repo = clean_git_repos.get_repo(repo_id)
+        branch_ref = f"refs/heads/{repo_with_agent_definition['default_branch']}".encode()
+        head = git_repo.refs[branch_ref]
+        parent = git_repo[head]
+
+        # Add .lazyaf/agents/broken.yaml on top of the default branch
+        blob = Blob.from_string(b"name: [unclosed\n")
+        root = git_repo[parent.tree]
+        lazyaf = git_repo[root[b".lazyaf"][1]]
+        agents = git_repo[lazyaf[b"agents"][1]]
+        agents.add(b"broken.yaml", 0o100644, blob.id)
+        lazyaf.add(b"agents", 0o040000, agents.id)
+        root.add(b".lazyaf", 0o040000, lazyaf.id)
+        commit = Commit()
+        commit.tree = root.id
+        commit.parents = [head]
+        commit.author = commit.committer = b"Test <test@example.com>"
+        commit.author_time = commit.commit_time = parent.commit_time + 1
+        commit.author_timezone = commit.commit_timezone = 0
+        commit.message = b"Add broken agent"
+        for obj in (blob, agents, lazyaf, root, commit):
+            git_repo.object_store.add_object(obj)
+        git_repo.refs[branch_ref] = commit.id
+        clean_git_repos.invalidate_refs(repo_id)
+
+        response = await client.get(f"/api/repos/{repo_id}/lazyaf/agents")
+        assert_status_code(response, 200)
+        assert [agent["name"] for agent in response.json()] == ["test-agent"]
+
+        response = await client.get(f"/api/repos/{repo_id}/lazyaf/agents/broken")
+        assert_status_code(response, 500)
+        assert "Error parsing agent file" in response.json()["detail"]
+
 
 class TestListRepoPipelines:
     """Tests for GET /api/repos/{repo_id}/lazyaf/pipelines endpoint."""
@@ -199,6 +199,43 @@ class TestGetJob:
         response = await client.get("/api/runners/unknown-id/job")
         assert_status_code(response, 404)
 
+    async def test_get_job_long_poll_times_out(self, client, clean_runner_pool, clean_job_queue):
+        """With ?wait the request is held open, then returns null."""
+        import time
+
+        runner = clean_runner_pool.register()
+
+        start = time.monotonic()
+        response = await client.get(f"/api/runners/{runner.id}/job", params={"wait": 0.2})
+        assert_status_code(response, 200)
+        assert response.json()["job"] is None
+        assert time.monotonic() - start >= 0.15
+
+    async def test_get_job_negative_wait_rejected(self, client, clean_runner_pool):
+        runner = clean_runner_pool.register()
+        response = await client.get(f"/api/runners/{runner.id}/job", params={"wait": -1})
+        assert_status_code(response, 422)
+
+    async def test_get_jobs_for_free_slots(self, client, clean_runner_pool, clean_job_queue):
+        """A multi-slot runner can take several jobs in one poll."""
+        from app.services.job_queue import QueuedJob
+
+        register = await client.post("/api/runners/register", json={"slots": 2})
+        assert register.json()["slots"] == 2
+        runner_id = register.json()["runner_id"]
+        for i in range(3):
+            await clean_job_queue.enqueue(QueuedJob(
+                id=f"job-{i}", card_id=f"card-{i}", repo_id="repo-1", repo_url="",
+                base_branch="main", card_title="Test", card_description="",
+            ))
+
+        response = await client.get(f"/api/runners/{runner_id}/job", params={"max_jobs": 5})
+        assert_status_code(response, 200)
+        result = response.json()
+        assert [job["id"] for job in result["jobs"]] == ["job-0", "job-1"]
+        assert result["job"]["id"] == "job-0"
+        assert clean_runner_pool.get_runner(runner_id).status == "busy"
+
 
 class TestCompleteJob:
     """Tests for POST /api/runners/{id}/complete endpoint."""
@@ -226,6 +263,26 @@ class TestCompleteJob:
         )
         assert_status_code(response, 200)
 
+    async def test_complete_job_by_id(self, client, clean_runner_pool):
+        """A multi-slot runner completes a specific job and keeps the others."""
+        from app.services.job_queue import QueuedJob
+
+        runner = clean_runner_pool.register(slots=2)
+        for job_id in ("job-1", "job-2"):
+            runner.jobs[job_id] = QueuedJob(
+                id=job_id, card_id="card-1", repo_id="repo-1", repo_url="",
+                base_branch="main", card_title="Test", card_description="",
+            )
+        runner.status = "busy"
+
+        response = await client.post(
+            f"/api/runners/{runner.id}/complete",
+            json={"success": True, "job_id": "job-2"},
+        )
+        assert_status_code(response, 200)
+        assert list(runner.jobs) == ["job-1"]
+        assert runner.status == "idle"
+
     async def test_complete_job_unknown_runner(self, client, clean_runner_pool):
         """Complete returns 404 for unknown runner."""
         response = await client.post(
@@ -274,6 +331,24 @@ class TestRunnerLogs:
         assert result["total"] == 3
 
 
+    async def test_logs_per_job(self, client, clean_runner_pool):
+        """Lines tagged with a job can be read back for that job alone."""
+        from app.services.job_queue import QueuedJob
+
+        runner = clean_runner_pool.register(slots=2)
+        for job_id in ("job-1", "job-2"):
+            runner.jobs[job_id] = QueuedJob(
+                id=job_id, card_id="card-1", repo_id="repo-1", repo_url="",
+                base_branch="main", card_title="Test", card_description="",
+            )
+        await client.post(f"/api/runners/{runner.id}/logs", json={"lines": ["one"], "job_id": "job-1"})
+        await client.post(f"/api/runners/{runner.id}/logs", json={"lines": ["two"], "job_id": "job-2"})
+
+        response = await client.get(f"/api/runners/{runner.id}/logs", params={"job_id": "job-2"})
+        assert_status_code(response, 200)
+        assert response.json()["logs"] == ["two"]
+
+
 class TestPoolStatus:
     """Tests for GET /api/runners/status endpoint."""
 
@@ -289,6 +364,7 @@ class TestPoolStatus:
         assert result["offline_runners"] == 0
         assert result["queued_jobs"] == 0
         assert result["pending_jobs"] == 0
+        assert result["dispatch_latency"]["dispatched"] >= 0
 
     async def test_pool_status_with_runners(self, client, clean_runner_pool, clean_job_queue):
         """Returns status with runners."""
@@ -322,6 +398,40 @@ class TestPoolStatus:
         assert result["busy_runners"] == 2
         assert result["offline_runners"] == 1
 
+    async def test_pool_status_shows_scheduling(self, client, clean_runner_pool, clean_job_queue):
+        """Reports queue load by priority and repo, and why the last job was picked."""
+        from app.services.job_queue import QueuedJob
+
+        for job_id, playground in [("card-job", False), ("playground-job", True)]:
+            await clean_job_queue.enqueue(QueuedJob(
+                id=job_id,
+                card_id="card-1",
+                repo_id="repo-1",
+                repo_url="",
+                base_branch="main",
+                card_title="Test",
+                card_description="",
+                is_playground=playground,
+            ))
+        runner = clean_runner_pool.register(runner_type="claude-code")
+        job = await clean_runner_pool.get_job(runner.id)
+        assert job.id == "playground-job"
+
+        response = await client.get("/api/runners/status")
+        scheduling = response.json()["scheduling"]
+
+        assert scheduling["policy"]["priority_order"] == ["playground", "card", "pipeline"]
+        assert scheduling["queued_by_priority"] == {"playground": 0, "card": 1, "pipeline": 0}
+        assert scheduling["running"] == 1
+        assert scheduling["repos"] == [{
+            "repo_id": "repo-1", "weight": 1.0, "queued": 1, "running": 1, "share": 1.0, "capped": False,
+        }]
+        decision = scheduling["recent_decisions"][-1]
+        assert decision["job_id"] == "playground-job"
+        assert decision["priority"] == "playground"
+        assert decision["runner_id"] == runner.id
+        assert decision["candidates"] == 2
+
 
 class TestDockerCommand:
     """Tests for GET /api/runners/docker-command endpoint."""
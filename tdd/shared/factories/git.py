@@ -0,0 +1,61 @@
+"""
+Git object factories for tests of app.services.git.
+
+Build commits in a dulwich object store and convert between packs, object
+stores and the MissingObject lists the walk functions return.
+"""
+import io
+import sys
+from pathlib import Path
+
+from dulwich.object_store import MemoryObjectStore
+from dulwich.objects import Blob, Commit, Tree
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.services.git.walk import MissingObject
+
+
+def make_commit(store, files: dict[str, bytes], parents=(), commit_time=1000, message=b"commit"):
+    """Add a commit with a flat or nested file layout to an object store."""
+    def build_tree(entries: dict) -> bytes:
+        tree = Tree()
+        for name, value in entries.items():
+            if isinstance(value, dict):
+                tree.add(name.encode(), 0o040000, build_tree(value))
+            else:
+                blob = Blob.from_string(value)
+                store.add_object(blob)
+                tree.add(name.encode(), 0o100644, blob.id)
+        store.add_object(tree)
+        return tree.id
+
+    commit = Commit()
+    commit.tree = build_tree(files)
+    commit.parents = list(parents)
+    commit.author = commit.committer = b"Test <test@example.com>"
+    commit.author_time = commit.commit_time = commit_time
+    commit.author_timezone = commit.commit_timezone = 0
+    commit.message = message
+    store.add_object(commit)
+    return commit.id
+
+
+def shas(missing) -> list[bytes]:
+    """SHAs of a list of MissingObject, in order."""
+    return [obj.sha for obj in missing]
+
+
+def missing_objects(blobs) -> list:
+    """MissingObject entries for blobs, as a walk would return them."""
+    return [MissingObject(b.id, b.type_num) for b in blobs]
+
+
+def unpack_into_store(pack: bytes):
+    """Import a pack into a fresh MemoryObjectStore, resolving any deltas."""
+    store = MemoryObjectStore()
+    f = io.BytesIO(pack)
+    store.add_thin_pack(f.read, None)
+    return store
@@ -0,0 +1 @@
+# Git service tests (app.services.git)
@@ -0,0 +1,45 @@
+"""
+Fixtures shared by the app.services.git unit tests.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.services.git.pack import generate_pack
+from shared.factories.git import make_commit
+
+
+@pytest.fixture
+def history():
+    """Linear history c1 <- c2 <- c3 with a shared subdirectory."""
+    from dulwich.object_store import MemoryObjectStore
+
+    store = MemoryObjectStore()
+    lib = {"util.py": b"util v1\n", "big.py": b"big\n" * 100}
+    c1 = make_commit(store, {"README": b"v1\n", "lib": lib}, commit_time=1000)
+    c2 = make_commit(store, {"README": b"v2\n", "lib": lib}, [c1], commit_time=2000)
+    c3 = make_commit(store, {"README": b"v3\n", "lib": lib}, [c2], commit_time=3000)
+    return store, [c1, c2, c3]
+
+
+@pytest.fixture
+def packed_store(tmp_path):
+    """Disk object store holding five blob versions in one deltified pack."""
+    import io
+    from dulwich.objects import Blob
+    from dulwich.object_store import DiskObjectStore
+
+    store = DiskObjectStore.init(str(tmp_path / "objects"))
+    text = b"".join(b"line %d of a reasonably long file\n" % i for i in range(200))
+    blobs = [Blob.from_string(text + b"edit %d\n" % i) for i in range(5)]
+    objects = [(b.type_num, b.as_raw_string()) for b in blobs]
+    pack = b"".join(generate_pack(objects, len(objects), delta_window=10))
+    f = io.BytesIO(pack)
+    store.add_thin_pack(f.read, None)
+    store.close()
+    return DiskObjectStore(str(tmp_path / "objects")), blobs
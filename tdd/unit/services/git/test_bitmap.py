@@ -0,0 +1,166 @@
+"""
+Unit tests for app.services.git.bitmap.
+
+These tests verify:
+- Bitmap missing-object queries match the object walk
+- Stored bitmaps replace walks below them
+- Rebuilding, unloading and torn-append recovery of the index
+"""
+import sys
+from pathlib import Path
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.services.git.bitmap import ReachabilityBitmaps, _BitmapIndex, _IndexCache, iter_bits
+from app.services.git.walk import find_missing_objects
+from shared.factories.git import make_commit, shas
+
+
+# -----------------------------------------------------------------------------
+# Reachability Bitmap Tests
+# -----------------------------------------------------------------------------
+
+class _RecordingStore:
+    """Object store wrapper that records which objects were read."""
+
+    def __init__(self, store):
+        self.store = store
+        self.read = set()
+
+    def __getitem__(self, sha):
+        self.read.add(sha)
+        return self.store[sha]
+
+    def __contains__(self, sha):
+        return sha in self.store
+
+
+def _bitmaps(store, tmp_path):
+    return ReachabilityBitmaps(_BitmapIndex(tmp_path / "lazyaf"), store)
+
+
+class TestIterBits:
+    """Tests for iter_bits()."""
+
+    def test_yields_set_positions_in_order(self):
+        assert list(iter_bits(0)) == []
+        assert list(iter_bits(0b100101)) == [0, 2, 5]
+        assert list(iter_bits(1 << 1000 | 1)) == [0, 1000]
+
+
+class TestReachabilityBitmaps:
+    """Tests for ReachabilityBitmaps."""
+
+    def test_full_clone_matches_object_walk(self, history, tmp_path):
+        store, (c1, c2, c3) = history
+        missing = _bitmaps(store, tmp_path).find_missing_objects([c3])
+        assert set(shas(missing)) == set(shas(find_missing_objects(store, [c3], [])))
+
+    def test_incremental_fetch_matches_object_walk(self, history, tmp_path):
+        store, (c1, c2, c3) = history
+        bitmaps = _bitmaps(store, tmp_path)
+        bitmaps.write_bitmaps([c1, c3])
+        missing = bitmaps.find_missing_objects([c3], [c1])
+        assert set(shas(missing)) == set(shas(find_missing_objects(store, [c3], [c1])))
+        assert bitmaps.find_missing_objects([c2], [c3]) == []
+
+    def test_objects_are_grouped_by_type_with_paths(self, history, tmp_path):
+        store, (c1, c2, c3) = history
+        missing = _bitmaps(store, tmp_path).find_missing_objects([c3], [c2])
+        assert [obj.type_num for obj in missing] == [1, 2, 3]
+        assert missing[0].sha == c3
+        assert missing[2].path == b"README"
+
+    def test_annotated_tag_want_includes_tag_and_target(self, history, tmp_path):
+        from dulwich.objects import Commit, Tag
+
+        store, (c1, c2, c3) = history
+        tag = Tag()
+        tag.name = b"v1"
+        tag.object = (Commit, c3)
+        tag.tagger = b"Test <test@example.com>"
+        tag.tag_time = 4000
+        tag.tag_timezone = 0
+        tag.message = b"release"
+        store.add_object(tag)
+        missing = _bitmaps(store, tmp_path).find_missing_objects([tag.id], [c2])
+        assert shas(missing)[:2] == [tag.id, c3]
+
+    def test_stored_bitmap_replaces_walk_below_it(self, history, tmp_path):
+        store, (c1, c2, c3) = history
+        _bitmaps(store, tmp_path).write_bitmaps([c2])
+
+        recording = _RecordingStore(store)
+        reloaded = _bitmaps(recording, tmp_path)
+        assert reloaded.available
+        missing = reloaded.find_missing_objects([c3])
+        assert set(shas(missing)) == set(shas(find_missing_objects(store, [c3], [])))
+        assert c1 not in recording.read
+        assert c2 not in recording.read
+
+    def test_missing_blobs_are_skipped(self, tmp_path):
+        from dulwich.object_store import MemoryObjectStore
+        from dulwich.objects import Blob
+
+        store = MemoryObjectStore()
+        c1 = make_commit(store, {"a": b"kept", "b": b"dropped"})
+        dropped = Blob.from_string(b"dropped").id
+        del store._data[dropped]
+        missing = _bitmaps(store, tmp_path).find_missing_objects([c1])
+        assert dropped not in shas(missing)
+        assert Blob.from_string(b"kept").id in shas(missing)
+
+    def test_torn_append_is_discarded(self, history, tmp_path):
+        store, (c1, c2, c3) = history
+        _bitmaps(store, tmp_path).write_bitmaps([c3])
+        for name in ("objects.table", "bitmaps"):
+            with open(tmp_path / "lazyaf" / name, "ab") as f:
+                f.write(b"\x00" * 7)
+        missing = _bitmaps(store, tmp_path).find_missing_objects([c3], [c2])
+        assert set(shas(missing)) == set(shas(find_missing_objects(store, [c3], [c2])))
+
+    def test_walks_run_without_the_index_lock(self, history, tmp_path):
+        store, (c1, c2, c3) = history
+        bitmaps = _bitmaps(store, tmp_path)
+        bitmaps.write_bitmaps([c1])
+        locked = []
+
+        class CheckingStore(_RecordingStore):
+            def __getitem__(self, sha):
+                locked.append(bitmaps._index.lock.locked())
+                return super().__getitem__(sha)
+
+        bitmaps.object_store = CheckingStore(store)
+        missing = bitmaps.find_missing_objects([c3], [c1])
+        assert set(shas(missing)) == set(shas(find_missing_objects(store, [c3], [c1])))
+        assert locked and not any(locked)
+
+    def test_rebuild_keeps_only_current_tips(self, history, tmp_path):
+        store, (c1, c2, c3) = history
+        bitmaps = _bitmaps(store, tmp_path)
+        bitmaps.write_bitmaps([c1, c3])
+        table_size = (tmp_path / "lazyaf" / "objects.table").stat().st_size
+
+        assert bitmaps.rebuild([c2]) == 1
+        assert (tmp_path / "lazyaf" / "objects.table").stat().st_size < table_size
+        reloaded = _bitmaps(store, tmp_path)
+        reloaded._index.refresh()
+        assert list(reloaded._index.bitmaps) == [c2]
+        assert c3 not in reloaded._index.position
+        missing = reloaded.find_missing_objects([c3], [c1])
+        assert set(shas(missing)) == set(shas(find_missing_objects(store, [c3], [c1])))
+        assert not list((tmp_path / "lazyaf").glob("*.tmp"))
+
+    def test_least_recently_used_indexes_are_unloaded(self, history, tmp_path):
+        store, (c1, c2, c3) = history
+        cache = _IndexCache(max_loaded=1)
+        first = cache.get(tmp_path / "a")
+        ReachabilityBitmaps(first, store).write_bitmaps([c3])
+        assert first.bitmaps
+
+        cache.get(tmp_path / "b")
+        assert not first.bitmaps and not first.shas
+        assert cache.get(tmp_path / "a") is first
+        assert ReachabilityBitmaps(first, store).find_missing_objects([c3], [c3]) == []
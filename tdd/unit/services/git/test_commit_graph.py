@@ -0,0 +1,135 @@
+"""
+Unit tests for app.services.git.commit_graph.
+
+These tests verify:
+- Commit-graph ancestry queries (is-ancestor, merge-base, ahead/behind)
+- Persistence, incremental extension and rebuilding of the index
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.services.git.commit_graph import CommitGraph, _GraphIndex
+from shared.factories.git import make_commit
+
+
+# -----------------------------------------------------------------------------
+# Commit Graph Tests
+# -----------------------------------------------------------------------------
+
+@pytest.fixture
+def graph_store(tmp_path):
+    """
+    Object store with a fork and a merge:
+
+        base <- m1 <- m2 <----- merge
+            \                  /
+             f1 <- f2 <--------
+    """
+    from dulwich.object_store import MemoryObjectStore
+
+    store = MemoryObjectStore()
+    c = {}
+    c["base"] = make_commit(store, {"a": b"0"}, commit_time=1000)
+    c["m1"] = make_commit(store, {"a": b"1"}, [c["base"]], commit_time=1100)
+    c["m2"] = make_commit(store, {"a": b"2"}, [c["m1"]], commit_time=1200)
+    c["f1"] = make_commit(store, {"b": b"1"}, [c["base"]], commit_time=1150)
+    c["f2"] = make_commit(store, {"b": b"2"}, [c["f1"]], commit_time=1250)
+    c["merge"] = make_commit(store, {"a": b"2", "b": b"2"}, [c["m2"], c["f2"]], commit_time=1300)
+    return store, c, tmp_path / "commit-graph"
+
+
+def _graph(store, path):
+    return CommitGraph(_GraphIndex(path), store)
+
+
+class TestCommitGraph:
+    """Tests for CommitGraph."""
+
+    def test_generation_numbers(self, graph_store):
+        store, c, path = graph_store
+        graph = _graph(store, path)
+        assert graph.generation(c["base"]) == 1
+        assert graph.generation(c["f2"]) == 3
+        assert graph.generation(c["merge"]) == 4
+        assert graph.generation(b"f" * 40) is None
+
+    def test_is_ancestor(self, graph_store):
+        store, c, path = graph_store
+        graph = _graph(store, path)
+        assert graph.is_ancestor(c["base"], c["merge"])
+        assert graph.is_ancestor(c["f1"], c["merge"])
+        assert graph.is_ancestor(c["m2"], c["m2"])
+        assert not graph.is_ancestor(c["f1"], c["m2"])
+        assert not graph.is_ancestor(c["merge"], c["base"])
+
+    def test_merge_base(self, graph_store):
+        store, c, path = graph_store
+        graph = _graph(store, path)
+        assert graph.merge_base(c["m2"], c["f2"]) == c["base"]
+        assert graph.merge_base(c["merge"], c["f1"]) == c["f1"]
+        assert graph.merge_base(c["m1"], c["m1"]) == c["m1"]
+
+    def test_unrelated_histories_have_no_merge_base(self, graph_store):
+        store, c, path = graph_store
+        orphan = make_commit(store, {"z": b"z"}, commit_time=5000)
+        assert _graph(store, path).merge_base(orphan, c["merge"]) is None
+
+    def test_criss_cross_merge_base_is_a_best_common_ancestor(self, graph_store):
+        store, c, path = graph_store
+        x = make_commit(store, {"x": b"1"}, [c["m1"], c["f1"]], commit_time=1400)
+        y = make_commit(store, {"y": b"1"}, [c["f1"], c["m1"]], commit_time=1500)
+        assert _graph(store, path).merge_base(x, y) in {c["m1"], c["f1"]}
+
+    def test_ahead_behind(self, graph_store):
+        store, c, path = graph_store
+        graph = _graph(store, path)
+        assert graph.ahead_behind(c["m2"], c["f2"]) == (2, 2)
+        assert graph.ahead_behind(c["base"], c["merge"]) == (5, 0)
+        assert graph.ahead_behind(c["merge"], c["m2"]) == (0, 3)
+        assert graph.ahead_behind(c["m1"], c["m1"]) == (0, 0)
+
+    def test_index_is_persisted_and_extended_incrementally(self, graph_store):
+        store, c, path = graph_store
+        assert _graph(store, path).update([c["m2"]]) == 3
+        reloaded = _graph(store, path)
+        assert len(reloaded) == 3
+        assert reloaded.update([c["merge"]]) == 3
+        assert reloaded.update([c["merge"]]) == 0
+        assert _graph(store, path).is_ancestor(c["f1"], c["merge"])
+
+    def test_rebuild_keeps_only_commits_reachable_from_tips(self, graph_store):
+        store, c, path = graph_store
+        _graph(store, path).update([c["merge"]])
+        assert _graph(store, path).rebuild([c["m2"]]) == 3
+        graph = _graph(store, path)
+        assert len(graph) == 3
+        assert graph.is_ancestor(c["base"], c["m2"])
+        assert not list(path.parent.glob("*.tmp"))
+
+    def test_torn_append_is_discarded(self, graph_store):
+        store, c, path = graph_store
+        _graph(store, path).update([c["merge"]])
+        with open(path, "ab") as f:
+            f.write(b"\x00" * 10)
+        graph = _graph(store, path)
+        assert len(graph) == 6
+        assert graph.merge_base(c["m2"], c["f2"]) == c["base"]
+
+    def test_history_longer_than_walk_limit(self, tmp_path):
+        from dulwich.object_store import MemoryObjectStore
+
+        store = MemoryObjectStore()
+        root = tip = make_commit(store, {"a": b"0"}, commit_time=1)
+        for i in range(1500):
+            tip = make_commit(store, {"a": b"%d" % i}, [tip], commit_time=2 + i)
+        side = make_commit(store, {"side": b"1"}, [root], commit_time=5000)
+        graph = _graph(store, tmp_path / "commit-graph")
+        assert graph.is_ancestor(root, tip)
+        assert graph.merge_base(tip, side) == root
+        assert graph.ahead_behind(side, tip) == (1500, 1)
@@ -0,0 +1,61 @@
+"""
+Unit tests for app.services.git.filter.
+
+These tests verify:
+- Parsing of partial-clone filter specs
+- Omission of filtered blobs from a pack
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.services.git.filter import filter_objects, parse_filter_spec
+from app.services.git.walk import find_missing_objects
+from shared.factories.git import missing_objects
+
+
+# -----------------------------------------------------------------------------
+# Object Filter Tests
+# -----------------------------------------------------------------------------
+
+class TestObjectFilter:
+    """Tests for parse_filter_spec() and filter_objects()."""
+
+    def test_parses_supported_specs(self):
+        assert parse_filter_spec(b"blob:none").blob_limit == 0
+        assert parse_filter_spec(b"blob:limit=500").blob_limit == 500
+        assert parse_filter_spec(b"blob:limit=2k").blob_limit == 2048
+        assert parse_filter_spec(b"blob:limit=1M").blob_limit == 1 << 20
+
+    @pytest.mark.parametrize("spec", [b"tree:0", b"blob:limit=", b"blob:limit=x", b"sparse:oid=abc"])
+    def test_rejects_unsupported_specs(self, spec):
+        with pytest.raises(ValueError):
+            parse_filter_spec(spec)
+
+    def test_blob_none_keeps_commits_trees_and_wanted_blobs(self, history):
+        store, (_, _, c3) = history
+        missing = find_missing_objects(store, [c3])
+        readme = dict((e.path, e.sha) for e in store[store[c3].tree].items())[b"README"]
+        kept = filter_objects(store, missing, parse_filter_spec(b"blob:none"), keep=[readme])
+        assert [o for o in kept if o.type_num == 3] == [o for o in missing if o.sha == readme]
+        assert {o.sha for o in missing if o.type_num != 3} <= {o.sha for o in kept}
+
+    def test_blob_limit_omits_blobs_at_or_over_the_limit(self, history):
+        store, (_, _, c3) = history
+        missing = find_missing_objects(store, [c3])
+        kept = filter_objects(store, missing, parse_filter_spec(b"blob:limit=400"))
+        # big.py is exactly 400 bytes
+        assert {o.path for o in kept if o.type_num == 3} == {b"README", b"lib/util.py"}
+
+    def test_sizes_of_packed_deltas_come_from_the_pack(self, packed_store, monkeypatch):
+        store, blobs = packed_store
+        size = len(blobs[0].as_raw_string())
+        monkeypatch.setattr(type(store), "__getitem__", lambda self, sha: pytest.fail("blob was inflated"))
+        assert filter_objects(store, missing_objects(blobs), parse_filter_spec(b"blob:limit=%d" % size)) == []
+        kept = filter_objects(store, missing_objects(blobs), parse_filter_spec(b"blob:limit=%d" % (size + 1)))
+        assert len(kept) == 5
@@ -0,0 +1,105 @@
+"""
+Unit tests for app.services.git.negotiation.
+
+These tests verify:
+- have/want negotiation for protocol v0 (multi_ack_detailed, no-done)
+- Acknowledgments for protocol v2 fetch
+"""
+import sys
+from pathlib import Path
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.services.git.negotiation import negotiate, negotiate_v2
+from app.services.git.protocol import pkt_line, UploadPackRequest
+
+
+# -----------------------------------------------------------------------------
+# Negotiation Tests
+# -----------------------------------------------------------------------------
+
+def _request(wants, haves=(), caps=(b"multi_ack_detailed", b"no-done"), done=False):
+    return UploadPackRequest(wants=list(wants), haves=list(haves), capabilities=list(caps), done=done)
+
+
+class TestNegotiate:
+    """Tests for negotiate() ACK/NAK handling."""
+
+    def test_clone_without_haves_sends_nak_and_pack(self, history):
+        store, (_, _, c3) = history
+        result = negotiate(store, _request([c3], done=True))
+        assert result.lines == [pkt_line(b"NAK\n")]
+        assert result.send_pack is True
+
+    def test_detailed_acks_common_and_ready_with_no_done(self, history):
+        store, (_, c2, c3) = history
+        result = negotiate(store, _request([c3], [c2]))
+        assert result.lines == [
+            pkt_line(b"ACK " + c2 + b" common\n"),
+            pkt_line(b"ACK " + c2 + b" ready\n"),
+            pkt_line(b"NAK\n"),
+            pkt_line(b"ACK " + c2 + b"\n"),
+        ]
+        assert result.common == [c2]
+        assert result.send_pack is True
+
+    def test_unknown_haves_keep_negotiating(self, history):
+        store, (_, _, c3) = history
+        result = negotiate(store, _request([c3], [b"f" * 40]))
+        assert result.lines == [pkt_line(b"NAK\n")]
+        assert result.send_pack is False
+
+    def test_unknown_have_after_common_reports_ready(self, history):
+        store, (c1, _, c3) = history
+        result = negotiate(store, _request([c3], [c1, b"f" * 40]))
+        assert pkt_line(b"ACK " + b"f" * 40 + b" ready\n") in result.lines
+        assert result.send_pack is True
+
+    def test_without_no_done_waits_for_done(self, history):
+        store, (_, c2, c3) = history
+        result = negotiate(store, _request([c3], [c2], caps=[b"multi_ack_detailed"]))
+        assert result.send_pack is False
+        assert result.lines[-1] == pkt_line(b"NAK\n")
+
+    def test_done_acks_last_common(self, history):
+        store, (c1, c2, c3) = history
+        result = negotiate(store, _request([c3], [c2, c1], done=True))
+        assert result.lines[-1] == pkt_line(b"ACK " + c1 + b"\n")
+        assert result.common == [c2, c1]
+        assert result.send_pack is True
+
+    def test_plain_client_gets_single_ack(self, history):
+        store, (c1, c2, c3) = history
+        result = negotiate(store, _request([c3], [c2, c1], caps=[], done=True))
+        assert result.lines == [pkt_line(b"ACK " + c2 + b"\n")]
+        assert result.send_pack is True
+
+
+class TestNegotiateV2:
+    """Tests for negotiate_v2() acknowledgments."""
+
+    def test_done_skips_acknowledgments(self, history):
+        store, (_, c2, c3) = history
+        result = negotiate_v2(store, _request([c3], [c2], done=True))
+        assert result.lines == []
+        assert result.common == [c2]
+        assert result.send_pack is True
+
+    def test_common_have_is_acked_and_ready(self, history):
+        store, (_, c2, c3) = history
+        result = negotiate_v2(store, _request([c3], [b"f" * 40, c2]))
+        assert result.lines == [
+            pkt_line(b"acknowledgments\n"),
+            pkt_line(b"ACK " + c2 + b"\n"),
+            pkt_line(b"ready\n"),
+            b"0001",
+        ]
+        assert result.send_pack is True
+
+    def test_unknown_haves_get_nak_and_flush(self, history):
+        store, (_, _, c3) = history
+        result = negotiate_v2(store, _request([c3], [b"f" * 40]))
+        assert result.lines == [pkt_line(b"acknowledgments\n"), pkt_line(b"NAK\n"), b"0000"]
+        assert result.send_pack is False
@@ -0,0 +1,187 @@
+"""
+Unit tests for app.services.git.pack.
+
+These tests verify:
+- Streaming pack generation (header, objects, incremental checksum)
+- Delta compression and OFS_DELTA encoding
+"""
+import hashlib
+import struct
+import zlib
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.services.git.pack import (
+    PackStreamWriter,
+    create_delta,
+    delta_sort_key,
+    encode_object_header,
+    encode_ofs_delta_offset,
+    generate_pack,
+    pack_name_hash,
+)
+from shared.factories.git import unpack_into_store
+
+
+# -----------------------------------------------------------------------------
+# Pack Generation Tests
+# -----------------------------------------------------------------------------
+
+class TestEncodeObjectHeader:
+    """Tests for encode_object_header()."""
+
+    def test_small_size_fits_one_byte(self):
+        assert encode_object_header(3, 5) == bytes([(3 << 4) | 5])
+
+    def test_large_size_uses_continuation(self):
+        header = encode_object_header(3, 300)
+        assert header[0] & 0x80
+        assert not header[-1] & 0x80
+        # Decode back: low 4 bits, then 7 bits per byte
+        size = header[0] & 0x0f
+        shift = 4
+        for byte in header[1:]:
+            size |= (byte & 0x7f) << shift
+            shift += 7
+        assert size == 300
+
+
+class TestGeneratePack:
+    """Tests for generate_pack() and PackStreamWriter."""
+
+    def test_header_declares_count(self):
+        pack = b"".join(generate_pack([(3, b"one"), (3, b"two")], 2))
+        assert pack[:4] == b"PACK"
+        assert struct.unpack(">I", pack[4:8])[0] == 2
+        assert struct.unpack(">I", pack[8:12])[0] == 2
+
+    def test_trailer_is_sha1_of_pack(self):
+        pack = b"".join(generate_pack([(3, b"blob data")], 1))
+        assert pack[-20:] == hashlib.sha1(pack[:-20]).digest()
+
+    def test_object_payload_is_zlib_compressed(self):
+        pack = b"".join(generate_pack([(3, b"hello")], 1))
+        header = encode_object_header(3, 5)
+        body = pack[12 + len(header):-20]
+        assert zlib.decompress(body) == b"hello"
+
+    def test_yields_incrementally(self):
+        chunks = list(generate_pack([(3, b"a"), (3, b"b"), (3, b"c")], 3))
+        # header + one chunk per object + trailer
+        assert len(chunks) == 5
+
+    def test_count_mismatch_raises(self):
+        with pytest.raises(ValueError):
+            b"".join(generate_pack([(3, b"a")], 2))
+
+    def test_writer_tracks_offset(self):
+        writer = PackStreamWriter(1)
+        header = writer.header()
+        assert writer.offset == len(header) == 12
+        obj = writer.write_object(3, b"data")
+        assert writer.offset == 12 + len(obj)
+
+
+class TestDeltaPacks:
+    """Tests for OFS_DELTA output from generate_pack()."""
+
+    def _versions(self, count=5):
+        from dulwich.objects import Blob
+
+        text = b"".join(b"line %d of a reasonably long file\n" % i for i in range(200))
+        blobs = []
+        for i in range(count):
+            blobs.append(Blob.from_string(text + b"edit %d\n" % i))
+        return blobs
+
+    def test_delta_pack_is_smaller_and_round_trips(self):
+        blobs = self._versions()
+        objects = [(b.type_num, b.as_raw_string()) for b in blobs]
+        full = b"".join(generate_pack(objects, len(objects)))
+        deltified = b"".join(generate_pack(objects, len(objects), delta_window=10))
+        assert len(deltified) < len(full) // 2
+        store = unpack_into_store(deltified)
+        for blob in blobs:
+            assert store[blob.id].as_raw_string() == blob.as_raw_string()
+
+    def test_only_same_type_objects_are_bases(self):
+        from dulwich.objects import Blob
+
+        data = b"shared content that is long enough to deltify\n" * 20
+        objects = [(2, data), (Blob.type_num, data + b"x")]
+        pack = b"".join(generate_pack(objects, 2, delta_window=10))
+        # Second object starts right after the first; its type must stay a blob
+        first_len = len(encode_object_header(2, len(data)) + zlib.compress(data))
+        assert (pack[12 + first_len] >> 4) & 0x7 == Blob.type_num
+
+    def test_depth_limited_chains_round_trip(self):
+        blobs = self._versions(4)
+        objects = [(b.type_num, b.as_raw_string()) for b in blobs]
+        pack = b"".join(generate_pack(objects, len(objects), delta_window=1, delta_depth=1))
+        # With depth 1 and a window of 1, every other object is stored whole
+        store = unpack_into_store(pack)
+        assert len(list(store)) == 4
+
+    def test_small_objects_are_not_deltified(self):
+        objects = [(3, b"tiny"), (3, b"tiny!")]
+        assert b"".join(generate_pack(objects, 2, delta_window=10)) == b"".join(generate_pack(objects, 2))
+
+
+class TestCreateDelta:
+    """Tests for create_delta() and the OFS_DELTA encoding helpers."""
+
+    @pytest.mark.parametrize("base,target", [
+        (b"", b"new content"),
+        (b"abcdefghijklmnopqrstuvwxyz" * 10, b""),
+        (b"abcdefghijklmnopqrstuvwxyz" * 10, b"abcdefghijklmnopqrstuvwxyz" * 10 + b"!"),
+        (b"0123456789abcdef" * 5000, b"prefix" + b"0123456789abcdef" * 5000),
+        (b"unrelated base data " * 20, b"completely different target " * 20),
+    ])
+    def test_applies_back_to_target(self, base, target):
+        from dulwich.pack import apply_delta
+
+        assert b"".join(apply_delta(base, create_delta(base, target))) == target
+
+    def test_copies_shared_content(self):
+        base = b"".join(b"line %d\n" % i for i in range(1000))
+        target = base[:3000] + b"inserted\n" + base[3000:]
+        assert len(create_delta(base, target)) < 64
+
+    def test_max_size_gives_up_early(self):
+        """An unrelated target is abandoned after about max_size bytes, not scanned to the end."""
+        class CountingBytes(bytes):
+            reads = 0
+
+            def __getitem__(self, key):
+                CountingBytes.reads += 1
+                return super().__getitem__(key)
+
+        base = b"unrelated base data " * 1000
+        target = CountingBytes(bytes(range(256)) * 400)
+        assert create_delta(base, target, max_size=100) is None
+        assert CountingBytes.reads < 1000 < len(target)
+        assert create_delta(base, bytes(target)) is not None
+
+    def test_max_size_keeps_deltas_that_fit(self):
+        base = b"".join(b"line %d\n" % i for i in range(1000))
+        target = base[:3000] + b"inserted\n" + base[3000:]
+        delta = create_delta(base, target)
+        assert create_delta(base, target, max_size=len(delta)) == delta
+        assert create_delta(base, target, max_size=len(delta) - 1) is None
+
+    def test_ofs_delta_offset_encoding(self):
+        assert encode_ofs_delta_offset(1) == b"\x01"
+        assert encode_ofs_delta_offset(127) == b"\x7f"
+        # git's implicit +1 per continuation byte: 128 -> 0x80 0x00
+        assert encode_ofs_delta_offset(128) == b"\x80\x00"
+        assert encode_ofs_delta_offset(16511) == b"\xff\x7f"
+
+    def test_name_hash_groups_same_file_names(self):
+        assert pack_name_hash(b"a/Makefile") & 0xff000000 == pack_name_hash(b"b/Makefile") & 0xff000000
+        assert delta_sort_key(3, b"x/util.py")[0] == 3
@@ -0,0 +1,164 @@
+"""
+Unit tests for app.services.git.pack_cache.
+
+These tests verify:
+- Cache keys for want/common sets and pack options
+- Generated-pack cache (LRU eviction, coalescing of identical requests)
+- Generation on git workers
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.services.git.pack_cache import PackCache, pack_cache_key
+from app.services.git.workers import GitWorkerPool
+
+
+SHA_A = b"a" * 40
+SHA_B = b"b" * 40
+
+
+# -----------------------------------------------------------------------------
+# Pack Cache Tests
+# -----------------------------------------------------------------------------
+
+class TestPackCacheKey:
+    """Tests for pack_cache_key()."""
+
+    def test_ignores_order_and_duplicates(self):
+        assert pack_cache_key("r", [SHA_A, SHA_B], []) == pack_cache_key("r", [SHA_B, SHA_A, SHA_A], [])
+
+    def test_distinguishes_repo_sets_and_options(self):
+        base = pack_cache_key("r", [SHA_A], [SHA_B])
+        assert base != pack_cache_key("other", [SHA_A], [SHA_B])
+        assert base != pack_cache_key("r", [SHA_B], [SHA_A])
+        assert base != pack_cache_key("r", [SHA_A], [SHA_B], [b"ofs-delta"])
+
+
+class TestPackCache:
+    """Tests for PackCache."""
+
+    def _counting(self, data: bytes, calls: list):
+        def generate():
+            calls.append(1)
+            yield data[:3]
+            yield data[3:]
+        return generate
+
+    def test_miss_then_hit(self, tmp_path):
+        cache = PackCache(tmp_path, max_bytes=1024)
+        calls = []
+        first = b"".join(cache.get_or_generate("k", self._counting(b"PACKDATA", calls)))
+        second = b"".join(cache.get_or_generate("k", self._counting(b"PACKDATA", calls)))
+        assert first == second == b"PACKDATA"
+        assert len(calls) == 1
+        assert (tmp_path / "k.pack").read_bytes() == b"PACKDATA"
+
+    def test_concurrent_requests_share_one_generation(self, tmp_path):
+        import threading
+
+        cache = PackCache(tmp_path, max_bytes=1024)
+        release = threading.Event()
+        calls = []
+
+        def generate():
+            calls.append(1)
+            yield b"head"
+            release.wait(5)
+            yield b"tail"
+
+        leader = cache.get_or_generate("k", generate)
+        assert next(leader) == b"head"
+        follower = cache.get_or_generate("k", generate)
+        release.set()
+        assert b"head" + b"".join(leader) == b"".join(follower) == b"headtail"
+        assert len(calls) == 1
+
+    def test_generation_completes_when_caller_stops_reading(self, tmp_path):
+        import time
+
+        cache = PackCache(tmp_path, max_bytes=1024)
+        stream = cache.get_or_generate("k", self._counting(b"PACKDATA", []))
+        stream.close()
+        for _ in range(100):
+            if (tmp_path / "k.pack").exists():
+                break
+            time.sleep(0.01)
+        assert (tmp_path / "k.pack").read_bytes() == b"PACKDATA"
+
+    def test_errors_reach_every_reader_and_are_not_cached(self, tmp_path):
+        cache = PackCache(tmp_path, max_bytes=1024)
+
+        def failing():
+            yield b"partial"
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            b"".join(cache.get_or_generate("k", failing))
+        calls = []
+        assert b"".join(cache.get_or_generate("k", self._counting(b"PACKDATA", calls))) == b"PACKDATA"
+        assert len(calls) == 1
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = PackCache(tmp_path, max_bytes=20)
+        b"".join(cache.get_or_generate("a", self._counting(b"x" * 8, [])))
+        b"".join(cache.get_or_generate("b", self._counting(b"y" * 8, [])))
+        # Touch "a" so "b" becomes the eviction candidate
+        b"".join(cache.get_or_generate("a", self._counting(b"x" * 8, [])))
+        b"".join(cache.get_or_generate("c", self._counting(b"z" * 8, [])))
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["a.pack", "c.pack"]
+
+    def test_reloads_existing_entries_and_drops_partial_files(self, tmp_path):
+        (tmp_path / "k.pack").write_bytes(b"PACKDATA")
+        (tmp_path / "half.tmp").write_bytes(b"PA")
+        cache = PackCache(tmp_path, max_bytes=1024)
+        calls = []
+        assert b"".join(cache.get_or_generate("k", self._counting(b"other", calls))) == b"PACKDATA"
+        assert calls == []
+        assert not (tmp_path / "half.tmp").exists()
+
+    def test_generation_runs_on_git_workers(self, tmp_path):
+        import threading
+
+        pool = GitWorkerPool(2)
+        cache = PackCache(tmp_path, max_bytes=1024, submit=pool.submit)
+        threads = []
+
+        def generate():
+            threads.append(threading.current_thread().name)
+            yield b"PACKDATA"
+
+        try:
+            assert b"".join(cache.get_or_generate("k", generate)) == b"PACKDATA"
+        finally:
+            pool.shutdown()
+        assert threads[0].startswith("git-worker")
+
+    def test_requester_generates_when_workers_are_saturated(self, tmp_path, monkeypatch):
+        from app.services.git import pack_cache
+
+        monkeypatch.setattr(pack_cache, "CLAIM_TIMEOUT", 0.01)
+        pool = GitWorkerPool(1)
+        cache = PackCache(tmp_path, max_bytes=1024, submit=pool.submit)
+        calls = []
+        try:
+            # The requester holds the only worker, so the queued generation cannot start
+            result = pool.submit(lambda: b"".join(cache.get_or_generate("k", self._counting(b"PACKDATA", calls))))
+            assert result.result(5) == b"PACKDATA"
+        finally:
+            pool.shutdown()
+        assert len(calls) == 1
+        assert (tmp_path / "k.pack").read_bytes() == b"PACKDATA"
+
+    def test_zero_budget_disables_cache(self, tmp_path):
+        cache = PackCache(tmp_path / "cache", max_bytes=0)
+        calls = []
+        for _ in range(2):
+            assert b"".join(cache.get_or_generate("k", self._counting(b"PACKDATA", calls))) == b"PACKDATA"
+        assert len(calls) == 2
+        assert not (tmp_path / "cache").exists()
@@ -0,0 +1,169 @@
+"""
+Unit tests for app.services.git.protocol.
+
+These tests verify:
+- pkt-line decoding and upload-pack request parsing
+- Protocol v2 command requests and fetch arguments
+- Side-band framing of pack streams
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.services.git.protocol import (
+    iter_pkt_lines,
+    parse_command_request,
+    parse_fetch_args,
+    parse_upload_pack_request,
+    pkt_line,
+    protocol_version,
+    sideband_frames,
+)
+
+
+SHA_A = b"a" * 40
+SHA_B = b"b" * 40
+
+
+# -----------------------------------------------------------------------------
+# pkt-line Decoding Tests
+# -----------------------------------------------------------------------------
+
+class TestIterPktLines:
+    """Tests for iter_pkt_lines()."""
+
+    def test_decodes_lines_and_strips_newline(self):
+        data = pkt_line(b"hello\n") + pkt_line(b"world")
+        assert list(iter_pkt_lines(data)) == [b"hello", b"world"]
+
+    def test_flush_and_delim_yield_none(self):
+        data = pkt_line(b"a\n") + b"0000" + pkt_line(b"b\n") + b"0001"
+        assert list(iter_pkt_lines(data)) == [b"a", None, b"b", None]
+
+    def test_stops_on_malformed_length(self):
+        data = pkt_line(b"a\n") + b"zzzz"
+        assert list(iter_pkt_lines(data)) == [b"a"]
+
+
+class TestParseUploadPackRequest:
+    """Tests for parse_upload_pack_request()."""
+
+    def test_parses_wants_haves_caps_and_done(self):
+        data = (
+            pkt_line(b"want " + SHA_A + b" side-band-64k ofs-delta\n")
+            + pkt_line(b"want " + SHA_B + b"\n")
+            + b"0000"
+            + pkt_line(b"have " + SHA_B + b"\n")
+            + pkt_line(b"done\n")
+        )
+        request = parse_upload_pack_request(data)
+        assert request.wants == [SHA_A, SHA_B]
+        assert request.haves == [SHA_B]
+        assert request.capabilities == [b"side-band-64k", b"ofs-delta"]
+        assert request.done is True
+        assert request.has_capability(b"ofs-delta")
+
+    def test_parses_shallow_and_deepen_lines(self):
+        data = (
+            pkt_line(b"want " + SHA_A + b" side-band-64k deepen-relative\n")
+            + pkt_line(b"shallow " + SHA_B + b"\n")
+            + pkt_line(b"deepen 3\n")
+            + pkt_line(b"deepen-since 1700000000\n")
+            + pkt_line(b"deepen-not refs/tags/v1\n")
+            + b"0000"
+        )
+        request = parse_upload_pack_request(data)
+        assert request.shallows == [SHA_B]
+        assert request.depth == 3
+        assert request.deepen_since == 1700000000
+        assert request.deepen_not == [b"refs/tags/v1"]
+        assert request.deepen_relative is True
+        assert request.deepen is True
+
+    def test_invalid_deepen_values_are_rejected(self):
+        for line in (b"deepen three\n", b"deepen -1\n", b"deepen-since yesterday\n"):
+            request = parse_upload_pack_request(pkt_line(b"want " + SHA_A + b"\n") + pkt_line(line) + b"0000")
+            assert request.deepen is False
+            with pytest.raises(ValueError, match="invalid deepen"):
+                request.validate()
+        parse_upload_pack_request(pkt_line(b"want " + SHA_A + b"\n") + pkt_line(b"deepen 2\n")).validate()
+
+    def test_parses_filter_line(self):
+        data = (
+            pkt_line(b"want " + SHA_A + b" side-band-64k filter\n")
+            + pkt_line(b"filter blob:none\n")
+            + b"0000"
+        )
+        request = parse_upload_pack_request(data)
+        assert request.filter_spec == b"blob:none"
+        assert request.has_capability(b"filter")
+
+    def test_flush_only_is_empty_request(self):
+        request = parse_upload_pack_request(b"0000")
+        assert request.wants == []
+        assert request.done is False
+
+
+class TestProtocolV2Requests:
+    """Tests for protocol_version(), parse_command_request() and parse_fetch_args()."""
+
+    def test_protocol_version_from_header(self):
+        assert protocol_version(None) == 0
+        assert protocol_version("version=2") == 2
+        assert protocol_version("object-format=sha1:version=1:version=2") == 2
+        assert protocol_version("version=x") == 0
+
+    def test_parses_command_capabilities_and_args(self):
+        data = (
+            pkt_line(b"command=ls-refs\n")
+            + pkt_line(b"agent=git/2.39\n")
+            + b"0001"
+            + pkt_line(b"symrefs\n")
+            + pkt_line(b"ref-prefix refs/heads/main\n")
+            + b"0000"
+        )
+        request = parse_command_request(data)
+        assert request.command == b"ls-refs"
+        assert request.capabilities == [b"agent=git/2.39"]
+        assert request.args == [b"symrefs", b"ref-prefix refs/heads/main"]
+
+    def test_fetch_args_become_upload_pack_request(self):
+        request = parse_fetch_args([b"thin-pack", b"ofs-delta", b"want " + SHA_A, b"have " + SHA_B, b"done"])
+        assert request.wants == [SHA_A]
+        assert request.haves == [SHA_B]
+        assert request.done is True
+        assert request.has_capability(b"ofs-delta")
+
+    def test_fetch_filter_argument(self):
+        request = parse_fetch_args([b"want " + SHA_A, b"filter blob:limit=1k", b"done"])
+        assert request.filter_spec == b"blob:limit=1k"
+        assert request.capabilities == []
+
+
+# -----------------------------------------------------------------------------
+# Side-band Framing Tests
+# -----------------------------------------------------------------------------
+
+class TestSidebandFrames:
+    """Tests for sideband_frames()."""
+
+    def test_coalesces_small_chunks(self):
+        frames = list(sideband_frames([b"ab", b"cd", b"ef"], max_data=100))
+        assert frames == [pkt_line(b"\x01abcdef")]
+
+    def test_splits_large_chunks(self):
+        frames = list(sideband_frames([b"x" * 25], max_data=10))
+        assert [len(f) for f in frames] == [15, 15, 10]
+        assert all(f[4:5] == b"\x01" for f in frames)
+
+    def test_uses_requested_band(self):
+        frames = list(sideband_frames([b"oops"], band=3))
+        assert frames == [pkt_line(b"\x03oops")]
+
+    def test_empty_stream_yields_nothing(self):
+        assert list(sideband_frames([])) == []
@@ -0,0 +1,114 @@
+"""
+Unit tests for app.services.git.reuse.
+
+These tests verify:
+- Verbatim reuse of entries from on-disk packs
+"""
+import sys
+from pathlib import Path
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.services.git.reuse import plan_pack_reuse
+from shared.factories.git import missing_objects, unpack_into_store
+
+
+# -----------------------------------------------------------------------------
+# Pack Reuse Tests
+# -----------------------------------------------------------------------------
+
+def _pack_types(pack: bytes, tmp_path) -> list[int]:
+    """Return the stored entry types of a pack, in order."""
+    from dulwich.pack import PackData
+
+    path = tmp_path / "out.pack"
+    path.write_bytes(pack)
+    data = PackData(str(path), object_format=_object_format())
+    try:
+        return [u.pack_type_num for u in data.iter_unpacked()]
+    finally:
+        data.close()
+
+
+def _object_format():
+    from dulwich.object_format import DEFAULT_OBJECT_FORMAT
+
+    return DEFAULT_OBJECT_FORMAT
+
+
+class TestPackReuse:
+    """Tests for plan_pack_reuse() and PackReuse.generate_pack()."""
+
+    def _build(self, reuse, store):
+        fresh = ((store[o.sha].type_num, store[o.sha].as_raw_string()) for o in reuse.fresh)
+        return b"".join(reuse.generate_pack(fresh))
+
+    def test_packed_objects_are_copied_with_their_deltas(self, packed_store, tmp_path):
+        from dulwich.pack import OFS_DELTA
+
+        store, blobs = packed_store
+        reuse = plan_pack_reuse(store, missing_objects(blobs))
+        assert reuse.reused_count == 5 and reuse.fresh == []
+        pack = self._build(reuse, store)
+        assert OFS_DELTA in _pack_types(pack, tmp_path)
+        out = unpack_into_store(pack)
+        for blob in blobs:
+            assert out[blob.id].as_raw_string() == blob.as_raw_string()
+
+    def test_deltas_against_unsent_bases_are_sent_whole(self, packed_store, tmp_path):
+        store, blobs = packed_store
+        reuse = plan_pack_reuse(store, missing_objects(blobs[1:2]))
+        pack = self._build(reuse, store)
+        assert _pack_types(pack, tmp_path) == [blobs[1].type_num]
+        assert unpack_into_store(pack)[blobs[1].id].as_raw_string() == blobs[1].as_raw_string()
+
+    def test_without_ofs_delta_uses_ref_deltas(self, packed_store, tmp_path):
+        from dulwich.pack import OFS_DELTA
+
+        store, blobs = packed_store
+        reuse = plan_pack_reuse(store, missing_objects(blobs), allow_ofs_delta=False)
+        pack = self._build(reuse, store)
+        assert OFS_DELTA not in _pack_types(pack, tmp_path)
+        out = unpack_into_store(pack)
+        assert {b.id for b in blobs} <= set(out)
+
+    def test_loose_objects_are_encoded_fresh(self, packed_store):
+        from dulwich.objects import Blob
+
+        store, blobs = packed_store
+        loose = Blob.from_string(b"loose object\n")
+        store.add_object(loose)
+        reuse = plan_pack_reuse(store, missing_objects([loose] + blobs))
+        assert reuse.reused_count == 5
+        assert [o.sha for o in reuse.fresh] == [loose.id]
+        out = unpack_into_store(self._build(reuse, store))
+        assert out[loose.id].as_raw_string() == b"loose object\n"
+
+    def test_corrupt_entry_falls_back_to_object_store(self, packed_store, monkeypatch):
+        store, blobs = packed_store
+        reuse = plan_pack_reuse(store, missing_objects(blobs))
+        layout, _ = reuse.reused[0]
+        monkeypatch.setattr(layout, "crc_at", {offset: 0 for offset in layout.crc_at})
+        out = unpack_into_store(self._build(reuse, store))
+        for blob in blobs:
+            assert out[blob.id].as_raw_string() == blob.as_raw_string()
+
+    def test_pack_layout_is_reused_between_requests(self, packed_store, monkeypatch):
+        """Only the first fetch from a pack reads its whole index."""
+        from app.services.git import reuse as reuse_module
+
+        store, blobs = packed_store
+        built = []
+        original = reuse_module._PackLayout
+        monkeypatch.setattr(reuse_module, "_PackLayout", lambda pack: built.append(pack) or original(pack))
+
+        first = plan_pack_reuse(store, missing_objects(blobs))
+        second = plan_pack_reuse(store, missing_objects(blobs[:1]))
+        assert len(built) == 1
+        assert first.reused[0][0] is second.reused[0][0]
+
+        reuse_module.forget_pack_layout(store.packs[0])
+        plan_pack_reuse(store, missing_objects(blobs[:1]))
+        assert len(built) == 2
@@ -0,0 +1,67 @@
+"""
+Unit tests for app.services.git.shallow.
+
+These tests verify:
+- Shallow boundaries for deepen, deepen-since and deepen-not
+- Unshallowing of a client's existing boundary
+"""
+import sys
+from pathlib import Path
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.services.git.shallow import INFINITE_DEPTH, compute_shallow
+
+
+# -----------------------------------------------------------------------------
+# Shallow Boundary Tests
+# -----------------------------------------------------------------------------
+
+class TestComputeShallow:
+    """Tests for compute_shallow() boundaries."""
+
+    def test_depth_counts_wanted_commit_as_one(self, history):
+        store, (_, c2, c3) = history
+        assert compute_shallow(store, [c3], [], depth=1).shallow == [c3]
+        info = compute_shallow(store, [c3], [], depth=2)
+        assert info.shallow == [c2]
+        assert info.boundary == {c2}
+
+    def test_deepening_unshallows_client_boundary(self, history):
+        store, (c1, c2, c3) = history
+        info = compute_shallow(store, [c3], [c3], depth=3)
+        assert info.shallow == [c1]
+        assert info.unshallow == [c3]
+        assert info.extra_wants == [c2]
+
+    def test_existing_boundary_is_not_resent(self, history):
+        store, (_, _, c3) = history
+        info = compute_shallow(store, [c3], [c3], depth=1)
+        assert info.shallow == []
+        assert info.unshallow == []
+
+    def test_deepen_relative_counts_from_client_boundary(self, history):
+        store, (c1, c2, c3) = history
+        info = compute_shallow(store, [c3], [c3], depth=1, deepen_relative=True)
+        assert info.shallow == [c2]
+        assert info.unshallow == [c3]
+
+    def test_deepen_since_and_not(self, history):
+        store, (c1, c2, c3) = history
+        assert compute_shallow(store, [c3], [], deepen_since=2000).shallow == [c2]
+        assert compute_shallow(store, [c3], [], deepen_not=[c1]).shallow == [c2]
+
+    def test_unshallow_removes_every_boundary(self, history):
+        store, (_, c2, c3) = history
+        info = compute_shallow(store, [c3], [c3], depth=INFINITE_DEPTH)
+        assert info.shallow == []
+        assert info.unshallow == [c3]
+        assert info.extra_wants == [c2]
+
+    def test_without_deepen_keeps_client_boundary(self, history):
+        store, (_, c2, c3) = history
+        info = compute_shallow(store, [c3], [c2])
+        assert info.lines() == []
+        assert info.boundary == {c2}
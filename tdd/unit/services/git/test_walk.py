@@ -0,0 +1,109 @@
+"""
+Unit tests for app.services.git.walk.
+
+These tests verify:
+- Missing-object walks from wants to haves
+- Reachability checks between commits
+"""
+import sys
+from pathlib import Path
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.services.git.walk import find_missing_objects, reaches_any
+from shared.factories.git import make_commit, shas
+
+
+# -----------------------------------------------------------------------------
+# Object Walk Tests
+# -----------------------------------------------------------------------------
+
+class TestFindMissingObjects:
+    """Tests for find_missing_objects()."""
+
+    def test_full_clone_includes_everything(self, history):
+        store, (c1, c2, c3) = history
+        missing = shas(find_missing_objects(store, [c3]))
+        # 3 commits, 3 root trees, 3 READMEs, 1 lib tree, 2 lib blobs
+        assert len(missing) == 12
+        assert missing[:3] == [c3, c2, c1]
+
+    def test_excludes_objects_reachable_from_common(self, history):
+        store, (c1, c2, c3) = history
+        missing = shas(find_missing_objects(store, [c3], [c2]))
+        head = store[c3]
+        readme = dict((e.path, e.sha) for e in store[head.tree].items())[b"README"]
+        assert set(missing) == {c3, head.tree, readme}
+
+    def test_common_older_ancestor_still_prunes_unchanged_subtrees(self, history):
+        store, (c1, c2, c3) = history
+        missing = shas(find_missing_objects(store, [c3], [c1]))
+        lib_tree = dict((e.path, e.sha) for e in store[store[c3].tree].items())[b"lib"]
+        assert c1 not in missing
+        assert lib_tree not in missing
+        assert {c2, c3} <= set(missing)
+
+    def test_shallow_commits_stop_the_walk(self, history):
+        store, (_, c2, c3) = history
+        missing = shas(find_missing_objects(store, [c3], shallow=[c2]))
+        assert missing[:2] == [c3, c2]
+        assert len(missing) == 9  # 2 commits, 2 root trees, 2 READMEs, lib tree, 2 lib blobs
+
+    def test_want_equal_to_common_sends_nothing(self, history):
+        store, (_, _, c3) = history
+        assert find_missing_objects(store, [c3], [c3]) == []
+
+    def test_reports_types_and_paths(self, history):
+        from dulwich.objects import Blob, Commit, Tree
+
+        store, (c1, _, _) = history
+        missing = find_missing_objects(store, [c1])
+        by_path = {obj.path: obj for obj in missing if obj.path}
+        assert missing[0].type_num == Commit.type_num
+        assert by_path[b"lib"].type_num == Tree.type_num
+        assert by_path[b"lib/util.py"].type_num == Blob.type_num
+        assert by_path[b"README"].sha == dict(
+            (e.path, e.sha) for e in store[store[c1].tree].items()
+        )[b"README"]
+
+    def test_annotated_tag_includes_target(self, history):
+        from dulwich.objects import Tag, Commit
+
+        store, (c1, _, _) = history
+        tag = Tag()
+        tag.name = b"v1"
+        tag.object = (Commit, c1)
+        tag.tagger = b"Test <test@example.com>"
+        tag.tag_time = 1000
+        tag.tag_timezone = 0
+        tag.message = b"v1"
+        store.add_object(tag)
+        missing = shas(find_missing_objects(store, [tag.id]))
+        assert missing[0] == tag.id
+        assert c1 in missing
+
+    def test_merge_history_excludes_shared_side(self):
+        from dulwich.object_store import MemoryObjectStore
+
+        store = MemoryObjectStore()
+        base = make_commit(store, {"a": b"1"}, commit_time=1000)
+        left = make_commit(store, {"a": b"1", "l": b"l"}, [base], commit_time=2000)
+        right = make_commit(store, {"a": b"1", "r": b"r"}, [base], commit_time=2500)
+        merge = make_commit(store, {"a": b"1", "l": b"l", "r": b"r"}, [left, right], commit_time=3000)
+        missing = shas(find_missing_objects(store, [merge], [left]))
+        assert merge in missing and right in missing
+        assert left not in missing and base not in missing
+
+
+class TestReachesAny:
+    """Tests for reaches_any()."""
+
+    def test_finds_ancestor(self, history):
+        store, (c1, _, c3) = history
+        assert reaches_any(store, c3, {c1}, cutoff_time=1000)
+
+    def test_descendant_is_not_reachable(self, history):
+        store, (c1, _, c3) = history
+        assert not reaches_any(store, c1, {c3}, cutoff_time=3000)
@@ -0,0 +1,94 @@
+"""
+Unit tests for app.services.git.workers.
+
+These tests verify:
+- Calls run off the event loop on a bounded pool
+- Queue depth, completion and failure stats
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.services.git.workers import GitWorkerPool
+
+
+# -----------------------------------------------------------------------------
+# Git Worker Pool Tests
+# -----------------------------------------------------------------------------
+
+class TestGitWorkerPool:
+    """Tests for GitWorkerPool."""
+
+    async def test_runs_calls_off_the_event_loop_thread(self):
+        import threading
+
+        pool = GitWorkerPool(2)
+        try:
+            thread_id = await pool.run(threading.get_ident)
+            assert thread_id != threading.get_ident()
+            assert await pool.run(lambda a, b=0: a + b, 1, b=2) == 3
+        finally:
+            pool.shutdown()
+
+    async def test_event_loop_keeps_running_during_blocking_call(self):
+        import asyncio
+        import threading
+
+        pool = GitWorkerPool(1)
+        release = threading.Event()
+        try:
+            blocked = asyncio.ensure_future(pool.run(release.wait, 5))
+            ticks = 0
+            for _ in range(10):
+                await asyncio.sleep(0.001)
+                ticks += 1
+            assert ticks == 10
+            assert not blocked.done()
+            release.set()
+            assert await blocked is True
+        finally:
+            pool.shutdown()
+
+    async def test_concurrency_limit_and_queue_depth(self):
+        import asyncio
+        import threading
+
+        pool = GitWorkerPool(2)
+        release = threading.Event()
+        try:
+            calls = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(5)]
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if pool.stats()["running"] == 2:
+                    break
+            stats = pool.stats()
+            assert stats["running"] == 2
+            assert stats["queued"] == 3
+            release.set()
+            await asyncio.gather(*calls)
+            stats = pool.stats()
+            assert (stats["running"], stats["queued"], stats["completed"]) == (0, 0, 5)
+            assert stats["peak_queued"] >= 3
+        finally:
+            pool.shutdown()
+
+    async def test_errors_propagate_and_are_counted(self):
+        pool = GitWorkerPool(1)
+        try:
+            with pytest.raises(ValueError):
+                await pool.run(int, "not a number")
+            assert pool.stats()["failed"] == 1
+        finally:
+            pool.shutdown()
+
+    async def test_iterate_consumes_blocking_iterator(self):
+        pool = GitWorkerPool(1)
+        try:
+            assert [item async for item in pool.iterate(iter([b"a", b"b", b"c"]))] == [b"a", b"b", b"c"]
+        finally:
+            pool.shutdown()
@@ -540,3 +540,839 @@ class TestRebaseBranch:
         result = manager.rebase_branch(repo_id, "feature", "main")
         assert result["success"] is True
         assert "up to date" in result["message"].lower()
+
+
+# -----------------------------------------------------------------------------
+# Repo Handle Cache Tests
+# -----------------------------------------------------------------------------
+
+def _commit_on(repo, ref: bytes, content: bytes, parents=()):
+    """Write a one-file commit straight into repo and point ref at it."""
+    from dulwich.objects import Blob, Tree, Commit
+
+    blob = Blob.from_string(content)
+    tree = Tree()
+    tree.add(b"file.txt", 0o100644, blob.id)
+    commit = Commit()
+    commit.tree = tree.id
+    commit.parents = list(parents)
+    commit.author = commit.committer = b"Test <test@example.com>"
+    commit.author_time = commit.commit_time = 1000
+    commit.author_timezone = commit.commit_timezone = 0
+    commit.message = content
+    for obj in (blob, tree, commit):
+        repo.object_store.add_object(obj)
+    repo.refs[ref] = commit.id
+    return commit.id
+
+
+class TestRepoHandleCache:
+    """Tests for the cached repo handles and ref snapshots."""
+
+    def test_get_repo_reuses_handle(self, repo_manager, sample_repo_id):
+        """Repeated get_repo() calls return the same open handle."""
+        repo_manager.create_bare_repo(sample_repo_id)
+        assert repo_manager.get_repo(sample_repo_id) is repo_manager.get_repo(sample_repo_id)
+
+    def test_cache_size_zero_opens_fresh_handles(self, temp_repos_dir, sample_repo_id):
+        """A zero-sized cache opens a new handle every time."""
+        manager = GitRepoManager(repos_dir=temp_repos_dir, repo_cache_size=0)
+        manager.create_bare_repo(sample_repo_id)
+        assert manager.get_repo(sample_repo_id) is not manager.get_repo(sample_repo_id)
+
+    def test_least_recently_used_handle_is_evicted(self, temp_repos_dir):
+        """Only repo_cache_size handles are kept."""
+        manager = GitRepoManager(repos_dir=temp_repos_dir, repo_cache_size=2)
+        for repo_id in ("a", "b", "c"):
+            manager.create_bare_repo(repo_id)
+        a = manager.get_repo("a")
+        manager.get_repo("b")
+        manager.get_repo("a")
+        manager.get_repo("c")
+        assert len(manager._handles) == 2
+        assert manager.get_repo("a") is a
+
+    def test_ref_snapshot_invalidated_by_branch_delete(self, repo_manager, sample_repo_id):
+        """Deleting a branch through the manager refreshes the ref snapshot."""
+        repo_manager.create_bare_repo(sample_repo_id)
+        repo = repo_manager.get_repo(sample_repo_id)
+        main = _commit_on(repo, b"refs/heads/main", b"main")
+        repo.refs.set_symbolic_ref(b"HEAD", b"refs/heads/main")
+        _commit_on(repo, b"refs/heads/feature", b"feature", [main])
+
+        assert repo_manager.list_branches(sample_repo_id) == ["feature", "main"]
+        assert repo_manager.delete_branch(sample_repo_id, "feature", force=True)["success"]
+        assert repo_manager.list_branches(sample_repo_id) == ["main"]
+
+    def test_ref_snapshot_invalidated_by_merge(self, repo_manager, sample_repo_id):
+        """A merge moves the target ref in the snapshot."""
+        repo_manager.create_bare_repo(sample_repo_id)
+        repo = repo_manager.get_repo(sample_repo_id)
+        main = _commit_on(repo, b"refs/heads/main", b"main")
+        feature = _commit_on(repo, b"refs/heads/feature", b"feature", [main])
+
+        assert repo_manager.get_branch_commit(sample_repo_id, "main") == main.decode()
+        assert repo_manager.merge_branch(sample_repo_id, "feature", "main")["success"]
+        assert repo_manager.get_branch_commit(sample_repo_id, "main") == feature.decode()
+
+    def test_deleted_and_recreated_repo_gets_fresh_handle(self, repo_manager, sample_repo_id):
+        """delete_repo() drops the cached handle and refs."""
+        repo_manager.create_bare_repo(sample_repo_id)
+        old = repo_manager.get_repo(sample_repo_id)
+        _commit_on(old, b"refs/heads/main", b"main")
+        assert repo_manager.list_branches(sample_repo_id) == ["main"]
+
+        repo_manager.delete_repo(sample_repo_id)
+        assert repo_manager.get_repo(sample_repo_id) is None
+        repo_manager.create_bare_repo(sample_repo_id)
+        assert repo_manager.get_repo(sample_repo_id) is not old
+        assert repo_manager.list_branches(sample_repo_id) == []
+
+    def test_shared_handle_reads_packs_from_many_threads(self, repo_manager, sample_repo_id):
+        """Concurrent reads through one cached handle return the right objects."""
+        from concurrent.futures import ThreadPoolExecutor
+        from dulwich.objects import Blob
+
+        repo_manager.create_bare_repo(sample_repo_id)
+        repo = repo_manager.get_repo(sample_repo_id)
+        blobs = [Blob.from_string(b"blob %d\n" % i * 50) for i in range(200)]
+        repo.object_store.add_objects([(blob, None) for blob in blobs])
+
+        def read_all(offset):
+            shared = repo_manager.get_repo(sample_repo_id)
+            for i in range(len(blobs)):
+                blob = blobs[(i + offset) % len(blobs)]
+                assert shared.object_store[blob.id].data == blob.data
+            return True
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            assert all(pool.map(read_all, range(0, 200, 25)))
+
+
+# -----------------------------------------------------------------------------
+# Ref Packing Tests
+# -----------------------------------------------------------------------------
+
+@pytest.fixture
+def many_branches(repo_manager, sample_repo_id):
+    """Repo with main and ten loose lazyaf/* branches."""
+    repo_manager.create_bare_repo(sample_repo_id)
+    repo = repo_manager.get_repo(sample_repo_id)
+    main = _commit_on(repo, b"refs/heads/main", b"main")
+    repo.refs.set_symbolic_ref(b"HEAD", b"refs/heads/main")
+    for i in range(10):
+        _commit_on(repo, b"refs/heads/lazyaf/job-%d" % i, b"job %d" % i, [main])
+    return repo
+
+
+class TestPackRefs:
+    """Tests for pack_refs(), get_ref_counts() and maybe_pack_refs()."""
+
+    def test_packs_loose_refs_and_keeps_values(self, repo_manager, sample_repo_id, many_branches):
+        """Every loose ref moves to packed-refs; refs read the same afterwards."""
+        before = many_branches.get_refs()
+        assert repo_manager.get_ref_counts(sample_repo_id) == {"loose": 11, "packed": 0, "total": 11}
+
+        result = repo_manager.pack_refs(sample_repo_id)
+
+        assert result["success"] and result["packed"] == 11 and result["pruned"] == 11
+        assert result["refs"] == {"loose": 0, "packed": 11, "total": 11}
+        # Empty refs/heads/lazyaf is pruned, refs/heads stays
+        lazyaf_dir = repo_manager.get_repo_path(sample_repo_id) / "refs" / "heads" / "lazyaf"
+        assert not lazyaf_dir.exists() and lazyaf_dir.parent.is_dir()
+        assert GitRepoManager(repos_dir=repo_manager.repos_dir).get_repo(sample_repo_id).get_refs() == before
+
+    def test_updates_and_deletes_after_packing(self, repo_manager, sample_repo_id, many_branches):
+        """Packed branches can still be moved and deleted through the manager."""
+        repo_manager.pack_refs(sample_repo_id)
+        main = many_branches.refs[b"refs/heads/main"]
+        moved = _commit_on(many_branches, b"refs/heads/lazyaf/job-1", b"moved", [main])
+        assert repo_manager.delete_branch(sample_repo_id, "lazyaf/job-2", force=True)["success"]
+        repo_manager.invalidate_refs(sample_repo_id)
+
+        branches = repo_manager.list_branches(sample_repo_id)
+        assert "lazyaf/job-2" not in branches and len(branches) == 10
+        assert repo_manager.get_branch_commit(sample_repo_id, "lazyaf/job-1") == moved.decode()
+        assert repo_manager.get_ref_counts(sample_repo_id) == {"loose": 1, "packed": 10, "total": 10}
+
+    def test_loose_ref_updated_during_packing_is_kept(self, repo_manager, sample_repo_id, many_branches, monkeypatch):
+        """A ref rewritten between reading and pruning keeps its newer loose value."""
+        from app.services.git import refs as refs_module
+
+        main = many_branches.refs[b"refs/heads/main"]
+        write_packed = refs_module._write_packed
+
+        def write_then_update(repo, update, drop=None):
+            write_packed(repo, update, drop)
+            if update:
+                _commit_on(many_branches, b"refs/heads/lazyaf/job-3", b"concurrent", [main])
+
+        monkeypatch.setattr(refs_module, "_write_packed", write_then_update)
+        result = repo_manager.pack_refs(sample_repo_id)
+
+        assert result["kept"] == 1 and result["pruned"] == 10
+        fresh = GitRepoManager(repos_dir=repo_manager.repos_dir).get_repo(sample_repo_id)
+        assert fresh.refs[b"refs/heads/lazyaf/job-3"] == many_branches.refs[b"refs/heads/lazyaf/job-3"]
+
+    def test_ref_deleted_during_packing_stays_deleted(self, repo_manager, sample_repo_id, many_branches, monkeypatch):
+        """A branch deleted before packed-refs was written is not resurrected."""
+        from app.services.git import refs as refs_module
+
+        read_loose = refs_module.read_loose_refs
+
+        def read_then_delete(controldir):
+            loose = read_loose(controldir)
+            del many_branches.refs[b"refs/heads/lazyaf/job-4"]
+            return loose
+
+        monkeypatch.setattr(refs_module, "read_loose_refs", read_then_delete)
+        repo_manager.pack_refs(sample_repo_id)
+
+        fresh = GitRepoManager(repos_dir=repo_manager.repos_dir).get_repo(sample_repo_id)
+        assert b"refs/heads/lazyaf/job-4" not in fresh.get_refs()
+        assert len(fresh.get_refs()) == 11  # HEAD, main and nine job branches
+
+    def test_maybe_pack_refs_respects_threshold(self, repo_manager, sample_repo_id, many_branches):
+        assert repo_manager.maybe_pack_refs(sample_repo_id, threshold=20) is None
+        assert repo_manager.maybe_pack_refs(sample_repo_id, threshold=5)["packed"] == 11
+        assert repo_manager.maybe_pack_refs(sample_repo_id, threshold=5) is None
+
+    async def test_maintenance_pass_packs_repos_over_threshold(self, repo_manager, sample_repo_id, many_branches):
+        """GitMaintenance.run_once() packs refs of repos with enough loose refs."""
+        from app.services.git_maintenance import GitMaintenance
+
+        repo_manager.create_bare_repo("quiet-repo")
+        maintenance = GitMaintenance(repo_manager, pack_refs_threshold=5)
+        results = await maintenance.run_once()
+        assert list(results) == [sample_repo_id]
+        assert results[sample_repo_id]["pack_refs"]["refs"]["loose"] == 0
+        assert await maintenance.run_once() == {}
+
+    def test_missing_repo(self, repo_manager):
+        assert repo_manager.get_ref_counts("nope") is None
+        assert repo_manager.pack_refs("nope") == {"success": False, "error": "Repository not found"}
+
+    def test_annotated_tags_are_packed_with_peeled_target(self, repo_manager, sample_repo_id, many_branches):
+        from dulwich.objects import Tag
+
+        main = many_branches.refs[b"refs/heads/main"]
+        tag = Tag()
+        tag.name = b"v1"
+        tag.object = (many_branches[main].__class__, main)
+        tag.tagger = b"Test <test@example.com>"
+        tag.tag_time = 1000
+        tag.tag_timezone = 0
+        tag.message = b"v1"
+        many_branches.object_store.add_object(tag)
+        many_branches.refs[b"refs/tags/v1"] = tag.id
+
+        repo_manager.pack_refs(sample_repo_id)
+        packed = (repo_manager.get_repo_path(sample_repo_id) / "packed-refs").read_bytes()
+        assert tag.id + b" refs/tags/v1\n^" + main + b"\n" in packed
+
+
+# -----------------------------------------------------------------------------
+# Repack Tests
+# -----------------------------------------------------------------------------
+
+class TestRepack:
+    """Tests for repack(), maybe_repack() and the activity tracking that throttles them."""
+
+    def test_consolidates_loose_objects_and_packs(self, repo_manager, sample_repo_id, many_branches):
+        """Loose objects and existing packs end up in one pack with all refs intact."""
+        from dulwich.objects import Blob
+
+        many_branches.object_store.add_objects([(Blob.from_string(b"packed %d" % i), None) for i in range(3)])
+        before = many_branches.get_refs()
+        assert repo_manager.get_object_stats(sample_repo_id) == {"packs": 1, "loose_objects": 33}
+
+        result = repo_manager.repack(sample_repo_id, prune_grace=0)
+
+        assert result["success"] and result["packed_objects"] == 33
+        # The unreferenced blobs in the old pack are pruned with it
+        assert result["pruned_objects"] == 3
+        assert result["after"] == {"packs": 1, "loose_objects": 0}
+        fresh = GitRepoManager(repos_dir=repo_manager.repos_dir).get_repo(sample_repo_id)
+        assert fresh.get_refs() == before
+        for sha in before.values():
+            assert fresh[fresh[sha].tree].items()
+
+    def test_prunes_deleted_branch_objects(self, repo_manager, sample_repo_id, many_branches):
+        """Objects only reachable from a deleted lazyaf branch are removed."""
+        job = many_branches.refs[b"refs/heads/lazyaf/job-0"]
+        assert repo_manager.delete_branch(sample_repo_id, "lazyaf/job-0", force=True)["success"]
+
+        result = repo_manager.repack(sample_repo_id, prune_grace=0)
+
+        assert result["pruned_objects"] == 3  # commit, tree and blob
+        fresh = GitRepoManager(repos_dir=repo_manager.repos_dir).get_repo(sample_repo_id)
+        assert job not in fresh.object_store
+
+    def test_rewrites_indexes_for_current_tips(self, repo_manager, sample_repo_id, many_branches):
+        """The commit-graph and bitmaps of a pruned branch are dropped, not kept forever."""
+        from app.services.git.bitmap import ReachabilityBitmaps
+        from app.services.git.commit_graph import CommitGraph
+
+        job = many_branches.refs[b"refs/heads/lazyaf/job-0"]
+        main = many_branches.refs[b"refs/heads/main"]
+        repo = repo_manager.get_repo(sample_repo_id)
+        ReachabilityBitmaps.for_repo(repo).write_bitmaps([job, main])
+        CommitGraph.for_repo(repo).update([job, main])
+        assert repo_manager.delete_branch(sample_repo_id, "lazyaf/job-0", force=True)["success"]
+
+        repo_manager.repack(sample_repo_id, prune_grace=0)
+
+        bitmaps = ReachabilityBitmaps.for_repo(repo)
+        assert bitmaps.find_missing_objects([main], [main]) == []
+        assert main in bitmaps._index.bitmaps
+        assert job not in bitmaps._index.bitmaps and job not in bitmaps._index.position
+        graph = CommitGraph.for_repo(repo)
+        assert graph.generation(main) is not None
+        assert job not in graph._index.position
+
+    def test_grace_period_keeps_young_unreachable_objects(self, repo_manager, sample_repo_id, many_branches):
+        """Unreachable objects newer than the grace period survive, reachable ones are packed."""
+        job = many_branches.refs[b"refs/heads/lazyaf/job-0"]
+        del many_branches.refs[b"refs/heads/lazyaf/job-0"]
+
+        result = repo_manager.repack(sample_repo_id, prune_grace=3600)
+
+        assert result["pruned_objects"] == 0
+        assert result["after"] == {"packs": 1, "loose_objects": 3}
+        assert job in many_branches.object_store
+
+    def test_young_packs_are_consolidated(self, repo_manager, sample_repo_id, many_branches):
+        """Recent push packs are merged; their unreachable objects survive the grace period."""
+        from dulwich.objects import Blob
+
+        blobs = [Blob.from_string(b"in flight %d" % i) for i in range(3)]
+        for blob in blobs:
+            many_branches.object_store.add_objects([(blob, None)])
+        assert repo_manager.get_object_stats(sample_repo_id)["packs"] == 3
+
+        result = repo_manager.repack(sample_repo_id, prune_grace=3600)
+
+        assert result["after"] == {"packs": 1, "loose_objects": 0}
+        assert result["packed_objects"] == 36
+        assert result["pruned_objects"] == 0
+        fresh = GitRepoManager(repos_dir=repo_manager.repos_dir).get_repo(sample_repo_id)
+        for blob in blobs:
+            assert fresh[blob.id].data == blob.data
+
+    def test_maybe_repack_skips_single_pack(self, repo_manager, sample_repo_id, many_branches, monkeypatch):
+        """A repo that is already one pack is not walked again."""
+        import app.services.git_server as git_server
+
+        repo_manager.repack(sample_repo_id, prune_grace=0)
+        monkeypatch.setattr(git_server, "repack_repo", lambda *args, **kwargs: pytest.fail("walked"))
+        assert repo_manager.maybe_repack(sample_repo_id, pack_limit=1, loose_limit=1, idle_seconds=0) is None
+
+    def test_repeated_repack_keeps_one_pack(self, repo_manager, sample_repo_id, many_branches):
+        repo_manager.repack(sample_repo_id, prune_grace=0)
+        main = many_branches.refs[b"refs/heads/main"]
+        _commit_on(many_branches, b"refs/heads/lazyaf/job-0", b"pushed", [main])
+
+        result = repo_manager.repack(sample_repo_id, prune_grace=0)
+
+        assert result["after"] == {"packs": 1, "loose_objects": 0}
+        assert result["packed_objects"] == 33
+        assert result["pruned_objects"] == 3  # the previous job-0 commit
+
+    def test_aborts_when_repo_becomes_active(self, repo_manager, sample_repo_id, many_branches):
+        """A clone starting mid-repack makes it give up without changing the repo."""
+        repo_manager.activity.begin(sample_repo_id)
+        try:
+            result = repo_manager.repack(sample_repo_id, prune_grace=0)
+        finally:
+            repo_manager.activity.end(sample_repo_id)
+
+        assert result == {"success": False, "error": "Repack aborted: repository in use"}
+        assert repo_manager.get_object_stats(sample_repo_id) == {"packs": 0, "loose_objects": 33}
+        pack_dir = repo_manager.get_repo_path(sample_repo_id) / "objects" / "pack"
+        assert list(pack_dir.iterdir()) == []
+
+    def test_maybe_repack_respects_limits_and_idle_time(self, repo_manager, sample_repo_id, many_branches):
+        assert repo_manager.maybe_repack(sample_repo_id, pack_limit=5, loose_limit=100, idle_seconds=0) is None
+
+        repo_manager.activity.touch(sample_repo_id)
+        assert repo_manager.maybe_repack(sample_repo_id, pack_limit=5, loose_limit=10, idle_seconds=60) is None
+
+        result = repo_manager.maybe_repack(sample_repo_id, pack_limit=5, loose_limit=10, idle_seconds=0)
+        assert result["success"] and result["after"]["loose_objects"] == 0
+
+    async def test_maintenance_pass_skips_repack_while_workers_busy(self, repo_manager, sample_repo_id, many_branches,
+                                                                    monkeypatch):
+        from app.services.git_maintenance import GitMaintenance
+
+        maintenance = GitMaintenance(repo_manager, pack_refs_threshold=100, loose_limit=10, idle_seconds=0)
+        monkeypatch.setattr(maintenance, "_workers_busy", lambda: True)
+        assert await maintenance.run_once() == {}
+
+        monkeypatch.setattr(maintenance, "_workers_busy", lambda: False)
+        results = await maintenance.run_once()
+        assert results[sample_repo_id]["repack"]["after"]["loose_objects"] == 0
+
+    def test_activity_tracks_streamed_transfers(self, repo_manager, sample_repo_id):
+        activity = repo_manager.activity
+        assert activity.idle_seconds(sample_repo_id) == float("inf")
+
+        frames = activity.track(sample_repo_id, iter([b"a", b"b"]))
+        assert next(frames) == b"a"
+        assert activity.active(sample_repo_id) == 1
+        assert activity.idle_seconds(sample_repo_id) == 0
+        frames.close()
+        assert activity.active(sample_repo_id) == 0
+        assert activity.idle_seconds(sample_repo_id) < 60
+
+
+# -----------------------------------------------------------------------------
+# Branch Diff Tests
+# -----------------------------------------------------------------------------
+
+def _commit_files(repo, ref: bytes, files: dict[bytes, bytes], parents=()):
+    """Write a commit with the given files straight into repo and point ref at it."""
+    from dulwich.objects import Blob, Tree, Commit
+
+    tree = Tree()
+    objects = []
+    for path, content in files.items():
+        blob = Blob.from_string(content)
+        tree.add(path, 0o100644, blob.id)
+        objects.append(blob)
+    commit = Commit()
+    commit.tree = tree.id
+    commit.parents = list(parents)
+    commit.author = commit.committer = b"Test <test@example.com>"
+    commit.author_time = commit.commit_time = 1000
+    commit.author_timezone = commit.commit_timezone = 0
+    commit.message = b"commit"
+    for obj in objects + [tree, commit]:
+        repo.object_store.add_object(obj)
+    repo.refs[ref] = commit.id
+    return commit.id
+
+
+@pytest.fixture
+def diff_repo(repo_manager, sample_repo_id):
+    """Repo whose feature branch modifies, adds, deletes and adds a binary file."""
+    repo_manager.create_bare_repo(sample_repo_id)
+    repo = repo_manager.get_repo(sample_repo_id)
+    main = _commit_files(repo, b"refs/heads/main", {
+        b"keep.txt": b"one\ntwo\nthree\n",
+        b"gone.txt": b"bye\n",
+    })
+    repo.refs.set_symbolic_ref(b"HEAD", b"refs/heads/main")
+    _commit_files(repo, b"refs/heads/feature", {
+        b"keep.txt": b"one\n2\nthree\nfour\n",
+        b"new.txt": b"".join(b"line %d\n" % i for i in range(50)),
+        b"image.png": b"\x89PNG\r\n\x1a\n\x00\x00binary",
+    }, [main])
+    return sample_repo_id
+
+
+class TestBranchDiff:
+    """Tests for get_diff() file lists and per-file get_file_diff()."""
+
+    def test_diff_lists_files_with_stats_only(self, repo_manager, diff_repo):
+        """The file list carries line stats but no patch text."""
+        diff = repo_manager.get_diff(diff_repo, "main", "feature")
+        files = {f["path"]: f for f in diff["files"]}
+
+        assert "diff" not in diff
+        assert all("diff" not in f for f in diff["files"])
+        assert files["keep.txt"]["status"] == "modified"
+        assert (files["keep.txt"]["additions"], files["keep.txt"]["deletions"]) == (2, 1)
+        assert (files["new.txt"]["additions"], files["new.txt"]["deletions"]) == (50, 0)
+        assert (files["gone.txt"]["status"], files["gone.txt"]["deletions"]) == ("deleted", 1)
+        assert diff["total_additions"] == 52
+        assert diff["total_deletions"] == 2
+        assert diff["commit_count"] == 1
+
+    def test_binary_file_is_summarized(self, repo_manager, diff_repo):
+        """Binary files report sizes instead of line stats or a patch."""
+        diff = repo_manager.get_diff(diff_repo, "main", "feature")
+        image = next(f for f in diff["files"] if f["path"] == "image.png")
+        assert image["binary"] is True
+        assert image["new_size"] == 16
+
+        patch = repo_manager.get_file_diff(diff_repo, "main", "feature", "image.png")
+        assert patch["binary"] is True
+        assert patch["diff"] == ""
+
+    def test_file_diff_returns_unified_diff(self, repo_manager, diff_repo):
+        """get_file_diff() returns one file's patch."""
+        patch = repo_manager.get_file_diff(diff_repo, "main", "feature", "keep.txt")
+        assert patch["diff"].startswith("--- a/keep.txt\n+++ b/keep.txt\n")
+        assert "-two\n+2\n" in patch["diff"]
+        assert patch["truncated"] is False
+
+    def test_file_diff_caps_lines_and_bytes(self, repo_manager, diff_repo):
+        """Long patches are cut on a line boundary and flagged as truncated."""
+        by_lines = repo_manager.get_file_diff(diff_repo, "main", "feature", "new.txt", max_lines=10)
+        assert by_lines["truncated"] is True
+        assert len(by_lines["diff"].splitlines()) == 10
+
+        by_bytes = repo_manager.get_file_diff(diff_repo, "main", "feature", "new.txt", max_bytes=100)
+        assert by_bytes["truncated"] is True
+        assert len(by_bytes["diff"].encode()) <= 100
+        assert by_bytes["diff"].endswith("\n")
+
+    def test_file_diff_unknown_path(self, repo_manager, diff_repo):
+        """Paths the branch does not change return an error."""
+        assert "error" in repo_manager.get_file_diff(diff_repo, "main", "feature", "missing.txt")
+
+    def test_diff_is_cached_by_commit_pair(self, repo_manager, diff_repo, monkeypatch):
+        """Trees are only diffed once per (diff base, head) pair."""
+        import app.services.git.diff as diff_module
+
+        calls = []
+        original = diff_module.diff_trees
+        monkeypatch.setattr(diff_module, "diff_trees", lambda *a, **kw: calls.append(a) or original(*a, **kw))
+
+        first = repo_manager.get_diff(diff_repo, "main", "feature")
+        repo_manager.get_file_diff(diff_repo, "main", "feature", "keep.txt")
+        assert repo_manager.get_diff(diff_repo, "main", "feature") == first
+        assert len(calls) == 1
+
+        repo = repo_manager.get_repo(diff_repo)
+        _commit_files(repo, b"refs/heads/feature", {b"keep.txt": b"changed\n"}, [repo.refs[b"refs/heads/feature"]])
+        repo_manager.invalidate_refs(diff_repo)
+        repo_manager.get_diff(diff_repo, "main", "feature")
+        assert len(calls) == 2
+
+    def test_stats_match_patch(self, repo_manager, sample_repo_id):
+        """Line stats agree with the +/- lines of the formatted patch."""
+        import random
+
+        rng = random.Random(7)
+        repo_manager.create_bare_repo(sample_repo_id)
+        repo = repo_manager.get_repo(sample_repo_id)
+        old = [b"%d\n" % rng.randrange(20) for _ in range(200)]
+        new = [line for line in old if rng.random() > 0.2]
+        for _ in range(40):
+            new.insert(rng.randrange(len(new) + 1), b"%d\n" % rng.randrange(20))
+        main = _commit_files(repo, b"refs/heads/main", {b"f.txt": b"".join(old)})
+        _commit_files(repo, b"refs/heads/feature", {b"f.txt": b"".join(new)}, [main])
+
+        stats = repo_manager.get_diff(sample_repo_id, "main", "feature")["files"][0]
+        patch = repo_manager.get_file_diff(sample_repo_id, "main", "feature", "f.txt")["diff"]
+        lines = patch.splitlines()[2:]
+        assert stats["additions"] == sum(1 for line in lines if line.startswith("+"))
+        assert stats["deletions"] == sum(1 for line in lines if line.startswith("-"))
+
+    def test_diffstats_for_many_branches(self, repo_manager, diff_repo):
+        """get_diffstats() summarizes each branch and flags missing ones."""
+        repo = repo_manager.get_repo(diff_repo)
+        main = repo.refs[b"refs/heads/main"]
+        _commit_files(repo, b"refs/heads/other", {b"keep.txt": b"one\ntwo\nthree\n"}, [main])
+
+        result = repo_manager.get_diffstats(diff_repo, "main", ["feature", "other", "missing"])
+        stats = result["stats"]
+        assert (stats["feature"]["files_changed"], stats["feature"]["additions"], stats["feature"]["deletions"]) == (4, 52, 2)
+        assert (stats["other"]["files_changed"], stats["other"]["additions"], stats["other"]["deletions"]) == (1, 0, 1)
+        assert "error" in stats["missing"]
+
+    def test_blob_pair_stats_shared_between_branches(self, repo_manager, diff_repo, monkeypatch):
+        """Branches making the same change only count its lines once."""
+        import app.services.git.diff as diff_module
+
+        calls = []
+        original = diff_module.blob_stats
+        monkeypatch.setattr(diff_module, "blob_stats", lambda *a: calls.append(a[1:]) or original(*a))
+
+        repo = repo_manager.get_repo(diff_repo)
+        main = repo.refs[b"refs/heads/main"]
+        files = {b"keep.txt": b"one\ntwo\nthree\n", b"gone.txt": b"bye!\n"}
+        _commit_files(repo, b"refs/heads/copy-a", files, [main])
+        _commit_files(repo, b"refs/heads/copy-b", {**files, b"extra.txt": b"extra\n"}, [main])
+
+        stats = repo_manager.get_diffstats(diff_repo, "main", ["copy-a", "copy-b"])["stats"]
+        assert stats["copy-a"]["additions"] == 1
+        assert stats["copy-b"]["additions"] == 2
+        assert len(calls) == len(set(calls)) == 2
+
+
+# -----------------------------------------------------------------------------
+# Tree Path Cache Tests
+# -----------------------------------------------------------------------------
+
+def _commit_tree(repo, ref: bytes, files: dict[bytes, bytes], parents=()):
+    """Commit nested files ("dir/name" paths) straight into repo and point ref at it."""
+    from dulwich.objects import Blob, Tree, Commit
+
+    def build(entries):
+        tree = Tree()
+        subdirs = {}
+        for path, content in entries.items():
+            head, _, rest = path.partition(b"/")
+            if rest:
+                subdirs.setdefault(head, {})[rest] = content
+            else:
+                blob = Blob.from_string(content)
+                repo.object_store.add_object(blob)
+                tree.add(head, 0o100644, blob.id)
+        for name, sub in subdirs.items():
+            tree.add(name, 0o040000, build(sub))
+        repo.object_store.add_object(tree)
+        return tree.id
+
+    commit = Commit()
+    commit.tree = build(files)
+    commit.parents = list(parents)
+    commit.author = commit.committer = b"Test <test@example.com>"
+    commit.author_time = commit.commit_time = 1000
+    commit.author_timezone = commit.commit_timezone = 0
+    commit.message = b"commit"
+    repo.object_store.add_object(commit)
+    repo.refs[ref] = commit.id
+    return commit.id
+
+
+@pytest.fixture
+def lazyaf_repo(repo_manager, sample_repo_id):
+    """Repo with a few .lazyaf agent and pipeline files on main."""
+    repo_manager.create_bare_repo(sample_repo_id)
+    repo = repo_manager.get_repo(sample_repo_id)
+    _commit_tree(repo, b"refs/heads/main", {
+        b".lazyaf/agents/a.yaml": b"name: a\n",
+        b".lazyaf/agents/b.yaml": b"name: b\n",
+        b".lazyaf/pipelines/ci.yaml": b"name: ci\n",
+        b"README.md": b"hello\n",
+    })
+    return sample_repo_id
+
+
+class TestTreePathCache:
+    """Tests for cached file and directory reads from branches."""
+
+    def test_reads_files_and_directories(self, repo_manager, lazyaf_repo):
+        """Nested files and listings resolve; missing or wrong-type paths give None."""
+        assert repo_manager.get_file_content(lazyaf_repo, "main", ".lazyaf/agents/a.yaml") == b"name: a\n"
+        assert repo_manager.list_directory(lazyaf_repo, "main", ".lazyaf/agents") == ["a.yaml", "b.yaml"]
+        assert repo_manager.list_directory(lazyaf_repo, "main", "") == [".lazyaf", "README.md"]
+        assert repo_manager.get_file_content(lazyaf_repo, "main", ".lazyaf/agents/missing.yaml") is None
+        assert repo_manager.get_file_content(lazyaf_repo, "main", ".lazyaf/agents") is None
+        assert repo_manager.list_directory(lazyaf_repo, "main", "README.md") is None
+        assert repo_manager.list_directory(lazyaf_repo, "main", "nope/deeper") is None
+
+    def test_repeated_reads_skip_tree_parsing(self, repo_manager, lazyaf_repo, monkeypatch):
+        """Once warm, listing and reading every agent file reads no trees or commits."""
+        from dulwich.objects import Blob
+        from app.services.git.repo_cache import _SharedObjectStore
+
+        def read_agents():
+            names = repo_manager.list_directory(lazyaf_repo, "main", ".lazyaf/agents")
+            return [repo_manager.get_file_content(lazyaf_repo, "main", f".lazyaf/agents/{n}") for n in names]
+
+        expected = read_agents()
+        reads = []
+        original = _SharedObjectStore.__getitem__
+        monkeypatch.setattr(_SharedObjectStore, "__getitem__", lambda self, sha: reads.append(original(self, sha)) or reads[-1])
+
+        assert read_agents() == expected
+        assert all(isinstance(obj, Blob) for obj in reads)
+
+    def test_branch_update_is_visible(self, repo_manager, lazyaf_repo):
+        """A moved branch resolves to its new tree."""
+        repo = repo_manager.get_repo(lazyaf_repo)
+        assert repo_manager.list_directory(lazyaf_repo, "main", ".lazyaf/agents") == ["a.yaml", "b.yaml"]
+
+        _commit_tree(repo, b"refs/heads/main", {b".lazyaf/agents/c.yaml": b"name: c\n"}, [repo.refs[b"refs/heads/main"]])
+        repo_manager.invalidate_refs(lazyaf_repo)
+        assert repo_manager.list_directory(lazyaf_repo, "main", ".lazyaf/agents") == ["c.yaml"]
+        assert repo_manager.get_file_content(lazyaf_repo, "main", ".lazyaf/agents/a.yaml") is None
+
+    def test_missing_objects_are_not_cached(self):
+        """A tree absent from one store doesn't poison lookups in another."""
+        from dulwich.object_store import MemoryObjectStore
+        from dulwich.objects import Blob, Tree
+        from app.services.git.tree_cache import TreePathCache
+
+        blob = Blob.from_string(b"x")
+        tree = Tree()
+        tree.add(b"x.txt", 0o100644, blob.id)
+        cache = TreePathCache()
+
+        with pytest.raises(KeyError):
+            cache.lookup(MemoryObjectStore(), tree.id, "x.txt")
+
+        store = MemoryObjectStore()
+        store.add_objects([(blob, None), (tree, None)])
+        assert cache.lookup(store, tree.id, "x.txt") == (0o100644, blob.id)
+        assert cache.lookup(store, tree.id, "y.txt") is None
+
+
+# -----------------------------------------------------------------------------
+# Lazyaf Index Tests
+# -----------------------------------------------------------------------------
+
+AGENT_YAML = b"name: fixer\nprompt_template: Fix it\n"
+PIPELINE_YAML = b"name: ci\nsteps:\n  - name: Test\n    config:\n      command: pytest\n"
+
+
+class TestLazyafIndex:
+    """Tests for the compiled .lazyaf/ agents and pipelines index."""
+
+    def test_compiles_agents_pipelines_and_errors(self, repo_manager, sample_repo_id):
+        """Valid files get models; malformed ones keep their error and parsed data."""
+        repo_manager.create_bare_repo(sample_repo_id)
+        repo = repo_manager.get_repo(sample_repo_id)
+        _commit_tree(repo, b"refs/heads/main", {
+            b".lazyaf/agents/fixer.yaml": AGENT_YAML,
+            b".lazyaf/agents/broken.yaml": b"name: [unclosed\n",
+            b".lazyaf/agents/partial.yml": b"name: partial\n",
+            b".lazyaf/agents/empty.yaml": b"",
+            b".lazyaf/agents/notes.txt": b"ignored\n",
+            b".lazyaf/pipelines/ci.yaml": PIPELINE_YAML,
+        })
+
+        config = repo_manager.get_lazyaf_config(sample_repo_id, "main")
+        assert list(config.agents) == ["broken.yaml", "fixer.yaml", "partial.yml"]
+        assert config.agents["fixer.yaml"].model.prompt_template == "Fix it"
+        assert config.agents["broken.yaml"].data is None
+        assert config.agents["partial.yml"].data == {"name": "partial"}
+        assert config.agents["partial.yml"].model is None
+        assert set(config.errors) == {"agents/broken.yaml", "agents/partial.yml"}
+        assert config.find("agents", "partial").filename == "partial.yml"
+        assert config.pipelines["ci.yaml"].model.steps[0].config == {"command": "pytest"}
+
+    def test_missing_branch_or_directory(self, repo_manager, lazyaf_repo, sample_repo_id):
+        """Unknown branches give None; commits without .lazyaf/ give an empty config."""
+        assert repo_manager.get_lazyaf_config(lazyaf_repo, "nope") is None
+
+        repo = repo_manager.get_repo(lazyaf_repo)
+        _commit_tree(repo, b"refs/heads/bare", {b"README.md": b"hi\n"})
+        repo_manager.invalidate_refs(lazyaf_repo)
+        config = repo_manager.get_lazyaf_config(lazyaf_repo, "bare")
+        assert config.agents == {} and config.pipelines == {}
+
+    def test_compiled_once_per_lazyaf_tree(self, repo_manager, lazyaf_repo, monkeypatch):
+        """Branches sharing a .lazyaf tree share one compiled entry."""
+        import app.services.lazyaf_index as index_module
+
+        repo = repo_manager.get_repo(lazyaf_repo)
+        main = repo.refs[b"refs/heads/main"]
+        files = {
+            b".lazyaf/agents/a.yaml": b"name: a\n",
+            b".lazyaf/agents/b.yaml": b"name: b\n",
+            b".lazyaf/pipelines/ci.yaml": b"name: ci\n",
+        }
+        _commit_tree(repo, b"refs/heads/feature", {**files, b"src.py": b"print()\n"}, [main])
+        repo_manager.invalidate_refs(lazyaf_repo)
+
+        calls = []
+        original = index_module.compile_lazyaf
+        monkeypatch.setattr(index_module, "compile_lazyaf", lambda *a: calls.append(a) or original(*a))
+
+        first = repo_manager.get_lazyaf_config(lazyaf_repo, "main")
+        assert repo_manager.get_lazyaf_config(lazyaf_repo, "feature") is first
+        assert repo_manager.get_lazyaf_config(lazyaf_repo, "main") is first
+        assert len(calls) == 1
+
+    def test_merge_compiles_new_tip(self, repo_manager, lazyaf_repo):
+        """A merge that changes .lazyaf/ compiles it before anyone reads it."""
+        repo = repo_manager.get_repo(lazyaf_repo)
+        main = repo.refs[b"refs/heads/main"]
+        _commit_tree(repo, b"refs/heads/feature", {
+            b".lazyaf/agents/a.yaml": b"name: a\n",
+            b".lazyaf/agents/new.yaml": AGENT_YAML,
+            b"README.md": b"hello\n",
+        }, [main])
+        assert repo_manager.merge_branch(lazyaf_repo, "feature", "main")["success"]
+
+        merged = repo.refs[b"refs/heads/main"]
+        lazyaf_tree = repo_manager._trees.lookup(repo.object_store, repo[merged].tree, ".lazyaf")[1]
+        assert lazyaf_tree in repo_manager._lazyaf
+
+
+# -----------------------------------------------------------------------------
+# Merge Object Batching Tests
+# -----------------------------------------------------------------------------
+
+@pytest.fixture
+def diverged_repo(repo_manager, sample_repo_id):
+    """main and feature both change nested files and both add docs/."""
+    repo_manager.create_bare_repo(sample_repo_id)
+    repo = repo_manager.get_repo(sample_repo_id)
+    base = _commit_tree(repo, b"refs/heads/main", {
+        b"src/app/main.py": b"main\n",
+        b"src/app/util.py": b"util\n",
+        b"README.md": b"hello\n",
+    })
+    repo.refs.set_symbolic_ref(b"HEAD", b"refs/heads/main")
+    _commit_tree(repo, b"refs/heads/main", {
+        b"src/app/main.py": b"main v2\n",
+        b"src/app/util.py": b"util\n",
+        b"docs/a.md": b"a\n",
+        b"README.md": b"hello\n",
+    }, [base])
+    _commit_tree(repo, b"refs/heads/feature", {
+        b"src/app/main.py": b"main\n",
+        b"src/app/util.py": b"util v2\n",
+        b"docs/b.md": b"b\n",
+        b"README.md": b"hello\n",
+    }, [base])
+    return repo
+
+
+class TestMergeObjectBatching:
+    """Server-side merges write their new objects as one pack."""
+
+    def test_merge_writes_one_pack(self, repo_manager, sample_repo_id, diverged_repo):
+        store = diverged_repo.object_store
+        loose = store.count_loose_objects()
+
+        result = repo_manager.merge_branch(sample_repo_id, "feature", "main")
+
+        assert result["success"] and result["merge_type"] == "merge"
+        assert store.count_loose_objects() == loose
+        assert store.count_pack_files() == 1
+        # commit, root, src, src/app and docs trees; no empty base tree
+        assert len(store.packs[0]) == 5
+        for path, content in [("src/app/main.py", b"main v2\n"), ("src/app/util.py", b"util v2\n"),
+                              ("docs/a.md", b"a\n"), ("docs/b.md", b"b\n")]:
+            assert repo_manager.get_file_content(sample_repo_id, "main", path) == content
+
+    def test_merge_indexes_new_tip(self, repo_manager, sample_repo_id, diverged_repo):
+        """Merge commits get a bitmap and commit-graph entry, like pushed tips."""
+        from app.services.git.bitmap import ReachabilityBitmaps
+        from app.services.git.commit_graph import CommitGraph
+
+        repo_manager.merge_branch(sample_repo_id, "feature", "main")
+
+        tip = diverged_repo.refs[b"refs/heads/main"]
+        repo = repo_manager.get_repo(sample_repo_id)
+        bitmaps = ReachabilityBitmaps.for_repo(repo)
+        assert bitmaps.available
+        assert bitmaps.find_missing_objects([tip], [tip]) == []
+        assert tip in bitmaps._index.bitmaps
+        assert tip in CommitGraph.for_repo(repo)._index.position
+
+    def test_conflicting_merge_writes_nothing(self, repo_manager, sample_repo_id, diverged_repo):
+        main = diverged_repo.refs[b"refs/heads/main"]
+        _commit_tree(diverged_repo, b"refs/heads/feature", {b"src/app/main.py": b"clash\n"}, [main])
+        _commit_tree(diverged_repo, b"refs/heads/main", {b"src/app/main.py": b"other\n"}, [main])
+        repo_manager.invalidate_refs(sample_repo_id)
+        loose = diverged_repo.object_store.count_loose_objects()
+
+        result = repo_manager.merge_branch(sample_repo_id, "feature", "main")
+
+        assert not result["success"] and result["conflicts"][0]["path"] == "src/app/main.py"
+        assert diverged_repo.object_store.count_loose_objects() == loose
+        assert diverged_repo.object_store.count_pack_files() == 0
+
+    def test_resolution_skips_superseded_trees(self, repo_manager, sample_repo_id, diverged_repo):
+        """Only the trees the resolved commit points at are written."""
+        main = diverged_repo.refs[b"refs/heads/main"]
+        _commit_tree(diverged_repo, b"refs/heads/feature", {b"src/app/main.py": b"clash\n"}, [main])
+        _commit_tree(diverged_repo, b"refs/heads/main", {b"src/app/main.py": b"other\n"}, [main])
+        repo_manager.invalidate_refs(sample_repo_id)
+
+        result = repo_manager.resolve_and_merge(
+            sample_repo_id, "feature", "main", [{"path": "src/app/main.py", "content": "resolved\n"}],
+        )
+
+        assert result["success"]
+        # commit, root, src and src/app trees and the resolved blob
+        assert len(diverged_repo.object_store.packs[0]) == 5
+        assert repo_manager.get_file_content(sample_repo_id, "main", "src/app/main.py") == b"resolved\n"
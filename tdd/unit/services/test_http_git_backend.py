@@ -19,6 +19,7 @@ import pytest
 backend_path = Path(__file__).parent.parent.parent.parent / "backend"
 sys.path.insert(0, str(backend_path))
 
+from app.services.git.protocol import iter_pkt_lines
 from app.services.git_server import GitRepoManager, HTTPGitBackend, pkt_line
 
 
@@ -392,3 +393,365 @@ class TestEdgeCases:
 
         content, _ = git_backend.get_info_refs(uuid_id, "git-upload-pack")
         assert content is not None
+
+
+# -----------------------------------------------------------------------------
+# Streaming Upload Pack Tests
+# -----------------------------------------------------------------------------
+
+def _demux_sideband(response: bytes) -> tuple[bytes, bytes]:
+    """Split an upload-pack response into (preamble, band-1 pack bytes)."""
+    from app.services.git.protocol import iter_pkt_lines
+
+    nak_end = response.index(b"NAK\n") + 4
+    pack = b""
+    for line in iter_pkt_lines(response[nak_end:]):
+        if line is not None and line[:1] == b"\x01":
+            pack += line[1:]
+    return response[:nak_end], pack
+
+
+@pytest.fixture
+def repo_with_commits(repo_manager, created_repo):
+    """Create a repo with two commits on main."""
+    from dulwich.objects import Blob, Tree, Commit
+    import time
+
+    repo = repo_manager.get_repo(created_repo)
+    parent = None
+    commits = []
+    for i in range(2):
+        blob = Blob.from_string(f"content {i}\n".encode() * 50)
+        repo.object_store.add_object(blob)
+        tree = Tree()
+        tree.add(b"file.txt", 0o100644, blob.id)
+        repo.object_store.add_object(tree)
+
+        commit = Commit()
+        commit.tree = tree.id
+        commit.parents = [parent] if parent else []
+        commit.author = commit.committer = b"Test <test@example.com>"
+        commit.author_time = commit.commit_time = int(time.time())
+        commit.author_timezone = commit.commit_timezone = 0
+        commit.message = f"Commit {i}".encode()
+        repo.object_store.add_object(commit)
+        parent = commit.id
+        commits.append(commit.id)
+
+    repo.refs[b"refs/heads/main"] = parent
+    return created_repo, commits
+
+
+class TestStreamUploadPack:
+    """Tests for stream_upload_pack() pack streaming."""
+
+    def _clone_request(self, sha: bytes, caps: bytes = b"side-band-64k ofs-delta") -> bytes:
+        return pkt_line(b"want " + sha + b" " + caps + b"\n") + b"0000" + pkt_line(b"done\n")
+
+    def test_missing_repo_raises_before_streaming(self, git_backend):
+        """ValueError is raised eagerly, not on first iteration."""
+        with pytest.raises(ValueError):
+            git_backend.stream_upload_pack("nonexistent-repo", b"0000")
+
+    def test_returns_iterator_of_frames(self, git_backend, repo_with_commits):
+        """Response is produced as multiple frames, starting with NAK."""
+        repo_id, commits = repo_with_commits
+        frames = list(git_backend.stream_upload_pack(repo_id, self._clone_request(commits[-1])))
+        assert frames[0] == pkt_line(b"NAK\n")
+        assert frames[-1] == b"0000"
+        assert len(frames) > 2
+
+    def test_pack_contains_all_reachable_objects(self, git_backend, repo_manager, repo_with_commits):
+        """Streamed pack imports cleanly into another repo."""
+        from io import BytesIO
+
+        repo_id, commits = repo_with_commits
+        response = git_backend.handle_upload_pack(repo_id, self._clone_request(commits[-1]))
+        _, pack = _demux_sideband(response)
+        assert pack[:4] == b"PACK"
+        # 2 commits + 2 trees + 2 blobs
+        assert int.from_bytes(pack[8:12], "big") == 6
+
+        repo_manager.create_bare_repo("clone-target")
+        target = repo_manager.get_repo("clone-target")
+        stream = BytesIO(pack)
+        target.object_store.add_thin_pack(stream.read, stream.read)
+        for sha in commits:
+            assert target.object_store[sha].type_name == b"commit"
+
+    def test_without_sideband_sends_raw_pack(self, git_backend, repo_with_commits):
+        """Clients without side-band get the raw pack after NAK."""
+        repo_id, commits = repo_with_commits
+        response = git_backend.handle_upload_pack(
+            repo_id, self._clone_request(commits[-1], caps=b"ofs-delta")
+        )
+        assert response.startswith(pkt_line(b"NAK\n") + b"PACK")
+        assert response.endswith(b"0000")
+
+    def test_negotiation_without_done_sends_nak_only(self, git_backend, repo_with_commits):
+        """A have round without done (and no no-done) just gets NAK."""
+        repo_id, commits = repo_with_commits
+        request = (
+            pkt_line(b"want " + commits[-1] + b" side-band-64k\n")
+            + b"0000"
+            + pkt_line(b"have " + b"f" * 40 + b"\n")
+            + b"0000"
+        )
+        assert git_backend.handle_upload_pack(repo_id, request) == pkt_line(b"NAK\n")
+
+    def test_fetch_excludes_objects_client_has(self, git_backend, repo_with_commits):
+        """Incremental fetch only packs objects newer than the common commit."""
+        repo_id, commits = repo_with_commits
+        request = (
+            pkt_line(b"want " + commits[-1] + b" multi_ack_detailed no-done side-band-64k\n")
+            + b"0000"
+            + pkt_line(b"have " + commits[0] + b"\n")
+            + b"0000"
+        )
+        response = git_backend.handle_upload_pack(repo_id, request)
+        preamble, pack = _demux_sideband(response)
+        assert pkt_line(b"ACK " + commits[0] + b" common\n") in preamble
+        assert pkt_line(b"ACK " + commits[0] + b" ready\n") in preamble
+        # Only the new commit, its tree and its blob
+        assert int.from_bytes(pack[8:12], "big") == 3
+
+    def test_identical_requests_are_served_from_pack_cache(self, git_backend, repo_with_commits, monkeypatch):
+        """A repeated clone reuses the cached pack instead of walking objects again."""
+        from app.services import git_server
+
+        repo_id, commits = repo_with_commits
+        first = git_backend.handle_upload_pack(repo_id, self._clone_request(commits[-1]))
+
+        def fail(*args, **kwargs):
+            raise AssertionError("pack should come from the cache")
+
+        monkeypatch.setattr(git_server, "find_missing_objects", fail)
+        second = git_backend.handle_upload_pack(repo_id, self._clone_request(commits[-1]))
+        assert second == first
+
+    def test_different_capabilities_do_not_share_cached_pack(self, git_backend, repo_with_commits):
+        """Packs built without ofs-delta are cached separately."""
+        repo_id, commits = repo_with_commits
+        git_backend.handle_upload_pack(repo_id, self._clone_request(commits[-1]))
+        git_backend.handle_upload_pack(repo_id, self._clone_request(commits[-1], caps=b"side-band-64k"))
+        assert len(list(git_backend.pack_cache.cache_dir.glob("*.pack"))) == 2
+
+    def test_pack_generation_counts_as_repo_activity(self, git_backend, repo_manager, repo_with_commits,
+                                                     monkeypatch):
+        """A generation that outlives its request keeps the repo busy until the pack is cached."""
+        import threading
+        import time
+
+        repo_id, commits = repo_with_commits
+        activity = repo_manager.activity
+        release = threading.Event()
+        seen = []
+        generate_pack = git_backend._generate_pack
+
+        def slow_generate_pack(*args):
+            chunks = generate_pack(*args)
+            yield next(chunks)
+            release.wait(5)
+            seen.append(activity.active(repo_id))
+            yield from chunks
+
+        monkeypatch.setattr(git_backend, "_generate_pack", slow_generate_pack)
+        # Without side-band each generated chunk is passed straight through
+        frames = git_backend.stream_upload_pack(repo_id, self._clone_request(commits[-1], caps=b"ofs-delta"))
+        assert next(frames) == pkt_line(b"NAK\n")
+        assert next(frames).startswith(b"PACK")
+        frames.close()
+        release.set()
+        for _ in range(100):
+            if list(git_backend.pack_cache.cache_dir.glob("*.pack")):
+                break
+            time.sleep(0.01)
+        assert seen == [1]
+        assert activity.active(repo_id) == 0
+        assert len(list(git_backend.pack_cache.cache_dir.glob("*.pack"))) == 1
+
+    def test_first_deepen_round_only_sends_shallow_list(self, git_backend, repo_with_commits):
+        """A depth request without haves or done gets just the shallow list."""
+        repo_id, commits = repo_with_commits
+        request = pkt_line(b"want " + commits[-1] + b" side-band-64k\n") + pkt_line(b"deepen 1\n") + b"0000"
+        response = git_backend.handle_upload_pack(repo_id, request)
+        assert response == pkt_line(b"shallow " + commits[-1] + b"\n") + b"0000"
+
+    def test_shallow_clone_packs_only_latest_commit(self, git_backend, repo_with_commits):
+        """deepen 1 with done sends the shallow list, NAK and a one-commit pack."""
+        repo_id, commits = repo_with_commits
+        request = (
+            pkt_line(b"want " + commits[-1] + b" side-band-64k ofs-delta\n")
+            + pkt_line(b"deepen 1\n")
+            + b"0000"
+            + pkt_line(b"done\n")
+        )
+        response = git_backend.handle_upload_pack(repo_id, request)
+        preamble, pack = _demux_sideband(response)
+        assert preamble == pkt_line(b"shallow " + commits[-1] + b"\n") + b"0000" + pkt_line(b"NAK\n")
+        # 1 commit + 1 tree + 1 blob
+        assert int.from_bytes(pack[8:12], "big") == 3
+
+    def test_blob_none_filter_packs_commits_and_trees(self, git_backend, repo_with_commits):
+        """A blobless clone gets every commit and tree but no blobs."""
+        repo_id, commits = repo_with_commits
+        request = (
+            pkt_line(b"want " + commits[-1] + b" side-band-64k ofs-delta filter\n")
+            + pkt_line(b"filter blob:none\n")
+            + b"0000"
+            + pkt_line(b"done\n")
+        )
+        _, pack = _demux_sideband(git_backend.handle_upload_pack(repo_id, request))
+        # 2 commits + 2 trees
+        assert int.from_bytes(pack[8:12], "big") == 4
+
+    def test_filtered_fetch_of_blob_by_id_sends_the_blob(self, git_backend, repo_manager, repo_with_commits):
+        """Lazy fetches want missing blobs by id, which the filter never omits."""
+        repo_id, commits = repo_with_commits
+        repo = repo_manager.get_repo(repo_id)
+        blob_id = repo[repo[commits[0]].tree][b"file.txt"][1]
+        request = (
+            pkt_line(b"want " + blob_id + b" side-band-64k filter\n")
+            + pkt_line(b"filter blob:none\n")
+            + b"0000"
+            + pkt_line(b"done\n")
+        )
+        _, pack = _demux_sideband(git_backend.handle_upload_pack(repo_id, request))
+        assert int.from_bytes(pack[8:12], "big") == 1
+
+    def test_unsupported_filter_is_an_error_line(self, git_backend, repo_with_commits):
+        repo_id, commits = repo_with_commits
+        request = (
+            pkt_line(b"want " + commits[-1] + b" side-band-64k filter\n")
+            + pkt_line(b"filter tree:0\n")
+            + b"0000"
+            + pkt_line(b"done\n")
+        )
+        response = git_backend.handle_upload_pack(repo_id, request)
+        assert response == pkt_line(b"ERR unsupported filter spec 'tree:0'\n")
+
+    def test_invalid_deepen_is_an_error_line(self, git_backend, repo_with_commits):
+        """A malformed depth gets ERR, not a missing-repo error."""
+        repo_id, commits = repo_with_commits
+        request = (
+            pkt_line(b"want " + commits[-1] + b" side-band-64k\n")
+            + pkt_line(b"deepen abc\n")
+            + b"0000"
+            + pkt_line(b"done\n")
+        )
+        response = git_backend.handle_upload_pack(repo_id, request)
+        assert response == pkt_line(b"ERR invalid deepen value 'abc'\n")
+
+
+
+# -----------------------------------------------------------------------------
+# Protocol v2 Tests
+# -----------------------------------------------------------------------------
+
+def _v2_request(command: bytes, args: list[bytes]) -> bytes:
+    lines = [pkt_line(b"command=" + command + b"\n"), pkt_line(b"agent=git/2.39\n"), b"0001"]
+    lines += [pkt_line(arg + b"\n") for arg in args]
+    return b"".join(lines) + b"0000"
+
+
+class TestProtocolV2:
+    """Tests for Git-Protocol: version=2 upload-pack (ls-refs and fetch)."""
+
+    def test_info_refs_advertises_v2_capabilities(self, git_backend, created_repo):
+        """v2 clients get capabilities instead of refs."""
+        content, content_type = git_backend.get_info_refs(created_repo, "git-upload-pack", version=2)
+        assert content_type == "application/x-git-upload-pack-advertisement"
+        assert content.startswith(pkt_line(b"version 2\n"))
+        assert pkt_line(b"ls-refs\n") in content
+        assert pkt_line(b"fetch=shallow filter\n") in content
+        assert content.endswith(b"0000")
+
+    def test_receive_pack_stays_on_v0(self, git_backend, created_repo):
+        """Pushes keep the v0 advertisement."""
+        content, _ = git_backend.get_info_refs(created_repo, "git-receive-pack", version=2)
+        assert content.startswith(pkt_line(b"# service=git-receive-pack\n"))
+
+    def test_ls_refs_filters_by_prefix(self, git_backend, repo_manager, repo_with_commits):
+        """Only refs under the requested prefixes are listed."""
+        repo_id, commits = repo_with_commits
+        repo = repo_manager.get_repo(repo_id)
+        for i in range(20):
+            repo.refs[f"refs/heads/lazyaf/card-{i}".encode()] = commits[0]
+        repo.refs.set_symbolic_ref(b"HEAD", b"refs/heads/main")
+        repo_manager.invalidate_refs(repo_id)
+
+        request = _v2_request(b"ls-refs", [b"symrefs", b"ref-prefix HEAD", b"ref-prefix refs/heads/main"])
+        response = git_backend.handle_upload_pack(repo_id, request, version=2)
+        assert response == (
+            pkt_line(commits[-1] + b" HEAD symref-target:refs/heads/main\n")
+            + pkt_line(commits[-1] + b" refs/heads/main\n")
+            + b"0000"
+        )
+
+    def test_fetch_with_done_sends_packfile(self, git_backend, repo_with_commits):
+        """A clone gets the packfile section straight away."""
+        repo_id, commits = repo_with_commits
+        request = _v2_request(b"fetch", [b"ofs-delta", b"want " + commits[-1], b"done"])
+        response = git_backend.handle_upload_pack(repo_id, request, version=2)
+        assert response.startswith(pkt_line(b"packfile\n"))
+        pack = b"".join(
+            line[1:] for line in iter_pkt_lines(response) if line is not None and line[:1] == b"\x01"
+        )
+        assert pack[:4] == b"PACK"
+        assert int.from_bytes(pack[8:12], "big") == 6
+
+    def test_fetch_with_invalid_deepen_since_is_an_error_line(self, git_backend, repo_with_commits):
+        repo_id, commits = repo_with_commits
+        request = _v2_request(b"fetch", [b"want " + commits[-1], b"deepen-since soon", b"done"])
+        response = git_backend.handle_upload_pack(repo_id, request, version=2)
+        assert response == pkt_line(b"ERR invalid deepen-since value 'soon'\n")
+
+    def test_fetch_acks_common_commit_then_sends_pack(self, git_backend, repo_with_commits):
+        """Incremental fetch is acknowledged as ready and only packs new objects."""
+        repo_id, commits = repo_with_commits
+        request = _v2_request(b"fetch", [b"want " + commits[-1], b"have " + commits[0]])
+        response = git_backend.handle_upload_pack(repo_id, request, version=2)
+        assert response.startswith(
+            pkt_line(b"acknowledgments\n")
+            + pkt_line(b"ACK " + commits[0] + b"\n")
+            + pkt_line(b"ready\n")
+            + b"0001"
+            + pkt_line(b"packfile\n")
+        )
+        pack = b"".join(
+            line[1:] for line in iter_pkt_lines(response) if line is not None and line[:1] == b"\x01"
+        )
+        assert int.from_bytes(pack[8:12], "big") == 3
+
+    def test_fetch_with_deepen_sends_shallow_info(self, git_backend, repo_with_commits):
+        """Shallow fetches get a shallow-info section before the packfile."""
+        repo_id, commits = repo_with_commits
+        request = _v2_request(b"fetch", [b"want " + commits[-1], b"deepen 1", b"done"])
+        response = git_backend.handle_upload_pack(repo_id, request, version=2)
+        assert response.startswith(
+            pkt_line(b"shallow-info\n")
+            + pkt_line(b"shallow " + commits[-1] + b"\n")
+            + b"0001"
+            + pkt_line(b"packfile\n")
+        )
+
+    def test_fetch_with_filter_omits_blobs(self, git_backend, repo_with_commits):
+        """The filter argument applies to v2 fetches too."""
+        repo_id, commits = repo_with_commits
+        request = _v2_request(b"fetch", [b"want " + commits[-1], b"filter blob:limit=1k", b"done"])
+        response = git_backend.handle_upload_pack(repo_id, request, version=2)
+        pack = b"".join(
+            line[1:] for line in iter_pkt_lines(response) if line is not None and line[:1] == b"\x01"
+        )
+        # Both 500-byte blobs are under the limit
+        assert int.from_bytes(pack[8:12], "big") == 6
+        request = _v2_request(b"fetch", [b"want " + commits[-1], b"filter blob:limit=500", b"done"])
+        response = git_backend.handle_upload_pack(repo_id, request, version=2)
+        pack = b"".join(
+            line[1:] for line in iter_pkt_lines(response) if line is not None and line[:1] == b"\x01"
+        )
+        assert int.from_bytes(pack[8:12], "big") == 4
+
+    def test_unknown_command_is_an_error_line(self, git_backend, created_repo):
+        response = git_backend.handle_upload_pack(created_repo, _v2_request(b"bogus", []), version=2)
+        assert response.startswith(pkt_line(b"ERR unknown command bogus\n"))
@@ -18,7 +18,7 @@ import pytest
 backend_path = Path(__file__).parent.parent.parent.parent / "backend"
 sys.path.insert(0, str(backend_path))
 
-from app.services.job_queue import JobQueue, QueuedJob
+from app.services.job_queue import JobQueue, QueuedJob, SchedulingPolicy, priority_class
 
 
 # -----------------------------------------------------------------------------
@@ -217,6 +217,17 @@ class TestDequeue:
         assert queue.pending_count == 1
         assert queue.get_pending("job-123") is sample_job
 
+    async def test_dequeue_skips_jobs_that_do_not_fit(self, queue):
+        """Groups whose next job the runner can't fit are passed over, not emptied."""
+        big = make_scheduled_job("big", repo_id="repo-a")
+        small = make_scheduled_job("small", repo_id="repo-b")
+        await queue.enqueue(big)
+        await queue.enqueue(small)
+
+        assert await queue.dequeue(fits=lambda job: job is not big) is small
+        assert await queue.dequeue(fits=lambda job: job is not big) is None
+        assert await queue.dequeue() is big
+
 
 # -----------------------------------------------------------------------------
 # Wait For Job Tests
@@ -268,6 +279,167 @@ class TestWaitForJob:
         assert elapsed >= 0.09
         assert elapsed <= 1.0  # Should not wait much longer than timeout
 
+    async def test_wait_for_job_wakes_on_enqueue(self, queue):
+        """A waiting runner gets the job as soon as it is enqueued, not on a poll tick."""
+        import asyncio
+        import time
+
+        waiter = asyncio.create_task(queue.wait_for_job(timeout=5.0))
+        await asyncio.sleep(0.01)
+        start = time.monotonic()
+        await queue.enqueue(make_job("fresh-job"))
+        result = await asyncio.wait_for(waiter, 1.0)
+
+        assert result.id == "fresh-job"
+        assert time.monotonic() - start < 0.1
+
+    async def test_wait_for_job_ignores_jobs_for_other_runners(self, queue):
+        """Non-matching jobs wake the waiter but are left in the queue."""
+        import asyncio
+
+        waiter = asyncio.create_task(queue.wait_for_job(runner_type="gemini", timeout=5.0, runner_id="r1"))
+        await asyncio.sleep(0.01)
+        other = make_job("claude-job")
+        other.runner_type = "claude-code"
+        await queue.enqueue(other)
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        pinned = make_job("pinned-job")
+        pinned.required_runner_id = "r1"
+        await queue.enqueue(pinned)
+        result = await asyncio.wait_for(waiter, 1.0)
+
+        assert result.id == "pinned-job"
+        assert queue.queue_size == 1
+
+    async def test_dispatch_stats(self, queue):
+        """Dispatch latency covers jobs from enqueue to dequeue."""
+        assert queue.dispatch_stats()["dispatched"] == 0
+        assert queue.dispatch_stats()["avg_seconds"] is None
+
+        await queue.enqueue(make_job("job-1"))
+        await queue.enqueue(make_job("job-2"))
+        await queue.dequeue()
+        await queue.dequeue()
+
+        stats = queue.dispatch_stats()
+        assert stats["dispatched"] == 2
+        assert 0 <= stats["avg_seconds"] <= stats["max_seconds"] < 1.0
+
+
+# -----------------------------------------------------------------------------
+# Matching and Cancel Tests
+# -----------------------------------------------------------------------------
+
+def _matches(job: QueuedJob, runner_type: str | None, runner_id: str | None) -> bool:
+    """Reference matching rules: affinity first, then "any" or the same type."""
+    if job.required_runner_id and job.required_runner_id != runner_id:
+        return False
+    job_type = job.runner_type or "any"
+    return job_type == "any" or (runner_type is not None and job_type == runner_type)
+
+
+class TestMatching:
+    """dequeue() hands out the oldest job the runner may take."""
+
+    async def test_fifo_across_types_and_affinity(self, queue):
+        jobs = []
+        for job_id, runner_type, required in [
+            ("claude-1", "claude-code", None),
+            ("any-1", "any", None),
+            ("gemini-1", "gemini", None),
+            ("pinned-1", "any", "r1"),
+            ("claude-2", "claude-code", None),
+        ]:
+            job = make_job(job_id)
+            job.runner_type = runner_type
+            job.required_runner_id = required
+            jobs.append(job)
+            await queue.enqueue(job)
+
+        assert (await queue.dequeue("gemini", "r2")).id == "any-1"
+        assert (await queue.dequeue("gemini", "r2")).id == "gemini-1"
+        assert await queue.dequeue("gemini", "r2") is None
+        assert (await queue.dequeue("claude-code", "r1")).id == "claude-1"
+        assert (await queue.dequeue("claude-code", "r1")).id == "pinned-1"
+        assert await queue.dequeue(None, "r3") is None
+        assert (await queue.dequeue("claude-code", "r3")).id == "claude-2"
+        assert queue.queue_size == 0
+
+    async def test_matches_reference_rules(self, queue):
+        """A random mix of jobs and runners dequeues exactly like a linear scan."""
+        import random
+
+        rng = random.Random(7)
+        types = ["any", "claude-code", "gemini", None]
+        runners = [(t, f"r{i}") for i, t in enumerate(["claude-code", "gemini", None, "any"])]
+        reference = []
+        for i in range(300):
+            job = make_job(f"job-{i}")
+            job.runner_type = rng.choice(types)
+            job.required_runner_id = rng.choice([None, None, None, "r0", "r1", "r2"])
+            reference.append(job)
+            await queue.enqueue(job)
+
+        for _ in range(400):
+            runner_type, runner_id = rng.choice(runners)
+            expected = next((j for j in reference if _matches(j, runner_type, runner_id)), None)
+            got = await queue.dequeue(runner_type, runner_id)
+            assert got is expected
+            if expected is not None:
+                reference.remove(expected)
+        assert queue.queue_size == len(reference)
+
+    async def test_dequeue_does_not_scan_unmatched_jobs(self, queue):
+        """Thousands of jobs for another runner type don't slow a dequeue down."""
+        import time
+
+        for i in range(5000):
+            job = make_job(f"gemini-{i}")
+            job.runner_type = "gemini"
+            await queue.enqueue(job)
+
+        start = time.monotonic()
+        for _ in range(1000):
+            assert await queue.dequeue("claude-code", "r1") is None
+        assert time.monotonic() - start < 0.5
+
+
+class TestCancel:
+    """Tests for JobQueue.cancel()."""
+
+    async def test_cancel_removes_queued_job(self, queue):
+        await queue.enqueue(make_job("job-1"))
+        await queue.enqueue(make_job("job-2"))
+
+        assert await queue.cancel("job-1") is True
+        assert queue.queue_size == 1
+        assert queue.get_pending("job-1") is None
+        assert (await queue.dequeue()).id == "job-2"
+        assert await queue.dequeue() is None
+
+    async def test_cancel_unknown_or_dequeued_job(self, queue):
+        await queue.enqueue(make_job("job-1"))
+        await queue.dequeue()
+
+        assert await queue.cancel("job-1") is False
+        assert await queue.cancel("nope") is False
+        # Still pending: a runner is working on it
+        assert queue.get_pending("job-1") is not None
+
+    async def test_cancelled_entries_are_compacted(self, queue):
+        """Cancelled jobs in a deque no runner drains don't pile up."""
+        for i in range(200):
+            job = make_job(f"pinned-{i}")
+            job.required_runner_id = "gone"
+            await queue.enqueue(job)
+        for i in range(200):
+            await queue.cancel(f"pinned-{i}")
+
+        assert queue.queue_size == 0
+        assert sum(len(q) for q in queue._queues.values()) < 100
+
 
 # -----------------------------------------------------------------------------
 # Pending Tracking Tests
@@ -428,3 +600,156 @@ class TestEdgeCases:
 
         assert queue1.pending_count == 1
         assert queue2.pending_count == 0
+
+
+# -----------------------------------------------------------------------------
+# Scheduling Policy Tests
+# -----------------------------------------------------------------------------
+
+def make_scheduled_job(job_id: str, repo_id: str = "repo-a", **fields) -> QueuedJob:
+    """make_job() with a repo and any scheduling-related fields."""
+    job = make_job(job_id)
+    job.repo_id = repo_id
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return job
+
+
+class TestSchedulingPolicy:
+    """Tests for SchedulingPolicy configuration."""
+
+    def test_priority_class_is_derived_from_job(self):
+        assert priority_class(make_scheduled_job("p", is_playground=True)) == "playground"
+        assert priority_class(make_scheduled_job("s", pipeline_run_id="run-1")) == "pipeline"
+        assert priority_class(make_scheduled_job("c")) == "card"
+        assert priority_class(make_scheduled_job("x", pipeline_run_id="run-1", priority="card")) == "card"
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.setenv("JOB_PRIORITY_ORDER", "card, playground")
+        monkeypatch.setenv("JOB_REPO_WEIGHTS", "repo-a=2, repo-b=0.5")
+        monkeypatch.setenv("JOB_REPO_CONCURRENCY", "4")
+        monkeypatch.setenv("JOB_PIPELINE_CONCURRENCY", "2")
+
+        policy = SchedulingPolicy.from_env()
+
+        assert policy.priority_order == ["card", "playground"]
+        assert policy.repo_weights == {"repo-a": 2.0, "repo-b": 0.5}
+        assert policy.repo_concurrency == 4
+        assert policy.pipeline_concurrency == 2
+        assert policy.rank("pipeline") == 2  # unknown classes sort last
+
+    def test_defaults_from_empty_env(self, monkeypatch):
+        for name in ("JOB_PRIORITY_ORDER", "JOB_REPO_WEIGHTS", "JOB_REPO_CONCURRENCY", "JOB_PIPELINE_CONCURRENCY"):
+            monkeypatch.delenv(name, raising=False)
+        assert SchedulingPolicy.from_env() == SchedulingPolicy()
+
+    def test_rejects_invalid_values(self):
+        with pytest.raises(ValueError):
+            SchedulingPolicy(repo_weights={"repo-a": 0})
+        with pytest.raises(ValueError):
+            SchedulingPolicy(repo_concurrency=-1)
+
+
+class TestScheduling:
+    """dequeue() order under priority classes, fair share and caps."""
+
+    async def test_priority_classes(self, queue):
+        """Playground jobs go before card jobs, which go before pipeline steps."""
+        await queue.enqueue(make_scheduled_job("step", pipeline_run_id="run-1"))
+        await queue.enqueue(make_scheduled_job("card"))
+        await queue.enqueue(make_scheduled_job("playground", is_playground=True))
+
+        assert [(await queue.dequeue("claude-code", "r1")).id for _ in range(3)] == ["playground", "card", "step"]
+
+    async def test_busy_repo_does_not_starve_others(self, queue):
+        """A repo with many running jobs yields to a repo with none."""
+        for i in range(10):
+            await queue.enqueue(make_scheduled_job(f"a-{i}", "repo-a", pipeline_run_id="run-a"))
+        await queue.enqueue(make_scheduled_job("b-0", "repo-b", pipeline_run_id="run-b"))
+
+        assert (await queue.dequeue("claude-code", "r1")).id == "a-0"
+        assert (await queue.dequeue("claude-code", "r2")).id == "b-0"
+        assert (await queue.dequeue("claude-code", "r3")).id == "a-1"
+
+    async def test_weighted_share(self):
+        """A repo with twice the weight gets twice the running jobs."""
+        queue = JobQueue(SchedulingPolicy(repo_weights={"repo-a": 2}))
+        for i in range(6):
+            await queue.enqueue(make_scheduled_job(f"a-{i}", "repo-a"))
+            await queue.enqueue(make_scheduled_job(f"b-{i}", "repo-b"))
+
+        picked = [(await queue.dequeue("claude-code", f"r{i}")).repo_id for i in range(6)]
+
+        assert picked.count("repo-a") == 4
+        assert picked.count("repo-b") == 2
+
+    async def test_repo_concurrency_cap(self):
+        """Jobs of a repo at its cap wait until one of its jobs finishes."""
+        queue = JobQueue(SchedulingPolicy(repo_concurrency=1))
+        await queue.enqueue(make_scheduled_job("a-1", "repo-a", is_playground=True))
+        await queue.enqueue(make_scheduled_job("a-2", "repo-a", is_playground=True))
+        await queue.enqueue(make_scheduled_job("b-1", "repo-b"))
+
+        assert (await queue.dequeue("claude-code", "r1")).id == "a-1"
+        assert (await queue.dequeue("claude-code", "r2")).id == "b-1"
+        assert await queue.dequeue("claude-code", "r3") is None
+
+        queue.remove_pending("a-1")
+        assert (await queue.dequeue("claude-code", "r3")).id == "a-2"
+
+    async def test_pipeline_concurrency_cap(self):
+        """Steps of a pipeline run at its cap wait; other runs are not held back."""
+        queue = JobQueue(SchedulingPolicy(pipeline_concurrency=1))
+        await queue.enqueue(make_scheduled_job("run1-a", pipeline_run_id="run-1"))
+        await queue.enqueue(make_scheduled_job("run1-b", pipeline_run_id="run-1"))
+        await queue.enqueue(make_scheduled_job("run2-a", pipeline_run_id="run-2"))
+
+        assert (await queue.dequeue("claude-code", "r1")).id == "run1-a"
+        assert (await queue.dequeue("claude-code", "r2")).id == "run2-a"
+        assert await queue.dequeue("claude-code", "r3") is None
+        assert queue.scheduling_stats()["pipelines"][0] == {
+            "pipeline_run_id": "run-1", "queued": 1, "running": 1, "capped": True,
+        }
+
+    async def test_requeued_job_stops_counting_as_running(self):
+        """A job put back after its runner went away frees its repo's slot."""
+        queue = JobQueue(SchedulingPolicy(repo_concurrency=1))
+        job = make_scheduled_job("a-1")
+        await queue.enqueue(job)
+        await queue.dequeue("claude-code", "r1")
+
+        await queue.enqueue(job)
+
+        assert (await queue.dequeue("claude-code", "r2")) is job
+
+    async def test_finished_job_wakes_capped_waiter(self):
+        """A long-poll blocked by a cap returns as soon as the repo is back under it."""
+        import asyncio
+
+        queue = JobQueue(SchedulingPolicy(repo_concurrency=1))
+        await queue.enqueue(make_scheduled_job("a-1"))
+        await queue.enqueue(make_scheduled_job("a-2"))
+        await queue.dequeue("claude-code", "r1")
+
+        waiter = asyncio.create_task(queue.wait_for_job("claude-code", timeout=5.0, runner_id="r2"))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+
+        queue.remove_pending("a-1")
+        job = await asyncio.wait_for(waiter, timeout=1.0)
+        assert job.id == "a-2"
+
+    async def test_decisions_are_recorded(self, queue):
+        await queue.enqueue(make_scheduled_job("card"))
+        await queue.dequeue("claude-code", "r1")
+
+        stats = queue.scheduling_stats()
+        decision = stats["recent_decisions"][-1]
+        assert decision["job_id"] == "card"
+        assert decision["priority"] == "card"
+        assert decision["runner_id"] == "r1"
+        assert stats["running"] == 1
+        assert stats["repos"][0]["running"] == 1
+
+        queue.remove_pending("card")
+        assert queue.scheduling_stats()["running"] == 0
@@ -0,0 +1,291 @@
+"""
+Unit tests for job_store.py - database journal of the job queue.
+
+These tests verify:
+- Queued and assigned jobs are written to the job_queue table
+- Finished, cancelled and cleared jobs are removed from it
+- A new JobQueue rehydrates queued and assigned jobs from the store
+- The claim query is served by the (state, runner_type, created_at) index
+"""
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+# Add backend to path for imports
+backend_path = Path(__file__).parent.parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from app.models import QueuedJobRecord
+from app.services.job_queue import JobQueue, QueuedJob
+from app.services.job_store import JobStore, JobStoreError, deserialize_job, serialize_job
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+
+@pytest.fixture
+def session_factory(async_engine):
+    return async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def queue(session_factory):
+    """A JobQueue persisting through a JobStore on the test database."""
+    queue = JobQueue()
+    await queue.attach_store(JobStore(session_factory))
+    return queue
+
+
+def make_job(job_id: str, **fields) -> QueuedJob:
+    job = QueuedJob(
+        id=job_id,
+        card_id="card-default",
+        repo_id="repo-default",
+        repo_url="",
+        base_branch="main",
+        card_title="Test Job",
+        card_description="Test description",
+    )
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return job
+
+
+async def rows(session_factory) -> dict[str, QueuedJobRecord]:
+    async with session_factory() as session:
+        result = await session.execute(select(QueuedJobRecord))
+        return {record.id: record for record in result.scalars()}
+
+
+# -----------------------------------------------------------------------------
+# Serialization Tests
+# -----------------------------------------------------------------------------
+
+class TestSerialization:
+
+    def test_round_trip(self):
+        job = make_job(
+            "job-1",
+            step_type="script",
+            step_config={"command": "make test", "env": {"A": "1"}},
+            agent_file_ids=["a", "b"],
+            pipeline_run_id="run-1",
+            created_at=datetime(2025, 1, 2, 3, 4, 5),
+        )
+        assert deserialize_job(serialize_job(job)) == job
+
+    def test_ignores_unknown_fields(self):
+        payload = serialize_job(make_job("job-1")).replace('"id"', '"retired_field": 1, "id"')
+        assert deserialize_job(payload).id == "job-1"
+
+
+# -----------------------------------------------------------------------------
+# Persistence Tests
+# -----------------------------------------------------------------------------
+
+class TestPersistence:
+
+    async def test_enqueue_writes_queued_row(self, queue, session_factory):
+        await queue.enqueue(make_job("job-1", runner_type="gemini"))
+
+        record = (await rows(session_factory))["job-1"]
+        assert record.state == "queued"
+        assert record.runner_type == "gemini"
+        assert record.runner_id is None
+
+    async def test_dequeue_marks_row_assigned(self, queue, session_factory):
+        await queue.enqueue(make_job("job-1"))
+        await queue.dequeue("claude-code", "runner-1")
+
+        record = (await rows(session_factory))["job-1"]
+        assert record.state == "assigned"
+        assert record.runner_id == "runner-1"
+        assert record.assigned_runner_type == "claude-code"
+        assert record.assigned_at is not None
+
+    async def test_requeue_resets_row(self, queue, session_factory):
+        job = make_job("job-1")
+        await queue.enqueue(job)
+        await queue.dequeue("claude-code", "runner-1")
+        await queue.enqueue(job)
+
+        record = (await rows(session_factory))["job-1"]
+        assert record.state == "queued"
+        assert record.runner_id is None
+
+    async def test_finished_and_cancelled_jobs_are_removed(self, queue, session_factory):
+        await queue.enqueue(make_job("done"))
+        await queue.enqueue(make_job("cancelled"))
+        await queue.dequeue("claude-code", "runner-1")
+
+        queue.remove_pending("done")
+        await queue.cancel("cancelled")
+        await queue.flush()
+
+        assert await rows(session_factory) == {}
+
+    async def test_clear_removes_all_rows(self, queue, session_factory):
+        await queue.enqueue(make_job("job-1"))
+        await queue.enqueue(make_job("job-2"))
+        await queue.clear()
+
+        assert await rows(session_factory) == {}
+
+    async def test_playground_jobs_are_not_persisted(self, queue, session_factory):
+        await queue.enqueue(make_job("playground", is_playground=True))
+        await queue.dequeue("claude-code", "runner-1")
+
+        assert await rows(session_factory) == {}
+
+    async def test_changes_are_batched(self, session_factory):
+        """Changes recorded before a flush are written in one go."""
+        store = JobStore(session_factory)
+        for i in range(5):
+            store.queued(make_job(f"job-{i}"))
+        store.done("job-0")
+
+        assert await store.flush() == 6
+        assert await store.flush() == 0
+        assert sorted(await rows(session_factory)) == ["job-1", "job-2", "job-3", "job-4"]
+
+
+# -----------------------------------------------------------------------------
+# Rehydration Tests
+# -----------------------------------------------------------------------------
+
+class TestRehydrate:
+
+    async def test_new_queue_resumes_where_old_one_stopped(self, queue, session_factory):
+        """After a restart, queued jobs keep their order and assignments come back."""
+        registration = {"name": "big-box", "slots": 8, "capacity": {"cpus": 32.0}}
+        for job_id in ("first", "second", "third"):
+            await queue.enqueue(make_job(job_id))
+        await queue.dequeue("gemini", "runner-1", registration=registration)
+
+        restarted = JobQueue()
+        assigned = await restarted.attach_store(JobStore(session_factory))
+
+        assert [(job.id, runner_id, runner_type, reg) for job, runner_id, runner_type, reg in assigned] == [
+            ("first", "runner-1", "gemini", registration),
+        ]
+        assert restarted.queue_size == 2
+        assert restarted.get_pending("first") is not None
+        assert restarted.scheduling_stats()["running"] == 1
+        assert (await restarted.dequeue("claude-code", "runner-2")).id == "second"
+        assert (await restarted.dequeue("claude-code", "runner-2")).id == "third"
+
+    async def test_restored_job_completes(self, queue, session_factory):
+        await queue.enqueue(make_job("job-1"))
+        await queue.dequeue("claude-code", "runner-1")
+
+        restarted = JobQueue()
+        await restarted.attach_store(JobStore(session_factory))
+        restarted.remove_pending("job-1")
+        await restarted.flush()
+
+        assert await rows(session_factory) == {}
+        assert restarted.pending_count == 0
+
+    async def test_empty_store(self, session_factory):
+        queue = JobQueue()
+        assert await queue.attach_store(JobStore(session_factory)) == []
+        assert queue.queue_size == 0
+
+
+class TestClaimIndex:
+
+    async def test_claim_query_uses_index(self, async_engine):
+        async with async_engine.connect() as conn:
+            result = await conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM job_queue "
+                "WHERE state = 'queued' AND runner_type = 'gemini' ORDER BY created_at LIMIT 1"
+            ))
+            plan = " ".join(str(row[-1]) for row in result)
+
+        assert "ix_job_queue_claim" in plan
+        assert "TEMP B-TREE" not in plan
+
+
+# -----------------------------------------------------------------------------
+# Write Failure Tests
+# -----------------------------------------------------------------------------
+
+class FlakySessions:
+    """Session factory whose next `failures` sessions fail on execute, like a locked database."""
+
+    def __init__(self, session_factory, failures: int = 0):
+        self.session_factory = session_factory
+        self.failures = failures
+
+    def __call__(self):
+        session = self.session_factory()
+        if self.failures > 0:
+            self.failures -= 1
+
+            async def locked(*args, **kwargs):
+                raise RuntimeError("database is locked")
+
+            session.execute = locked
+        return session
+
+
+class TestWriteFailures:
+
+    @pytest.fixture(autouse=True)
+    def no_retry_delay(self, monkeypatch):
+        monkeypatch.setattr("app.services.job_store.FLUSH_RETRY_DELAY", 0)
+
+    async def test_transient_failure_is_retried(self, session_factory):
+        store = JobStore(FlakySessions(session_factory, failures=2))
+        store.queued(make_job("job-1"))
+
+        assert await store.flush() == 1
+        assert list(await rows(session_factory)) == ["job-1"]
+
+    async def test_failed_batch_is_kept_in_order(self, session_factory):
+        sessions = FlakySessions(session_factory, failures=3)
+        store = JobStore(sessions)
+        store.queued(make_job("job-1"))
+        store.queued(make_job("job-2"))
+
+        with pytest.raises(JobStoreError):
+            await store.flush()
+        store.done("job-1")
+
+        assert await store.flush() == 3
+        assert list(await rows(session_factory)) == ["job-2"]
+
+    async def test_dequeue_requeues_unrecorded_assignment(self, session_factory):
+        """A job whose assignment can't be written is not handed out."""
+        sessions = FlakySessions(session_factory)
+        queue = JobQueue()
+        await queue.attach_store(JobStore(sessions))
+        await queue.enqueue(make_job("job-1"))
+
+        sessions.failures = 3
+        assert await queue.dequeue("claude-code", "runner-1") is None
+        assert queue.queue_size == 1
+        assert queue.scheduling_stats()["running"] == 0
+
+        job = await queue.dequeue("claude-code", "runner-1")
+        assert job.id == "job-1"
+        assert (await rows(session_factory))["job-1"].state == "assigned"
+
+    async def test_enqueue_retries_failed_write_in_background(self, session_factory):
+        """A store failure doesn't fail enqueue; the job is written by a background flush."""
+        sessions = FlakySessions(session_factory)
+        store = JobStore(sessions)
+        queue = JobQueue()
+        await queue.attach_store(store)
+
+        sessions.failures = 3
+        assert await queue.enqueue(make_job("job-1")) == "job-1"
+        assert queue.queue_size == 1
+        await asyncio.gather(*store._flush_tasks)
+        assert (await rows(session_factory))["job-1"].state == "queued"
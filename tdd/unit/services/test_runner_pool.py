@@ -149,6 +149,23 @@ class TestRegister:
         runner = pool.register()
         assert runner.status == "idle"
 
+    def test_reregister_requeues_current_job(self, pool):
+        """A runner that registers again mid-job has lost it, so the job is requeued."""
+        runner = pool.register(runner_id="runner-1")
+        runner.status = "busy"
+        runner.current_job = make_job("lost-job")
+
+        def close_coro(coro):
+            coro.close()
+            return MagicMock()
+
+        with patch("asyncio.create_task", side_effect=close_coro) as mock_create_task:
+            pool.register(runner_id="runner-1")
+
+        assert runner.status == "idle"
+        assert runner.current_job is None
+        mock_create_task.assert_called_once()
+
 
 # -----------------------------------------------------------------------------
 # Unregister Tests
@@ -291,6 +308,39 @@ class TestGetJob:
 
         assert runner.logs == []
 
+    @pytest.mark.asyncio
+    async def test_get_job_long_polls_until_enqueue(self, pool):
+        """get_job(wait=...) returns the job as soon as it is enqueued."""
+        from app.services.job_queue import JobQueue
+
+        runner = pool.register()
+        queue = JobQueue()
+        with patch("app.services.runner_pool.job_queue", queue):
+            waiter = asyncio.create_task(pool.get_job(runner.id, wait=5))
+            await asyncio.sleep(0.01)
+            assert not waiter.done()
+            await queue.enqueue(make_job("late-job"))
+            job = await asyncio.wait_for(waiter, 0.5)
+
+        assert job.id == "late-job"
+        assert runner.status == "busy"
+
+    @pytest.mark.asyncio
+    async def test_long_poll_requeues_job_if_runner_went_away(self, pool):
+        """A job found after the runner unregistered goes back on the queue."""
+        from app.services.job_queue import JobQueue
+
+        runner = pool.register()
+        queue = JobQueue()
+        with patch("app.services.runner_pool.job_queue", queue):
+            waiter = asyncio.create_task(pool.get_job(runner.id, wait=5))
+            await asyncio.sleep(0.01)
+            pool.unregister(runner.id)
+            await queue.enqueue(make_job("orphan-job"))
+            assert await asyncio.wait_for(waiter, 0.5) is None
+
+        assert queue.queue_size == 1
+
 
 # -----------------------------------------------------------------------------
 # Complete Job Tests
@@ -328,6 +378,33 @@ class TestCompleteJob:
 
         assert result == job
 
+    def test_complete_restored_job(self, pool):
+        """A job restored after a backend restart completes like any other."""
+        job = make_job("restored-job")
+        runner = pool.restore_assignment("runner-1", job, "gemini")
+
+        assert pool.get_runner("runner-1") is runner
+        assert runner.runner_type == "gemini"
+        assert runner.status == "busy"
+        assert runner.is_alive(pool.HEARTBEAT_TIMEOUT)
+
+        with patch("app.services.runner_pool.job_queue"):
+            result = pool.complete_job("runner-1", success=True)
+
+        assert result is job
+        assert runner.status == "idle"
+
+    def test_restored_runner_keeps_registration(self, pool):
+        """A multi-slot runner comes back from a restart with all its slots, capacity and name."""
+        registration = {"name": "big-box", "slots": 8, "capacity": {"cpus": 32.0}}
+        runner = pool.restore_assignment("runner-1", make_job("restored-job"), "gemini", registration)
+
+        assert runner.name == "big-box"
+        assert runner.slots == 8
+        assert runner.capacity == {"cpus": 32.0}
+        assert runner.free_slots == 7
+        assert runner.status == "idle"
+
     def test_complete_job_returns_none_if_no_job(self, pool):
         """complete_job returns None if runner has no job."""
         runner = pool.register()
@@ -626,3 +703,111 @@ class TestCleanup:
         runner.status = "busy"
         pool._cleanup_dead_runners()
         assert runner.status == "busy"
+
+
+# -----------------------------------------------------------------------------
+# Multi-slot Tests
+# -----------------------------------------------------------------------------
+
+class TestMultiSlot:
+    """Tests for runners that run several jobs at once."""
+
+    @pytest.fixture
+    def queue(self):
+        from app.services.job_queue import JobQueue
+        queue = JobQueue()
+        with patch("app.services.runner_pool.job_queue", queue):
+            yield queue
+
+    def make_job(self, job_id: str, repo_id: str = "repo-default", **resources) -> QueuedJob:
+        job = make_job(job_id)
+        job.repo_id = repo_id
+        if resources:
+            job.step_config = {"resources": resources}
+        return job
+
+    async def test_get_jobs_fills_free_slots(self, pool, queue):
+        runner = pool.register(slots=3)
+        for i in range(5):
+            await queue.enqueue(self.make_job(f"job-{i}"))
+
+        jobs = await pool.get_jobs(runner.id)
+
+        assert [job.id for job in jobs] == ["job-0", "job-1", "job-2"]
+        assert list(runner.jobs) == ["job-0", "job-1", "job-2"]
+        assert runner.current_job.id == "job-0"
+        assert runner.status == "busy"
+        assert await pool.get_jobs(runner.id) == []
+
+    async def test_max_jobs_limits_batch(self, pool, queue):
+        runner = pool.register(slots=3)
+        for i in range(3):
+            await queue.enqueue(self.make_job(f"job-{i}"))
+
+        assert len(await pool.get_jobs(runner.id, max_jobs=2)) == 2
+        assert runner.status == "idle"
+        assert runner.free_slots == 1
+
+    async def test_capacity_limits_concurrent_jobs(self, pool, queue):
+        """Jobs that don't fit the runner's leftover capacity stay queued for others."""
+        runner = pool.register(slots=4, capacity={"cpus": 4})
+        await queue.enqueue(self.make_job("big", repo_id="repo-a", cpus=3))
+        await queue.enqueue(self.make_job("too-big", repo_id="repo-b", cpus=2))
+        await queue.enqueue(self.make_job("small", repo_id="repo-c", cpus=1))
+        await queue.enqueue(self.make_job("unsized", repo_id="repo-d"))
+
+        jobs = await pool.get_jobs(runner.id)
+
+        assert [job.id for job in jobs] == ["big", "small", "unsized"]
+        assert queue.queue_size == 1
+        assert runner.resources_in_use() == {"cpus": 4.0}
+
+    async def test_complete_by_job_id_frees_one_slot(self, pool, queue):
+        runner = pool.register(slots=2)
+        await queue.enqueue(self.make_job("first"))
+        await queue.enqueue(self.make_job("second"))
+        await pool.get_jobs(runner.id)
+
+        completed = pool.complete_job(runner.id, success=True, job_id="second")
+
+        assert completed.id == "second"
+        assert list(runner.jobs) == ["first"]
+        assert runner.status == "idle"
+        assert pool.complete_job(runner.id, success=True, job_id="second") is None
+
+    async def test_logs_are_kept_per_job(self, pool, queue):
+        runner = pool.register(slots=2)
+        await queue.enqueue(self.make_job("first"))
+        await queue.enqueue(self.make_job("second"))
+        await pool.get_jobs(runner.id)
+
+        pool.append_log(runner.id, "a", job_id="first")
+        pool.append_log(runner.id, "b", job_id="second")
+        pool.append_log(runner.id, "c", job_id="first")
+
+        assert pool.get_job_logs(runner.id, "first") == ["a", "c"]
+        assert pool.get_job_logs(runner.id, "second") == ["b"]
+        assert pool.get_logs(runner.id) == ["a", "b", "c"]
+
+    def test_single_slot_job_logs_are_runner_logs(self, pool):
+        runner = pool.register()
+        runner.current_job = make_job("only")
+        pool.append_log(runner.id, "untagged")
+        assert pool.get_job_logs(runner.id, "only") == ["untagged"]
+
+    async def test_stalled_job_is_requeued(self, pool, queue):
+        """A job whose slot stops heartbeating goes back to the queue; its runner keeps going."""
+        runner = pool.register(slots=2)
+        await queue.enqueue(self.make_job("stalled"))
+        await queue.enqueue(self.make_job("healthy"))
+        await pool.get_jobs(runner.id)
+        pool.heartbeat(runner.id, job_id="stalled")
+        pool.heartbeat(runner.id, job_id="healthy")
+        runner.job_heartbeats["stalled"] -= timedelta(seconds=pool.HEARTBEAT_TIMEOUT + 1)
+
+        pool._cleanup_dead_runners()
+        await asyncio.sleep(0)
+
+        assert list(runner.jobs) == ["healthy"]
+        assert runner.status == "idle"
+        assert queue.queue_size == 1